@@ -41,10 +41,11 @@ def create_app(config=None):
         logger.debug("Applied custom configuration")
     
     # Register blueprints
-    from api.routes import portfolio, options, recommendations
+    from api.routes import portfolio, options, recommendations, metrics
     app.register_blueprint(portfolio.bp)
     app.register_blueprint(options.bp)
     app.register_blueprint(recommendations.bp)
+    app.register_blueprint(metrics.bp)
     logger.info("Registered API blueprints")
     
     @app.route('/health')
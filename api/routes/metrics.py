@@ -0,0 +1,48 @@
+"""
+Latency metrics API routes
+"""
+
+from flask import Blueprint, request, jsonify
+from core.metrics import get_metrics
+
+bp = Blueprint('metrics', __name__, url_prefix='/api/metrics')
+
+@bp.route('', methods=['GET'])
+def get_latency_metrics():
+    """
+    Get latency histograms and counters of IB operations
+    
+    Query Parameters:
+        operation: Only include this operation (e.g. get_option_chain, first_tick)
+        symbol: Only include this symbol's series
+        symbols: 'false' to leave out the per-symbol breakdown
+    """
+    try:
+        return jsonify(get_metrics().snapshot(
+            operation=request.args.get('operation'),
+            symbol=request.args.get('symbol'),
+            include_symbols=request.args.get('symbols', 'true').lower() != 'false'
+        ))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/log', methods=['POST'])
+def log_latency_metrics():
+    """
+    Write a summary line per operation to the TWS log
+    """
+    try:
+        return jsonify({'success': True, 'operations': get_metrics().log_summary()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/reset', methods=['POST'])
+def reset_latency_metrics():
+    """
+    Discard the metrics recorded so far
+    """
+    try:
+        get_metrics().reset()
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
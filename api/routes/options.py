@@ -2,7 +2,7 @@
 Options API routes
 """
 
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
 from api.services.options_service import OptionsService
 import traceback
 import logging
@@ -16,6 +16,9 @@ logger = logging.getLogger('api.routes.options')
 bp = Blueprint('options', __name__, url_prefix='/api/options')
 options_service = OptionsService()
 
+# Most requests accepted by one call to the batch OTM endpoint
+MAX_BATCH_REQUESTS = 200
+
 # Market status is now checked directly in the route functions
 
 # Helper function to check market status with better error handling
@@ -45,6 +48,56 @@ def otm_options():
     
     return jsonify(result)
 
+@bp.route('/otm/batch', methods=['POST'])
+def otm_options_batch():
+    """
+    Get OTM option data for many tickers in one request, streamed as NDJSON.
+    
+    Request body:
+        {"requests": [{"ticker": "AAPL", "optionType": "PUT", "otm": 10, "expiration": "nearest"}, ...]}
+        optionType (optional): 'CALL' or 'PUT'; both when omitted
+        otm (optional): OTM percentage (default: 10)
+        expiration (optional): YYYYMMDD, 'nearest' for the first listed expiration,
+                               or omitted for the closest Friday
+    
+    Returns:
+        application/x-ndjson response with one JSON object per line: one per
+        request as soon as it finishes (see OptionsService.iter_otm_batch),
+        then a final {"done": true, ...} line
+    """
+    body = request.get_json(silent=True)
+    items = body.get('requests') if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Request body must contain a non-empty 'requests' list"}), 400
+    if len(items) > MAX_BATCH_REQUESTS:
+        return jsonify({"error": f"At most {MAX_BATCH_REQUESTS} requests per batch"}), 400
+    
+    specs = []
+    for i, item in enumerate(items):
+        ticker = item.get('ticker') if isinstance(item, dict) else None
+        if not isinstance(ticker, str) or not ticker.strip():
+            return jsonify({"error": f"Request {i} has no ticker"}), 400
+        option_type = item.get('optionType')
+        if option_type and option_type not in ['CALL', 'PUT']:
+            return jsonify({"error": f"Invalid optionType in request {i}: {option_type}. Must be 'CALL' or 'PUT'"}), 400
+        try:
+            otm_percentage = float(item.get('otm', 10))
+        except (TypeError, ValueError):
+            return jsonify({"error": f"Invalid otm in request {i}: {item.get('otm')}"}), 400
+        specs.append({
+            'ticker': ticker.strip().upper(),
+            'option_type': option_type or None,
+            'otm_percentage': otm_percentage,
+            'expiration': item.get('expiration') or None
+        })
+    
+    def generate():
+        for result in options_service.iter_otm_batch(specs):
+            yield json.dumps(result) + '\n'
+    
+    # Disable proxy buffering so each line reaches the client when it is ready
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
 @bp.route('/stock-price', methods=['GET'])
 def get_stock_price():
     """
@@ -209,15 +262,18 @@ def execute_order(order_id):
 @bp.route('/check-orders', methods=['POST'])
 def check_orders():
     """
-    Check status of pending/processing orders with TWS API and update them in the database.
+    Get the current status of submitted orders from the database.
+    
+    The order sync worker keeps the database in step with TWS, so this
+    endpoint makes no TWS requests.
     
     Returns:
-        JSON response with updated orders
+        JSON response with the submitted orders
     """
     logger.info("POST /check-orders request received")
     
     try:
-        # Use the options service to check and update order statuses
+        # Use the options service to read the synced order statuses
         response = options_service.check_pending_orders()
         
         # Return the response from the service
@@ -429,4 +485,122 @@ def get_option_expirations():
         logger.error(f"Error getting option expirations for {request.args.get('ticker', 'unknown')}: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({"error": str(e)}), 500
-       
\ No newline at end of file
+
+@bp.route('/surface', methods=['GET'])
+def get_option_surface():
+    """
+    Get quotes and greeks for several expirations as a strike x expiry grid.
+    
+    Query parameters:
+        ticker (str): The ticker symbol (e.g., 'NVDA')
+        expirations (str, optional): Comma-separated expiration dates (YYYYMMDD)
+        optionType (str, optional): 'CALL' or 'PUT'; both when omitted
+        window (float, optional): Strike window in percent around the stock price (default 15)
+        maxStrikes (int, optional): Number of strikes nearest the stock price to keep
+        minDelta, maxDelta (float, optional): Absolute delta band to keep
+        
+    Returns:
+        JSON response with the expirations and strikes axes and a grid per right
+    """
+    ticker = request.args.get('ticker')
+    if not ticker:
+        return jsonify({"error": "No ticker provided"}), 400
+    
+    try:
+        expirations = [e.strip() for e in request.args.get('expirations', '').split(',') if e.strip()]
+        strike_window_pct = float(request.args.get('window', 15))
+        max_strikes = request.args.get('maxStrikes', type=int)
+        min_delta = request.args.get('minDelta', type=float)
+        max_delta = request.args.get('maxDelta', type=float)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    delta_band = None
+    if min_delta is not None or max_delta is not None:
+        delta_band = (min_delta or 0.0, max_delta if max_delta is not None else 1.0)
+    
+    try:
+        result = options_service.get_option_surface(
+            ticker,
+            expirations=expirations or None,
+            option_type=request.args.get('optionType'),
+            strike_window_pct=strike_window_pct,
+            max_strikes=max_strikes,
+            delta_band=delta_band
+        )
+        if "error" in result:
+            status = 400 if result["error"].startswith("Invalid option_type") else 404
+            return jsonify(result), status
+        return jsonify(result)
+    
+    except Exception as e:
+        logger.error(f"Error getting option surface for {ticker}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/volatility', methods=['GET'])
+def get_volatility_stats():
+    """
+    Get realized volatility and implied volatility rank from stored daily history.
+    
+    Query parameters:
+        ticker (str): The ticker symbol (e.g., 'NVDA')
+        lookbackDays (int, optional): Calendar days of history for the IV rank (default 365)
+        windows (str, optional): Comma-separated realized volatility windows in trading days (default 10,20,60)
+        
+    Returns:
+        JSON response with realized volatility by window and the IV rank and percentile
+    """
+    ticker = request.args.get('ticker')
+    if not ticker:
+        return jsonify({"error": "No ticker provided"}), 400
+    
+    try:
+        lookback_days = int(request.args.get('lookbackDays', 365))
+        windows = tuple(int(w) for w in request.args.get('windows', '10,20,60').split(',') if w.strip())
+    except ValueError as e:
+        return jsonify({"error": f"Invalid parameter: {e}"}), 400
+    if lookback_days <= 0 or not windows or min(windows) < 2:
+        return jsonify({"error": "lookbackDays must be positive and windows at least 2"}), 400
+    
+    try:
+        result = options_service.get_volatility_stats(ticker, lookback_days=lookback_days, windows=windows)
+        if "error" in result:
+            return jsonify(result), 404
+        return jsonify(result)
+    
+    except Exception as e:
+        logger.error(f"Error getting volatility stats for {ticker}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
+
+@bp.route('/chain-cache/refresh', methods=['POST'])
+def refresh_option_chains():
+    """
+    Reload cached option chain metadata, e.g. ahead of the market open.
+    
+    Request body (optional):
+        tickers (list): Ticker symbols to reload; defaults to every cached ticker
+        
+    Returns:
+        JSON response mapping each ticker to whether it was refreshed
+    """
+    logger.info("POST /chain-cache/refresh request received")
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        tickers = data.get('tickers')
+        if isinstance(tickers, str):
+            tickers = [t.strip() for t in tickers.split(',') if t.strip()]
+            
+        result = options_service.refresh_option_chains(tickers)
+        
+        if "error" in result:
+            logger.error(f"Error refreshing option chains: {result['error']}")
+            return jsonify(result), 500
+            
+        return jsonify(result)
+        
+    except Exception as e:
+        logger.error(f"Error refreshing option chains: {str(e)}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": str(e)}), 500
@@ -5,78 +5,57 @@ Handles options data retrieval and processing
 
 import logging
 import math
-import random
+import operator
 import time
-from datetime import datetime, timedelta, time as datetime_time
-import pandas as pd
-from core.connection import IBConnection, Option, Stock, suppress_ib_logs
+from datetime import datetime, timedelta, timezone, time as datetime_time
+import numpy as np
+from core.connection import (IBConnection, Option, Stock, suppress_ib_logs, request_priority,
+                             PRIORITY_ORDERS, PRIORITY_SCREENER)
+from core.history import iv_rank, realized_volatility
 from core.utils import get_closest_friday, get_next_monthly_expiration, is_market_hours
 from config import Config
 from db.database import OptionsDatabase
+from core.connection_pool import get_connection_pool
+from core.response_cache import get_response_cache
 import traceback
 import concurrent.futures
+import contextvars
 from functools import partial
 import json
 
 logger = logging.getLogger('api.services.options')
 
+# Numeric option fields _process_options_chain reads into columns
+CHAIN_COLUMNS = ('strike', 'bid', 'ask', 'last', 'open_interest', 'implied_volatility', 'delta', 'gamma', 'theta', 'vega')
+_chain_fields = operator.itemgetter(*CHAIN_COLUMNS)
+
+
+# Most tickers get_otm_options processes at once. Workers only wait on the
+# shared connection's I/O thread, where their IB requests overlap.
+MAX_TICKER_WORKERS = 32
+
 class OptionsService:
     """
     Service for handling options data operations
     """
     def __init__(self):
         self.config = Config()
-        self.connection = None
         db_path = self.config.get('db_path')
         self.db = OptionsDatabase(db_path)
         self.portfolio_service = None  # Will be initialized when needed
+        # Per-ticker OTM results, shared by every OptionsService in the process
+        self.otm_cache = get_response_cache('otm_cache', ttl=self.config.get('otm_cache_ttl', 10),
+                                            stale_ttl=self.config.get('otm_cache_stale_ttl', 60))
         
     def _ensure_connection(self):
         """
-        Ensure that the IB connection exists and is connected.
-        Reuses existing connection if already established.
+        Borrow the shared IB connection from the process-wide connection pool.
+        The pool connects (or reconnects) with a stable client ID when needed.
         """
         try:
-            # If we already have a connected instance, just return it
-            if self.connection is not None and self.connection.is_connected():
-                logger.debug("Reusing existing TWS connection")
-                return self.connection
-            
-            # If connection exists but is disconnected, try to reconnect with same client ID
-            if self.connection is not None:
-                logger.info("Existing connection found but disconnected, attempting to reconnect")
-                if self.connection.connect():
-                    logger.info("Successfully reconnected to TWS/IB Gateway with existing client ID")
-                    return self.connection
-                else:
-                    logger.warning("Failed to reconnect with existing client ID, will create new connection")
-        
-            # No connection or reconnection failed, create a new one
-            # Generate a unique client ID based on current timestamp and random number
-            unique_client_id = int(time.time() % 10000) + random.randint(1000, 9999)
-            logger.info(f"Creating new TWS connection with client ID: {unique_client_id}")
-            
-            port = self.config.get('port', 7497)
-            
-            self.connection = IBConnection(
-                host=self.config.get('host', '127.0.0.1'),
-                port=port,
-                client_id=unique_client_id,  # Use the unique client ID instead of fixed ID 1
-                timeout=self.config.get('timeout', 20),
-                readonly=self.config.get('readonly', True)
-            )
-            
-            # Try to connect with proper error handling
-            if not self.connection.connect():
-                logger.error("Failed to connect to TWS/IB Gateway")
-                return None
-            else:
-                logger.info("Successfully connected to TWS/IB Gateway")
-                return self.connection
+            return get_connection_pool().get()
         except Exception as e:
             logger.error(f"Error ensuring connection: {str(e)}")
-            if "There is no current event loop" in str(e):
-                logger.error("Asyncio event loop error - please check connection.py for proper handling")
             return None
         
     def _adjust_to_standard_strike(self, price):
@@ -91,6 +70,7 @@ class OptionsService:
         """
         return round(price)
       
+    @request_priority(PRIORITY_ORDERS)
     def execute_order(self, order_id, db):
         """
         Execute an order by sending it to TWS
@@ -137,7 +117,6 @@ class OptionsService:
             # Get order details directly (no more nested JSON)
             ticker = order.get('ticker')
             if not ticker:
-                conn.disconnect()
                 return {
                     "success": False,
                     "error": "Missing ticker in order details"
@@ -145,7 +124,6 @@ class OptionsService:
                 
             quantity = int(order.get('quantity', 0))
             if quantity <= 0:
-                conn.disconnect()
                 return {
                     "success": False,
                     "error": "Invalid quantity"
@@ -160,7 +138,6 @@ class OptionsService:
             option_type = order.get('option_type')
             
             if not all([expiry, strike, option_type]):
-                conn.disconnect()
                 return {
                     "success": False,
                     "error": "Missing option details (expiry, strike, or option_type)"
@@ -262,7 +239,6 @@ class OptionsService:
             )
             
             if not contract:
-                conn.disconnect()
                 return {
                     "success": False,
                     "error": "Failed to create option contract"
@@ -277,7 +253,6 @@ class OptionsService:
             )
             logger.debug(f"Created IB order: {ib_order}")
             if not ib_order:
-                conn.disconnect()
                 return {
                     "success": False,
                     "error": "Failed to create order"
@@ -285,7 +260,6 @@ class OptionsService:
                 
             # Place order
             result = conn.place_order(contract, ib_order)
-            conn.disconnect()
             
             if not result:
                 return {
@@ -341,10 +315,19 @@ class OptionsService:
                 "error": str(e)
             }, 500
       
+    @request_priority(PRIORITY_SCREENER)
     def get_otm_options(self, ticker, otm_percentage=10, option_type=None, expiration=None):
         """
         Get option contracts that are OTM by the specified percentage
         
+        Several tickers are processed concurrently on the shared connection:
+        portfolio positions are loaded once, then each ticker's stock quote,
+        chain metadata and option snapshots are requested from its own worker
+        thread, so the requests of all tickers overlap on the I/O thread.
+        Each ticker's result is served from the OTM response cache while it is
+        fresh: for `otm_cache_ttl` seconds intraday and until the next market
+        open outside market hours.
+        
         Args:
             ticker (str): Ticker symbol or comma-separated list of tickers
             otm_percentage (float): Percentage OTM to filter by
@@ -352,7 +335,7 @@ class OptionsService:
             expiration (str, optional): Filter by specific expiration date
             
         Returns:
-            dict: Dictionary of option data
+            dict: Dictionary of option data keyed by ticker under 'data'
         """
         start_time = time.time()
         
@@ -366,32 +349,166 @@ class OptionsService:
         if not conn:
             logger.error("Failed to establish connection to IB")
         
-        is_market_open = is_market_hours()
-        
-        # If no tickers provided, get them from portfolio
-        tickers = [ticker]
+        # Split a comma-separated list, keeping the first occurrence of each ticker
+        tickers = list(dict.fromkeys(t.strip() for t in (ticker or '').split(',') if t.strip()))
         if not tickers:
             logger.info("No tickers found, unable to proceed")
             return {'error': 'No tickers found for processing'}
-                
-        # Process each ticker
-        result = {}
         
-        for ticker in tickers:
+        # Index positions once for all tickers
+        position_index = self._get_position_index()
+        
+        def process(ticker):
             try:
-                ticker_data = self._process_ticker_for_otm(conn, ticker, otm_percentage, expiration, is_market_open, option_type)
-                result[ticker] = ticker_data
+                return self._get_cached_otm(conn, ticker, otm_percentage, expiration, option_type, position_index)
             except Exception as e:
                 logger.error(f"Error processing {ticker} for OTM options: {e}")
                 logger.error(traceback.format_exc())
-                result[ticker] = {"error": str(e)}
+                return {"error": str(e)}
+        
+        if len(tickers) == 1:
+            result = {tickers[0]: process(tickers[0])}
+        else:
+            workers = min(len(tickers), MAX_TICKER_WORKERS)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='otm') as executor:
+                # Copy the context so workers keep this request's IB priority
+                futures = [executor.submit(contextvars.copy_context().run, process, t) for t in tickers]
+                result = {t: future.result() for t, future in zip(tickers, futures)}
         
         elapsed = time.time() - start_time
+        logger.debug(f"Processed {len(tickers)} tickers for OTM options in {elapsed:.2f}s")
         
         # Return the results
         return {'data': result}
+    
+    def iter_otm_batch(self, specs):
+        """
+        Process several OTM option requests concurrently, yielding each result as soon as it is ready
+        
+        Every spec names a ticker, option type, OTM percentage and expiration,
+        so a dashboard refresh with per-ticker settings needs one call instead
+        of one request per ticker and option type. Positions are loaded once;
+        an expiration of 'nearest' is resolved to the first listed expiration
+        from the cached chain metadata.
+        
+        Args:
+            specs (list): Dicts with 'ticker', 'option_type' ('CALL', 'PUT' or None),
+                          'otm_percentage' and 'expiration' (YYYYMMDD, 'nearest' or None)
+            
+        Yields:
+            dict: One per spec in completion order, with 'index' (position in specs),
+                  'ticker', 'option_type', 'otm_percentage', 'expiration' and 'data'
+                  (the ticker's entry as returned by get_otm_options), plus the listed
+                  'expirations' when 'nearest' was resolved, followed by
+                  {'done': True, 'count': int, 'elapsed': float}
+        """
+        start_time = time.time()
+        conn = self._ensure_connection()
+        if not conn:
+            logger.error("Failed to establish connection to IB")
+        
+        position_index = self._get_position_index()
+        
+        def process(index, spec):
+            ticker = spec['ticker']
+            expiration = spec.get('expiration')
+            expirations = None
+            try:
+                if expiration == 'nearest':
+                    expirations = self.get_option_expirations(ticker).get('expirations') or []
+                    expiration = expirations[0]['value'] if expirations else None
+                data = self._get_cached_otm(conn, ticker, spec.get('otm_percentage', 10), expiration,
+                                            spec.get('option_type'), position_index)
+            except Exception as e:
+                logger.error(f"Error processing {ticker} for OTM options: {e}")
+                logger.error(traceback.format_exc())
+                data = {"error": str(e)}
+            result = {
+                'index': index,
+                'ticker': ticker,
+                'option_type': spec.get('option_type'),
+                'otm_percentage': spec.get('otm_percentage', 10),
+                'expiration': expiration,
+                'data': data
+            }
+            if expirations is not None:
+                result['expirations'] = expirations
+            return result
+        
+        count = 0
+        if specs:
+            workers = min(len(specs), MAX_TICKER_WORKERS)
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='otm-batch')
+            try:
+                # Set the priority only while submitting: this generator may be
+                # resumed in another context, so it must not hold a context token
+                with request_priority(PRIORITY_SCREENER):
+                    futures = [executor.submit(contextvars.copy_context().run, process, i, spec)
+                               for i, spec in enumerate(specs)]
+                for future in concurrent.futures.as_completed(futures):
+                    count += 1
+                    yield future.result()
+            finally:
+                # Drop queued specs if the client stopped reading the stream
+                executor.shutdown(wait=False, cancel_futures=True)
+        
+        elapsed = time.time() - start_time
+        logger.debug(f"Processed a batch of {count} OTM option requests in {elapsed:.2f}s")
+        yield {'done': True, 'count': count, 'elapsed': round(elapsed, 3)}
+    
+    def _get_cached_otm(self, conn, ticker, otm_percentage, expiration, option_type, position_index):
+        """
+        Get one ticker's OTM options from the response cache, processing the ticker on a miss
+        
+        Entries are keyed by (ticker, OTM %, option type, expiration) and follow
+        the market session (see ResponseCache). The position is always taken
+        from the current position index, so it is never stale.
+        
+        Args:
+            conn (IBConnection): Connection to Interactive Brokers
+            ticker (str): Ticker symbol
+            otm_percentage (float): Percentage OTM to filter by
+            expiration (str, optional): Expiration date in YYYYMMDD format; the closest Friday if None
+            option_type (str, optional): Filter by option type ('CALL' or 'PUT')
+            position_index (PositionIndex, optional): Portfolio positions
+            
+        Returns:
+            dict: The ticker's entry as returned by get_otm_options
+        """
+        target_expiration = expiration or get_closest_friday().strftime('%Y%m%d')
+        key = (ticker.upper(), float(otm_percentage), option_type, target_expiration)
+        
+        def load():
+            # Checked on every load, since a background reload may run after the session changed
+            return self._process_ticker_for_otm(conn, ticker, otm_percentage, target_expiration, is_market_hours(),
+                                                option_type, position_index=position_index)
         
-    def _process_ticker_for_otm(self, conn, ticker, otm_percentage, expiration=None, is_market_open=None, option_type=None):
+        result = self.otm_cache.get(key, load, symbol=ticker,
+                                    cacheable=lambda value: isinstance(value, dict) and 'error' not in value)
+        result = dict(result)
+        if position_index is not None:
+            result['position'] = position_index.shares(ticker)
+        return result
+    
+    def _get_position_index(self):
+        """
+        Get the portfolio positions used to report position sizes
+        
+        Returns:
+            PositionIndex: Index from PortfolioService.get_position_index, or None if error
+        """
+        try:
+            if self.portfolio_service is None:
+                from api.services.portfolio_service import PortfolioService
+                self.portfolio_service = PortfolioService()
+            return self.portfolio_service.get_position_index()
+        except Exception as e:
+            logger.error(f"Error getting positions: {e}")
+            logger.error(traceback.format_exc())
+            return None
+        
+    def _process_ticker_for_otm(self, conn, ticker, otm_percentage, expiration=None, is_market_open=None, option_type=None,
+                                position_index=None):
         """
         Process a single ticker for OTM options
         
@@ -402,6 +519,7 @@ class OptionsService:
             expiration (str, optional): Expiration date in YYYYMMDD format
             is_market_open (bool, optional): Whether the market is open
             option_type (str, optional): Filter by option type ('CALL' or 'PUT')
+            position_index (PositionIndex, optional): Portfolio positions; loaded when not given
             
         Returns:
             dict: Option data for the ticker
@@ -418,7 +536,7 @@ class OptionsService:
                 logger.error(traceback.format_exc())
         
         # If we don't have a valid stock price, return an error
-        if stock_price is None or not isinstance(stock_price, (int, float)) or stock_price <= 0:
+        if stock_price is None or not isinstance(stock_price, (int, float)) or math.isnan(stock_price) or stock_price <= 0:
             logger.error(f"No valid stock price received for {ticker}")
             return {'error': 'Unable to obtain valid stock price'}
                 
@@ -428,22 +546,12 @@ class OptionsService:
         # Get position information from portfolio
         position_size = 0
         try:
-            # Import and use portfolio service to get position size if not already initialized
-            if self.portfolio_service is None:
-                from api.services.portfolio_service import PortfolioService
-                self.portfolio_service = PortfolioService()
-            
-            # Get positions from portfolio service
-            positions = self.portfolio_service.get_positions()
+            if position_index is None:
+                position_index = self._get_position_index()
             
-            # Find the matching ticker in positions
-            for pos in positions:
-                if pos.get('symbol') == ticker:
-                    position_size = pos.get('position', 0)
-                    break
-            
-            if position_size == 0:
-                pass
+            # Shares held of the ticker; a dict lookup in the shared index
+            if position_index is not None:
+                position_size = position_index.shares(ticker)
         except Exception as e:
             logger.error(f"Error getting position for {ticker}: {e}")
             logger.error(traceback.format_exc())
@@ -471,15 +579,21 @@ class OptionsService:
                 # Use provided expiration if available, otherwise use default
                 target_expiration = expiration if expiration else default_expiration
                 
+                # Outside market hours TWS rarely computes model greeks, so only wait
+                # for quotes and let the connection compute greeks locally
+                wait_for_greeks = is_market_open is not False
+                
                 # Get call options if requested
                 if not option_type or option_type == 'CALL':
-                    call_option = conn.get_option_chain(ticker, target_expiration, 'C', call_strike)
+                    call_option = conn.get_option_chain(ticker, target_expiration, 'C', call_strike,
+                                                        wait_for_greeks=wait_for_greeks)
                     if call_option:
                         options.append(call_option)
                 
                 # Get put options if requested
                 if not option_type or option_type == 'PUT':
-                    put_option = conn.get_option_chain(ticker, target_expiration, 'P', put_strike)
+                    put_option = conn.get_option_chain(ticker, target_expiration, 'P', put_strike,
+                                                       wait_for_greeks=wait_for_greeks)
                     if put_option:
                         options.append(put_option)
                 
@@ -508,6 +622,11 @@ class OptionsService:
         """
         Process options chain data and format it with flattened structure
         
+        The options of all chains are read into NumPy columns once; NaN and
+        missing values, the last price fallback, IV scaling and the earnings
+        fields are computed over whole columns, and the option dicts are built
+        in a single pass at the end.
+        
         Args:
             options_chains (list): List of option chain objects from IB
             ticker (str): Stock symbol
@@ -531,282 +650,144 @@ class OptionsService:
                 'puts': []
             }
             
-            # Process each option chain in the list
+            # Split the options of every chain by type, keeping only the requested types
+            wanted = {'CALL': [], 'PUT': []} if not option_type else {option_type: []}
             for chain in options_chains:
-                # Extract the list of options from the chain
                 if not chain or 'options' not in chain:
                     logger.warning(f"Invalid option chain format for {ticker}: {chain}")
                     continue
-                
-                options_list = chain.get('options', [])
-                
-                # Process each option in the chain
-                for option in options_list:
-                    try:
-                        # Skip if we're filtering by option type and this doesn't match
-                        current_option_type = option.get('option_type')
-                        if option_type and current_option_type:
-                            if (option_type == 'CALL' and current_option_type != 'CALL') or \
-                               (option_type == 'PUT' and current_option_type != 'PUT'):
-                                continue
-                        
-                        # Calculate ATM factor for Greeks
-                        strike = option.get('strike', 0)
-                        # Handle NaN and missing values
-                        bid = option.get('bid', 0)
-                        ask = option.get('ask', 0)
-                        last = option.get('last', 0)
-                        
-                        # If last is 0 or NaN, use mid price
-                        if last == 0 or isinstance(last, float) and math.isnan(last):
-                            last = (bid + ask) / 2 if bid > 0 or ask > 0 else 0.1
-                        
-                        # Handle NaN values for Greeks
-                        iv = option.get('implied_volatility', 0)
-                        if isinstance(iv, float) and math.isnan(iv):
-                            iv = 0
-                        
-                        delta = option.get('delta', 0)
-                        if isinstance(delta, float) and math.isnan(delta):
-                            delta = 0
-                        
-                        gamma = option.get('gamma', 0)
-                        if isinstance(gamma, float) and math.isnan(gamma):
-                            gamma = 0
-                        
-                        theta = option.get('theta', 0)
-                        if isinstance(theta, float) and math.isnan(theta):
-                            theta = 0
-                        
-                        vega = option.get('vega', 0)
-                        if isinstance(vega, float) and math.isnan(vega):
-                            vega = 0
-                        
-                        open_interest = option.get('open_interest', 0)
-                        if isinstance(open_interest, float) and math.isnan(open_interest):
-                            open_interest = 0
-                        
-                        # Format option data with flattened structure
-                        option_data = {
-                            'symbol': f"{ticker}{option.get('expiration')}{'C' if option.get('option_type') == 'CALL' else 'P'}{int(strike)}",
-                            'strike': strike,
-                            'expiration': option.get('expiration'),
-                            'option_type': option.get('option_type'),
-                            'bid': bid,
-                            'ask': ask,
-                            'last': last,
-                            'open_interest': int(open_interest),
-                            'implied_volatility': round(iv * 100, 2) if iv is not None and iv < 1 and iv > 0 else (0 if iv is None else round(iv, 2)),  # Handle percentage vs decimal
-                            'delta': round(delta, 5) if delta is not None else 0,
-                            'gamma': round(gamma, 5) if gamma is not None else 0,
-                            'theta': round(theta, 5) if theta is not None else 0,
-                            'vega': round(vega, 5) if vega is not None else 0
-                        }
-                        
-                        # Calculate and add flattened earnings data based on option type 
-                        if option.get('option_type') == 'CALL':
-                            position_qty = 100  # Assume 100 shares per standard position
-                            max_contracts = int(position_qty / 100)  # Each contract represents 100 shares
-                            premium_per_contract = last * 100  # Premium per contract (100 shares)
-                            total_premium = premium_per_contract * max_contracts
-                            
-                            # Ensure we don't divide by zero or NaN
-                            if strike > 0 and max_contracts > 0:
-                                return_on_capital = (total_premium / (strike * 100 * max_contracts)) * 100
-                            else:
-                                return_on_capital = 0
-                            
-                            # Add flattened earnings data
-                            option_data['earnings_max_contracts'] = max_contracts
-                            option_data['earnings_premium_per_contract'] = round(premium_per_contract, 2)
-                            option_data['earnings_total_premium'] = round(total_premium, 2)
-                            option_data['earnings_return_on_capital'] = round(return_on_capital, 2)
-                            
-                            # Add to calls list directly
-                            result['calls'].append(option_data)
-                            
-                        elif option.get('option_type') == 'PUT':
-                            position_value = strike * 100 * int(100 / 100)  # Cash needed to secure puts
-                            max_contracts = 1 if strike <= 0 else int(position_value / (strike * 100))
-                            premium_per_contract = last * 100  # Premium per contract
-                            total_premium = premium_per_contract * max_contracts
-                            
-                            # Ensure we don't divide by zero or NaN
-                            if position_value > 0:
-                                return_on_cash = (total_premium / position_value) * 100
-                            else:
-                                return_on_cash = 0
-                            
-                            # Add flattened earnings data
-                            option_data['earnings_max_contracts'] = max_contracts
-                            option_data['earnings_premium_per_contract'] = round(premium_per_contract, 2)
-                            option_data['earnings_total_premium'] = round(total_premium, 2)
-                            option_data['earnings_return_on_cash'] = round(return_on_cash, 2)
-                            
-                            # Add to puts list directly
-                            result['puts'].append(option_data)
-                    
-                    except Exception as e:
-                        logger.error(f"Error processing individual option in chain for {ticker}: {str(e)}")
-                        logger.error(traceback.format_exc())
+                for option in chain.get('options', []):
+                    same_type = wanted.get(option.get('option_type'))
+                    if same_type is not None:
+                        same_type.append(option)
             
-            # Sort options by strike price
-            result['calls'] = sorted(result['calls'], key=lambda x: x['strike'])
-            result['puts'] = sorted(result['puts'], key=lambda x: x['strike'])
+            for right, key, return_field in (('CALL', 'calls', 'earnings_return_on_capital'),
+                                              ('PUT', 'puts', 'earnings_return_on_cash')):
+                if wanted.get(right):
+                    result[key] = self._format_option_columns(wanted[right], right, ticker, return_field)
             
-            # Final sanitization to ensure no NaN values exist in the result
-            self._sanitize_result(result)
+            # The option dicts are NaN-free, so only the top-level values need sanitizing
+            for key in ('stock_price', 'otm_percentage'):
+                if isinstance(result[key], float) and math.isnan(result[key]):
+                    result[key] = 0
             
             return result
             
         except Exception as e:
             logger.error(f"Error processing options chain for {ticker}: {str(e)}")
             logger.error(traceback.format_exc())
-            return {} 
-
-    def _sanitize_result(self, result):
+            return {}
+    
+    def _option_columns(self, options):
         """
-        Sanitize the result dictionary by replacing any NaN values with 0
+        Read option dicts into float columns with the derived quote and earnings fields
+        
+        Missing, None and NaN values become 0, except for the strike, which is
+        left NaN so the option can be dropped.
         
         Args:
-            result (dict): The result dictionary to sanitize
+            options (list): Option dictionaries from IBConnection.get_option_chain
+            
+        Returns:
+            dict: NumPy arrays keyed by CHAIN_COLUMNS plus 'premium' and 'return'
         """
-        if not result or not isinstance(result, dict):
-            return
+        # One float matrix for all fields; None converts to NaN. IBConnection
+        # sets every field, so rows are read with one itemgetter call each
+        try:
+            rows = list(map(_chain_fields, options))
+        except KeyError:
+            rows = [[option.get(field) for field in CHAIN_COLUMNS] for option in options]
+        matrix = np.array(rows, dtype=float).reshape(len(options), len(CHAIN_COLUMNS))
+        strike = matrix[:, 0].copy()
+        values = matrix[:, 1:]
+        values[np.isnan(values)] = 0.0
+        columns = dict(zip(CHAIN_COLUMNS[1:], values.T))
+        columns['strike'] = strike
+        bid, ask, last = columns['bid'], columns['ask'], columns['last']
+        
+        # Use the mid price when there is no last price, or a nominal 0.1 without quotes
+        fallback = np.where((bid > 0) | (ask > 0), (bid + ask) / 2, 0.1)
+        columns['last'] = last = np.where(last == 0, fallback, last)
+        
+        # IVs below 1 are decimals and are reported in percent
+        iv = columns['implied_volatility']
+        columns['implied_volatility'] = np.where((iv > 0) & (iv < 1), iv * 100, iv)
+        
+        # One contract per 100 shares, or secured by strike x 100 in cash
+        columns['premium'] = premium = last * 100
+        columns['return'] = np.divide(premium, strike * 100, out=np.zeros_like(premium), where=strike > 0) * 100
+        return columns
+    
+    def _format_option_columns(self, options, right, ticker, return_field):
+        """
+        Build the option dicts of one option type, sorted by strike
+        
+        Args:
+            options (list): Option dictionaries of this type
+            right (str): 'CALL' or 'PUT'
+            ticker (str): Stock symbol
+            return_field (str): Name of the return on capital or cash field
             
-        # Helper function to recursively sanitize dictionaries
-        def sanitize_dict(d):
-            if not isinstance(d, dict):
-                return
-                
-            for key, value in d.items():
-                # Check if value is NaN
-                if isinstance(value, float) and math.isnan(value):
-                    d[key] = 0
-                # Recursively sanitize nested dictionaries
-                elif isinstance(value, dict):
-                    sanitize_dict(value)
-                # Sanitize items in lists
-                elif isinstance(value, list):
-                    for item in value:
-                        if isinstance(item, dict):
-                            sanitize_dict(item)
+        Returns:
+            list: Option dictionaries with flattened earnings fields
+        """
+        columns = self._option_columns(options)
+        strike = columns['strike']
+        selected = np.flatnonzero(np.isfinite(strike))
+        order = selected[np.argsort(strike[selected], kind='stable')]
+        chosen = [options[i] for i in order.tolist()]
+        count = len(chosen)
         
-        # Sanitize the entire result dictionary
-        sanitize_dict(result)
+        def rounded(field, digits):
+            return np.round(columns[field][order], digits).tolist()
         
+        expirations = [option.get('expiration') for option in chosen]
+        premium = rounded('premium', 2)
+        letter = right[0]
+        keys = ('symbol', 'strike', 'expiration', 'option_type', 'bid', 'ask', 'last', 'open_interest',
+                'implied_volatility', 'delta', 'gamma', 'theta', 'vega', 'partial', 'earnings_max_contracts',
+                'earnings_premium_per_contract', 'earnings_total_premium', return_field)
+        rows = zip(
+            [f"{ticker}{expiration}{letter}{whole}"
+             for expiration, whole in zip(expirations, strike[order].astype(np.int64).tolist())],
+            [option.get('strike', 0) for option in chosen],
+            expirations,
+            [right] * count,
+            columns['bid'][order].tolist(),
+            columns['ask'][order].tolist(),
+            columns['last'][order].tolist(),
+            columns['open_interest'][order].astype(np.int64).tolist(),
+            rounded('implied_volatility', 2),
+            rounded('delta', 5),
+            rounded('gamma', 5),
+            rounded('theta', 5),
+            rounded('vega', 5),
+            [option.get('partial', False) for option in chosen],
+            [1] * count,
+            premium,
+            premium,
+            rounded('return', 2)
+        )
+        return [dict(zip(keys, row)) for row in rows]
+
     def check_pending_orders(self):
         """
-        Check status of pending/processing orders and update them in the database
-        by querying the TWS API for current status.
+        Get the current state of orders submitted to TWS.
+        
+        Status changes are written to the database by the order sync worker
+        (core/order_sync.py) as TWS reports them, so this only reads SQLite.
         
         Returns:
-            dict: Result with updated orders
+            dict: Result with the submitted orders' current state
         """
         try:
-            # Get all pending and processing orders from database
-            db = self.db
-            try:
-                orders = db.get_orders(
-                    status_filter=['pending', 'processing'],
-                    limit=50  # Limit to most recent orders
-                )
-                
-                # Log details of each order at debug level
-                for i, order in enumerate(orders):
-                    logger.debug(f"Order {i+1}: ID={order.get('id')}, Status={order.get('status')}, " +
-                                f"Executed={order.get('executed')}, IB ID={order.get('ib_order_id', 'None')}")
-                    
-            except Exception as db_error:
-                logger.error(f"Error retrieving orders from database: {str(db_error)}")
-                logger.error(traceback.format_exc())
-                return {
-                    "success": False,
-                    "error": f"Database error: {str(db_error)}"
-                }
-            
-            if not orders or len(orders) == 0:
-                return {
-                    "success": True,
-                    "message": "No pending or processing orders to check",
-                    "updated_orders": []
-                }
-                
-            # Connect to TWS
-            conn = self._ensure_connection()
-                
-            updated_orders = []
-            for order in orders:
-                order_id = order.get('id')
-                ib_order_id = order.get('ib_order_id')
-                
-                # Only check orders that have been submitted to IB
-                if order.get('status') == 'processing' and ib_order_id:
-                    try:
-                        # Check status in TWS
-                        ib_status = conn.check_order_status(ib_order_id)
-                        
-                        if ib_status:
-                            # Determine new status based on IB status
-                            new_status = "processing"  # Default if still being processed
-                            executed = False  # Default not executed
-                            
-                            # Map IB status to our status
-                            if ib_status.get('status') in ['Filled', 'ApiCancelled', 'Cancelled']:
-                                if ib_status.get('status') == 'Filled':
-                                    new_status = "executed"
-                                    executed = True  # Mark as executed if filled
-                                else:
-                                    new_status = "canceled"
-                                    executed = True  # Mark as executed if cancelled
-                                    
-                            # Update execution details
-                            execution_details = {
-                                "ib_order_id": ib_order_id,
-                                "ib_status": ib_status.get('status'),
-                                "filled": ib_status.get('filled', 0),
-                                "remaining": ib_status.get('remaining', 0),
-                                "avg_fill_price": ib_status.get('avg_fill_price', 0),
-                                "commission": ib_status.get('commission', 0),
-                                "last_updated": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                            }
-                            
-                            # Update database with new status
-                            update_result = db.update_order_status(
-                                order_id=order_id,
-                                status=new_status,
-                                executed=executed,  # Set executed flag based on status
-                                execution_details=execution_details
-                            )
-                            
-                            if update_result:
-                                
-                                # Add to list of updated orders
-                                updated_order = order.copy()
-                                updated_order['status'] = new_status
-                                updated_order.update(execution_details)
-                                updated_orders.append(updated_order)
-                                
-                            else:
-                                logger.error(f"Failed to update order {order_id} in database")
-                                # Verify current order status
-                                current_order = db.get_order(order_id)
-                                if current_order:
-                                    pass
-                                else:
-                                    logger.error(f"Could not find order {order_id} in database after update attempt")
-                    except Exception as e:
-                        logger.error(f"Error checking status for order {order_id}: {str(e)}")
-                        logger.error(traceback.format_exc())
+            orders = self.db.get_orders(limit=50)
+            submitted_orders = [order for order in orders if order.get('ib_order_id')]
             
-            # Disconnect from TWS
-            if conn:
-                conn.disconnect()
-                
             return {
                 "success": True,
-                "message": f"Updated {len(updated_orders)} orders",
-                "updated_orders": updated_orders
+                "message": f"Loaded {len(submitted_orders)} submitted orders",
+                "updated_orders": submitted_orders
             }
                 
         except Exception as e:
@@ -817,6 +798,7 @@ class OptionsService:
                 "error": str(e)
             }
 
+    @request_priority(PRIORITY_ORDERS)
     def cancel_order(self, order_id):
         """
         Cancel an order, supporting both pending and processing orders.
@@ -922,13 +904,6 @@ class OptionsService:
                     tws_error_message = f"Error canceling order in TWS: {str(e)}"
                 
                 finally:
-                    # Clean up connection if it exists
-                    if conn:
-                        try:
-                            conn.disconnect()
-                        except:
-                            pass
-                    
                     # If TWS cancellation was successful, return the success response
                     if tws_cancel_success:
                         return {
@@ -1016,6 +991,7 @@ class OptionsService:
                     "secondary_error": str(inner_e)
                 }, 500
 
+    @request_priority(PRIORITY_SCREENER)
     def get_stock_price(self, ticker):
         """
         Get just the current stock price for a ticker without fetching options.
@@ -1049,6 +1025,7 @@ class OptionsService:
             logger.error(traceback.format_exc())
             return 0 
 
+    @request_priority(PRIORITY_SCREENER)
     def get_option_expirations(self, ticker):
         """
         Get available expiration dates for options of a given ticker.
@@ -1068,34 +1045,19 @@ class OptionsService:
                 logger.error(f"Failed to establish connection to IB for {ticker} expirations")
                 return {"error": "Failed to establish connection to IB"}
                 
-            # Get market status
-            is_market_open = is_market_hours()
-            
-            # Set appropriate market data type based on market status
-            if not is_market_open:
-                conn.set_market_data_type(2)  # Frozen data when market is closed
-            else:
-                conn.set_market_data_type(1)  # Live data when market is open
-                
-            # Create a Stock object for the ticker
-            stock = Stock(ticker, 'SMART', 'USD')
-            conn.ib.qualifyContracts(stock)
+            # Expirations come from the cached chain metadata, so repeat lookups
+            # do not go back to TWS until the cache entry expires
+            chain = conn.get_option_params(ticker, 'SMART')
             
-            # Get option chains to find available expirations
-            chains = conn.ib.reqSecDefOptParams(stock.symbol, '', stock.secType, stock.conId)
-            
-            if not chains:
+            if not chain:
                 logger.error(f"No option chains found for {ticker}")
                 return {"error": f"No option chains found for {ticker}"}
                 
-            # Get the first valid exchange's data (typically SMART)
-            chain = next((c for c in chains if c.exchange == 'SMART' and len(c.expirations) > 2), chains[0])
-            
             # Extract and filter valid expirations (only future dates)
             today = datetime.now().strftime('%Y%m%d')
             
-            # Sort expirations chronologically
-            valid_expirations = sorted([exp for exp in chain.expirations if exp >= today])
+            # Cached expirations are already sorted chronologically
+            valid_expirations = [exp for exp in chain['expirations'] if exp >= today]
             
             if not valid_expirations:
                 logger.error(f"No valid future expirations found for {ticker}")
@@ -1119,4 +1081,127 @@ class OptionsService:
         except Exception as e:
             logger.error(f"Error getting option expirations for {ticker}: {str(e)}")
             logger.error(traceback.format_exc())
-            return {"error": str(e)} 
\ No newline at end of file
+            return {"error": str(e)}
+
+    @request_priority(PRIORITY_SCREENER)
+    def get_option_surface(self, ticker, expirations=None, option_type=None, strike_window_pct=15,
+                           max_strikes=None, delta_band=None):
+        """
+        Get quotes and greeks for several expirations as a strike x expiry grid
+        
+        Args:
+            ticker (str): The ticker symbol
+            expirations (list, optional): Expiration dates (YYYYMMDD); defaults to the
+                                          closest Friday, the Friday after it and the
+                                          next monthly expiration
+            option_type (str, optional): 'CALL' or 'PUT'; both when omitted
+            strike_window_pct (float, optional): Keep strikes within this percentage of spot
+            max_strikes (int, optional): Keep the N strikes nearest spot per expiration and right
+            delta_band (tuple, optional): (min, max) absolute delta to keep
+            
+        Returns:
+            dict: Surface from IBConnection.get_option_surface, or a dict with an 'error'
+        """
+        if option_type and option_type not in ['CALL', 'PUT']:
+            logger.error(f"Invalid option_type: {option_type}. Must be 'CALL' or 'PUT'")
+            return {'error': f"Invalid option_type: {option_type}. Must be 'CALL' or 'PUT'"}
+        
+        try:
+            conn = self._ensure_connection()
+            if not conn:
+                logger.error(f"Failed to establish connection to IB for {ticker} option surface")
+                return {"error": "Failed to establish connection to IB"}
+            
+            if not expirations:
+                closest_friday = get_closest_friday()
+                expirations = [
+                    closest_friday.strftime('%Y%m%d'),
+                    (closest_friday + timedelta(days=7)).strftime('%Y%m%d'),
+                    get_next_monthly_expiration()
+                ]
+            rights = (option_type[0],) if option_type else ('C', 'P')
+            
+            surface = conn.get_option_surface(ticker, expirations, rights,
+                                              strike_window_pct=strike_window_pct, max_strikes=max_strikes,
+                                              delta_band=delta_band)
+            if not surface:
+                return {"error": f"No option surface available for {ticker}"}
+            return surface
+        
+        except Exception as e:
+            logger.error(f"Error getting option surface for {ticker}: {str(e)}")
+            logger.error(traceback.format_exc())
+            return {"error": str(e)}
+
+    @request_priority(PRIORITY_SCREENER)
+    def get_volatility_stats(self, ticker, lookback_days=365, windows=(10, 20, 60)):
+        """
+        Get realized volatility and implied volatility rank from daily history
+        
+        Daily closes and the underlying's daily implied volatility come from the
+        connection's bar store, which only requests bars it has not fetched
+        before, so repeat calls are served locally.
+        
+        Args:
+            ticker (str): The ticker symbol
+            lookback_days (int, optional): Calendar days of history used for the IV rank
+            windows (tuple, optional): Trading-day windows to compute realized volatility over
+            
+        Returns:
+            dict: 'ticker', 'realized_volatility' (annualized, by window), 'implied_volatility'
+                  (current, low, high, iv_rank and iv_percentile, or None) and 'bars',
+                  or a dict with an 'error'
+        """
+        try:
+            conn = self._ensure_connection()
+            if not conn:
+                logger.error(f"Failed to establish connection to IB for {ticker} volatility")
+                return {"error": "Failed to establish connection to IB"}
+            
+            # Fetch enough history for the longest window even with a short lookback
+            days = max(lookback_days, int(max(windows) * 365 / 252) + 10)
+            prices = conn.get_historical_bars(ticker, days=days)
+            if prices is None or not len(prices['close']):
+                return {"error": f"No price history available for {ticker}"}
+            volatilities = conn.get_historical_bars(ticker, days=lookback_days,
+                                                    what_to_show='OPTION_IMPLIED_VOLATILITY')
+            
+            return {
+                'ticker': ticker,
+                'realized_volatility': {str(window): realized_volatility(prices['close'], window)
+                                        for window in windows},
+                'implied_volatility': iv_rank(volatilities['close']) if volatilities is not None else None,
+                'bars': int(len(prices['close'])),
+                'as_of': datetime.fromtimestamp(int(prices['time'][-1]), timezone.utc).strftime('%Y-%m-%d')
+            }
+        except Exception as e:
+            logger.error(f"Error getting volatility stats for {ticker}: {str(e)}")
+            logger.error(traceback.format_exc())
+            return {"error": str(e)}
+
+    @request_priority(PRIORITY_SCREENER)
+    def refresh_option_chains(self, tickers=None):
+        """
+        Reload cached option chain metadata, e.g. ahead of the market open
+        
+        Args:
+            tickers (list, optional): Ticker symbols to reload; defaults to every
+                                      ticker currently in the chain cache
+            
+        Returns:
+            dict: Dictionary mapping each ticker to whether it was refreshed
+        """
+        try:
+            conn = self._ensure_connection()
+            if not conn:
+                logger.error("Failed to establish connection to IB for chain refresh")
+                return {"error": "Failed to establish connection to IB"}
+            
+            refreshed = conn.refresh_option_params(tickers)
+            logger.info(f"Refreshed option chains for {sum(refreshed.values())}/{len(refreshed)} tickers")
+            return {"refreshed": refreshed}
+        
+        except Exception as e:
+            logger.error(f"Error refreshing option chains: {str(e)}")
+            logger.error(traceback.format_exc())
+            return {"error": str(e)}
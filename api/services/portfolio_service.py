@@ -4,9 +4,9 @@ Manages portfolio data and calculations
 """
 
 import logging
-import random
-import time
-from core.connection import IBConnection
+from core.connection import request_priority, PRIORITY_PORTFOLIO
+from core.connection_pool import get_connection_pool
+from core.portfolio_model import get_position_index
 from config import Config
 import traceback
 
@@ -19,43 +19,18 @@ class PortfolioService:
     def __init__(self):
         self.config = Config()
         logger.info(f"Portfolio service using port: {self.config.get('port')}")
-        self.connection = None
         
     def _ensure_connection(self):
         """
-        Ensure that the IB connection exists and is connected
+        Borrow the shared IB connection from the process-wide connection pool
         """
         try:
-            if self.connection is None or not self.connection.is_connected():
-                # Generate a unique client ID based on current timestamp and random number
-                # to avoid conflicts with other connections
-                unique_client_id = int(time.time() % 10000) + random.randint(1000, 9999)
-                logger.info(f"Creating new TWS connection with client ID: {unique_client_id}")
-                
-                # Create new connection
-                port = self.config.get('port', 7497)
-                logger.info(f"Connecting to TWS on port: {port}")
-                
-                self.connection = IBConnection(
-                    host=self.config.get('host', '127.0.0.1'),
-                    port=port,
-                    client_id=unique_client_id,  # Use the unique client ID instead of fixed ID 1
-                    timeout=self.config.get('timeout', 20),
-                    readonly=self.config.get('readonly', True)
-                )
-                
-                # Try to connect with proper error handling
-                if not self.connection.connect():
-                    logger.error("Failed to connect to TWS/IB Gateway")
-                else:
-                    logger.info("Successfully connected to TWS/IB Gateway")
-            return self.connection
+            return get_connection_pool().get()
         except Exception as e:
             logger.error(f"Error ensuring connection: {str(e)}")
-            if "There is no current event loop" in str(e):
-                logger.error("Asyncio event loop error - please check connection.py for proper handling")
             return None
         
+    @request_priority(PRIORITY_PORTFOLIO)
     def get_portfolio_summary(self):
         """
         Get account summary information including cash balance and account value
@@ -86,6 +61,7 @@ class PortfolioService:
             logger.error(traceback.format_exc())
             return None
     
+    @request_priority(PRIORITY_PORTFOLIO)
     def get_positions(self, security_type=None):
         """
         Get portfolio positions, optionally filtered by security type
@@ -104,46 +80,41 @@ class PortfolioService:
             
             # Get portfolio data from IB connection
             portfolio = conn.get_portfolio()
-            positions = portfolio.get('positions', {})
             
-            # Convert positions dict to list format expected by the API
-            positions_list = []
-            for key, pos in positions.items():
-                contract = pos.get('contract')
-                if not contract:
-                    continue
-                
-                # Skip if filtering by security type and this doesn't match
-                pos_type = pos.get('security_type', '')
-                if security_type and pos_type != security_type:
-                    continue
-                # Build position dictionary
-                position_data = {
-                    'symbol': contract.symbol if hasattr(contract, 'symbol') else '',
-                    'position': pos.get('shares', 0),
-                    'market_price': pos.get('market_price', 0),
-                    'market_value': pos.get('market_value', 0),
-                    'avg_cost': pos.get('avg_cost', 0),
-                    'unrealized_pnl': pos.get('unrealized_pnl', 0),
-                    'security_type': pos_type
-                }
-                
-                # Add option-specific fields if this is an option
-                if pos_type == 'OPT' and hasattr(contract, 'lastTradeDateOrContractMonth') and hasattr(contract, 'strike') and hasattr(contract, 'right'):
-                    position_data.update({
-                        'expiration': contract.lastTradeDateOrContractMonth,
-                        'strike': contract.strike,
-                        'option_type': 'CALL' if contract.right == 'C' else 'PUT'
-                    })
-                
-                positions_list.append(position_data)
-            
-            return positions_list
+            # Copy the shared index records so callers may modify them
+            return [dict(record) for record in get_position_index(portfolio).positions(security_type)]
         except Exception as e:
             logger.error(f"Error getting positions: {e}")
             logger.error(traceback.format_exc())
             return []
     
+    @request_priority(PRIORITY_PORTFOLIO)
+    def get_position_index(self):
+        """
+        Get the positions of the current portfolio indexed for lookups by symbol or option contract
+        
+        The index is built once per portfolio snapshot version and shared, so
+        looking up a position is a dict hit instead of an IB round trip.
+        
+        Returns:
+            PositionIndex: Index of the current positions, or None if error
+        """
+        try:
+            conn = self._ensure_connection()
+            if not conn:
+                logger.error("No connection available for positions.")
+                return None
+            
+            portfolio = conn.get_portfolio()
+            if not portfolio:
+                return None
+            return get_position_index(portfolio)
+        except Exception as e:
+            logger.error(f"Error getting position index: {e}")
+            logger.error(traceback.format_exc())
+            return None
+    
+    @request_priority(PRIORITY_PORTFOLIO)
     def get_weekly_option_income(self):
         """
         Get expected weekly income from option positions expiring this week
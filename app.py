@@ -10,6 +10,8 @@ from api import create_app
 from core.logging_config import get_logger
 from db.database import OptionsDatabase
 from core.connection import IBConnection, suppress_ib_logs
+from core.connection_pool import get_connection_pool
+from core.order_sync import get_order_sync_worker
 
 # Configure logging
 logger = get_logger('autotrader.app', 'api')
@@ -57,6 +59,13 @@ def create_application():
     app.config['connection_config'] = connection_config
     logger.info(f"Using connection config: {connection_config}")
     
+    # Connect the shared TWS connection in the background, so the handshake
+    # happens once at startup rather than on the first request
+    get_connection_pool().start()
+    
+    # Write order status changes to the database as TWS reports them
+    get_order_sync_worker().start()
+    
     return app
 
 # Create the application
@@ -0,0 +1,142 @@
+"""
+Option chain metadata cache for Interactive Brokers
+"""
+
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytz
+
+from core.logging_config import get_logger
+from core.utils import get_next_market_open
+
+logger = get_logger('autotrader.chain_cache', 'tws')
+
+
+class OptionChainCache:
+    """
+    In-memory cache of option chain metadata (expirations and strikes)
+
+    Entries are keyed by (symbol, exchange) and expire after the TTL or at the
+    next market open, whichever comes first, since listings only change
+    between sessions. Entries fetched before the open on a trading day last
+    until the following open, so `refresh` can reload them ahead of the open.
+    """
+    def __init__(self, ttl=6 * 3600):
+        """
+        Initialize the chain cache
+
+        Args:
+            ttl (float): Seconds a cached chain stays valid (default: 6 hours)
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (symbol, exchange) -> {'params': dict, 'expires_at': datetime}
+        self._entries = {}
+
+    @staticmethod
+    def _key(symbol, exchange='SMART'):
+        return ((symbol or '').upper(), (exchange or '').upper())
+
+    @staticmethod
+    def _now():
+        return datetime.now(pytz.utc)
+
+    def get(self, symbol, exchange='SMART', now=None):
+        """
+        Get the cached chain metadata for a symbol
+
+        Args:
+            symbol (str): Underlying symbol
+            exchange (str): Exchange the chain was requested for
+            now (datetime, optional): Current timezone-aware time
+
+        Returns:
+            dict: Chain metadata with 'expirations' and 'strikes', or None on a miss
+        """
+        now = now or self._now()
+        key = self._key(symbol, exchange)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now >= entry['expires_at']:
+                del self._entries[key]
+                return None
+            return entry['params']
+
+    def put(self, symbol, exchange, params, now=None):
+        """
+        Store chain metadata for a symbol
+
+        Args:
+            symbol (str): Underlying symbol
+            exchange (str): Exchange the chain was requested for
+            params (dict): Chain metadata with 'expirations' and 'strikes'
+            now (datetime, optional): Current timezone-aware time
+        """
+        now = now or self._now()
+        next_open = get_next_market_open(now)
+        if next_open.date() == now.astimezone(next_open.tzinfo).date():
+            # Fetched before today's open (e.g. a pre-open refresh): the listings
+            # already reflect today's session, so keep them until the following open
+            next_open = get_next_market_open(next_open)
+        expires_at = min(now + timedelta(seconds=self.ttl), next_open)
+        with self._lock:
+            self._entries[self._key(symbol, exchange)] = {'params': params, 'expires_at': expires_at}
+
+    def invalidate(self, symbol=None, exchange=None):
+        """
+        Drop cached entries
+
+        Args:
+            symbol (str, optional): Only drop entries for this symbol; all if None
+            exchange (str, optional): Only drop entries for this exchange
+        """
+        with self._lock:
+            for key in list(self._entries):
+                if symbol is not None and key[0] != symbol.upper():
+                    continue
+                if exchange is not None and key[1] != exchange.upper():
+                    continue
+                del self._entries[key]
+
+    def keys(self):
+        """
+        Get the (symbol, exchange) pairs currently cached, including expired ones
+
+        Returns:
+            list: List of (symbol, exchange) tuples
+        """
+        with self._lock:
+            return list(self._entries)
+
+    async def refresh(self, fetch, keys=None):
+        """
+        Reload chain metadata concurrently, e.g. ahead of the market open
+
+        Args:
+            fetch (callable): Coroutine function called as fetch(symbol, exchange)
+                              that returns fresh chain metadata or None
+            keys (list, optional): (symbol, exchange) pairs to reload; defaults to
+                                   every pair currently cached
+
+        Returns:
+            dict: Mapping of symbol to True if it was refreshed, False otherwise
+        """
+        keys = list(keys if keys is not None else self.keys())
+        fetched = await asyncio.gather(*(fetch(symbol, exchange) for symbol, exchange in keys),
+                                       return_exceptions=True)
+        results = {}
+        for (symbol, exchange), params in zip(keys, fetched):
+            if isinstance(params, Exception):
+                logger.error(f"Error refreshing option chain for {symbol}: {params}")
+                params = None
+            if params:
+                self.put(symbol, exchange, params)
+            results[symbol] = bool(params)
+        return results
+
+    def __len__(self):
+        return len(self._entries)
@@ -8,6 +8,7 @@ import math
 import time
 import os
 import json
+import statistics
 import threading
 import traceback
 from typing import Optional, Dict, Any
@@ -15,6 +16,17 @@ from datetime import datetime
 import pytz
 from core.utils import is_market_hours
 from .currency import CurrencyHelper
+from .market_data import MarketDataSubscriptions
+from .metrics import get_metrics, timed
+from .contract_cache import ContractCache
+from .chain_cache import OptionChainCache
+from .history import BAR_SIZES, BarStore, bars_to_columns, duration_string, series_key
+from .greeks import DEFAULT_VOLATILITY, bs_greeks, implied_volatility, select_strikes, years_to_expiry
+from .order_state import OrderStateIndex
+from .portfolio_model import PortfolioModel
+from .session_recording import SessionRecorder
+from .io_thread import get_io_thread, on_io_thread, current_priority, DEFAULT_PRIORITY
+from contextlib import contextmanager
 
 # Import ib_async instead of ib_insync
 from ib_async import IB, Stock, Option, Contract, util
@@ -52,11 +64,238 @@ def suppress_ib_logs():
 suppress_ib_logs()
 
 
+def _is_positive(value):
+    """
+    Check whether a ticker field holds a usable positive value (not None or NaN)
+    """
+    return value is not None and not (isinstance(value, float) and math.isnan(value)) and value > 0
+
+
+def _is_number(value):
+    """
+    Check whether a field holds a value at all (not None or NaN)
+    """
+    return value is not None and not (isinstance(value, float) and math.isnan(value))
+
+
+# Readiness predicates for ticker fields, used by IBConnection.wait_for_tickers
+TICKER_READY_CHECKS = {
+    'price': lambda ticker: _is_positive(ticker.marketPrice()),
+    'bid': lambda ticker: _is_positive(ticker.bid),
+    'ask': lambda ticker: _is_positive(ticker.ask),
+    'last': lambda ticker: _is_positive(ticker.last),
+    'close': lambda ticker: _is_positive(ticker.close),
+    'greeks': lambda ticker: ticker.modelGreeks is not None,
+    'iv': lambda ticker: _is_positive(ticker.impliedVolatility),
+}
+
+# Fields an option ticker needs before its snapshot is considered complete
+OPTION_MODEL_FIELDS = ('greeks', 'iv')
+
+# Fields an option ticker needs when its greeks may be computed locally instead
+OPTION_QUOTE_FIELDS = ('price',)
+
+# Generic ticks requested for options (106 = implied volatility)
+OPTION_GENERIC_TICKS = '106'
+
+# Option data fields reported for every cell of an option surface
+SURFACE_FIELDS = ('bid', 'ask', 'last', 'volume', 'open_interest', 'implied_volatility',
+                  'delta', 'gamma', 'theta', 'vega', 'partial')
+
+# Request priorities, lower runs first on the I/O thread
+PRIORITY_ORDERS = 0
+PRIORITY_PORTFOLIO = 1
+PRIORITY_SCREENER = 2
+PRIORITY_BACKGROUND = DEFAULT_PRIORITY  # Untagged work, e.g. health checks
+
+# Smallest pause while paced; avoids spinning on floating-point token remainders
+MIN_PACING_SLEEP = 0.001
+TOKEN_EPSILON = 1e-6
+
+# Request budgets as (requests, per seconds). IB allows about 50 messages per
+# second per client and 60 historical data requests per 10 minutes; 'total'
+# meters every request together so the per-kind budgets cannot add up past it.
+DEFAULT_REQUEST_BUDGETS = {
+    'total': (45, 1.0),
+    'mktdata': (40, 1.0),
+    'qualify': (40, 1.0),
+    'secdef': (10, 1.0),
+    'historical': (60, 600.0),
+}
+
+
+@contextmanager
+def request_priority(priority):
+    """
+    Run IB requests made in this context at the given priority
+    
+    Can be used as a context manager or as a decorator on service methods.
+    
+    Args:
+        priority (int): One of PRIORITY_ORDERS, PRIORITY_PORTFOLIO or PRIORITY_SCREENER
+    """
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+# TWS error code sent when another session already uses the requested client ID
+CLIENT_ID_IN_USE_CODE = 326
+
+
+class ClientIdInUseError(ConnectionError):
+    """
+    Raised (as IBConnection.last_error) when TWS rejects the client ID as already in use
+    """
+
+
+class RequestPacer:
+    """
+    Token-bucket pacing of IB requests against per-kind budgets
+    
+    Each request kind has a bucket refilled continuously at `requests / seconds`
+    and holding at most `requests` tokens, so short bursts go out at full speed
+    and sustained load settles at the budgeted rate. Every request also draws
+    from the 'total' bucket.
+    """
+    def __init__(self, budgets=None, sleep=time.sleep, clock=time.monotonic):
+        """
+        Initialize the pacer
+        
+        Args:
+            budgets (dict, optional): Overrides of DEFAULT_REQUEST_BUDGETS as
+                                      {kind: (requests, seconds)}
+            sleep (callable): Function used by the blocking acquire() to wait
+            clock (callable): Monotonic clock returning seconds
+        """
+        self.sleep = sleep
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._waiting = {}  # priority -> number of acquire_async calls waiting
+        self._buckets = {}
+        for kind, (requests, seconds) in {**DEFAULT_REQUEST_BUDGETS, **(budgets or {})}.items():
+            # bucket: [tokens, capacity, refill rate per second, last refill time]
+            self._buckets[kind] = [float(requests), float(requests), requests / seconds, clock()]
+    
+    def capacity(self, kind):
+        """
+        Get the largest batch that can be acquired at once for a request kind
+        
+        Args:
+            kind (str): Request kind
+            
+        Returns:
+            int: Bucket capacity, limited by the 'total' bucket
+        """
+        return int(min(self._buckets[kind][1], self._buckets['total'][1]))
+    
+    def _refill(self, bucket, now):
+        bucket[0] = min(bucket[1], bucket[0] + (now - bucket[3]) * bucket[2])
+        bucket[3] = now
+    
+    def _buckets_for(self, kind):
+        return [self._buckets[kind], self._buckets['total']] if kind != 'total' else [self._buckets['total']]
+    
+    def _reserve(self, kind, count):
+        """
+        Consume `count` tokens if they are available
+        
+        Returns:
+            float: 0 if the tokens were consumed, otherwise seconds until they will be
+        """
+        with self._lock:
+            buckets = self._buckets_for(kind)
+            now = self.clock()
+            for bucket in buckets:
+                self._refill(bucket, now)
+            # Tolerate floating-point remainders left by continuous refills
+            if all(bucket[0] >= count - TOKEN_EPSILON for bucket in buckets):
+                for bucket in buckets:
+                    bucket[0] = max(0.0, bucket[0] - count)
+                return 0.0
+            return max(MIN_PACING_SLEEP, max((count - bucket[0]) / bucket[2] for bucket in buckets))
+    
+    def charge(self, kind, count=1):
+        """
+        Record requests that were sent without waiting, such as cancellations
+        
+        The buckets may go negative, which delays the next paced requests.
+        
+        Args:
+            kind (str): Request kind
+            count (int): Number of requests sent
+        """
+        with self._lock:
+            now = self.clock()
+            for bucket in self._buckets_for(kind):
+                self._refill(bucket, now)
+                bucket[0] -= count
+    
+    def acquire(self, kind, count=1):
+        """
+        Block until `count` requests of a kind fit the budget, then consume them
+        
+        Args:
+            kind (str): Request kind ('mktdata', 'qualify', 'secdef', 'historical')
+            count (int): Number of requests about to be sent
+            
+        Returns:
+            float: Seconds spent waiting
+        """
+        count = min(count, self.capacity(kind))
+        waited = 0.0
+        while True:
+            wait = self._reserve(kind, count)
+            if not wait:
+                return waited
+            if not waited:
+                logger.debug(f"Pacing {count} {kind} request(s) for {wait:.3f}s")
+            self.sleep(wait)
+            waited += wait
+    
+    async def acquire_async(self, kind, count=1):
+        """
+        Wait on the event loop until `count` requests fit the budget, then consume them
+        
+        Waiters with a more urgent `current_priority` are served first, so paced
+        screener requests cannot hold back order or portfolio traffic.
+        
+        Args:
+            kind (str): Request kind ('mktdata', 'qualify', 'secdef', 'historical')
+            count (int): Number of requests about to be sent
+            
+        Returns:
+            float: Seconds spent waiting
+        """
+        count = min(count, self.capacity(kind))
+        priority = current_priority.get()
+        waited = 0.0
+        self._waiting[priority] = self._waiting.get(priority, 0) + 1
+        try:
+            while True:
+                if min(p for p, n in self._waiting.items() if n) >= priority:
+                    wait = self._reserve(kind, count)
+                    if not wait:
+                        get_metrics().observe(f"pacing.{kind}", waited)
+                        return waited
+                else:
+                    # Let the more urgent waiter take the next tokens
+                    wait = MIN_PACING_SLEEP
+                await asyncio.sleep(wait)
+                waited += wait
+        finally:
+            self._waiting[priority] -= 1
+
+
 class IBConnection:
     """
     Class for managing connection to Interactive Brokers
     """
-    def __init__(self, host='127.0.0.1', port=7497, client_id=1, timeout=20, readonly=True):
+    def __init__(self, host='127.0.0.1', port=7497, client_id=1, timeout=20, readonly=True,
+                 max_market_data_lines=100, subscription_ttl=300, contract_cache=None, chain_cache=None,
+                 io_thread=None, request_budgets=None, record_dir=None, bar_store=None, risk_free_rate=0.0):
         """
         Initialize the IB connection
         
@@ -66,35 +305,48 @@ class IBConnection:
             client_id (int): Client ID for TWS/IB Gateway
             timeout (int): Connection timeout in seconds
             readonly (bool): Whether to connect in readonly mode
+            max_market_data_lines (int): Maximum simultaneous market data subscriptions
+            subscription_ttl (float): Seconds an unused subscription keeps streaming
+            contract_cache (ContractCache, optional): Qualification cache; a memory-only
+                                                      cache is used if not provided
+            chain_cache (OptionChainCache, optional): Option chain metadata cache; a
+                                                      default one is used if not provided
+            io_thread (IBIOThread, optional): Thread that runs all IB traffic; the
+                                              process-wide I/O thread is used if not provided
+            request_budgets (dict, optional): Overrides of DEFAULT_REQUEST_BUDGETS as
+                                              {kind: (requests, seconds)}
+            record_dir (str, optional): Directory to record every session's TWS API
+                                        messages to, for replay with tools/replay_gateway.py
+            bar_store (BarStore, optional): Historical bar store; a memory-only store
+                                            is used if not provided
+            risk_free_rate (float): Continuously compounded rate used by local implied
+                                    volatility, greeks and delta-based strike selection
         """
         self.host = host
         self.port = port
         self.client_id = client_id
         self.timeout = timeout
         self.readonly = readonly
+        self.io_thread = io_thread if io_thread is not None else get_io_thread()
         self.ib = IB()
         self._connected = False
+        self.last_error = None  # Exception from the most recent failed connect()
+        self.pacer = RequestPacer(request_budgets)
+        self.market_data = MarketDataSubscriptions(self, max_lines=max_market_data_lines, idle_ttl=subscription_ttl)
+        self.orders = OrderStateIndex()
+        self.portfolio_model = PortfolioModel()
+        self.contract_cache = contract_cache if contract_cache is not None else ContractCache()
+        self.chain_cache = chain_cache if chain_cache is not None else OptionChainCache()
+        self.bar_store = bar_store if bar_store is not None else BarStore()
+        self.record_dir = record_dir
+        self.risk_free_rate = risk_free_rate
+        self.recorder = None  # SessionRecorder of the current session while recording
         
         # Suppress ib_async logs when initializing
         suppress_ib_logs()
     
-    def _ensure_event_loop(self):
-        """
-        Ensure that an event loop exists for the current thread
-        """
-        try:
-            # Check if an event loop exists and is running
-            loop = asyncio.get_event_loop()
-            if not loop.is_running():
-                pass  # Loop exists but not running, which is fine
-        except RuntimeError:
-            # No event loop exists in this thread, create one
-            logger.debug("Creating new event loop for thread")
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-        return True
-    
-    def connect(self):
+    @timed('connect')
+    async def connect_async(self):
         """
         Connect to TWS/IB Gateway
         
@@ -108,27 +360,31 @@ class IBConnection:
             if self._connected and self.ib.isConnected():
                 return True
             
-            # Ensure event loop exists
-            self._ensure_event_loop()
-            
             self.ib.clientId = self.client_id
-            self.ib.connect(self.host, self.port, clientId=self.client_id, readonly=self.readonly, timeout=self.timeout)
+            if self.record_dir:
+                self._start_recording()
+            await self._connect_or_detect_id_in_use()
             
             self._connected = self.ib.isConnected()
             if self._connected:
+                self.last_error = None
+                self.orders.attach(self.ib)
+                accounts = self.ib.managedAccounts()
+                if accounts:
+                    self.portfolio_model.attach(self.ib, accounts[0])
                 logger.info(f"Successfully connected to IB with client ID {self.client_id}")
                 return True
             else:
+                self.last_error = ConnectionError(f"Not connected with client ID {self.client_id}")
                 logger.error(f"Failed to connect to IB with client ID {self.client_id}")
+                self._stop_recording()
                 return False
         except Exception as e:
-            error_msg = str(e)
-            if "clientId" in error_msg and "already in use" in error_msg:
+            self.last_error = e
+            error_msg = str(e) or repr(e)
+            if isinstance(e, ClientIdInUseError):
                 logger.error(f"Connection error: Client ID {self.client_id} is already in use by another application.")
                 logger.error("Please try using a different client ID, or close other applications connected to TWS/IB Gateway.")
-            elif "There is no current event loop" in error_msg:
-                logger.error("Asyncio event loop error detected. This may be due to threading issues.")
-                logger.error("Please try running your code in the main thread or configuring asyncio properly.")
             else:
                 logger.error(f"Error connecting to IB: {error_msg}")
                 # Log more detailed error information for debugging
@@ -136,16 +392,90 @@ class IBConnection:
                 logger.debug(traceback.format_exc())
             
             self._connected = False
+            self._stop_recording()
             return False
     
+    connect = on_io_thread(connect_async)
+    
+    def _start_recording(self):
+        """
+        Record the session about to be opened to a new file in record_dir
+        """
+        self._stop_recording()
+        try:
+            os.makedirs(self.record_dir, exist_ok=True)
+            filename = f"ib_session_{self.client_id}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl.gz"
+            self.recorder = SessionRecorder(os.path.join(self.record_dir, filename),
+                                            host=self.host, port=self.port, client_id=self.client_id)
+            self.recorder.attach(self.ib)
+        except Exception as e:
+            logger.error(f"Error starting session recording: {e}")
+            logger.error(traceback.format_exc())
+            self.recorder = None
+    
+    def _stop_recording(self):
+        """
+        Finish the current session recording, if any
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+    
+    async def _connect_or_detect_id_in_use(self):
+        """
+        Run the ib_async handshake, failing fast if TWS reports the client ID in use
+        
+        TWS answers a duplicate client ID with error 326 and closes the socket
+        before the API is ready, which ib_async would otherwise only surface as
+        a handshake timeout.
+        
+        Raises:
+            ClientIdInUseError: If TWS rejected the client ID
+        """
+        loop = asyncio.get_running_loop()
+        in_use = loop.create_future()
+        
+        def flag_in_use():
+            if not in_use.done():
+                in_use.set_result(True)
+        
+        def on_error(req_id, error_code, error_string, contract=None):
+            if error_code == CLIENT_ID_IN_USE_CODE:
+                flag_in_use()
+        
+        def on_api_error(message):
+            if 'already in use' in message:
+                flag_in_use()
+        
+        self.ib.errorEvent += on_error
+        self.ib.client.apiError += on_api_error
+        connecting = asyncio.ensure_future(self.ib.connectAsync(
+            self.host, self.port, clientId=self.client_id, readonly=self.readonly, timeout=self.timeout))
+        try:
+            await asyncio.wait([connecting, in_use], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.ib.errorEvent -= on_error
+            self.ib.client.apiError -= on_api_error
+        
+        if in_use.done():
+            connecting.cancel()
+            await asyncio.gather(connecting, return_exceptions=True)
+            self.ib.disconnect()
+            raise ClientIdInUseError(f"Client ID {self.client_id} is already in use")
+        in_use.cancel()
+        connecting.result()
+    
+    @on_io_thread
     def disconnect(self):
         """
         Disconnect from Interactive Brokers
         """
         if self._connected:
+            self.market_data.clear()
             self.ib.disconnect()
             self._connected = False
             logger.info("Disconnected from IB")
+        self._stop_recording()
     
     def is_connected(self):
         """
@@ -156,7 +486,73 @@ class IBConnection:
         """
         return self._connected and self.ib.isConnected()
     
-    def get_stock_price(self, symbol):
+    @on_io_thread
+    def evict_idle_market_data(self):
+        """
+        Cancel market data subscriptions that have been idle longer than their TTL
+        
+        Returns:
+            int: Number of subscriptions cancelled
+        """
+        evicted = self.market_data.evict_idle()
+        if evicted:
+            logger.debug(f"Evicted {evicted} idle market data subscription(s)")
+        return evicted
+    
+    @timed('qualify')
+    async def qualify_contracts_async(self, *contracts):
+        """
+        Qualify contracts, serving previously qualified ones from the contract cache
+        
+        Like ib.qualifyContracts, contracts are updated in place. Only cache
+        misses are sent to TWS, in paced batches no larger than the qualify budget.
+        
+        Args:
+            *contracts: Contracts to qualify
+            
+        Returns:
+            list: Qualified contract, or None if it could not be qualified, for each input
+        """
+        results = [None] * len(contracts)
+        misses = []
+        
+        for i, contract in enumerate(contracts):
+            fields = self.contract_cache.get(contract)
+            if fields is not None:
+                util.dataclassUpdate(contract, **fields)
+                results[i] = contract
+            else:
+                misses.append(i)
+        metrics = get_metrics()
+        metrics.increment('cache_hits', 'qualify', count=len(contracts) - len(misses))
+        metrics.increment('cache_misses', 'qualify', count=len(misses))
+        
+        if misses:
+            pending = [contracts[i] for i in misses]
+            # Keys must be taken before qualification updates the contracts in place
+            keys = [self.contract_cache.make_key(contract) for contract in pending]
+            qualified = []
+            batch_size = self.pacer.capacity('qualify')
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                await self.pacer.acquire_async('qualify', len(batch))
+                with metrics.timer('qualify.round_trip'):
+                    batch_qualified = await self.ib.qualifyContractsAsync(*batch)
+                if len(batch_qualified) != len(batch):
+                    # Older ib_async versions only return the contracts that qualified
+                    batch_qualified = [contract if contract.conId else None for contract in batch]
+                qualified.extend(batch_qualified)
+            
+            for i, contract in zip(misses, qualified):
+                results[i] = contract if contract and not isinstance(contract, list) else None
+            self.contract_cache.put_many(keys, [results[i] for i in misses])
+        
+        return results
+    
+    qualify_contracts = on_io_thread(qualify_contracts_async)
+    
+    @timed('get_stock_price', 'symbol')
+    async def get_stock_price_async(self, symbol):
         """
         Get the current price of a stock
         
@@ -168,13 +564,10 @@ class IBConnection:
         """
         if not self.is_connected():
             logger.warning("Not connected to IB. Attempting to connect...")
-            if not self.connect():
+            if not await self.connect_async():
                 return None
         
         try:
-            # Ensure event loop exists for this thread
-            self._ensure_event_loop()
-            
             # Determine if market is open and set data type accordingly
             is_market_open = is_market_hours()
             
@@ -189,26 +582,25 @@ class IBConnection:
             contract = Contract(symbol=symbol, secType='STK', exchange='SMART', currency='USD')
             
             # Qualify the contract
-            qualified_contracts = self.ib.qualifyContracts(contract)
-            if not qualified_contracts:
+            qualified_contracts = await self.qualify_contracts_async(contract)
+            if not qualified_contracts or qualified_contracts[0] is None:
                 logger.error(f"Failed to qualify contract for {symbol}")
                 return None
             
             qualified_contract = qualified_contracts[0]
             
-            # Request market data
-            ticker = self.ib.reqMktData(contract=qualified_contract)
-            
-            for _ in range(10):
-                self.ib.sleep(0.1)
-                if ticker.marketPrice() is not None and ticker.marketPrice() > 0:
-                    break
-            
-            # Get the last price
-            last_price = ticker.last if ticker.last else (ticker.close if ticker.close else None)
-            bid_price = ticker.bid if ticker.bid else None
-            ask_price = ticker.ask if ticker.ask else None
-            last_rth_trade = ticker.lastRTHTrade.price if hasattr(ticker, 'lastRTHTrade') and ticker.lastRTHTrade else None
+            # Read the streaming ticker, subscribing on first use
+            async with self.market_data.subscription_async(qualified_contract) as ticker:
+                if ticker is None:
+                    return None
+                await self._wait_for_first_tick_async(ticker, symbol, timeout=1.0)
+                
+                # Get the last price
+                # NaN is truthy, so fields without data are checked with _is_positive
+                last_price = ticker.last if _is_positive(ticker.last) else (ticker.close if _is_positive(ticker.close) else None)
+                bid_price = ticker.bid if _is_positive(ticker.bid) else None
+                ask_price = ticker.ask if _is_positive(ticker.ask) else None
+                last_rth_trade = ticker.lastRTHTrade.price if hasattr(ticker, 'lastRTHTrade') and ticker.lastRTHTrade else None
             
             # If no last price is available, check other prices
             if last_price is None:
@@ -222,9 +614,6 @@ class IBConnection:
                 elif last_rth_trade:
                     last_price = last_rth_trade
             
-            # Cancel the market data subscription
-            self.ib.cancelMktData(qualified_contract)
-            
             if last_price is None:
                 logger.error(f"Could not get price for {symbol}")
                 return None
@@ -232,21 +621,95 @@ class IBConnection:
             return last_price
             
         except Exception as e:
-            error_msg = str(e)
-            if "There is no current event loop" in error_msg:
-                logger.error("Asyncio event loop error in get_stock_price. Retrying with new event loop.")
-                # Try one more time with a fresh event loop
-                try:
-                    loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(loop)
-                    return self.get_stock_price(symbol)
-                except Exception as retry_error:
-                    logger.error(f"Failed to get stock price after event loop retry: {str(retry_error)}")
-                    return None
-            else:
-                logger.error(f"Error getting {symbol} price: {error_msg}")
+            logger.error(f"Error getting {symbol} price: {str(e)}")
             return None
+    
+    get_stock_price = on_io_thread(get_stock_price_async)
   
+    async def wait_for_ticker_async(self, ticker, fields=('price',), timeout=1.0):
+        """
+        Wait until a ticker has received the given fields
+        
+        Args:
+            ticker: ib_async Ticker returned by reqMktData
+            fields (tuple): Keys of TICKER_READY_CHECKS that must be present
+            timeout (float): Maximum time to wait in seconds
+            
+        Returns:
+            bool: True if all fields arrived before the timeout
+        """
+        return (await self.wait_for_tickers_async([ticker], fields, timeout))[0]
+    
+    wait_for_ticker = on_io_thread(wait_for_ticker_async)
+    
+    async def _wait_for_first_tick_async(self, ticker, symbol, timeout=1.0):
+        """
+        Wait for a stock ticker's first price, recorded as the 'first_tick' phase
+        
+        Returns:
+            bool: True if a price arrived before the timeout
+        """
+        metrics = get_metrics()
+        with metrics.timer('first_tick', symbol):
+            ready = await self.wait_for_ticker_async(ticker, ('price',), timeout=timeout)
+        if not ready:
+            metrics.increment('timeouts', 'first_tick', symbol)
+        return ready
+    
+    async def wait_for_tickers_async(self, tickers, fields=('price',), timeout=1.0):
+        """
+        Wait until every ticker has received the given fields or the timeout passes
+        
+        Readiness is driven by each ticker's updateEvent, so the wait returns as
+        soon as the last ticker becomes ready instead of on a polling interval.
+        
+        Args:
+            tickers (list): ib_async Tickers returned by reqMktData
+            fields (tuple): Keys of TICKER_READY_CHECKS that must be present
+            timeout (float): Overall deadline in seconds shared by all tickers
+            
+        Returns:
+            list: Readiness flag for each ticker, in input order
+        """
+        checks = [TICKER_READY_CHECKS[field] for field in fields]
+        
+        def is_ready(ticker):
+            try:
+                return all(check(ticker) for check in checks)
+            except Exception:
+                return False
+        
+        ready = [is_ready(ticker) for ticker in tickers]
+        pending = {id(ticker): i for i, ticker in enumerate(tickers) if not ready[i]}
+        if not pending or timeout <= 0:
+            return ready
+        
+        done = asyncio.get_running_loop().create_future()
+        
+        def on_update(ticker):
+            i = pending.get(id(ticker))
+            if i is not None and is_ready(ticker):
+                ready[i] = True
+                del pending[id(ticker)]
+                if not pending and not done.done():
+                    done.set_result(True)
+        
+        waiting = [tickers[i] for i in pending.values()]
+        for ticker in waiting:
+            ticker.updateEvent += on_update
+        try:
+            await asyncio.wait_for(done, timeout)
+        except (asyncio.TimeoutError, TimeoutError):
+            logger.debug(f"{len(pending)} of {len(tickers)} tickers not ready for {fields} after {timeout}s")
+        finally:
+            for ticker in waiting:
+                ticker.updateEvent -= on_update
+        
+        return ready
+    
+    wait_for_tickers = on_io_thread(wait_for_tickers_async)
+    
+    @on_io_thread
     def set_market_data_type(self, data_type=1):
         """
         Set market data type for IB client
@@ -272,73 +735,55 @@ class IBConnection:
             logger.error(f"Error setting market data type: {e}")
             return False
             
-    def get_option_chain(self, symbol, expiration=None, right='C', target_strike=None, exchange='SMART'):
+    @timed('get_option_chain', 'symbol')
+    async def get_option_chain_async(self, symbol, expiration=None, right='C', target_strike=None, exchange='SMART', snapshot_timeout=5.0,
+                                     strike_window_pct=None, max_strikes=None, delta_band=None, volatility=DEFAULT_VOLATILITY,
+                                     wait_for_greeks=True):
         """
         Get option chain for a given symbol, expiration, and right
         
+        Strikes are narrowed before any market data is requested: to a window
+        around spot, to an estimated delta band and/or to the strikes nearest a
+        target (see core.greeks.select_strikes). All selected strikes are
+        snapshotted as one batch: contracts are qualified in a single call,
+        every market data request is opened up front and they are awaited
+        together against one overall deadline.
+        
         Args:
             symbol (str): Stock symbol
             expiration (str, optional): Option expiration date in YYYYMMDD format
             right (str, optional): Option right - 'C' for calls, 'P' for puts
-            target_strike (float, optional): Specific strike price to look for
+            target_strike (float, optional): Strike price to look for; only the closest
+                                             strike is kept unless max_strikes is given
             exchange (str, optional): Exchange to use
+            snapshot_timeout (float, optional): Overall deadline in seconds for
+                                                greeks and implied volatility to arrive
+            strike_window_pct (float, optional): Keep strikes within this percentage of spot
+            max_strikes (int, optional): Keep the N strikes nearest target_strike (or spot)
+            delta_band (tuple, optional): (min, max) absolute delta to keep, estimated
+                                          locally with Black-Scholes
+            volatility (float, optional): Volatility assumed for the delta estimate
+            wait_for_greeks (bool, optional): Wait for TWS model greeks; when False only
+                                              quotes are awaited and greeks are computed locally
             
         Returns:
-            dict: Option chain data or None if error
+            dict: Option chain data or None if error. Options that did not receive
+                  full data before the deadline are marked with 'partial': True
         """
         try:
             if not self.is_connected():
                 logger.error(f"Cannot get option chain for {symbol} - not connected")
                 return None
             
-            # Determine if market is open and set data type accordingly
-            is_market_open = is_market_hours()
-            
-            if not is_market_open:
-                # Use frozen data when market is closed
-                self.set_market_data_type(2)  # 2 = Frozen
-            else:
-                # Use live data when market is open
-                self.set_market_data_type(1)  # 1 = Live
-            
-            # Rest of the method remains the same...
-            stock = Stock(symbol, exchange, 'USD')
-            self.ib.qualifyContracts(stock)
-            
-            # Get stock price for reference
-            ticker = self.ib.reqMktData(stock)
-            for _ in range(10):
-                self.ib.sleep(0.1)
-                if ticker.marketPrice() is not None and ticker.marketPrice() > 0:
-                    break
-            
-            stock_price = ticker.marketPrice()
-            if not stock_price or stock_price <= 0:
-                stock_price = ticker.last if hasattr(ticker, 'last') and ticker.last > 0 else None
-            if not stock_price or stock_price <= 0:
-                stock_price = ticker.close if hasattr(ticker, 'close') and ticker.close > 0 else None
-            
-            if not stock_price or stock_price <= 0:
-                logger.warning(f"Could not get valid price for {symbol}")
-                return None
-            
-            # Cancel the market data request
-            self.ib.cancelMktData(stock)
-            
-            # Get option chains to find expirations and strikes
-            chains = self.ib.reqSecDefOptParams(stock.symbol, '', stock.secType, stock.conId)
-            
-            if not chains:
-                logger.error(f"No option chains found for {symbol}")
+            stock_price, chain = await self._get_underlying_and_chain_async(symbol, exchange)
+            if stock_price is None or not chain:
                 return None
-            # Get the first exchange's data
-            chain = next((c for c in chains if c.exchange == exchange and len(c.strikes) > 1), chains[0])
             # If expiration not provided, get the next standard expiration
             if not expiration:
                 # Find closest expiration to current date
-                if chain.expirations:
+                if chain['expirations']:
                     today = datetime.now().strftime('%Y%m%d')
-                    valid_expirations = [exp for exp in chain.expirations if exp >= today]
+                    valid_expirations = [exp for exp in chain['expirations'] if exp >= today]
                     
                     if valid_expirations:
                         expiration = sorted(valid_expirations)[0]
@@ -354,7 +799,7 @@ class IBConnection:
                 return None
             
             # Get strikes from the chain
-            strikes = chain.strikes if hasattr(chain, 'strikes') and chain.strikes else []
+            strikes = list(chain['strikes'])
             
             # If no strikes available but target_strike provided, use that
             if not strikes and target_strike is not None:
@@ -365,15 +810,23 @@ class IBConnection:
                 logger.error(f"No strikes available for {symbol} and no target strike provided")
                 return None
                 
-            # If target_strike is provided, find the closest strike
-            if target_strike is not None and strikes:
-                closest_strike = min(strikes, key=lambda s: abs(s - target_strike))
-                strikes = [closest_strike]
-            
             # Final check to ensure expiration is set
             if not expiration:
                 logger.error(f"No expiration date available for {symbol}")
                 return None
+            
+            # Only request market data for the strikes that matter
+            if target_strike is not None and max_strikes is None:
+                max_strikes = 1
+            listed = len(strikes)
+            strikes = select_strikes(strikes, stock_price, right, expiration,
+                                     window_pct=strike_window_pct, max_strikes=max_strikes,
+                                     center=target_strike, delta_band=delta_band, volatility=volatility,
+                                     rate=self.risk_free_rate)
+            if not strikes:
+                logger.warning(f"No {symbol} strikes match the requested selection")
+                return None
+            logger.debug(f"Selected {len(strikes)} of {listed} {symbol} strikes for {expiration} {right}")
                 
             # Create option contract for each strike
             option_contracts = []
@@ -391,80 +844,11 @@ class IBConnection:
                 'expiration': expiration,  # Just use the first one since we're filtering
                 'stock_price': stock_price,
                 'right': right,
-                'options': []
+                'options': await self._snapshot_option_contracts_async(option_contracts, timeout=snapshot_timeout,
+                                                                       underlying_price=stock_price,
+                                                                       wait_for_greeks=wait_for_greeks)
             }
             
-            # Rest of the method remains the same...
-            # Qualify and request market data for each option
-            for contract in option_contracts:
-                try:
-                    # Qualify the contract
-                    qualified_contracts = self.ib.qualifyContracts(contract)
-                    if not qualified_contracts:
-                        logger.warning(f"Could not qualify option contract: {contract.symbol} {contract.lastTradeDateOrContractMonth} {contract.strike} {contract.right}")
-                        continue
-                    
-                    qualified_contract = qualified_contracts[0]
-                    
-                    # Request market data with model computation
-                    ticker = self.ib.reqMktData(qualified_contract, '106', False,False)  # Added genericTickList='13' to get implied volatility
-                   
-                    # Wait for data to arrive - give more time for Greeks and implied volatility
-                    for _ in range(50):  # Increased from 50 to give more time
-                        self.ib.sleep(0.1)
-                        if ticker.modelGreeks is not None and ticker.impliedVolatility is not None and ticker.impliedVolatility > 0:
-                            break
-                    
-                    # Extract market data
-                    bid = ticker.bid if hasattr(ticker, 'bid') and ticker.bid is not None and ticker.bid > 0 else 0
-                    ask = ticker.ask if hasattr(ticker, 'ask') and ticker.ask is not None and ticker.ask > 0 else 0
-                    last = ticker.last if hasattr(ticker, 'last') and ticker.last is not None and ticker.last > 0 else 0
-                    volume = ticker.volume if hasattr(ticker, 'volume') and ticker.volume is not None else 0
-                    open_interest = ticker.openInterest if hasattr(ticker, 'openInterest') and ticker.openInterest is not None else 0
-                    implied_vol = ticker.impliedVolatility if hasattr(ticker, 'impliedVolatility') and ticker.impliedVolatility is not None else 0
-                    # Get real delta from model greeks if available
-                    delta = None
-                    gamma = None
-                    theta = None
-                    vega = None
-                    
-                    if hasattr(ticker, 'modelGreeks') and ticker.modelGreeks:
-                        delta = ticker.modelGreeks.delta if hasattr(ticker.modelGreeks, 'delta') else None
-                        gamma = ticker.modelGreeks.gamma if hasattr(ticker.modelGreeks, 'gamma') else None
-                        theta = ticker.modelGreeks.theta if hasattr(ticker.modelGreeks, 'theta') else None
-                        vega = ticker.modelGreeks.vega if hasattr(ticker.modelGreeks, 'vega') else None
-                        
-                        logger.debug(f"Got real greeks for {contract.symbol} {contract.right} {contract.strike}: delta={delta}, gamma={gamma}, theta={theta}, vega={vega}")
-                    else:
-                        logger.debug(f"No model greeks available for {contract.symbol} {contract.right} {contract.strike}")
-                        
-                    # Create option data dictionary
-                    option_data = {
-                        'strike': contract.strike,
-                        'expiration': contract.lastTradeDateOrContractMonth,
-                        'option_type': 'CALL' if contract.right == 'C' else 'PUT',
-                        'bid': bid,
-                        'ask': ask,
-                        'last': last,
-                        'volume': volume,
-                        'open_interest': open_interest,
-                        'implied_volatility': implied_vol,
-                        'delta': round(delta, 3) if delta is not None else None,
-                        'gamma': round(gamma, 5) if gamma is not None else None,
-                        'theta': round(theta, 5) if theta is not None else None,
-                        'vega': round(vega, 5) if vega is not None else None
-                    }
-                    
-                    # Add to the result
-                    result['options'].append(option_data)
-                    
-                    # Cancel market data request
-                    self.ib.cancelMktData(qualified_contract)
-        
-                except Exception as e:
-                    logger.error(f"Error getting market data for option {contract.symbol} {contract.lastTradeDateOrContractMonth} {contract.strike} {contract.right}: {e}")
-                    logger.error(traceback.format_exc())
-            
             # Sort options by strike price
             result['options'] = sorted(result['options'], key=lambda x: x['strike'])
             
@@ -474,6 +858,549 @@ class IBConnection:
             logger.error(traceback.format_exc())
             return None
     
+    get_option_chain = on_io_thread(get_option_chain_async)
+    
+    @timed('get_option_surface', 'symbol')
+    async def get_option_surface_async(self, symbol, expirations, rights=('C', 'P'), exchange='SMART', snapshot_timeout=5.0,
+                                       strike_window_pct=None, max_strikes=None, delta_band=None, volatility=DEFAULT_VOLATILITY,
+                                       wait_for_greeks=True):
+        """
+        Get quotes and greeks for several expirations and rights as a strike x expiry grid
+        
+        The underlying is quoted once and the chain metadata comes from the
+        chain cache; strikes are narrowed per expiration and right as in
+        get_option_chain, then every contract is snapshotted in one batch
+        against a single deadline.
+        
+        Args:
+            symbol (str): Stock symbol
+            expirations (list): Expiration dates in YYYYMMDD format; dates the
+                                chain does not list are skipped
+            rights (tuple, optional): Rights to include, 'C' and/or 'P'
+            exchange (str, optional): Exchange to use
+            snapshot_timeout (float, optional): Overall deadline in seconds for
+                                                greeks and implied volatility to arrive
+            strike_window_pct (float, optional): Keep strikes within this percentage of spot
+            max_strikes (int, optional): Keep the N strikes nearest spot per expiration and right
+            delta_band (tuple, optional): (min, max) absolute delta to keep, estimated
+                                          locally with Black-Scholes
+            volatility (float, optional): Volatility assumed for the delta estimate
+            wait_for_greeks (bool, optional): Wait for TWS model greeks; when False only
+                                              quotes are awaited and greeks are computed locally
+            
+        Returns:
+            dict: 'symbol', 'stock_price', 'expirations' and 'strikes' (the grid axes)
+                  and 'grid', mapping each right to a dict of SURFACE_FIELDS, each a
+                  list with one row per expiration and one value per strike (None
+                  where the contract was not selected or returned no data); None if error
+        """
+        try:
+            if not self.is_connected():
+                logger.error(f"Cannot get option surface for {symbol} - not connected")
+                return None
+            
+            stock_price, chain = await self._get_underlying_and_chain_async(symbol, exchange)
+            if stock_price is None or not chain:
+                return None
+            
+            listed = set(chain['expirations'])
+            unlisted = set(expirations) - listed
+            if unlisted:
+                logger.warning(f"Skipping expirations not listed for {symbol}: {', '.join(sorted(unlisted))}")
+            expirations = sorted(set(expirations) & listed)
+            if not expirations:
+                logger.error(f"None of the requested expirations are listed for {symbol}")
+                return None
+            
+            option_contracts = []
+            for expiration in expirations:
+                for right in rights:
+                    strikes = select_strikes(chain['strikes'], stock_price, right, expiration,
+                                             window_pct=strike_window_pct, max_strikes=max_strikes,
+                                             delta_band=delta_band, volatility=volatility,
+                                             rate=self.risk_free_rate)
+                    option_contracts.extend(
+                        Option(symbol=symbol, lastTradeDateOrContractMonth=expiration, strike=strike, right=right,
+                               exchange=exchange, currency='USD', multiplier=100)
+                        for strike in strikes)
+            
+            if not option_contracts:
+                logger.warning(f"No {symbol} strikes match the requested selection")
+                return None
+            logger.debug(f"Requesting {len(option_contracts)} {symbol} options across {len(expirations)} expirations")
+            
+            options = await self._snapshot_option_contracts_async(option_contracts, timeout=snapshot_timeout,
+                                                                  underlying_price=stock_price,
+                                                                  wait_for_greeks=wait_for_greeks)
+            return self._build_option_surface(symbol, stock_price, expirations, rights, options)
+        except Exception as e:
+            logger.error(f"Error retrieving option surface for {symbol}: {e}")
+            logger.error(traceback.format_exc())
+            return None
+    
+    get_option_surface = on_io_thread(get_option_surface_async)
+    
+    @timed('get_historical_bars', 'contract')
+    async def get_historical_bars_async(self, contract, days=365, bar_size='1 day', what_to_show='TRADES',
+                                        use_rth=True, end=None, timeout=60):
+        """
+        Get historical bars, fetching only the part of the span not stored yet
+        
+        Bars come from the bar store; ranges it has not fetched before are
+        requested with reqHistoricalData in chunks no longer than one request
+        may cover for the bar size, each paced against the 'historical' budget.
+        
+        Args:
+            contract (Contract or str): Contract, or a stock symbol
+            days (float, optional): Length of the span in calendar days
+            bar_size (str, optional): IB bar size, one of core.history.BAR_SIZES
+            what_to_show (str, optional): IB data type, e.g. 'TRADES', 'MIDPOINT'
+                                          or 'OPTION_IMPLIED_VOLATILITY'
+            use_rth (bool, optional): Only include regular trading hours
+            end (datetime, optional): End of the span; defaults to now
+            timeout (float, optional): Seconds to wait for each request
+            
+        Returns:
+            dict: 'time' (epoch seconds of each bar start) and 'open', 'high', 'low',
+                  'close' and 'volume' numpy arrays, oldest first; None if error
+        """
+        try:
+            if isinstance(contract, str):
+                contract = Stock(contract, 'SMART', 'USD')
+            if bar_size not in BAR_SIZES:
+                logger.error(f"Unsupported bar size {bar_size!r}; use one of {', '.join(BAR_SIZES)}")
+                return None
+            bar_seconds, max_request_seconds = BAR_SIZES[bar_size]
+            end_time = int((end or datetime.now(pytz.utc)).timestamp())
+            start_time = end_time - int(days * 86400)
+            key = series_key(contract, bar_size, what_to_show, use_rth)
+            
+            missing = self.bar_store.missing_ranges(key, start_time, end_time, bar_seconds)
+            metrics = get_metrics()
+            metrics.increment('cache_hits' if not missing else 'cache_misses', 'get_historical_bars', contract.symbol)
+            if missing:
+                if not self.is_connected():
+                    logger.error(f"Cannot get historical bars for {contract.symbol} - not connected")
+                    return None
+                if not contract.conId and not (await self.qualify_contracts_async(contract))[0]:
+                    logger.error(f"Could not qualify {contract.symbol} for historical data")
+                    return None
+            
+            for range_start, range_end in missing:
+                # Walk back from the end of the range, one request per chunk
+                chunk_end = range_end
+                while chunk_end > range_start:
+                    chunk_start = max(range_start, chunk_end - max_request_seconds)
+                    await self.pacer.acquire_async('historical')
+                    with metrics.timer('historical_request', contract.symbol):
+                        bars = await self.ib.reqHistoricalDataAsync(
+                            contract, datetime.fromtimestamp(chunk_end, pytz.utc),
+                            duration_string(chunk_end - chunk_start, bar_size), bar_size, what_to_show,
+                            use_rth, formatDate=2, timeout=timeout)
+                    if not bars:
+                        # No data, an error or a timeout; leave the range for the next call
+                        logger.warning(f"No {what_to_show} {bar_size} bars for {key} before "
+                                       f"{datetime.fromtimestamp(chunk_end, pytz.utc):%Y-%m-%d %H:%M}")
+                        break
+                    self.bar_store.merge(key, bars_to_columns(bars), chunk_start, chunk_end)
+                    chunk_end = chunk_start
+            
+            return self.bar_store.get(key, start_time - bar_seconds, end_time)
+        except Exception as e:
+            logger.error(f"Error getting historical bars for {getattr(contract, 'symbol', contract)}: {e}")
+            logger.error(traceback.format_exc())
+            return None
+    
+    get_historical_bars = on_io_thread(get_historical_bars_async)
+    
+    @staticmethod
+    def _build_option_surface(symbol, stock_price, expirations, rights, options):
+        """
+        Arrange option data dictionaries into a strike x expiry grid per right
+        
+        Args:
+            symbol (str): Stock symbol
+            stock_price (float): Underlying price used for strike selection
+            expirations (list): Sorted expirations (grid rows)
+            rights (tuple): Rights to include
+            options (list): Option data dictionaries from _build_option_data
+            
+        Returns:
+            dict: Surface as described in get_option_surface
+        """
+        strikes = sorted(set(option['strike'] for option in options))
+        row = {expiration: i for i, expiration in enumerate(expirations)}
+        column = {strike: j for j, strike in enumerate(strikes)}
+        grid = {
+            right: {field: [[None] * len(strikes) for _ in expirations] for field in SURFACE_FIELDS}
+            for right in rights
+        }
+        for option in options:
+            cells = grid.get('C' if option['option_type'] == 'CALL' else 'P')
+            if cells is None or option['expiration'] not in row:
+                continue
+            i, j = row[option['expiration']], column[option['strike']]
+            for field in SURFACE_FIELDS:
+                value = option.get(field)
+                # NaN is not valid JSON; report missing values as None
+                cells[field][i][j] = None if isinstance(value, float) and math.isnan(value) else value
+        return {
+            'symbol': symbol,
+            'stock_price': stock_price,
+            'expirations': expirations,
+            'strikes': strikes,
+            'grid': grid
+        }
+    
+    async def _get_underlying_and_chain_async(self, symbol, exchange='SMART'):
+        """
+        Quote an underlying and load its chain metadata, selecting live or frozen data
+        
+        Args:
+            symbol (str): Stock symbol
+            exchange (str, optional): Exchange to use
+            
+        Returns:
+            tuple: (stock_price, chain); stock_price is None if no valid price was
+                   received and chain is None if no chain was found
+        """
+        # Use frozen data when market is closed, live data when it is open
+        self.set_market_data_type(1 if is_market_hours() else 2)
+        
+        stock = Stock(symbol, exchange, 'USD')
+        await self.qualify_contracts_async(stock)
+        
+        stock_price = await self._get_underlying_price_async(stock)
+        if not stock_price or stock_price <= 0:
+            logger.warning(f"Could not get valid price for {symbol}")
+            return None, None
+        
+        # Expirations and strikes come from the cached chain metadata
+        chain = await self.get_option_params_async(symbol, exchange)
+        if not chain:
+            logger.error(f"No option chains found for {symbol}")
+        return stock_price, chain
+    
+    @timed('get_option_params', 'symbol')
+    async def get_option_params_async(self, symbol, exchange='SMART', force_refresh=False):
+        """
+        Get the expirations and strikes listed for a symbol's options
+        
+        Results come from the chain cache; reqSecDefOptParams is only called on a
+        miss, once the cached entry has expired, or when a refresh is forced.
+        
+        Args:
+            symbol (str): Underlying stock symbol
+            exchange (str, optional): Exchange whose chain to use
+            force_refresh (bool, optional): Bypass the cache and reload from TWS
+            
+        Returns:
+            dict: Chain metadata with sorted 'expirations' (YYYYMMDD) and 'strikes',
+                  the chain's 'exchange', 'trading_class' and 'multiplier', or None if error
+        """
+        if not force_refresh:
+            cached = self.chain_cache.get(symbol, exchange)
+            if cached is not None:
+                get_metrics().increment('cache_hits', 'get_option_params', symbol)
+                return cached
+        
+        try:
+            if not self.is_connected():
+                logger.error(f"Cannot get option parameters for {symbol} - not connected")
+                return None
+            
+            stock = Stock(symbol, 'SMART', 'USD')
+            await self.qualify_contracts_async(stock)
+            
+            await self.pacer.acquire_async('secdef')
+            with get_metrics().timer('sec_def_opt_params', symbol):
+                chains = await self.ib.reqSecDefOptParamsAsync(stock.symbol, '', stock.secType, stock.conId)
+            if not chains:
+                logger.error(f"No option chains found for {symbol}")
+                return None
+            
+            # Prefer the requested exchange's chain with the most listings
+            candidates = [c for c in chains if c.exchange == exchange] or chains[:1]
+            chain = max(candidates, key=lambda c: (len(c.expirations), len(c.strikes)))
+            
+            params = {
+                'symbol': symbol,
+                'exchange': chain.exchange,
+                'trading_class': chain.tradingClass,
+                'multiplier': chain.multiplier,
+                'expirations': sorted(chain.expirations),
+                'strikes': sorted(chain.strikes)
+            }
+            self.chain_cache.put(symbol, exchange, params)
+            return params
+        except Exception as e:
+            logger.error(f"Error retrieving option parameters for {symbol}: {e}")
+            logger.error(traceback.format_exc())
+            return None
+    
+    get_option_params = on_io_thread(get_option_params_async)
+    
+    async def refresh_option_params_async(self, symbols=None, exchange='SMART'):
+        """
+        Reload cached option chain metadata, e.g. ahead of the market open
+        
+        Args:
+            symbols (list, optional): Symbols to reload; defaults to every cached chain
+            exchange (str, optional): Exchange used for symbols given explicitly
+            
+        Returns:
+            dict: Mapping of symbol to True if it was refreshed, False otherwise
+        """
+        keys = [(symbol, exchange) for symbol in symbols] if symbols else None
+        return await self.chain_cache.refresh(
+            lambda symbol, chain_exchange: self.get_option_params_async(symbol, chain_exchange, force_refresh=True),
+            keys
+        )
+    
+    refresh_option_params = on_io_thread(refresh_option_params_async)
+    
+    async def _get_underlying_price_async(self, stock, timeout=1.0):
+        """
+        Get the reference price of a qualified underlying from its streaming ticker
+        
+        Args:
+            stock: Qualified stock contract
+            timeout (float): Maximum time to wait for a first price
+            
+        Returns:
+            float: Market, last or close price, or None if unavailable
+        """
+        async with self.market_data.subscription_async(stock) as ticker:
+            if ticker is None:
+                return None
+            await self._wait_for_first_tick_async(ticker, stock.symbol, timeout=timeout)
+            
+            stock_price = ticker.marketPrice()
+            if not stock_price or stock_price <= 0:
+                stock_price = ticker.last if hasattr(ticker, 'last') and ticker.last > 0 else None
+            if not stock_price or stock_price <= 0:
+                stock_price = ticker.close if hasattr(ticker, 'close') and ticker.close > 0 else None
+            return stock_price
+    
+    @timed('option_snapshot', 'contracts')
+    async def _snapshot_option_contracts_async(self, contracts, timeout=5.0, underlying_price=None, wait_for_greeks=True):
+        """
+        Qualify and snapshot a batch of option contracts concurrently
+        
+        When the underlying price is known, implied volatilities are solved from
+        the quotes and greeks TWS did not send are computed locally, each for the
+        whole batch at once (see _fill_implied_volatility and _fill_local_greeks).
+        
+        Args:
+            contracts (list): Unqualified option contracts
+            timeout (float): Overall deadline in seconds shared by all contracts
+            underlying_price (float, optional): Underlying price for local greeks
+            wait_for_greeks (bool): Wait for model greeks, or only for quotes and
+                                    implied volatility when greeks can be computed locally
+            
+        Returns:
+            list: Option data dictionaries, each flagged with 'partial' when the
+                  deadline passed before its data arrived, and with 'iv_source' and
+                  'greeks_source' ('model', 'local' or None)
+        """
+        if not contracts:
+            return []
+        
+        # Qualify every contract in a single round trip
+        qualified_contracts = [c for c in await self.qualify_contracts_async(*contracts) if c]
+        if len(qualified_contracts) < len(contracts):
+            logger.warning(f"Could only qualify {len(qualified_contracts)} of {len(contracts)} option contracts for {contracts[0].symbol}")
+        
+        # Open all market data requests before waiting on any of them
+        tickers = []
+        for contract in qualified_contracts:
+            try:
+                # Request market data with model computation (generic tick 106 = implied volatility)
+                ticker = await self.market_data.acquire_async(contract, OPTION_GENERIC_TICKS)
+                if ticker is None:
+                    logger.warning(f"No market data line available for option {contract.symbol} {contract.lastTradeDateOrContractMonth} {contract.strike} {contract.right}")
+                    continue
+                tickers.append((contract, ticker))
+            except Exception as e:
+                logger.error(f"Error requesting market data for option {contract.symbol} {contract.lastTradeDateOrContractMonth} {contract.strike} {contract.right}: {e}")
+        
+        try:
+            # Wait for all tickers together against a single deadline
+            symbol = contracts[0].symbol
+            metrics = get_metrics()
+            fields = OPTION_MODEL_FIELDS if wait_for_greeks or not underlying_price else OPTION_QUOTE_FIELDS
+            with metrics.timer('greeks_wait', symbol):
+                ready = await self.wait_for_tickers_async([ticker for _, ticker in tickers], fields, timeout=timeout)
+            if not all(ready):
+                metrics.increment('timeouts', 'greeks_wait', symbol)
+            
+            options = []
+            for (contract, ticker), is_ready in zip(tickers, ready):
+                try:
+                    option_data = self._build_option_data(contract, ticker)
+                    option_data['partial'] = not is_ready
+                    options.append(option_data)
+                except Exception as e:
+                    logger.error(f"Error getting market data for option {contract.symbol} {contract.lastTradeDateOrContractMonth} {contract.strike} {contract.right}: {e}")
+                    logger.error(traceback.format_exc())
+            
+            for option in options:
+                option['iv_source'] = 'model' if _is_positive(option['implied_volatility']) else None
+                option['greeks_source'] = 'model' if option['delta'] is not None else None
+            if underlying_price:
+                metrics.increment('local_iv', 'option_snapshot', symbol,
+                                  self._fill_implied_volatility(options, underlying_price))
+                local_count = self._fill_local_greeks(options, underlying_price)
+                metrics.increment('local_greeks', 'option_snapshot', symbol, local_count)
+            
+            partial_count = sum(1 for option in options if option['partial'])
+            metrics.increment('partial', 'option_snapshot', symbol, partial_count)
+            if partial_count:
+                logger.info(f"{partial_count} of {len(options)} options for {contracts[0].symbol} returned partial data after {timeout}s")
+            
+            return options
+        finally:
+            # Release the subscriptions so they keep streaming for the next refresh
+            for contract, _ in tickers:
+                self.market_data.release(contract, OPTION_GENERIC_TICKS)
+    
+    def _fill_implied_volatility(self, options, underlying_price):
+        """
+        Solve implied volatilities from the bid, ask and mid prices of a batch of options
+        
+        All prices of all options are inverted in one vectorized call. Every
+        option gets 'bid_iv' and 'ask_iv'; options TWS sent no implied
+        volatility for (typical of frozen and delayed data) get the volatility
+        of their mid price, or of their last price when there is no two-sided quote.
+        
+        Args:
+            options (list): Option data dictionaries from _build_option_data, updated in place
+            underlying_price (float): Underlying price
+            
+        Returns:
+            int: Number of options whose implied volatility was filled in
+        """
+        if not options:
+            return 0
+        
+        bids = [option['bid'] for option in options]
+        asks = [option['ask'] for option in options]
+        mids = [(bid + ask) / 2 if bid > 0 and ask > 0 else option['last']
+                for option, bid, ask in zip(options, bids, asks)]
+        solved = implied_volatility([bids, asks, mids], underlying_price,
+                                    [option['strike'] for option in options],
+                                    [years_to_expiry(option['expiration']) for option in options],
+                                    ['C' if option['option_type'] == 'CALL' else 'P' for option in options],
+                                    rate=self.risk_free_rate)
+        
+        def volatility(value):
+            return round(float(value), 4) if not math.isnan(value) else None
+        
+        filled = 0
+        for i, option in enumerate(options):
+            option['bid_iv'] = volatility(solved[0][i])
+            option['ask_iv'] = volatility(solved[1][i])
+            mid_iv = volatility(solved[2][i])
+            if option['iv_source'] is None and mid_iv is not None:
+                option['implied_volatility'] = mid_iv
+                option['iv_source'] = 'local'
+                filled += 1
+        if filled:
+            logger.debug(f"Solved implied volatility for {filled} of {len(options)} options")
+        return filled
+    
+    def _fill_local_greeks(self, options, underlying_price):
+        """
+        Compute Black-Scholes greeks for options that did not receive model greeks
+        
+        The whole batch is priced in one vectorized call at the connection's
+        risk_free_rate. Each option uses its own
+        implied volatility (from TWS or solved from its quotes), otherwise the
+        median implied volatility of the batch, otherwise DEFAULT_VOLATILITY.
+        
+        Args:
+            options (list): Option data dictionaries from _build_option_data, updated in place
+            underlying_price (float): Underlying price
+            
+        Returns:
+            int: Number of options whose greeks were filled in
+        """
+        missing = [option for option in options if option['delta'] is None]
+        if not missing:
+            return 0
+        
+        known = [option['implied_volatility'] for option in options if _is_positive(option['implied_volatility'])]
+        fallback = statistics.median(known) if known else DEFAULT_VOLATILITY
+        volatilities = [option['implied_volatility'] if _is_positive(option['implied_volatility']) else fallback
+                        for option in missing]
+        
+        greeks = bs_greeks(underlying_price,
+                           [option['strike'] for option in missing],
+                           [years_to_expiry(option['expiration']) for option in missing],
+                           volatilities,
+                           ['C' if option['option_type'] == 'CALL' else 'P' for option in missing],
+                           rate=self.risk_free_rate)
+        for i, option in enumerate(missing):
+            option['delta'] = round(float(greeks['delta'][i]), 3)
+            option['gamma'] = round(float(greeks['gamma'][i]), 5)
+            option['theta'] = round(float(greeks['theta'][i]), 5)
+            option['vega'] = round(float(greeks['vega'][i]), 5)
+            option['greeks_source'] = 'local'
+        logger.debug(f"Computed local greeks for {len(missing)} of {len(options)} options")
+        return len(missing)
+    
+    def _build_option_data(self, contract, ticker):
+        """
+        Extract quote and greeks fields from an option ticker
+        
+        Args:
+            contract: Qualified option contract
+            ticker: ib_async Ticker for the contract
+            
+        Returns:
+            dict: Option data dictionary
+        """
+        # Extract market data
+        bid = ticker.bid if hasattr(ticker, 'bid') and ticker.bid is not None and ticker.bid > 0 else 0
+        ask = ticker.ask if hasattr(ticker, 'ask') and ticker.ask is not None and ticker.ask > 0 else 0
+        last = ticker.last if hasattr(ticker, 'last') and ticker.last is not None and ticker.last > 0 else 0
+        volume = ticker.volume if hasattr(ticker, 'volume') and ticker.volume is not None else 0
+        open_interest = ticker.openInterest if hasattr(ticker, 'openInterest') and ticker.openInterest is not None else 0
+        implied_vol = ticker.impliedVolatility if hasattr(ticker, 'impliedVolatility') and ticker.impliedVolatility is not None else 0
+        # Get real delta from model greeks if available
+        delta = None
+        gamma = None
+        theta = None
+        vega = None
+        
+        if hasattr(ticker, 'modelGreeks') and ticker.modelGreeks:
+            delta = ticker.modelGreeks.delta if hasattr(ticker.modelGreeks, 'delta') else None
+            gamma = ticker.modelGreeks.gamma if hasattr(ticker.modelGreeks, 'gamma') else None
+            theta = ticker.modelGreeks.theta if hasattr(ticker.modelGreeks, 'theta') else None
+            vega = ticker.modelGreeks.vega if hasattr(ticker.modelGreeks, 'vega') else None
+            
+            logger.debug(f"Got real greeks for {contract.symbol} {contract.right} {contract.strike}: delta={delta}, gamma={gamma}, theta={theta}, vega={vega}")
+        else:
+            logger.debug(f"No model greeks available for {contract.symbol} {contract.right} {contract.strike}")
+            
+        # Create option data dictionary
+        return {
+            'strike': contract.strike,
+            'expiration': contract.lastTradeDateOrContractMonth,
+            'option_type': 'CALL' if contract.right == 'C' else 'PUT',
+            'bid': bid,
+            'ask': ask,
+            'last': last,
+            'volume': volume,
+            'open_interest': open_interest,
+            'implied_volatility': implied_vol,
+            # TWS sends NaN for greeks it could not compute; treat them as missing
+            'delta': round(delta, 3) if _is_number(delta) else None,
+            'gamma': round(gamma, 5) if _is_number(gamma) else None,
+            'theta': round(theta, 5) if _is_number(theta) else None,
+            'vega': round(vega, 5) if _is_number(vega) else None
+        }
+    
     def _convert_to_usd(self, value, currency):
         """
         Convert a value to USD if needed
@@ -489,7 +1416,8 @@ class IBConnection:
             return value
         return CurrencyHelper.convert_amount(value, currency, 'USD')
 
-    def get_portfolio(self):
+    @timed('portfolio_load')
+    async def get_portfolio_async(self):
         """
         Get current portfolio positions and account information from IB
         Returns all positions (Stocks, Options, and other security types)
@@ -509,7 +1437,7 @@ class IBConnection:
                 raise ConnectionError("Not connected to IB during market hours")
             else:
                 # Try to connect even when market is closed
-                if not self.connect():
+                if not await self.connect_async():
                     logger.error("Could not connect to IB during closed market.")
                     return None
         
@@ -522,112 +1450,20 @@ class IBConnection:
                 # Use live data when market is open
                 self.set_market_data_type(1)  # 1 = Live
                 
-            # Get account summary
+            # Follow the account through the update events ib_async subscribes to
             account_id = self.ib.managedAccounts()[0]
-            account_values = self.ib.accountSummary(account_id)
-            
-            if not account_values:
+            model = self.portfolio_model
+            if model.ib is not self.ib or model.account_id != account_id or not model.ready:
+                model.attach(self.ib, account_id)
+                if not model.ready:
+                    await asyncio.wait_for(self.ib.reqAccountUpdatesAsync(account_id), self.timeout)
+                    model.attach(self.ib, account_id)
+            
+            if not model.ready:
                 logger.warning("No account data available")
                 return None
             
-            # Extract relevant account information
-            account_info = {
-                'account_id': account_id,
-                'available_cash': 0,
-                'account_value': 0,
-                'excess_liquidity': 0,
-                'initial_margin': 0,
-                'leverage_percentage': 0
-            }
-            
-            # Map account tags to their corresponding fields
-            account_fields = {
-                'TotalCashValue': 'available_cash',
-                'NetLiquidation': 'account_value',
-                'ExcessLiquidity': 'excess_liquidity',
-                'FullInitMarginReq': 'initial_margin'
-            }
-            
-            for av in account_values:
-                try:
-                    # Skip if not a numeric field we care about
-                    if av.tag not in account_fields:
-                        continue
-                        
-                    # Get the currency for this value, default to USD if empty or missing
-                    currency = av.currency if hasattr(av, 'currency') and av.currency else 'USD'
-                    value = float(av.value)
-                    
-                    # Store the converted value
-                    account_info[account_fields[av.tag]] = self._convert_to_usd(value, currency)
-                except Exception as e:
-                    logger.error(f"Error processing account value {av.tag}: {str(e)}")
-            
-            # Calculate leverage percentage
-            if account_info['account_value'] > 0 and account_info['initial_margin'] > 0:
-                account_info['leverage_percentage'] = (account_info['initial_margin'] / account_info['account_value']) * 100
-            
-            # Get positions
-            portfolio = self.ib.portfolio()
-            positions = {}
-            
-            # Process all positions (both Stocks and Options)
-            stock_count = 0
-            option_count = 0
-            other_count = 0
-            
-            # Import Option class for isinstance check
-            from ib_async import Option
-            
-            for position in portfolio:
-                try:
-                    symbol = position.contract.symbol
-                    position_key = symbol
-                    position_type = 'UNKNOWN'
-                    # Default to USD if currency is empty or missing
-                    position_currency = position.contract.currency if position.contract.currency else 'USD'
-                    
-                    # Determine position type and create an appropriate key
-                    if isinstance(position.contract, Stock):
-                        position_type = 'STK'
-                        stock_count += 1
-                    elif isinstance(position.contract, Option):
-                        position_type = 'OPT'
-                        option_count += 1
-                        # For options, create a unique key including strike, expiry, and right
-                        expiry = position.contract.lastTradeDateOrContractMonth
-                        strike = position.contract.strike
-                        right = position.contract.right
-                        position_key = f"{symbol}_{expiry}_{strike}_{right}"
-                    else:
-                        position_type = position.contract.secType
-                        other_count += 1
-                    
-                    # Convert position values to USD if needed
-                    positions[position_key] = {
-                        'shares': position.position,
-                        'avg_cost': self._convert_to_usd(position.averageCost, position_currency),
-                        'market_price': self._convert_to_usd(position.marketPrice, position_currency),
-                        'market_value': self._convert_to_usd(position.marketValue, position_currency),
-                        'unrealized_pnl': self._convert_to_usd(position.unrealizedPNL, position_currency),
-                        'realized_pnl': self._convert_to_usd(position.realizedPNL, position_currency),
-                        'contract': position.contract,
-                        'security_type': position_type
-                    }
-                    
-                except Exception as e:
-                    logger.error(f"Error processing position: {str(e)}")
-            
-            return {
-                'account_id': account_id,
-                'available_cash': account_info.get('available_cash', 0),
-                'account_value': account_info.get('account_value', 0),
-                'excess_liquidity': account_info.get('excess_liquidity', 0),
-                'initial_margin': account_info.get('initial_margin', 0),
-                'leverage_percentage': account_info.get('leverage_percentage', 0),
-                'positions': positions,
-                'is_frozen': not is_market_open  # Indicate if data is frozen
-            }
+            return {**model.snapshot(), 'is_frozen': not is_market_open}  # Indicate if data is frozen
                 
         except Exception as e:
             error_msg = str(e)
@@ -636,6 +1472,23 @@ class IBConnection:
             
             # During market hours, propagate the error
             raise
+    
+    @timed('get_portfolio')
+    def get_portfolio(self):
+        """
+        Get current portfolio positions and account information
+        
+        Once the portfolio model is live this is served from memory on the
+        calling thread; otherwise get_portfolio_async runs on the I/O thread to
+        connect and seed the model.
+        
+        Returns:
+            dict: Dictionary containing account information and all positions
+        """
+        model = self.portfolio_model
+        if model.ready and model.ib is self.ib and self.is_connected():
+            return {**model.snapshot(), 'is_frozen': not is_market_hours()}
+        return self.io_thread.call(self.get_portfolio_async)
 
     def create_option_contract(self, symbol, expiry, strike, option_type, exchange='SMART', currency='USD'):
         """
@@ -720,7 +1573,8 @@ class IBConnection:
             logger.error(traceback.format_exc())
             return None
             
-    def place_order(self, contract, order):
+    @timed('place_order', 'contract')
+    async def place_order_async(self, contract, order):
         """
         Place an order for a contract
         
@@ -738,10 +1592,11 @@ class IBConnection:
         try:   
             # Place the order
             trade = self.ib.placeOrder(contract, order)
+            if hasattr(trade, 'orderStatus'):
+                self.orders.track(trade)
             
             # Wait for order acknowledgment (order ID assigned)
             timeout = 3  # seconds
-            start_time = time.time()
             
             # Check if we have a valid trade object with orderStatus
             if not hasattr(trade, 'orderStatus'):
@@ -755,9 +1610,21 @@ class IBConnection:
                     'avg_fill_price': 0
                 }
                 
-            # Wait for order ID to be assigned
-            while not trade.orderStatus.orderId and time.time() - start_time < timeout:
-                self.ib.waitOnUpdate(timeout=0.1)
+            # Wait for order ID to be assigned, driven by the trade's status events
+            if not trade.orderStatus.orderId:
+                acknowledged = asyncio.get_running_loop().create_future()
+                
+                def on_status(trade):
+                    if trade.orderStatus.orderId and not acknowledged.done():
+                        acknowledged.set_result(True)
+                
+                trade.statusEvent += on_status
+                try:
+                    await asyncio.wait_for(acknowledged, timeout)
+                except (asyncio.TimeoutError, TimeoutError):
+                    logger.warning(f"No order ID assigned after {timeout}s")
+                finally:
+                    trade.statusEvent -= on_status
                 
             # Create result dictionary with safe attribute access
             order_status = {
@@ -792,11 +1659,17 @@ class IBConnection:
                 pass
             
             return None
+    
+    place_order = on_io_thread(place_order_async)
 
+    @timed('check_order_status')
     def check_order_status(self, order_id):
         """
         Check the status of an order by its IB order ID
         
+        Reads the order state index, so it can be called from any thread and
+        never waits for TWS.
+        
         Args:
             order_id (int): The IB order ID to check
             
@@ -810,71 +1683,10 @@ class IBConnection:
                 logger.error("Not connected to TWS")
                 return None
             
-            # Ensure order ID is an integer
-            order_id = int(order_id)
-            
-            # Get all open orders
-            open_orders = self.ib.openOrders()
-            print(f"open_orders: {open_orders}")
-            
-            # Check if order is in open orders
-            for o in open_orders:
-                if hasattr(o, 'orderId') and o.orderId == order_id:
-                    # Check if it's a contract+order tuple or an order with status
-                    if hasattr(o, 'orderStatus'):
-                        return {
-                            'status': o.orderStatus.status,
-                            'filled': o.orderStatus.filled,
-                            'remaining': o.orderStatus.remaining,
-                            'avg_fill_price': float(o.orderStatus.avgFillPrice or 0),
-                            'last_fill_price': float(o.orderStatus.lastFillPrice or 0),
-                            'commission': float(o.orderStatus.commission or 0),
-                            'why_held': o.orderStatus.whyHeld
-                        }
-                    else:
-                        # This might be just the order object without status
-                        return {
-                            'status': 'Submitted',  # Default status for found orders
-                            'filled': 0,
-                            'remaining': o.totalQuantity if hasattr(o, 'totalQuantity') else 0,
-                            'avg_fill_price': 0,
-                            'last_fill_price': 0,
-                            'commission': 0,
-                            'why_held': ''
-                        }
-            
-            # Check trades for this order ID
-            trades = self.ib.trades()
-            for trade in trades:
-                if hasattr(trade.order, 'orderId') and trade.order.orderId == order_id:
-                    return {
-                        'status': trade.orderStatus.status,
-                        'filled': trade.orderStatus.filled,
-                        'remaining': trade.orderStatus.remaining,
-                        'avg_fill_price': float(trade.orderStatus.avgFillPrice or 0),
-                        'last_fill_price': float(trade.orderStatus.lastFillPrice or 0),
-                        'commission': float(trade.orderStatus.commission or 0),
-                        'why_held': trade.orderStatus.whyHeld
-                    }
-            
-            # Check execution history if not found in open orders or trades
-            executions = self.ib.executions()
-            for execution in executions:
-                if execution.orderId == order_id:
-                    # Get commission info from commissions report
-                    commission = 0
-                    for fill in self.ib.fills():
-                        if fill.execution.orderId == order_id:
-                            commission += float(fill.commissionReport.commission or 0)
-                    
-                    # Map to our standard format
-                    return {
-                        'status': 'Filled',
-                        'filled': execution.shares,
-                        'remaining': 0,
-                        'avg_fill_price': float(execution.price or 0),
-                        'commission': commission
-                    }
+            # Look the order up in the event-driven order state index
+            order_status = self.orders.get(int(order_id))
+            if order_status is not None:
+                return order_status
             
             # Order not found
             logger.warning(f"Order with ID {order_id} not found")
@@ -890,6 +1702,8 @@ class IBConnection:
             logger.error(traceback.format_exc())
             return None
         
+    @on_io_thread
+    @timed('cancel_order')
     def cancel_order(self, order_id):
         """
         Cancel an open order by its IB order ID
@@ -910,23 +1724,9 @@ class IBConnection:
             # Ensure order ID is an integer
             order_id = int(order_id)
             
-            # Get all open orders
-            open_orders = self.ib.openOrders()
-            
             # Find the order to cancel
-            order_to_cancel = None
-            for o in open_orders:
-                if hasattr(o, 'orderId') and o.orderId == order_id:
-                    order_to_cancel = o
-                    break
-            
-            # If not found in open orders, check trades
-            if not order_to_cancel:
-                trades = self.ib.trades()
-                for trade in trades:
-                    if hasattr(trade.order, 'orderId') and trade.order.orderId == order_id:
-                        order_to_cancel = trade.order
-                        break
+            trade = self.orders.get_trade(order_id)
+            order_to_cancel = trade.order if trade is not None else None
             
             if not order_to_cancel:
                 logger.warning(f"Order with ID {order_id} not found in open orders or trades")
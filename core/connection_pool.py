@@ -0,0 +1,253 @@
+"""
+Process-wide pool of Interactive Brokers connections
+"""
+
+import threading
+import time
+
+from config import Config
+from core.chain_cache import OptionChainCache
+from core.connection import ClientIdInUseError, IBConnection
+from core.contract_cache import ContractCache
+from core.history import BarStore
+from core.logging_config import get_logger
+from db.database import OptionsDatabase
+
+logger = get_logger('autotrader.connection_pool', 'tws')
+
+
+class IBConnectionPool:
+    """
+    Shares one IBConnection between every service in the process
+
+    Client IDs are leased deterministically: the pool tries `base_client_id`,
+    then the next ID up, until TWS accepts the handshake. Each process
+    therefore gets a stable ID in [base, base + max_client_ids), instead of a
+    random one that may collide. Only an ID that TWS reports as in use moves
+    the lease on to the next one; any other failure (refused, timed out) stops
+    the attempt, and further attempts from get() back off exponentially. The
+    leased ID is kept for reconnects. A background health check reconnects a
+    dropped connection before the next request needs it and releases idle
+    market data lines.
+    """
+    def __init__(self, host='127.0.0.1', port=7497, base_client_id=1, max_client_ids=32,
+                 health_check_interval=30, retry_backoff=1.0, max_retry_backoff=60.0,
+                 connection_factory=IBConnection, clock=time.monotonic, **connection_kwargs):
+        """
+        Initialize the pool (no connection is made until start() or get())
+
+        Args:
+            host (str): TWS/IB Gateway host
+            port (int): TWS/IB Gateway port
+            base_client_id (int): First client ID to try
+            max_client_ids (int): Number of consecutive client IDs that may be leased
+            health_check_interval (float): Seconds between background health checks
+            retry_backoff (float): Seconds get() waits before retrying after a failed connect
+            max_retry_backoff (float): Upper bound of the doubling retry backoff
+            connection_factory (callable): Builds the connection; IBConnection by default
+            clock (callable): Monotonic clock returning seconds
+            **connection_kwargs: Extra keyword arguments for the connection factory
+        """
+        self.host = host
+        self.port = port
+        self.base_client_id = base_client_id
+        self.max_client_ids = max_client_ids
+        self.health_check_interval = health_check_interval
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.connection_factory = connection_factory
+        self.clock = clock
+        self.connection_kwargs = connection_kwargs
+        self.connection = None
+        self.client_id = None
+        self._failures = 0
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._health_thread = None
+
+    def get(self):
+        """
+        Borrow the shared connection, connecting or reconnecting if needed
+
+        After a failed attempt, requests return None without contacting TWS
+        until the retry backoff has passed.
+
+        Returns:
+            IBConnection: Connected IBConnection, or None if TWS cannot be reached
+        """
+        conn = self.connection
+        if conn is not None and conn.is_connected():
+            return conn
+        if self.clock() < self._retry_at:
+            logger.debug("TWS connection is backing off after a failed attempt")
+            return None
+
+        with self._lock:
+            return self._ensure_connected()
+
+    def _ensure_connected(self):
+        """
+        Connect and record the outcome for the retry backoff (caller holds the lock)
+
+        Returns:
+            IBConnection: Connected IBConnection, or None on failure
+        """
+        conn = self.connection
+        if conn is not None and conn.is_connected():
+            return conn
+
+        conn = self._connect()
+        if conn is not None:
+            self._failures = 0
+            self._retry_at = 0.0
+        else:
+            self._failures += 1
+            backoff = min(self.max_retry_backoff, self.retry_backoff * 2 ** (self._failures - 1))
+            self._retry_at = self.clock() + backoff
+            logger.warning(f"Could not connect to TWS, retrying in {backoff:.0f}s")
+        return conn
+
+    def _connect(self):
+        """
+        Reconnect with the leased client ID, or lease a new one (caller holds the lock)
+
+        Returns:
+            IBConnection: Connected IBConnection, or None on failure
+        """
+        conn = self.connection
+
+        # Warm reconnect: keep the same object (and its caches) and client ID
+        if conn is not None:
+            logger.info(f"Reconnecting to TWS with leased client ID {self.client_id}")
+            if conn.connect():
+                return conn
+            if not isinstance(conn.last_error, ClientIdInUseError):
+                self._log_failure(conn.last_error)
+                return None
+            logger.info(f"Client ID {self.client_id} was taken by another session, leasing a new one")
+
+        return self._lease()
+
+    def _lease(self):
+        """
+        Connect with the first client ID that TWS accepts (caller holds the lock)
+
+        Returns:
+            IBConnection: Connected IBConnection, or None on failure
+        """
+        if self.connection is None:
+            self.connection = self.connection_factory(host=self.host, port=self.port,
+                                                      client_id=self.base_client_id, **self.connection_kwargs)
+        conn = self.connection
+
+        for client_id in range(self.base_client_id, self.base_client_id + self.max_client_ids):
+            conn.client_id = client_id
+            if conn.connect():
+                self.client_id = client_id
+                logger.info(f"Leased client ID {client_id} for the shared TWS connection")
+                return conn
+            if not isinstance(conn.last_error, ClientIdInUseError):
+                # Refusals and timeouts are not about the ID; other IDs would fail the same way
+                self._log_failure(conn.last_error)
+                return None
+            logger.debug(f"Client ID {client_id} is in use, trying the next one")
+
+        logger.error(f"No free client ID in range {self.base_client_id}-{self.base_client_id + self.max_client_ids - 1}")
+        return None
+
+    def _log_failure(self, error):
+        """
+        Log why a connection attempt failed
+        """
+        if isinstance(error, ConnectionRefusedError):
+            logger.error(f"TWS/IB Gateway at {self.host}:{self.port} refused the connection")
+        else:
+            logger.error(f"Could not connect to TWS/IB Gateway at {self.host}:{self.port}: {error!r}")
+
+    def check_health(self):
+        """
+        Reconnect the shared connection if it has dropped, ignoring the retry backoff
+
+        Also cancels idle market data subscriptions, so lines are released even
+        when no new subscription comes along to evict them.
+
+        Returns:
+            bool: True if the connection is up after the check
+        """
+        with self._lock:
+            conn = self._ensure_connected()
+        if conn is None:
+            return False
+        conn.evict_idle_market_data()
+        return True
+
+    def start(self):
+        """
+        Start the background health check, which also makes the first connection
+        """
+        if self._health_thread is not None and self._health_thread.is_alive():
+            return
+        self._stop.clear()
+        self._health_thread = threading.Thread(target=self._health_loop, name='ib-health', daemon=True)
+        self._health_thread.start()
+
+    def _health_loop(self):
+        """
+        Health check thread body
+        """
+        while not self._stop.is_set():
+            try:
+                self.check_health()
+            except Exception as e:
+                logger.error(f"Error during connection health check: {e}")
+            self._stop.wait(self.health_check_interval)
+
+    def close(self):
+        """
+        Stop the health check and disconnect the shared connection
+        """
+        self._stop.set()
+        with self._lock:
+            if self.connection is not None:
+                self.connection.disconnect()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_connection_pool(config=None):
+    """
+    Get the process-wide connection pool, creating it from configuration on first use
+
+    Args:
+        config (Config, optional): Configuration to build the pool from
+
+    Returns:
+        IBConnectionPool: The shared pool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            config = config or Config()
+            _pool = IBConnectionPool(
+                host=config.get('host', '127.0.0.1'),
+                port=config.get('port', 7497),
+                base_client_id=config.get('client_id', 1),
+                max_client_ids=config.get('max_client_ids', 32),
+                health_check_interval=config.get('health_check_interval', 30),
+                retry_backoff=config.get('connect_retry_backoff', 1.0),
+                max_retry_backoff=config.get('max_connect_retry_backoff', 60.0),
+                timeout=config.get('timeout', 20),
+                readonly=config.get('readonly', True),
+                max_market_data_lines=config.get('max_market_data_lines', 100),
+                subscription_ttl=config.get('subscription_ttl', 300),
+                request_budgets=config.get('request_budgets'),
+                record_dir=config.get('record_dir'),
+                contract_cache=ContractCache(OptionsDatabase(config.get('db_path'))),
+                chain_cache=OptionChainCache(ttl=config.get('chain_cache_ttl', 6 * 3600)),
+                bar_store=BarStore(config.get('history_dir', 'history')),
+                risk_free_rate=config.get('risk_free_rate', 0.0)
+            )
+        return _pool
@@ -0,0 +1,161 @@
+"""
+Contract qualification cache for Interactive Brokers contracts
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from ib_async import util
+
+from core.logging_config import get_logger
+
+logger = get_logger('autotrader.contract_cache', 'tws')
+
+
+class ContractCache:
+    """
+    Two-level cache of qualified contract details
+
+    An in-memory LRU sits in front of the `contracts` table of an
+    OptionsDatabase, so conIds survive restarts and repeat lookups never go
+    back to TWS. Options are dropped once their expiration date has passed.
+    """
+    def __init__(self, db=None, max_entries=5000):
+        """
+        Initialize the contract cache
+
+        Args:
+            db (OptionsDatabase, optional): Database used for persistence. If None,
+                                            the cache is memory-only.
+            max_entries (int): Maximum number of contracts kept in memory
+        """
+        self.db = db
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._purged_on = None
+        self.purge_expired()
+
+    @staticmethod
+    def make_key(contract):
+        """
+        Build the cache key for a contract from the fields used to request it
+
+        Args:
+            contract: Contract, qualified or not
+
+        Returns:
+            str: Key of (symbol, secType, expiry, strike, right, exchange, currency)
+        """
+        right = (getattr(contract, 'right', '') or '').upper()
+        right = {'CALL': 'C', 'PUT': 'P'}.get(right, right)
+        strike = getattr(contract, 'strike', 0.0) or 0.0
+        return '|'.join(str(part) for part in (
+            (contract.symbol or '').upper(),
+            contract.secType or '',
+            getattr(contract, 'lastTradeDateOrContractMonth', '') or '',
+            f"{float(strike):g}" if isinstance(strike, (int, float)) else strike,
+            right,
+            contract.exchange or '',
+            contract.currency or ''
+        ))
+
+    def get(self, contract):
+        """
+        Look up the qualified fields for a contract
+
+        Args:
+            contract: Contract to look up
+
+        Returns:
+            dict: Qualified contract fields (including conId) or None on a miss
+        """
+        self._purge_if_new_day()
+        key = self.make_key(contract)
+
+        with self._lock:
+            fields = self._entries.get(key)
+            if fields is not None:
+                self._entries.move_to_end(key)
+                return fields
+
+        if self.db is None:
+            return None
+
+        fields = self.db.get_cached_contract(key)
+        if fields is not None:
+            self._remember(key, fields)
+        return fields
+
+    def put_many(self, requested_contracts, qualified_contracts):
+        """
+        Store qualified contracts under the keys of the contracts that were requested
+
+        Args:
+            requested_contracts (list): Contracts as they were built before qualification,
+                                        or their cache keys
+            qualified_contracts (list): The matching qualified contracts
+        """
+        entries = []
+        for requested, qualified in zip(requested_contracts, qualified_contracts):
+            if not isinstance(getattr(qualified, 'conId', None), int) or qualified.conId <= 0:
+                continue
+            try:
+                key = requested if isinstance(requested, str) else self.make_key(requested)
+                fields = util.dataclassNonDefaults(qualified)
+                fields.pop('comboLegs', None)
+                fields.pop('deltaNeutralContract', None)
+            except Exception as e:
+                logger.debug(f"Not caching contract {qualified}: {e}")
+                continue
+            self._remember(key, fields)
+            entries.append((key, fields))
+
+        if entries and self.db is not None:
+            self.db.save_cached_contracts(entries)
+
+    def _remember(self, key, fields):
+        """
+        Add an entry to the in-memory LRU, evicting the oldest if full
+        """
+        with self._lock:
+            self._entries[key] = fields
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _purge_if_new_day(self):
+        """
+        Purge expired contracts the first time the cache is used on a new day
+        """
+        if self._purged_on != datetime.now().strftime('%Y%m%d'):
+            self.purge_expired()
+
+    def purge_expired(self, today=None):
+        """
+        Drop contracts whose expiration date is before today
+
+        Args:
+            today (str, optional): Current date in YYYYMMDD format
+
+        Returns:
+            int: Number of in-memory entries removed
+        """
+        today = today or datetime.now().strftime('%Y%m%d')
+        self._purged_on = today
+
+        with self._lock:
+            expired = [key for key, fields in self._entries.items()
+                       if fields.get('lastTradeDateOrContractMonth') and fields['lastTradeDateOrContractMonth'][:8] < today]
+            for key in expired:
+                del self._entries[key]
+
+        if self.db is not None:
+            deleted = self.db.delete_expired_contracts(today)
+            if deleted:
+                logger.info(f"Purged {deleted} expired contracts from the contract cache")
+        return len(expired)
+
+    def __len__(self):
+        return len(self._entries)
@@ -2,7 +2,12 @@
 Currency conversion and currency-related utilities for AllYouNeedIsWheel
 """
 
+from datetime import datetime
+import threading
+
 from currency_converter import CurrencyConverter
+import numpy as np
+import pytz
 import logging
 
 logger = logging.getLogger('autotrader.currency')
@@ -10,19 +15,116 @@ logger = logging.getLogger('autotrader.currency')
 BASE_CURRENCY = 'USD'
 
 class CurrencyHelper:
-    converter = CurrencyConverter()
+    """
+    Exchange rates to BASE_CURRENCY, cached for the trading day
+
+    Rates reported by IB in the account's ExchangeRate values take precedence.
+    Other currencies fall back to the bundled ECB rates, which are only parsed
+    on the first lookup that needs them.
+    """
+    # CurrencyConverter, created on first use because parsing its rate file is slow
+    converter = None
+    _lock = threading.Lock()
+    _rates = {}  # currency -> units of BASE_CURRENCY per unit, for _rates_day
+    _rates_day = None
+    _ib_rates = {}  # currency -> units of the IB account's base currency per unit
+
+    @staticmethod
+    def _trading_day():
+        return datetime.now(pytz.timezone('US/Eastern')).date()
+
+    @classmethod
+    def _get_converter(cls):
+        if cls.converter is None:
+            cls.converter = CurrencyConverter()
+        return cls.converter
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Drop cached and IB-reported rates
+        """
+        with cls._lock:
+            cls._rates = {}
+            cls._rates_day = None
+            cls._ib_rates = {}
+
+    @classmethod
+    def update_from_ib(cls, currency, rate):
+        """
+        Record an ExchangeRate account value reported by IB
+
+        Args:
+            currency (str): Currency the rate is for
+            rate (float): Units of the account's base currency per unit of `currency`
+        """
+        if not currency or currency == 'BASE' or not rate or rate <= 0:
+            return
+        with cls._lock:
+            cls._ib_rates[currency] = float(rate)
+            # Rates derived from the previous IB values are now stale
+            cls._rates = {}
+
+    @classmethod
+    def _rate_to_base(cls, currency):
+        """
+        Get units of BASE_CURRENCY per unit of `currency`, or None if unknown
+        """
+        if currency == BASE_CURRENCY:
+            return 1.0
+        with cls._lock:
+            today = cls._trading_day()
+            if cls._rates_day != today:
+                cls._rates = {}
+                cls._rates_day = today
+            rate = cls._rates.get(currency)
+            if rate is not None:
+                return rate
+            if currency in cls._ib_rates and BASE_CURRENCY in cls._ib_rates:
+                rate = cls._ib_rates[currency] / cls._ib_rates[BASE_CURRENCY]
+
+        if rate is None:
+            try:
+                rate = cls._get_converter().convert(1, currency, BASE_CURRENCY)
+            except Exception as e:
+                logger.warning(f"Could not get exchange rate for {currency} to {BASE_CURRENCY}: {e}")
+                return None
+
+        with cls._lock:
+            cls._rates[currency] = rate
+        return rate
 
     @staticmethod
     def get_exchange_rate(from_currency, to_currency=BASE_CURRENCY):
         if from_currency == to_currency:
             return 1.0
-        try:
-            return CurrencyHelper.converter.convert(1, from_currency, to_currency)
-        except Exception as e:
-            logger.warning(f"Could not get exchange rate for {from_currency} to {to_currency}: {e}")
+        from_rate = CurrencyHelper._rate_to_base(from_currency)
+        to_rate = CurrencyHelper._rate_to_base(to_currency)
+        if from_rate is None or to_rate is None:
             return 1.0
+        return from_rate / to_rate
 
     @staticmethod
     def convert_amount(amount, from_currency, to_currency=BASE_CURRENCY):
         rate = CurrencyHelper.get_exchange_rate(from_currency, to_currency)
         return amount * rate
+
+    @staticmethod
+    def convert_array(amounts, currencies, to_currency=BASE_CURRENCY):
+        """
+        Convert many amounts in one pass, looking each distinct currency up once
+
+        Args:
+            amounts (array-like): Shape (n,) or (n, k); row i is in currencies[i]
+            currencies (sequence): n currency codes; empty values mean BASE_CURRENCY
+            to_currency (str): Currency to convert to
+
+        Returns:
+            numpy.ndarray: Converted amounts with the shape of `amounts`
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        if len(currencies) == 0:
+            return amounts
+        codes, inverse = np.unique([currency or BASE_CURRENCY for currency in currencies], return_inverse=True)
+        rates = np.array([CurrencyHelper.get_exchange_rate(code, to_currency) for code in codes])[inverse]
+        return amounts * rates.reshape((-1,) + (1,) * (amounts.ndim - 1))
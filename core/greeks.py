@@ -0,0 +1,271 @@
+"""
+Local Black-Scholes estimates used to choose option strikes before requesting market data
+and to fill in greeks that TWS did not compute
+"""
+
+from datetime import datetime
+import math
+
+import numpy as np
+import pytz
+
+# Volatility assumed for delta estimates when the caller has no better guess
+DEFAULT_VOLATILITY = 0.30
+
+# Options stop trading at the close on their expiration date
+EXPIRY_TIME = (16, 0)
+
+# Floor for time to expiry, so estimates stay finite on expiration day
+MIN_YEARS = 1.0 / (365 * 24)
+
+# Volatility bracket searched by the implied volatility solver
+MIN_VOLATILITY = 1e-4
+MAX_VOLATILITY = 5.0
+
+# Coefficients of the Abramowitz & Stegun 26.2.17 normal CDF approximation (error below 7.5e-8)
+_CDF_P = 0.2316419
+_CDF_B = (0.319381530, -0.356563782, 1.781477937, -1.821255978, 1.330274429)
+
+
+def norm_cdf(x):
+    """
+    Standard normal cumulative distribution function
+
+    Args:
+        x (float): Value to evaluate
+
+    Returns:
+        float: P(Z <= x)
+    """
+    return 0.5 * (1.0 + math.erf(x / math.sqrt(2.0)))
+
+
+def norm_pdf_array(x):
+    """
+    Standard normal probability density, element-wise
+
+    Args:
+        x (array_like): Values to evaluate
+
+    Returns:
+        numpy.ndarray: Densities at x
+    """
+    x = np.asarray(x, dtype=float)
+    return np.exp(-0.5 * x * x) / math.sqrt(2.0 * math.pi)
+
+
+def norm_cdf_array(x):
+    """
+    Standard normal cumulative distribution function, element-wise
+
+    NumPy has no vectorized erf, so the Abramowitz & Stegun polynomial
+    approximation is used; it agrees with norm_cdf to within 1e-7.
+
+    Args:
+        x (array_like): Values to evaluate
+
+    Returns:
+        numpy.ndarray: P(Z <= x) for each value
+    """
+    x = np.asarray(x, dtype=float)
+    t = 1.0 / (1.0 + _CDF_P * np.abs(x))
+    poly = t * (_CDF_B[0] + t * (_CDF_B[1] + t * (_CDF_B[2] + t * (_CDF_B[3] + t * _CDF_B[4]))))
+    upper = 1.0 - norm_pdf_array(x) * poly
+    return np.where(x >= 0, upper, 1.0 - upper)
+
+
+def years_to_expiry(expiration, now=None):
+    """
+    Get the time left until an option expires, in years
+
+    Args:
+        expiration (str): Expiration date in YYYYMMDD format
+        now (datetime, optional): Current time (timezone-aware); defaults to now
+
+    Returns:
+        float: Years until the close on the expiration date, at least MIN_YEARS
+    """
+    eastern = pytz.timezone('US/Eastern')
+    expiry = eastern.localize(datetime.strptime(expiration, '%Y%m%d').replace(
+        hour=EXPIRY_TIME[0], minute=EXPIRY_TIME[1]))
+    now = now or datetime.now(eastern)
+    return max((expiry - now).total_seconds() / (365 * 24 * 3600), MIN_YEARS)
+
+
+def bs_delta(spot, strike, years, volatility, right, rate=0.0):
+    """
+    Black-Scholes delta of a European option
+
+    Args:
+        spot (float): Underlying price
+        strike (float): Strike price
+        years (float): Time to expiry in years
+        volatility (float): Annualized volatility, e.g. 0.3 for 30%
+        right (str): 'C' for calls, 'P' for puts
+        rate (float, optional): Continuously compounded risk-free rate
+
+    Returns:
+        float: Delta, between 0 and 1 for calls and between -1 and 0 for puts
+    """
+    d1 = (math.log(spot / strike) + (rate + 0.5 * volatility ** 2) * years) / (volatility * math.sqrt(years))
+    call_delta = norm_cdf(d1)
+    return call_delta if right == 'C' else call_delta - 1.0
+
+
+def bs_greeks(spot, strikes, years, volatilities, rights, rate=0.0):
+    """
+    Black-Scholes prices and greeks of a whole chain in one vectorized pass
+
+    Arguments broadcast against each other, so a single spot can be priced
+    against arrays of strikes, expiries, volatilities and rights. Greeks use
+    the TWS conventions so they can stand in for missing model greeks.
+
+    Args:
+        spot (float or array_like): Underlying price
+        strikes (float or array_like): Strike prices
+        years (float or array_like): Times to expiry in years, floored at MIN_YEARS
+        volatilities (float or array_like): Annualized volatilities, e.g. 0.3 for 30%
+        rights (str or array_like): 'C' for calls, 'P' for puts
+        rate (float, optional): Continuously compounded risk-free rate
+
+    Returns:
+        dict: 'price', 'delta', 'gamma', 'vega' (per volatility point) and
+              'theta' (per calendar day), each a numpy array of the broadcast shape
+    """
+    spot, strikes, years, volatilities, is_call = np.broadcast_arrays(
+        np.asarray(spot, dtype=float), np.asarray(strikes, dtype=float),
+        np.maximum(np.asarray(years, dtype=float), MIN_YEARS),
+        np.asarray(volatilities, dtype=float), np.asarray(rights) == 'C')
+
+    sqrt_t = np.sqrt(years)
+    d1 = (np.log(spot / strikes) + (rate + 0.5 * volatilities ** 2) * years) / (volatilities * sqrt_t)
+    d2 = d1 - volatilities * sqrt_t
+    pdf = norm_pdf_array(d1)
+    discount = np.exp(-rate * years)
+    cdf_d1 = norm_cdf_array(d1)
+    cdf_d2 = norm_cdf_array(d2)
+
+    call_price = spot * cdf_d1 - strikes * discount * cdf_d2
+    # Put-call parity: P = C - S + K e^(-rT)
+    put_price = call_price - spot + strikes * discount
+    decay = -spot * pdf * volatilities / (2 * sqrt_t)
+    call_theta = decay - rate * strikes * discount * cdf_d2
+    put_theta = decay + rate * strikes * discount * (1.0 - cdf_d2)
+
+    return {
+        'price': np.maximum(np.where(is_call, call_price, put_price), 0.0),
+        'delta': np.where(is_call, cdf_d1, cdf_d1 - 1.0),
+        'gamma': pdf / (spot * volatilities * sqrt_t),
+        'vega': spot * pdf * sqrt_t / 100,
+        'theta': np.where(is_call, call_theta, put_theta) / 365,
+    }
+
+
+def implied_volatility(prices, spot, strikes, years, rights, rate=0.0, tolerance=1e-6, max_iterations=100):
+    """
+    Solve Black-Scholes implied volatilities for many option prices at once
+
+    Every price is solved in the same array operations: each iteration takes
+    a Newton step where it stays inside the bracket known to contain the
+    root, and bisects the bracket otherwise, so deep ITM or far OTM options
+    with a vanishing vega still converge. Arguments broadcast against each
+    other, e.g. a (3, n) array of bid, ask and mid prices against n strikes.
+
+    Args:
+        prices (float or array_like): Option prices to invert
+        spot (float or array_like): Underlying price
+        strikes (float or array_like): Strike prices
+        years (float or array_like): Times to expiry in years, floored at MIN_YEARS
+        rights (str or array_like): 'C' for calls, 'P' for puts
+        rate (float, optional): Continuously compounded risk-free rate
+        tolerance (float, optional): Price error at which a volatility is accepted
+        max_iterations (int, optional): Iteration limit
+
+    Returns:
+        numpy.ndarray: Annualized volatilities of the broadcast shape, NaN where the
+                       price is missing or outside the range Black-Scholes can produce
+                       with volatilities between MIN_VOLATILITY and MAX_VOLATILITY
+    """
+    prices, spot, strikes, years, rights = np.broadcast_arrays(
+        np.asarray(prices, dtype=float), np.asarray(spot, dtype=float), np.asarray(strikes, dtype=float),
+        np.asarray(years, dtype=float), np.asarray(rights))
+    # Solve on flat copies so scalars and stacked rows index the same way
+    shape = prices.shape
+    prices, spot, strikes, years, rights = (np.ravel(a) for a in (prices, spot, strikes, years, rights))
+    low = np.full(prices.shape, MIN_VOLATILITY)
+    high = np.full(prices.shape, MAX_VOLATILITY)
+
+    with np.errstate(invalid='ignore'):
+        solvable = (np.isfinite(prices) & (prices > 0)
+                    & (bs_greeks(spot, strikes, years, low, rights, rate)['price'] <= prices)
+                    & (bs_greeks(spot, strikes, years, high, rights, rate)['price'] >= prices))
+    volatility = np.where(solvable, DEFAULT_VOLATILITY, np.nan)
+    active = solvable.copy()
+
+    for _ in range(max_iterations):
+        if not active.any():
+            break
+        greeks = bs_greeks(spot[active], strikes[active], years[active], volatility[active], rights[active], rate)
+        error = greeks['price'] - prices[active]
+        done = np.abs(error) < tolerance
+
+        sigma = volatility[active]
+        low[active] = np.where(error < 0, sigma, low[active])
+        high[active] = np.where(error > 0, sigma, high[active])
+        # vega is per volatility point
+        slope = greeks['vega'] * 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = sigma - error / slope
+        inside = (slope > 1e-12) & (newton > low[active]) & (newton < high[active])
+        step = np.where(inside, newton, 0.5 * (low[active] + high[active]))
+
+        volatility[active] = np.where(done, sigma, step)
+        active[active] = ~done
+
+    return volatility.reshape(shape)
+
+
+def select_strikes(strikes, spot, right='C', expiration=None, window_pct=None, max_strikes=None,
+                   center=None, delta_band=None, volatility=DEFAULT_VOLATILITY, rate=0.0, now=None):
+    """
+    Narrow a chain's strikes to the ones worth requesting market data for
+
+    Filters apply in order: the moneyness window, the delta band, then the
+    `max_strikes` nearest to `center`. Filters left as None are skipped.
+
+    Args:
+        strikes (iterable): Strikes listed for the chain
+        spot (float): Underlying price
+        right (str, optional): 'C' for calls, 'P' for puts (used by the delta band)
+        expiration (str, optional): Expiration in YYYYMMDD format, required for the delta band
+        window_pct (float, optional): Keep strikes within this percentage of spot
+        max_strikes (int, optional): Keep at most this many strikes nearest to `center`
+        center (float, optional): Price the nearest strikes are measured from; defaults to spot
+        delta_band (tuple, optional): (min, max) absolute delta to keep, e.g. (0.15, 0.35)
+        volatility (float, optional): Volatility assumed for the delta estimate
+        rate (float, optional): Risk-free rate for the delta estimate
+        now (datetime, optional): Current time for the delta estimate
+
+    Returns:
+        list: Selected strikes, sorted ascending
+    """
+    selected = sorted(strike for strike in strikes if strike and strike > 0)
+
+    if window_pct is not None:
+        low = spot * (1 - window_pct / 100)
+        high = spot * (1 + window_pct / 100)
+        selected = [strike for strike in selected if low <= strike <= high]
+
+    if delta_band is not None:
+        if not expiration:
+            raise ValueError("An expiration is required to select strikes by delta")
+        min_delta, max_delta = delta_band
+        years = years_to_expiry(expiration, now)
+        selected = [strike for strike in selected
+                    if min_delta <= abs(bs_delta(spot, strike, years, volatility, right, rate)) <= max_delta]
+
+    if max_strikes is not None:
+        center = spot if center is None else center
+        selected = sorted(sorted(selected, key=lambda strike: (abs(strike - center), strike))[:max_strikes])
+
+    return selected
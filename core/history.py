@@ -0,0 +1,341 @@
+"""
+Historical bar store with incremental fetching, and volatility analytics on top of it
+
+Bars fetched with reqHistoricalData are kept per series (contract, bar size,
+data type and trading hours) as columns in a compressed NumPy .npz file,
+together with the time span already fetched. Later requests only fetch the
+parts of their span that are not covered yet, so repeat analytics never
+request the same bars twice.
+"""
+
+from datetime import date, datetime, timezone
+import math
+import os
+import re
+import tempfile
+import threading
+import traceback
+
+import numpy as np
+
+from core.logging_config import get_logger
+
+logger = get_logger('autotrader.history', 'tws')
+
+# Supported bar sizes: IB bar size setting -> (seconds per bar, longest span fetched by one request)
+BAR_SIZES = {
+    '1 min': (60, 86400),
+    '5 mins': (300, 7 * 86400),
+    '15 mins': (900, 14 * 86400),
+    '30 mins': (1800, 30 * 86400),
+    '1 hour': (3600, 30 * 86400),
+    '1 day': (86400, 365 * 86400),
+}
+
+# Columns stored for every series, besides the bar start times
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+# Trading days per year used to annualize daily volatility
+TRADING_DAYS = 252
+
+
+def series_key(contract, bar_size='1 day', what_to_show='TRADES', use_rth=True):
+    """
+    Get the name a bar series is stored under
+
+    Args:
+        contract: Contract the bars are for
+        bar_size (str): IB bar size setting, e.g. '1 day'
+        what_to_show (str): IB data type, e.g. 'TRADES' or 'OPTION_IMPLIED_VOLATILITY'
+        use_rth (bool): Whether the bars cover regular trading hours only
+
+    Returns:
+        str: File-name safe key, e.g. 'AAPL_STK_1day_TRADES_rth'
+    """
+    parts = [contract.symbol, contract.secType or 'STK']
+    if contract.secType in ('OPT', 'FOP'):
+        parts += [contract.lastTradeDateOrContractMonth, f"{contract.strike:g}", contract.right]
+    parts += [bar_size.replace(' ', ''), what_to_show, 'rth' if use_rth else 'all']
+    return re.sub(r'[^A-Za-z0-9._-]', '', '_'.join(str(part) for part in parts))
+
+
+def duration_string(seconds, bar_size):
+    """
+    Format a time span as an IB duration string for a bar size
+
+    Args:
+        seconds (float): Span to cover
+        bar_size (str): IB bar size setting
+
+    Returns:
+        str: Duration such as '3600 S', '5 D' or '2 Y'
+    """
+    days = math.ceil(seconds / 86400)
+    if BAR_SIZES[bar_size][0] < 86400 and seconds <= 86400:
+        return f"{max(int(math.ceil(seconds)), 60)} S"
+    if days > 365:
+        return f"{math.ceil(days / 365)} Y"
+    return f"{max(days, 1)} D"
+
+
+def bar_time(value):
+    """
+    Convert the date of an ib_async bar to epoch seconds
+
+    Daily bars carry a date, stored as midnight UTC; intraday bars carry a
+    timezone-aware datetime.
+
+    Args:
+        value (date or datetime): Bar date
+
+    Returns:
+        int: Epoch seconds of the bar start
+    """
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    if isinstance(value, date):
+        return int(datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp())
+    raise ValueError(f"Unsupported bar date {value!r}")
+
+
+def bars_to_columns(bars):
+    """
+    Convert ib_async bars to sorted columns
+
+    Args:
+        bars (list): BarData objects
+
+    Returns:
+        dict: 'time' (int64 epoch seconds) and BAR_FIELDS (float64) arrays
+    """
+    bars = sorted(bars, key=lambda bar: bar_time(bar.date))
+    columns = {'time': np.array([bar_time(bar.date) for bar in bars], dtype=np.int64)}
+    for field in BAR_FIELDS:
+        columns[field] = np.array([getattr(bar, field) for bar in bars], dtype=float)
+    return columns
+
+
+def _empty_columns():
+    columns = {'time': np.empty(0, dtype=np.int64)}
+    columns.update((field, np.empty(0)) for field in BAR_FIELDS)
+    return columns
+
+
+class BarStore:
+    """
+    Columnar store of historical bars with the spans fetched for each series
+
+    Each series is one compressed .npz file holding a 'time' column, the
+    BAR_FIELDS columns and its fetched span. Loaded series stay in memory.
+    Without a directory the store is memory-only.
+    """
+    def __init__(self, directory=None):
+        """
+        Initialize the bar store
+
+        Args:
+            directory (str, optional): Directory for the .npz files; memory-only if None
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._series = {}  # key -> {'columns': dict, 'span': (start, end) or None}
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def _load(self, key):
+        """
+        Get a series from memory or disk (caller holds the lock)
+        """
+        series = self._series.get(key)
+        if series is not None:
+            return series
+        series = {'columns': _empty_columns(), 'span': None}
+        if self.directory and os.path.exists(self._path(key)):
+            try:
+                with np.load(self._path(key)) as data:
+                    series['columns'] = {name: data[name] for name in ('time',) + BAR_FIELDS}
+                    span = data['span']
+                    series['span'] = (int(span[0]), int(span[1])) if span.size else None
+            except Exception as e:
+                logger.error(f"Error loading bar series {key}: {e}")
+                logger.error(traceback.format_exc())
+        self._series[key] = series
+        return series
+
+    def _save(self, key, series):
+        """
+        Write a series atomically, so readers never see a partial file (caller holds the lock)
+        """
+        if not self.directory:
+            return
+        span = np.array(series['span'] or (), dtype=np.int64)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, span=span, **series['columns'])
+            os.replace(temp_path, self._path(key))
+        except Exception as e:
+            logger.error(f"Error saving bar series {key}: {e}")
+            logger.error(traceback.format_exc())
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def span(self, key):
+        """
+        Get the time span fetched for a series
+
+        Args:
+            key (str): Series key
+
+        Returns:
+            tuple: (start, end) epoch seconds, or None if nothing was fetched
+        """
+        with self._lock:
+            return self._load(key)['span']
+
+    def missing_ranges(self, key, start, end, bar_seconds):
+        """
+        Get the parts of a span that still have to be fetched
+
+        Gaps shorter than one bar are ignored. The range after the fetched span
+        starts one bar early, so a bar that was still forming is fetched again.
+
+        Args:
+            key (str): Series key
+            start (int): Span start in epoch seconds
+            end (int): Span end in epoch seconds
+            bar_seconds (int): Seconds per bar
+
+        Returns:
+            list: (start, end) ranges in epoch seconds, oldest first
+        """
+        span = self.span(key)
+        if span is None:
+            return [(start, end)]
+        ranges = []
+        if span[0] - start >= bar_seconds:
+            ranges.append((start, span[0]))
+        if end - span[1] >= bar_seconds:
+            ranges.append((max(span[1] - bar_seconds, start), end))
+        return ranges
+
+    def merge(self, key, columns, start, end):
+        """
+        Add fetched bars and extend the series' fetched span
+
+        Bars at times already stored replace the stored ones. The span only
+        grows to cover [start, end] when it touches the span fetched before,
+        so a gap left by a failed request is fetched again later.
+
+        Args:
+            key (str): Series key
+            columns (dict): Columns from bars_to_columns
+            start (int): Start of the fetched range in epoch seconds
+            end (int): End of the fetched range in epoch seconds
+        """
+        with self._lock:
+            series = self._load(key)
+            stored = series['columns']
+            times = np.concatenate([columns['time'], stored['time']])
+            # np.unique keeps the first occurrence, i.e. the freshly fetched bar
+            times, index = np.unique(times, return_index=True)
+            merged = {'time': times}
+            for field in BAR_FIELDS:
+                merged[field] = np.concatenate([columns[field], stored[field]])[index]
+            series['columns'] = merged
+
+            span = series['span']
+            if span is None or end < span[0] or start > span[1]:
+                if span is None or end - start > span[1] - span[0]:
+                    span = (start, end)
+            else:
+                span = (min(start, span[0]), max(end, span[1]))
+            series['span'] = span
+            self._save(key, series)
+
+    def get(self, key, start=None, end=None):
+        """
+        Get the stored bars of a series
+
+        Args:
+            key (str): Series key
+            start (int, optional): Only bars starting at or after this epoch second
+            end (int, optional): Only bars starting at or before this epoch second
+
+        Returns:
+            dict: 'time' and BAR_FIELDS arrays, oldest first
+        """
+        with self._lock:
+            columns = self._load(key)['columns']
+        mask = np.ones(columns['time'].shape, dtype=bool)
+        if start is not None:
+            mask &= columns['time'] >= start
+        if end is not None:
+            mask &= columns['time'] <= end
+        return {name: values[mask] for name, values in columns.items()}
+
+    def keys(self):
+        """
+        Get the keys of the series in memory and on disk
+
+        Returns:
+            list: Series keys, sorted
+        """
+        with self._lock:
+            keys = set(self._series)
+        if self.directory and os.path.isdir(self.directory):
+            keys.update(name[:-4] for name in os.listdir(self.directory) if name.endswith('.npz'))
+        return sorted(keys)
+
+
+def realized_volatility(closes, window=20, periods_per_year=TRADING_DAYS):
+    """
+    Annualized close-to-close volatility over the most recent bars
+
+    Args:
+        closes (array_like): Closing prices, oldest first
+        window (int): Number of returns to use
+        periods_per_year (int): Bars per year, to annualize
+
+    Returns:
+        float: Annualized volatility, e.g. 0.25 for 25%, or None with fewer than window + 1 closes
+    """
+    closes = np.asarray(closes, dtype=float)
+    closes = closes[np.isfinite(closes) & (closes > 0)]
+    if window < 2 or closes.size < window + 1:
+        return None
+    returns = np.diff(np.log(closes[-(window + 1):]))
+    return float(np.std(returns, ddof=1) * math.sqrt(periods_per_year))
+
+
+def iv_rank(volatilities, current=None):
+    """
+    Rank the current implied volatility against its history
+
+    Args:
+        volatilities (array_like): Historical implied volatilities, oldest first
+        current (float, optional): Current implied volatility; the last value if omitted
+
+    Returns:
+        dict: 'current', 'low', 'high', 'iv_rank' (position between the low and
+              high, 0-100) and 'iv_percentile' (share of days below current, 0-100),
+              or None without history
+    """
+    volatilities = np.asarray(volatilities, dtype=float)
+    volatilities = volatilities[np.isfinite(volatilities) & (volatilities > 0)]
+    if volatilities.size == 0:
+        return None
+    current = float(volatilities[-1] if current is None else current)
+    low, high = float(volatilities.min()), float(volatilities.max())
+    rank = (current - low) / (high - low) * 100 if high > low else 50.0
+    return {
+        'current': current,
+        'low': low,
+        'high': high,
+        'iv_rank': round(min(max(rank, 0.0), 100.0), 2),
+        'iv_percentile': round(float(np.mean(volatilities < current)) * 100, 2),
+    }
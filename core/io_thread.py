@@ -0,0 +1,251 @@
+"""
+Dedicated I/O thread for Interactive Brokers traffic
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import functools
+import itertools
+import queue
+import threading
+
+from core.logging_config import get_logger
+
+logger = get_logger('autotrader.io_thread', 'tws')
+
+# Priority of jobs submitted without an explicit priority. Lower values run
+# first, so untagged work queues behind every named request priority.
+DEFAULT_PRIORITY = 3
+
+# Priority of jobs submitted from the current context
+current_priority = contextvars.ContextVar('ib_io_priority', default=DEFAULT_PRIORITY)
+
+
+class IBIOThread:
+    """
+    Long-lived background thread that owns the asyncio loop used by ib_async
+
+    The loop runs for the lifetime of the thread, so streaming market data and
+    order events are processed whether or not a request is in flight. Work is
+    submitted from any thread through a thread-safe priority queue and its
+    result is delivered through a concurrent.futures.Future. Queued jobs are
+    started in order of `current_priority` at submission time, first come first
+    served within a priority. Coroutines run as tasks, so many callers' requests
+    overlap on the loop instead of waiting for each other. Plain callables run
+    inline on the loop and must not block.
+    """
+    def __init__(self, name='ib-io'):
+        """
+        Initialize the I/O thread (it is started on first use)
+
+        Args:
+            name (str): Thread name, shown in logs and debuggers
+        """
+        self.name = name
+        self.loop = None
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._thread = None
+        self._wakeup = None
+        self._stopping = False
+        self._started = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the thread and its event loop if they are not running yet
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._started.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        self._started.wait()
+
+    def stop(self, timeout=5):
+        """
+        Stop the thread once the jobs already queued have been started
+
+        Args:
+            timeout (float): Seconds to wait for the thread to exit
+        """
+        with self._lock:
+            thread = self._thread
+            if thread is None or not thread.is_alive():
+                return
+            self._stopping = True
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+        thread.join(timeout)
+
+    def in_io_thread(self):
+        """
+        Check whether the caller is running on the I/O thread
+
+        Returns:
+            bool: True if called from the I/O thread
+        """
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Queue a coroutine, coroutine function or callable to run on the I/O thread
+
+        The job is queued with the caller's `current_priority` and runs in a copy
+        of the caller's context, so the priority also applies to the requests it
+        makes.
+
+        Args:
+            fn: Coroutine object, or function to call; if it returns a coroutine,
+                the coroutine is scheduled on the loop and its result used instead
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            concurrent.futures.Future: Future resolved with the result or exception
+        """
+        self.start()
+        future = concurrent.futures.Future()
+        context = contextvars.copy_context()
+        self._queue.put((current_priority.get(), next(self._sequence), future, fn, args, kwargs, context))
+        self.loop.call_soon_threadsafe(self._wakeup.set)
+        return future
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run a job on the I/O thread and wait for its result
+
+        Plain callables invoked from the I/O thread itself run inline. Coroutines
+        cannot be waited on from the loop's own thread and must be awaited there.
+
+        Args:
+            fn: Coroutine object, coroutine function or callable
+            *args: Positional arguments for fn
+            **kwargs: Keyword arguments for fn
+
+        Returns:
+            The job's result (exceptions are re-raised in the caller)
+
+        Raises:
+            RuntimeError: If a coroutine is called synchronously from the I/O thread
+        """
+        if self.in_io_thread():
+            result = fn if asyncio.iscoroutine(fn) else fn(*args, **kwargs)
+            if asyncio.iscoroutine(result):
+                result.close()
+                raise RuntimeError("Blocking call to a coroutine from the I/O thread; await it instead")
+            return result
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _run(self):
+        """
+        Thread body: run the event loop until stopped
+        """
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._wakeup = asyncio.Event()
+        self._started.set()
+        logger.debug(f"I/O thread {self.name} started")
+
+        try:
+            self.loop.run_until_complete(self._dispatch())
+        finally:
+            pending = asyncio.all_tasks(self.loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            self.loop.close()
+            logger.debug(f"I/O thread {self.name} stopped")
+
+    async def _dispatch(self):
+        """
+        Start queued jobs whenever work is submitted, until the thread is stopped
+        """
+        while True:
+            self._start_pending()
+            if self._stopping:
+                return
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+    def _start_pending(self):
+        """
+        Start every job currently in the queue, most urgent first
+        """
+        while True:
+            try:
+                _, _, future, fn, args, kwargs, context = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if not future.set_running_or_notify_cancel():
+                if asyncio.iscoroutine(fn):
+                    fn.close()
+                continue
+
+            try:
+                result = fn if asyncio.iscoroutine(fn) else context.run(fn, *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+                continue
+
+            if asyncio.iscoroutine(result):
+                task = self.loop.create_task(result, context=context)
+                task.add_done_callback(functools.partial(self._resolve, future))
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def _resolve(future, task):
+        """
+        Copy a finished task's outcome to its caller's future
+        """
+        if task.cancelled():
+            future.set_exception(concurrent.futures.CancelledError())
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+
+_io_thread = None
+_io_thread_lock = threading.Lock()
+
+
+def get_io_thread():
+    """
+    Get the process-wide I/O thread shared by every IB connection
+
+    Returns:
+        IBIOThread: The shared I/O thread
+    """
+    global _io_thread
+    with _io_thread_lock:
+        if _io_thread is None:
+            _io_thread = IBIOThread()
+        return _io_thread
+
+
+def on_io_thread(method):
+    """
+    Build a blocking method that runs an IBConnection method on its I/O thread
+
+    Coroutine methods run as tasks on the loop, so callers from different
+    threads overlap; other methods run inline on the loop and must not block.
+
+    Args:
+        method (callable): Method, usually `async def`, of an object with an
+                           `io_thread` attribute
+
+    Returns:
+        callable: Wrapped method that blocks the caller until the result is ready
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        return self.io_thread.call(method, self, *args, **kwargs)
+    if method.__name__.endswith('_async'):
+        wrapper.__name__ = method.__name__[:-len('_async')]
+        wrapper.__qualname__ = method.__qualname__[:-len('_async')]
+    return wrapper
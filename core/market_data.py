@@ -0,0 +1,231 @@
+"""
+Persistent market data subscriptions for Interactive Brokers
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+from core.logging_config import get_logger
+
+logger = get_logger('autotrader.market_data', 'tws')
+
+
+class MarketDataSubscriptions:
+    """
+    Reference-counted pool of streaming market data subscriptions
+
+    Contracts stay subscribed after their last user releases them, so repeat
+    lookups read the latest ticker without paying the first-tick delay again.
+    Idle subscriptions are cancelled once they exceed the idle TTL, or in LRU
+    order when a new subscription would exceed the market data line limit.
+    """
+    def __init__(self, connection, max_lines=100, idle_ttl=300):
+        """
+        Initialize the subscription pool
+
+        Args:
+            connection (IBConnection): Owning connection whose IB client is used
+            max_lines (int): Maximum simultaneous market data lines to hold open
+            idle_ttl (float): Seconds an unreferenced subscription is kept streaming
+        """
+        self.connection = connection
+        self.max_lines = max_lines
+        self.idle_ttl = idle_ttl
+        self._lock = threading.RLock()
+        # key -> {'contract', 'ticker', 'refcount', 'last_used'}, least recently used first
+        self._subscriptions = OrderedDict()
+
+    @staticmethod
+    def _key(contract, generic_ticks=''):
+        """
+        Build the subscription key for a contract and generic tick list
+        """
+        if getattr(contract, 'conId', 0):
+            return (contract.conId, generic_ticks)
+        return (contract.symbol, contract.secType, getattr(contract, 'lastTradeDateOrContractMonth', ''),
+                getattr(contract, 'strike', 0.0), getattr(contract, 'right', ''), contract.exchange, generic_ticks)
+
+    def __len__(self):
+        return len(self._subscriptions)
+
+    def acquire(self, contract, generic_ticks=''):
+        """
+        Get a streaming ticker for a contract, subscribing if needed
+
+        A new subscription is charged to the connection's pacer without waiting;
+        use acquire_async from coroutines so the request waits for its budget.
+
+        Args:
+            contract: Qualified contract
+            generic_ticks (str): Generic tick list passed to reqMktData
+
+        Returns:
+            Ticker: Live ticker, or None if no market data line could be freed
+        """
+        return self._acquire(contract, generic_ticks, paced=False)
+
+    async def acquire_async(self, contract, generic_ticks=''):
+        """
+        Get a streaming ticker for a contract, waiting for pacing before subscribing
+
+        Args:
+            contract: Qualified contract
+            generic_ticks (str): Generic tick list passed to reqMktData
+
+        Returns:
+            Ticker: Live ticker, or None if no market data line could be freed
+        """
+        paced = False
+        if self.get_ticker(contract, generic_ticks) is None:
+            await self.connection.pacer.acquire_async('mktdata')
+            paced = True
+        return self._acquire(contract, generic_ticks, paced=paced)
+
+    def _acquire(self, contract, generic_ticks, paced):
+        """
+        Reference a subscription, charging the pacer unless the caller already waited
+        """
+        key = self._key(contract, generic_ticks)
+        with self._lock:
+            now = time.monotonic()
+            self.evict_idle(now)
+
+            entry = self._subscriptions.get(key)
+            if entry is None:
+                if not self._make_room():
+                    logger.warning(f"Market data line limit ({self.max_lines}) reached, cannot subscribe to {contract.symbol}")
+                    return None
+                if not paced:
+                    self.connection.pacer.charge('mktdata')
+                ticker = self.connection.ib.reqMktData(contract, generic_ticks, False, False)
+                entry = {'contract': contract, 'ticker': ticker, 'refcount': 0, 'last_used': now}
+                self._subscriptions[key] = entry
+                logger.debug(f"Subscribed to market data for {contract.symbol} ({len(self._subscriptions)}/{self.max_lines} lines)")
+
+            entry['refcount'] += 1
+            entry['last_used'] = now
+            self._subscriptions.move_to_end(key)
+            return entry['ticker']
+
+    def release(self, contract, generic_ticks=''):
+        """
+        Drop one reference to a contract's subscription
+
+        The subscription keeps streaming until it is evicted for being idle.
+
+        Args:
+            contract: Contract previously passed to acquire
+            generic_ticks (str): Generic tick list used when acquiring
+        """
+        key = self._key(contract, generic_ticks)
+        with self._lock:
+            entry = self._subscriptions.get(key)
+            if entry is None:
+                return
+            entry['refcount'] = max(0, entry['refcount'] - 1)
+            entry['last_used'] = time.monotonic()
+
+    @contextmanager
+    def subscription(self, contract, generic_ticks=''):
+        """
+        Context manager that acquires a ticker and releases it on exit
+
+        Args:
+            contract: Qualified contract
+            generic_ticks (str): Generic tick list passed to reqMktData
+
+        Yields:
+            Ticker: Live ticker, or None if no market data line was available
+        """
+        ticker = self.acquire(contract, generic_ticks)
+        try:
+            yield ticker
+        finally:
+            if ticker is not None:
+                self.release(contract, generic_ticks)
+
+    @asynccontextmanager
+    async def subscription_async(self, contract, generic_ticks=''):
+        """
+        Async context manager that acquires a ticker and releases it on exit
+
+        Args:
+            contract: Qualified contract
+            generic_ticks (str): Generic tick list passed to reqMktData
+
+        Yields:
+            Ticker: Live ticker, or None if no market data line was available
+        """
+        ticker = await self.acquire_async(contract, generic_ticks)
+        try:
+            yield ticker
+        finally:
+            if ticker is not None:
+                self.release(contract, generic_ticks)
+
+    def get_ticker(self, contract, generic_ticks=''):
+        """
+        Get the cached ticker for a contract without subscribing
+
+        Args:
+            contract: Contract to look up
+            generic_ticks (str): Generic tick list used when acquiring
+
+        Returns:
+            Ticker: Cached ticker or None if not subscribed
+        """
+        entry = self._subscriptions.get(self._key(contract, generic_ticks))
+        return entry['ticker'] if entry else None
+
+    def evict_idle(self, now=None):
+        """
+        Cancel unreferenced subscriptions that have been idle longer than the TTL
+
+        Args:
+            now (float, optional): Current monotonic time
+
+        Returns:
+            int: Number of subscriptions cancelled
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = [key for key, entry in self._subscriptions.items()
+                       if entry['refcount'] == 0 and now - entry['last_used'] > self.idle_ttl]
+            for key in expired:
+                self._cancel(key)
+            return len(expired)
+
+    def _make_room(self):
+        """
+        Free a market data line by evicting the least recently used idle subscription
+
+        Returns:
+            bool: True if a new subscription fits within the line limit
+        """
+        while len(self._subscriptions) >= self.max_lines:
+            victim = next((key for key, entry in self._subscriptions.items() if entry['refcount'] == 0), None)
+            if victim is None:
+                return False
+            self._cancel(victim)
+        return True
+
+    def _cancel(self, key):
+        """
+        Cancel a subscription and remove it from the pool
+        """
+        entry = self._subscriptions.pop(key)
+        try:
+            self.connection.pacer.charge('mktdata')
+            self.connection.ib.cancelMktData(entry['contract'])
+        except Exception as e:
+            logger.debug(f"Error cancelling market data for {entry['contract'].symbol}: {e}")
+
+    def clear(self):
+        """
+        Cancel every subscription, e.g. before disconnecting
+        """
+        with self._lock:
+            for key in list(self._subscriptions):
+                self._cancel(key)
@@ -0,0 +1,330 @@
+"""
+Latency histograms and counters for Interactive Brokers operations
+"""
+
+import asyncio
+import bisect
+import functools
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from core.logging_config import get_logger
+
+logger = get_logger('autotrader.metrics', 'tws')
+
+# Upper bounds of the histogram buckets in seconds: 0.5 ms to about 2 minutes,
+# each bucket sqrt(2) wider than the last, so percentiles are within ~20%
+BUCKET_BOUNDS = tuple(0.0005 * 2 ** (i / 2) for i in range(37))
+
+# Percentiles reported for every histogram
+PERCENTILES = (50, 90, 99)
+
+# Per-symbol series kept for each operation; further symbols share OTHER_SYMBOL
+MAX_SYMBOLS = 500
+OTHER_SYMBOL = '_other'
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket latency histogram with count, sum, min and max
+
+    Observations cost one bisect over the bucket bounds, so the histogram can
+    sit on every IB round trip. Percentiles are estimated as the upper bound
+    of the bucket they fall in, capped at the largest observation.
+    """
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        """
+        Record one duration
+
+        Args:
+            seconds (float): Duration in seconds
+        """
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def percentile(self, percent):
+        """
+        Estimate a percentile of the recorded durations
+
+        Args:
+            percent (float): Percentile between 0 and 100
+
+        Returns:
+            float: Estimated duration in seconds, or None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        rank = max(1, percent / 100 * self.count)
+        seen = 0
+        for i, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= rank:
+                bound = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Summarize the histogram in milliseconds
+
+        Returns:
+            dict: count, mean_ms, min_ms, max_ms and p50_ms/p90_ms/p99_ms
+        """
+        def ms(seconds):
+            return round(seconds * 1000, 3) if seconds is not None else None
+
+        result = {
+            'count': self.count,
+            'mean_ms': ms(self.total / self.count) if self.count else None,
+            'min_ms': ms(self.min),
+            'max_ms': ms(self.max),
+        }
+        for percent in PERCENTILES:
+            result[f"p{percent}_ms"] = ms(self.percentile(percent))
+        return result
+
+
+class _Series:
+    """
+    Histogram and event counters of one operation, or of one operation and symbol
+    """
+    def __init__(self):
+        self.histogram = LatencyHistogram()
+        self.counters = Counter()
+
+    def summary(self):
+        return {**self.histogram.summary(), **self.counters}
+
+
+class LatencyMetrics:
+    """
+    Thread-safe registry of latency histograms and counters per operation and symbol
+
+    Operations are named after IBConnection methods ('get_stock_price') or
+    their internal phases ('first_tick', 'greeks_wait'). Counters record
+    events such as 'timeouts', 'partial' and 'errors' next to the histogram
+    of the same operation.
+    """
+    def __init__(self, max_symbols=MAX_SYMBOLS):
+        """
+        Initialize an empty registry
+
+        Args:
+            max_symbols (int): Per-symbol series kept for each operation
+        """
+        self.max_symbols = max_symbols
+        self._lock = threading.Lock()
+        self._operations = {}  # operation -> _Series
+        self._symbols = {}  # operation -> {symbol: _Series}
+        self.started = time.time()
+
+    def _series(self, operation, symbol):
+        """
+        Get the operation's series and, when a symbol is given, its per-symbol series (caller holds the lock)
+        """
+        series = self._operations.get(operation)
+        if series is None:
+            series = self._operations[operation] = _Series()
+            self._symbols[operation] = {}
+        if symbol is None:
+            return series, None
+        by_symbol = self._symbols[operation]
+        symbol_series = by_symbol.get(symbol)
+        if symbol_series is None:
+            if len(by_symbol) >= self.max_symbols:
+                symbol = OTHER_SYMBOL
+            symbol_series = by_symbol.setdefault(symbol, _Series())
+        return series, symbol_series
+
+    def observe(self, operation, seconds, symbol=None):
+        """
+        Record the duration of one operation
+
+        Args:
+            operation (str): Operation name
+            seconds (float): Duration in seconds
+            symbol (str, optional): Symbol the operation was for
+        """
+        with self._lock:
+            series, symbol_series = self._series(operation, symbol)
+            series.histogram.observe(seconds)
+            if symbol_series is not None:
+                symbol_series.histogram.observe(seconds)
+
+    def increment(self, counter, operation, symbol=None, count=1):
+        """
+        Count events of an operation, e.g. timeouts or partial results
+
+        Args:
+            counter (str): Counter name
+            operation (str): Operation name
+            symbol (str, optional): Symbol the events were for
+            count (int): Number of events
+        """
+        if not count:
+            return
+        with self._lock:
+            series, symbol_series = self._series(operation, symbol)
+            series.counters[counter] += count
+            if symbol_series is not None:
+                symbol_series.counters[counter] += count
+
+    @contextmanager
+    def timer(self, operation, symbol=None):
+        """
+        Time the enclosed block, counting exceptions as 'timeouts' or 'errors'
+
+        Works around awaits as well, so phases of coroutines can be timed.
+
+        Args:
+            operation (str): Operation name
+            symbol (str, optional): Symbol the operation is for
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except (asyncio.TimeoutError, TimeoutError):
+            self.increment('timeouts', operation, symbol)
+            raise
+        except Exception:
+            self.increment('errors', operation, symbol)
+            raise
+        finally:
+            self.observe(operation, time.perf_counter() - started, symbol)
+
+    def snapshot(self, operation=None, symbol=None, include_symbols=True):
+        """
+        Summarize the recorded metrics
+
+        Args:
+            operation (str, optional): Only include this operation
+            symbol (str, optional): Only include this symbol's series
+            include_symbols (bool): Include per-symbol series under 'symbols'
+
+        Returns:
+            dict: {'since': epoch seconds, 'operations': {operation: summary}}, where
+                  each summary holds the histogram percentiles in milliseconds,
+                  the operation's counters and, optionally, 'symbols'
+        """
+        with self._lock:
+            operations = {}
+            for name, series in sorted(self._operations.items()):
+                if operation is not None and name != operation:
+                    continue
+                by_symbol = self._symbols[name]
+                if symbol is not None:
+                    if symbol not in by_symbol:
+                        continue
+                    operations[name] = by_symbol[symbol].summary()
+                    continue
+                summary = series.summary()
+                if include_symbols and by_symbol:
+                    summary['symbols'] = {key: value.summary() for key, value in sorted(by_symbol.items())}
+                operations[name] = summary
+        return {'since': self.started, 'operations': operations}
+
+    def log_summary(self, log=None):
+        """
+        Write one line per operation with its count, percentiles and counters
+
+        Args:
+            log (logging.Logger, optional): Logger to write to; the metrics logger by default
+
+        Returns:
+            int: Number of operations logged
+        """
+        log = log or logger
+        operations = self.snapshot(include_symbols=False)['operations']
+        for name, summary in operations.items():
+            counters = ' '.join(f"{key}={value}" for key, value in summary.items() if not key.endswith('_ms') and key != 'count')
+            log.info(f"{name}: n={summary['count']} mean={summary['mean_ms']}ms p50={summary['p50_ms']}ms "
+                     f"p90={summary['p90_ms']}ms p99={summary['p99_ms']}ms max={summary['max_ms']}ms {counters}".rstrip())
+        return len(operations)
+
+    def reset(self):
+        """
+        Discard everything recorded so far
+        """
+        with self._lock:
+            self._operations.clear()
+            self._symbols.clear()
+            self.started = time.time()
+
+
+def _symbol_of(value):
+    """
+    Get the symbol to file a measurement under from a symbol, a contract or a list of contracts
+    """
+    if value is None or isinstance(value, str):
+        return value or None
+    if isinstance(value, (list, tuple)):
+        return _symbol_of(value[0]) if value else None
+    return getattr(value, 'symbol', None) or None
+
+
+def timed(operation, symbol_arg=None):
+    """
+    Decorate a function or coroutine function to record its latency
+
+    Args:
+        operation (str): Operation name
+        symbol_arg (str, optional): Name of the parameter holding the symbol, or the
+                                    contract(s) whose symbol is used
+
+    Returns:
+        callable: Decorator
+    """
+    def decorator(fn):
+        position = None
+        if symbol_arg is not None:
+            position = fn.__code__.co_varnames[:fn.__code__.co_argcount].index(symbol_arg)
+
+        def symbol_for(args, kwargs):
+            if position is None:
+                return None
+            value = args[position] if position < len(args) else kwargs.get(symbol_arg)
+            return _symbol_of(value)
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                with get_metrics().timer(operation, symbol_for(args, kwargs)):
+                    return await fn(*args, **kwargs)
+        else:
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with get_metrics().timer(operation, symbol_for(args, kwargs)):
+                    return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """
+    Get the process-wide metrics registry
+
+    Returns:
+        LatencyMetrics: The shared registry
+    """
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = LatencyMetrics()
+    return _metrics
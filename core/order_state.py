@@ -0,0 +1,203 @@
+"""
+Event-driven index of Interactive Brokers order state
+"""
+
+import threading
+
+from core.logging_config import get_logger
+
+logger = get_logger('autotrader.order_state', 'tws')
+
+
+class OrderStateIndex:
+    """
+    Latest known state of every order, keyed by orderId and permId
+
+    The index is seeded from the trades and fills ib_async already holds when
+    it is attached, then kept current from the order status, open order, exec
+    details and commission report events. Lookups are dictionary reads and
+    never contact TWS. Listeners are called with (order_id, state) after every
+    change, on the I/O thread, and must not block.
+    """
+    def __init__(self):
+        """
+        Initialize an empty index (call attach() once connected)
+        """
+        self.ib = None
+        self._lock = threading.Lock()
+        # orderId -> {'trade': Trade or None, 'perm_id': int, 'state': dict}
+        self._by_order_id = {}
+        # permId -> orderId
+        self._by_perm_id = {}
+        self._listeners = []
+
+    def __len__(self):
+        return len(self._by_order_id)
+
+    def add_listener(self, callback):
+        """
+        Register a callback for order state changes
+
+        Args:
+            callback (callable): Called as callback(order_id, state)
+        """
+        if callback not in self._listeners:
+            self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        """
+        Unregister a callback added with add_listener
+        """
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _notify(self, order_id):
+        state = self.get(order_id)
+        for callback in list(self._listeners):
+            try:
+                callback(order_id, state)
+            except Exception as e:
+                logger.error(f"Error in order state listener: {e}")
+
+    def attach(self, ib):
+        """
+        Subscribe to an IB client's order events and seed the index from it
+
+        Args:
+            ib (IB): Connected ib_async client
+        """
+        if self.ib is not ib:
+            self.detach()
+            self.ib = ib
+            ib.openOrderEvent += self.track
+            ib.orderStatusEvent += self.track
+            ib.execDetailsEvent += self._on_fill
+            ib.commissionReportEvent += self._on_commission
+
+        # Executions from before this session have no trade; index them first
+        # so live trades for the same order take precedence
+        for fill in ib.fills():
+            self._track_execution(fill)
+        for trade in ib.trades():
+            self.track(trade)
+        logger.debug(f"Order state index seeded with {len(self)} orders")
+
+    def detach(self):
+        """
+        Unsubscribe from the current IB client's events
+        """
+        if self.ib is None:
+            return
+        self.ib.openOrderEvent -= self.track
+        self.ib.orderStatusEvent -= self.track
+        self.ib.execDetailsEvent -= self._on_fill
+        self.ib.commissionReportEvent -= self._on_commission
+        self.ib = None
+
+    def track(self, trade):
+        """
+        Record the current state of a trade
+
+        Args:
+            trade (Trade): Trade whose order and status to index
+        """
+        order_id = trade.order.orderId
+        if not order_id:
+            return
+        perm_id = trade.order.permId or trade.orderStatus.permId
+        status = trade.orderStatus
+        state = {
+            'status': status.status or 'Submitted',
+            'filled': status.filled,
+            'remaining': status.remaining if status.status else trade.order.totalQuantity,
+            'avg_fill_price': float(status.avgFillPrice or 0),
+            'last_fill_price': float(status.lastFillPrice or 0),
+            'commission': sum(float(fill.commissionReport.commission or 0) for fill in trade.fills),
+            'why_held': status.whyHeld
+        }
+        with self._lock:
+            self._by_order_id[order_id] = {'trade': trade, 'perm_id': perm_id, 'state': state}
+            if perm_id:
+                self._by_perm_id[perm_id] = order_id
+        self._notify(order_id)
+
+    def _track_execution(self, fill):
+        """
+        Record a fill whose order is not (or no longer) known as a trade
+        """
+        execution = fill.execution
+        if not execution.orderId:
+            return
+        commission = float(fill.commissionReport.commission or 0)
+        with self._lock:
+            entry = self._by_order_id.get(execution.orderId)
+            if entry is not None and entry['trade'] is not None:
+                return
+            if entry is None:
+                entry = self._by_order_id[execution.orderId] = {
+                    'trade': None,
+                    'perm_id': execution.permId,
+                    'state': {'status': 'Filled', 'filled': 0, 'remaining': 0,
+                              'avg_fill_price': 0.0, 'commission': 0.0},
+                    'exec_ids': set()
+                }
+            if execution.execId in entry['exec_ids']:
+                return
+            entry['exec_ids'].add(execution.execId)
+            state = entry['state']
+            filled = state['filled'] + execution.shares
+            state['avg_fill_price'] = (state['avg_fill_price'] * state['filled'] +
+                                       float(execution.price or 0) * execution.shares) / filled if filled else 0.0
+            state['filled'] = filled
+            state['commission'] += commission
+            if execution.permId:
+                self._by_perm_id[execution.permId] = execution.orderId
+        self._notify(execution.orderId)
+
+    def _on_fill(self, trade, fill):
+        self.track(trade)
+
+    def _on_commission(self, trade, fill, report):
+        self.track(trade)
+
+    def get(self, order_id):
+        """
+        Get the latest known state of an order
+
+        Args:
+            order_id (int): IB order ID
+
+        Returns:
+            dict: Copy of the order state, or None if the order is unknown
+        """
+        with self._lock:
+            entry = self._by_order_id.get(int(order_id))
+            return dict(entry['state']) if entry else None
+
+    def get_by_perm_id(self, perm_id):
+        """
+        Get the latest known state of an order by its permanent ID
+
+        Args:
+            perm_id (int): IB permanent order ID
+
+        Returns:
+            dict: Copy of the order state, or None if the order is unknown
+        """
+        with self._lock:
+            order_id = self._by_perm_id.get(int(perm_id))
+        return self.get(order_id) if order_id is not None else None
+
+    def get_trade(self, order_id):
+        """
+        Get the live trade for an order, e.g. to cancel it
+
+        Args:
+            order_id (int): IB order ID
+
+        Returns:
+            Trade: The trade, or None if the order is unknown or only known from executions
+        """
+        with self._lock:
+            entry = self._by_order_id.get(int(order_id))
+            return entry['trade'] if entry else None
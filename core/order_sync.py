@@ -0,0 +1,232 @@
+"""
+Background synchronization of IB order state into the orders table
+"""
+
+import queue
+import threading
+import time
+
+from config import Config
+from core.connection_pool import get_connection_pool
+from core.logging_config import get_logger
+from db.database import OptionsDatabase
+
+logger = get_logger('autotrader.order_sync', 'tws')
+
+# Order statuses in the orders table that are still waiting on TWS
+OPEN_ORDER_STATUSES = ('processing', 'canceling')
+
+
+def map_ib_status(ib_status):
+    """
+    Map an IB order status to the orders table status and executed flag
+
+    Args:
+        ib_status (str): IB order status, e.g. 'Submitted' or 'Filled'
+
+    Returns:
+        tuple: (status, executed)
+    """
+    if ib_status == 'Filled':
+        return 'executed', True
+    if ib_status in ('ApiCancelled', 'Cancelled'):
+        return 'canceled', True
+    return 'processing', False
+
+
+class OrderSyncWorker:
+    """
+    Writes order status transitions to SQLite as TWS reports them
+
+    The worker listens to the shared connection's OrderStateIndex and queues
+    every change; its own thread then updates the matching row of the orders
+    table, so the I/O thread never waits on SQLite and readers of the table
+    always see the latest state without contacting TWS. Changes for orders
+    not yet saved with their IB order ID are retried for `unmatched_ttl`
+    seconds, which covers fills reported before execute_order stores the ID.
+    """
+    def __init__(self, db, pool, poll_interval=1.0, unmatched_ttl=60.0, clock=time.monotonic):
+        """
+        Initialize the worker (call start() to run it)
+
+        Args:
+            db (OptionsDatabase): Database holding the orders table
+            pool (IBConnectionPool): Pool whose shared connection reports order events
+            poll_interval (float): Seconds between checks for a new connection and
+                                   retries of unmatched orders
+            unmatched_ttl (float): Seconds to keep retrying changes for unknown orders
+            clock (callable): Monotonic clock returning seconds
+        """
+        self.db = db
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.unmatched_ttl = unmatched_ttl
+        self.clock = clock
+        self._queue = queue.Queue()
+        self._unmatched = {}  # IB order ID -> (state, give up at)
+        self._index = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on_order_state(self, order_id, state):
+        """
+        OrderStateIndex listener; queues the change for the worker thread
+
+        Args:
+            order_id (int): IB order ID
+            state (dict): Order state from the index
+        """
+        self._queue.put((order_id, state))
+
+    def subscribe(self):
+        """
+        Listen to the shared connection's order index, reconciling when it changes
+
+        Returns:
+            bool: True if the worker is subscribed to a connection
+        """
+        conn = self.pool.connection
+        index = getattr(conn, 'orders', None)
+        if index is None:
+            return False
+        if index is not self._index:
+            if self._index is not None:
+                self._index.remove_listener(self.on_order_state)
+            index.add_listener(self.on_order_state)
+            self._index = index
+            self.reconcile()
+        return True
+
+    def reconcile(self):
+        """
+        Bring every open order in the table up to the index's current state
+
+        Returns:
+            int: Number of orders updated
+        """
+        if self._index is None:
+            return 0
+        updated = 0
+        for order in self.db.get_orders(status_filter=list(OPEN_ORDER_STATUSES), limit=500):
+            ib_order_id = order.get('ib_order_id')
+            if not ib_order_id:
+                continue
+            state = self._index.get(int(ib_order_id))
+            if state is not None and self.sync(int(ib_order_id), state):
+                updated += 1
+        return updated
+
+    def sync(self, order_id, state):
+        """
+        Write an order's IB state to its row if the state changed
+
+        Args:
+            order_id (int): IB order ID
+            state (dict): Order state from the index
+
+        Returns:
+            bool: True if the row was updated
+        """
+        order = self.db.get_order_by_ib_order_id(order_id)
+        if order is None:
+            _, give_up_at = self._unmatched.get(order_id, (None, self.clock() + self.unmatched_ttl))
+            self._unmatched[order_id] = (state, give_up_at)
+            return False
+        self._unmatched.pop(order_id, None)
+        if order['status'] not in OPEN_ORDER_STATUSES or state is None:
+            return False
+
+        new_status, executed = map_ib_status(state.get('status'))
+        execution_details = {
+            'ib_order_id': order_id,
+            'ib_status': state.get('status'),
+            'filled': state.get('filled', 0),
+            'remaining': state.get('remaining', 0),
+            'avg_fill_price': state.get('avg_fill_price', 0)
+        }
+        if (order['status'] == new_status and
+                all(order.get(field) == value for field, value in execution_details.items() if field != 'ib_order_id')):
+            return False
+
+        if not self.db.update_order_status(order_id=order['id'], status=new_status, executed=executed,
+                                           execution_details=execution_details):
+            logger.error(f"Failed to update order {order['id']} in database")
+            return False
+        logger.info(f"Order {order['id']} (IB {order_id}): {order['status']} -> {new_status} "
+                    f"({state.get('status')}, filled {state.get('filled', 0)})")
+        return True
+
+    def _retry_unmatched(self):
+        """
+        Retry changes for orders that were not in the table yet
+        """
+        now = self.clock()
+        for order_id, (state, give_up_at) in list(self._unmatched.items()):
+            if now >= give_up_at:
+                del self._unmatched[order_id]
+                logger.debug(f"No order saved with IB order ID {order_id}, ignoring its updates")
+            else:
+                self.sync(order_id, state)
+
+    def start(self):
+        """
+        Start the worker thread if it is not running yet
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='ib-order-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """
+        Stop the worker thread and stop listening for order changes
+
+        Args:
+            timeout (float): Seconds to wait for the thread to exit
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._index is not None:
+            self._index.remove_listener(self.on_order_state)
+            self._index = None
+
+    def _run(self):
+        """
+        Worker thread body
+        """
+        while not self._stop.is_set():
+            try:
+                self.subscribe()
+                try:
+                    order_id, state = self._queue.get(timeout=self.poll_interval)
+                except queue.Empty:
+                    self._retry_unmatched()
+                    continue
+                self.sync(order_id, state)
+            except Exception as e:
+                logger.error(f"Error synchronizing order state: {e}")
+                self._stop.wait(self.poll_interval)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_order_sync_worker(config=None):
+    """
+    Get the process-wide order sync worker, creating it from configuration on first use
+
+    Args:
+        config (Config, optional): Configuration to build the worker from
+
+    Returns:
+        OrderSyncWorker: The shared worker
+    """
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            config = config or Config()
+            _worker = OrderSyncWorker(OptionsDatabase(config.get('db_path')), get_connection_pool(config))
+        return _worker
@@ -0,0 +1,349 @@
+"""
+Live portfolio model fed by Interactive Brokers account update events
+"""
+
+import threading
+
+from ib_async import Option, Stock
+
+from core.currency import CurrencyHelper
+from core.logging_config import get_logger
+
+logger = get_logger('autotrader.portfolio_model', 'tws')
+
+# Account value tags kept by the model, mapped to portfolio snapshot fields
+ACCOUNT_FIELDS = {
+    'TotalCashValue': 'available_cash',
+    'NetLiquidation': 'account_value',
+    'ExcessLiquidity': 'excess_liquidity',
+    'FullInitMarginReq': 'initial_margin'
+}
+
+
+class PortfolioModel:
+    """
+    In-memory account values and positions, updated as IB streams changes
+
+    ib_async subscribes to account updates when it connects; the model listens
+    to the resulting account value and portfolio item events instead of
+    re-requesting the account summary. Every change bumps `version`, and
+    snapshot() rebuilds the portfolio dict at most once per version, so
+    readers get the latest portfolio without any IB round trip.
+    """
+    def __init__(self, rates=CurrencyHelper):
+        """
+        Initialize an empty model (call attach() once connected)
+
+        Args:
+            rates: Exchange rate provider with the CurrencyHelper interface, used
+                   to convert amounts to USD and fed IB's ExchangeRate values
+        """
+        self.rates = rates
+        self.ib = None
+        self.account_id = None
+        self.version = 0
+        self._lock = threading.Lock()
+        self._account_values = {}  # snapshot field -> {currency: value}
+        self._items = {}  # conId -> PortfolioItem
+        self._snapshot = None
+        self._snapshot_version = -1
+
+    @property
+    def ready(self):
+        """
+        bool: True once account values have been received
+        """
+        return bool(self._account_values)
+
+    def attach(self, ib, account_id):
+        """
+        Subscribe to an IB client's account update events and seed the model from it
+
+        Args:
+            ib (IB): Connected ib_async client with account updates subscribed
+            account_id (str): Account whose values and positions to keep
+        """
+        if self.ib is not ib:
+            self.detach()
+            self.ib = ib
+            ib.accountValueEvent += self.on_account_value
+            ib.updatePortfolioEvent += self.on_portfolio_item
+        with self._lock:
+            if account_id != self.account_id:
+                self._account_values.clear()
+                self._items.clear()
+            self.account_id = account_id
+            self.version += 1
+
+        for value in ib.accountValues(account_id):
+            self.on_account_value(value)
+        for item in ib.portfolio(account_id):
+            self.on_portfolio_item(item)
+        logger.debug(f"Portfolio model seeded with {len(self._items)} positions (version {self.version})")
+
+    def detach(self):
+        """
+        Unsubscribe from the current IB client's events
+        """
+        if self.ib is None:
+            return
+        self.ib.accountValueEvent -= self.on_account_value
+        self.ib.updatePortfolioEvent -= self.on_portfolio_item
+        self.ib = None
+
+    def on_account_value(self, value):
+        """
+        Apply an account value update
+
+        Args:
+            value (AccountValue): Updated account value
+        """
+        field = ACCOUNT_FIELDS.get(value.tag)
+        # Tags such as TotalCashValue arrive once per currency plus a 'BASE' row
+        # repeating their total; the snapshot sums the currency rows instead
+        if value.currency == 'BASE' or value.account != self.account_id:
+            return
+        if field is None and value.tag != 'ExchangeRate':
+            return
+        try:
+            amount = float(value.value)
+        except (TypeError, ValueError):
+            return
+        if field is None:
+            self.rates.update_from_ib(value.currency, amount)
+            with self._lock:
+                self.version += 1
+            return
+        with self._lock:
+            self._account_values.setdefault(field, {})[value.currency or 'USD'] = amount
+            self.version += 1
+
+    def on_portfolio_item(self, item):
+        """
+        Apply a portfolio item update; a zero position removes the item
+
+        Args:
+            item (PortfolioItem): Updated portfolio item
+        """
+        if item.account != self.account_id:
+            return
+        with self._lock:
+            if item.position == 0:
+                self._items.pop(item.contract.conId, None)
+            else:
+                self._items[item.contract.conId] = item
+            self.version += 1
+
+    def snapshot(self):
+        """
+        Get the portfolio as of the latest update
+
+        The same dict is returned until the next update, so callers must not
+        modify it.
+
+        Returns:
+            dict: Account information, 'positions' keyed like IBConnection.get_portfolio
+                  and the model 'version'
+        """
+        with self._lock:
+            if self._snapshot_version != self.version:
+                self._snapshot = self._build_snapshot()
+                self._snapshot_version = self.version
+            return self._snapshot
+
+    def _build_snapshot(self):
+        """
+        Build the portfolio dict from the current state (caller holds the lock)
+        """
+        account_info = {field: 0 for field in ACCOUNT_FIELDS.values()}
+        for field, amounts in self._account_values.items():
+            account_info[field] = sum(self.rates.convert_amount(amount, currency, 'USD')
+                                      for currency, amount in amounts.items())
+
+        leverage_percentage = 0
+        if account_info['account_value'] > 0 and account_info['initial_margin'] > 0:
+            leverage_percentage = (account_info['initial_margin'] / account_info['account_value']) * 100
+
+        # Convert every position's money fields to USD in one pass
+        items = list(self._items.values())
+        amounts = self.rates.convert_array(
+            [[item.averageCost, item.marketPrice, item.marketValue, item.unrealizedPNL, item.realizedPNL]
+             for item in items],
+            [item.contract.currency or 'USD' for item in items],
+            'USD'
+        ).tolist()
+
+        positions = {}
+        for item, (avg_cost, market_price, market_value, unrealized_pnl, realized_pnl) in zip(items, amounts):
+            contract = item.contract
+            position_key = contract.symbol
+            if isinstance(contract, Stock):
+                position_type = 'STK'
+            elif isinstance(contract, Option):
+                position_type = 'OPT'
+                position_key = f"{contract.symbol}_{contract.lastTradeDateOrContractMonth}_{contract.strike}_{contract.right}"
+            else:
+                position_type = contract.secType
+
+            positions[position_key] = {
+                'shares': item.position,
+                'avg_cost': avg_cost,
+                'market_price': market_price,
+                'market_value': market_value,
+                'unrealized_pnl': unrealized_pnl,
+                'realized_pnl': realized_pnl,
+                'contract': contract,
+                'security_type': position_type
+            }
+
+        return {
+            'account_id': self.account_id,
+            **account_info,
+            'leverage_percentage': leverage_percentage,
+            'positions': positions,
+            'version': self.version
+        }
+
+
+def position_record(position):
+    """
+    Convert a snapshot position to the dict served by the portfolio API
+
+    Args:
+        position (dict): Entry of a portfolio snapshot's 'positions'
+
+    Returns:
+        dict: symbol, position, prices, P&L and security_type, plus expiration,
+              strike and option_type for options
+    """
+    contract = position.get('contract')
+    security_type = position.get('security_type', '')
+    record = {
+        'symbol': contract.symbol if hasattr(contract, 'symbol') else '',
+        'position': position.get('shares', 0),
+        'market_price': position.get('market_price', 0),
+        'market_value': position.get('market_value', 0),
+        'avg_cost': position.get('avg_cost', 0),
+        'unrealized_pnl': position.get('unrealized_pnl', 0),
+        'security_type': security_type
+    }
+    if security_type == 'OPT' and hasattr(contract, 'lastTradeDateOrContractMonth') and hasattr(contract, 'strike') and hasattr(contract, 'right'):
+        record.update({
+            'expiration': contract.lastTradeDateOrContractMonth,
+            'strike': contract.strike,
+            'option_type': 'CALL' if contract.right == 'C' else 'PUT'
+        })
+    return record
+
+
+class PositionIndex:
+    """
+    Positions of one portfolio snapshot, keyed for dict lookups
+
+    Stocks are keyed by symbol and options by (symbol, expiry, strike, right),
+    so finding a ticker's position does not scan the portfolio. Records are
+    shared by every reader of the index and must not be modified.
+    """
+    def __init__(self, positions):
+        """
+        Index the positions of a portfolio snapshot
+
+        Args:
+            positions (dict): A snapshot's 'positions', as returned by IBConnection.get_portfolio
+        """
+        self.source = positions
+        self.records = []
+        self._stocks = {}  # symbol -> record
+        self._options = {}  # (symbol, expiry, strike, right) -> record
+        for position in positions.values():
+            if not position.get('contract'):
+                continue
+            record = position_record(position)
+            self.records.append(record)
+            if record['security_type'] == 'STK':
+                self._stocks.setdefault(record['symbol'], record)
+            elif 'option_type' in record:
+                key = (record['symbol'], record['expiration'], float(record['strike']), record['option_type'][0])
+                self._options[key] = record
+
+    def __len__(self):
+        return len(self.records)
+
+    def positions(self, security_type=None):
+        """
+        Get the position records, optionally of one security type
+
+        Args:
+            security_type (str, optional): e.g. 'STK' or 'OPT'
+
+        Returns:
+            list: Position records in snapshot order
+        """
+        if security_type is None:
+            return list(self.records)
+        return [record for record in self.records if record['security_type'] == security_type]
+
+    def stock(self, symbol):
+        """
+        Get the stock position of a symbol
+
+        Args:
+            symbol (str): Stock symbol
+
+        Returns:
+            dict: Position record, or None if the symbol is not held
+        """
+        return self._stocks.get(symbol)
+
+    def shares(self, symbol):
+        """
+        Get the number of shares held of a symbol
+
+        Args:
+            symbol (str): Stock symbol
+
+        Returns:
+            float: Shares held (negative if short), 0 if not held
+        """
+        record = self._stocks.get(symbol)
+        return record['position'] if record else 0
+
+    def option(self, symbol, expiry, strike, right):
+        """
+        Get the position in one option contract
+
+        Args:
+            symbol (str): Underlying symbol
+            expiry (str): Expiration date (YYYYMMDD)
+            strike (float): Strike price
+            right (str): 'C', 'P', 'CALL' or 'PUT'
+
+        Returns:
+            dict: Position record, or None if the contract is not held
+        """
+        return self._options.get((symbol, expiry, float(strike), right[:1].upper()))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_position_index(portfolio):
+    """
+    Get the position index of a portfolio snapshot, building it once per snapshot version
+
+    PortfolioModel.snapshot() returns the same positions dict until the next
+    update, so the index built for it is reused by every caller until then.
+
+    Args:
+        portfolio (dict): Portfolio as returned by IBConnection.get_portfolio
+
+    Returns:
+        PositionIndex: Index of the portfolio's positions
+    """
+    global _index
+    positions = portfolio.get('positions') or {}
+    with _index_lock:
+        if _index is None or _index.source is not positions:
+            _index = PositionIndex(positions)
+        return _index
@@ -0,0 +1,199 @@
+"""
+Market-session-aware cache of API responses with stale-while-revalidate
+"""
+
+import contextvars
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from datetime import datetime
+
+import pytz
+
+from core.logging_config import get_logger
+from core.metrics import get_metrics
+from core.utils import get_next_market_open, is_market_hours
+
+logger = get_logger('autotrader.response_cache', 'tws')
+
+
+class ResponseCache:
+    """
+    In-memory cache of computed responses whose lifetime follows the market session
+
+    While the market is open an entry is fresh for `ttl` seconds. Outside
+    market hours TWS serves frozen data that cannot change, so an entry stays
+    fresh until the next market open. For `stale_ttl` seconds after that a
+    request still gets the stale entry at once while one background thread
+    reloads it; later requests wait for a reload. Hits, stale hits, misses
+    and refreshes are counted in the metrics registry under `name`.
+    """
+    def __init__(self, name, ttl=10, stale_ttl=60, max_entries=2048, clock=time.time):
+        """
+        Initialize the response cache
+
+        Args:
+            name (str): Operation name the cache's metrics are recorded under
+            ttl (float): Seconds an entry stays fresh while the market is open
+            stale_ttl (float): Seconds past freshness an entry is served while it is reloaded
+            max_entries (int): Maximum number of entries kept; the least recently used are dropped
+            clock (callable): Returns the current time in epoch seconds
+        """
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        # key -> {'value': object, 'fresh_until': float, 'stale_until': float}
+        self._entries = OrderedDict()
+        self._loading = {}  # key -> threading.Event set when its load finishes
+
+    def fresh_until(self, now):
+        """
+        Get the time until which a response computed now stays fresh
+
+        Args:
+            now (float): Epoch seconds the response was computed at
+
+        Returns:
+            float: Epoch seconds
+        """
+        moment = datetime.fromtimestamp(now, pytz.utc)
+        if is_market_hours(now=moment):
+            return now + self.ttl
+        return get_next_market_open(moment).timestamp()
+
+    def get(self, key, loader, symbol=None, cacheable=None):
+        """
+        Get a response from the cache, loading it on a miss
+
+        Args:
+            key (tuple): Cache key; the first element is the symbol used by invalidate()
+            loader (callable): Computes the response when it is missing or stale
+            symbol (str, optional): Symbol the metrics are recorded for
+            cacheable (callable, optional): Returns False for responses that must not
+                                            be cached, e.g. errors
+
+        Returns:
+            object: The cached or freshly loaded response
+        """
+        metrics = get_metrics()
+        while True:
+            now = self.clock()
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and now < entry['fresh_until']:
+                    self._entries.move_to_end(key)
+                    metrics.increment('hits', self.name, symbol)
+                    return entry['value']
+                if entry is not None and now < entry['stale_until']:
+                    self._entries.move_to_end(key)
+                    if key not in self._loading:
+                        self._loading[key] = threading.Event()
+                        metrics.increment('refreshes', self.name, symbol)
+                        # Copy the context so the reload keeps the caller's IB priority
+                        context = contextvars.copy_context()
+                        threading.Thread(target=context.run, args=(self._load, key, loader, symbol, cacheable),
+                                         name=f"{self.name}-refresh", daemon=True).start()
+                    metrics.increment('stale_hits', self.name, symbol)
+                    return entry['value']
+                loading = self._loading.get(key)
+                if loading is None:
+                    self._loading[key] = threading.Event()
+                    break
+            # Another request is loading this key; use its result
+            loading.wait()
+
+        metrics.increment('misses', self.name, symbol)
+        return self._load(key, loader, symbol, cacheable, raise_errors=True)
+
+    def _load(self, key, loader, symbol=None, cacheable=None, raise_errors=False):
+        """
+        Compute a response and store it, then release requests waiting for it
+        """
+        try:
+            with get_metrics().timer(f"{self.name}_load", symbol):
+                value = loader()
+            if cacheable is None or cacheable(value):
+                now = self.clock()
+                fresh_until = self.fresh_until(now)
+                self.put(key, value, fresh_until)
+            return value
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.error(f"Error refreshing {self.name} entry {key}: {e}")
+            logger.error(traceback.format_exc())
+            return None
+        finally:
+            with self._lock:
+                loading = self._loading.pop(key, None)
+            if loading is not None:
+                loading.set()
+
+    def put(self, key, value, fresh_until):
+        """
+        Store a response
+
+        Args:
+            key (tuple): Cache key
+            value (object): Response to store
+            fresh_until (float): Epoch seconds until which the response is fresh
+        """
+        with self._lock:
+            self._entries[key] = {'value': value, 'fresh_until': fresh_until,
+                                  'stale_until': fresh_until + self.stale_ttl}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, symbol=None):
+        """
+        Drop cached entries
+
+        Args:
+            symbol (str, optional): Only drop entries whose key starts with this symbol; all if None
+        """
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == symbol.upper()]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(name, **kwargs):
+    """
+    Get a process-wide response cache by name, creating it on first use
+
+    Args:
+        name (str): Cache name, also the operation its metrics are recorded under
+        **kwargs: ResponseCache arguments used when the cache is created
+
+    Returns:
+        ResponseCache: The shared cache
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = _caches[name] = ResponseCache(name, **kwargs)
+        return cache
+
+
+def clear_response_caches():
+    """
+    Drop the entries of every process-wide response cache
+    """
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        cache.invalidate()
@@ -0,0 +1,220 @@
+"""
+Recording of the raw TWS API message stream of an IB session
+
+A SessionRecorder taps the socket of a connected ib_async client and writes
+every message it sends and receives, with the time since the recording
+started, to a gzip-compressed JSON lines file. Recording below ib_async
+captures every request type (qualification, market data, option chain
+parameters, account summary, orders) without wrapping individual calls.
+The files are played back by tools/replay_gateway.py.
+
+File layout: a header object on the first line, then one event per line as
+[seconds, direction, fields], where direction is '>' for messages sent to
+TWS and '<' for messages received from TWS.
+"""
+
+from datetime import datetime
+import gzip
+import json
+import struct
+import time
+import traceback
+
+from core.logging_config import get_logger
+
+logger = get_logger('autotrader.session_recording', 'tws')
+
+# Format marker and version written to the header of every recording
+RECORDING_FORMAT = 'tws-session'
+RECORDING_VERSION = 1
+
+SENT = '>'
+RECEIVED = '<'
+
+# Prefix of the first message a client sends, ahead of its supported versions
+HANDSHAKE_PREFIX = b'API\0'
+
+
+def encode_message(fields):
+    """
+    Serialize message fields into one length-prefixed TWS API frame
+
+    Args:
+        fields (list): Field values as strings
+
+    Returns:
+        bytes: The framed message
+    """
+    text = ''.join(f"{field}\0" for field in fields).encode()
+    return struct.pack('>I', len(text)) + text
+
+
+def decode_fields(payload):
+    """
+    Split a frame payload into its fields
+
+    Args:
+        payload (bytes): Message body without the length prefix
+
+    Returns:
+        list: Field values as strings
+    """
+    fields = payload.decode(errors='backslashreplace').split('\0')
+    if fields and fields[-1] == '':
+        fields.pop()
+    return fields
+
+
+class FrameSplitter:
+    """
+    Reassembles length-prefixed frames from a stream of socket reads
+    """
+    def __init__(self):
+        self._buffer = b''
+
+    def feed(self, data):
+        """
+        Add received bytes and return the messages they complete
+
+        Args:
+            data (bytes): Bytes read from the socket
+
+        Returns:
+            list: Field lists of every complete message, in order
+        """
+        self._buffer += data
+        messages = []
+        while len(self._buffer) >= 4:
+            size = struct.unpack('>I', self._buffer[:4])[0]
+            if len(self._buffer) < 4 + size:
+                break
+            messages.append(decode_fields(self._buffer[4:4 + size]))
+            self._buffer = self._buffer[4 + size:]
+        return messages
+
+
+class SessionRecorder:
+    """
+    Writes every message an ib_async client exchanges with TWS to a file
+
+    Attach before connecting so the handshake is captured; replay needs it.
+    Callbacks run on the I/O thread, alongside ib_async's own socket handling.
+    """
+    def __init__(self, path, clock=time.monotonic, **header):
+        """
+        Initialize the recorder (call attach() to start recording)
+
+        Args:
+            path (str): File to write, conventionally ending in .jsonl.gz
+            clock (callable): Monotonic time source for event offsets
+            **header: Extra values stored in the file header, e.g. client_id
+        """
+        self.path = path
+        self.clock = clock
+        self.header = header
+        self.events = 0
+        self._file = None
+        self._conn = None
+        self._send = None
+        self._splitter = FrameSplitter()
+        self._start = None
+
+    @property
+    def recording(self):
+        return self._file is not None
+
+    def attach(self, ib):
+        """
+        Start recording the traffic of an ib_async IB instance
+
+        Args:
+            ib (IB): Client whose socket traffic is recorded
+        """
+        if self.recording:
+            return
+        self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        header = {
+            'format': RECORDING_FORMAT,
+            'version': RECORDING_VERSION,
+            'recorded_at': datetime.now().isoformat(timespec='seconds'),
+            **self.header
+        }
+        self._file.write(json.dumps(header) + '\n')
+        self._start = self.clock()
+        self._splitter = FrameSplitter()
+
+        self._conn = ib.client.conn
+        self._send = self._conn.sendMsg
+        self._conn.sendMsg = self._on_send
+        # Record received data before the client handles it, so requests the
+        # client sends in response are recorded after the message that caused them
+        self._conn.hasData -= ib.client._onSocketHasData
+        self._conn.hasData += self._on_data
+        self._conn.hasData += ib.client._onSocketHasData
+        logger.info(f"Recording IB session to {self.path}")
+
+    def close(self):
+        """
+        Stop recording and finish the file
+        """
+        if not self.recording:
+            return
+        self._conn.hasData -= self._on_data
+        # Drop the instance attribute so the class method is used again
+        if self._conn.__dict__.get('sendMsg') == self._on_send:
+            del self._conn.sendMsg
+        try:
+            self._file.close()
+        except Exception as e:
+            logger.error(f"Error closing session recording {self.path}: {e}")
+        self._file = None
+        self._conn = None
+        self._send = None
+        logger.info(f"Recorded {self.events} IB messages to {self.path}")
+
+    def _write(self, direction, fields):
+        event = [round(self.clock() - self._start, 6), direction, fields]
+        self._file.write(json.dumps(event, separators=(',', ':')) + '\n')
+        self.events += 1
+
+    def _on_send(self, msg):
+        self._send(msg)
+        try:
+            if msg.startswith(HANDSHAKE_PREFIX):
+                # The version range follows the prefix without a field terminator
+                self._write(SENT, ['API'] + decode_fields(msg[len(HANDSHAKE_PREFIX) + 4:]))
+            else:
+                for fields in FrameSplitter().feed(msg):
+                    self._write(SENT, fields)
+        except Exception as e:
+            logger.error(f"Error recording sent message: {e}")
+            logger.error(traceback.format_exc())
+
+    def _on_data(self, data):
+        try:
+            for fields in self._splitter.feed(data):
+                self._write(RECEIVED, fields)
+        except Exception as e:
+            logger.error(f"Error recording received message: {e}")
+            logger.error(traceback.format_exc())
+
+
+def read_session(path):
+    """
+    Load a recording written by SessionRecorder
+
+    Args:
+        path (str): Recording file
+
+    Returns:
+        tuple: (header dict, list of (seconds, direction, fields) events)
+
+    Raises:
+        ValueError: If the file is not a session recording
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or '{}')
+        if header.get('format') != RECORDING_FORMAT:
+            raise ValueError(f"{path} is not a TWS session recording")
+        events = [tuple(json.loads(line)) for line in f if line.strip()]
+    return header, events
@@ -262,7 +262,7 @@ def get_strikes_around_price(price, interval, num_strikes):
     
     return strikes
 
-def is_market_hours(include_after_hours=False):
+def is_market_hours(include_after_hours=False, now=None):
     """
     Check if the current time is within market hours.
     
@@ -272,6 +272,8 @@ def is_market_hours(include_after_hours=False):
     
     Args:
         include_after_hours (bool): Whether to consider after-hours and pre-market as market hours
+        now (datetime, optional): Time to check; timezone-aware or US/Eastern local.
+                                  Defaults to the current time.
         
     Returns:
         bool: True if it's currently market hours, False otherwise
@@ -287,7 +289,12 @@ def is_market_hours(include_after_hours=False):
     """
     # Get the current time in ET
     eastern = pytz.timezone('US/Eastern')
-    now = datetime.now(eastern)
+    if now is None:
+        now = datetime.now(eastern)
+    elif now.tzinfo is None:
+        now = eastern.localize(now)
+    else:
+        now = now.astimezone(eastern)
     
     # Check if it's a weekend
     if now.weekday() >= 5:  # 5 is Saturday, 6 is Sunday
@@ -321,4 +328,31 @@ def is_market_hours(include_after_hours=False):
         return True
     
     # Not market hours
-    return False 
\ No newline at end of file
+    return False
+
+def get_next_market_open(now=None):
+    """
+    Get the start of the next regular trading session (9:30 AM ET, Monday to Friday)
+    
+    Args:
+        now (datetime, optional): Reference time; timezone-aware or US/Eastern local.
+                                  Defaults to the current time.
+        
+    Returns:
+        datetime: Timezone-aware US/Eastern datetime of the next market open
+    """
+    eastern = pytz.timezone('US/Eastern')
+    if now is None:
+        now = datetime.now(eastern)
+    elif now.tzinfo is None:
+        now = eastern.localize(now)
+    else:
+        now = now.astimezone(eastern)
+    
+    open_date = now.date()
+    if now.time() >= datetime_time(9, 30):
+        open_date += timedelta(days=1)
+    while open_date.weekday() >= 5:  # Skip Saturday and Sunday
+        open_date += timedelta(days=1)
+    
+    return eastern.localize(datetime.combine(open_date, datetime_time(9, 30)))
@@ -118,6 +118,21 @@ class OptionsDatabase:
             )
         ''')
         
+        # Create contracts table caching qualified contract details
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS contracts (
+                cache_key TEXT PRIMARY KEY,
+                symbol TEXT NOT NULL,
+                sec_type TEXT NOT NULL,
+                expiration TEXT,
+                con_id INTEGER NOT NULL,
+                details TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_contracts_expiration ON contracts (expiration)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_orders_ib_order_id ON orders (ib_order_id)')
+        
         conn.commit()
         conn.close()
     
@@ -485,6 +500,37 @@ class OptionsDatabase:
             print(f"Error getting order: {str(e)}")
             return None
             
+    def get_order_by_ib_order_id(self, ib_order_id):
+        """
+        Get the most recent order submitted to IB under an IB order ID
+        
+        Args:
+            ib_order_id (int or str): IB order ID assigned when the order was placed
+            
+        Returns:
+            dict: Order data or None if not found
+        """
+        try:
+            conn = sqlite3.connect(self._get_db_path_str())
+            conn.row_factory = sqlite3.Row
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT * FROM orders
+                WHERE ib_order_id = ?
+                ORDER BY id DESC
+                LIMIT 1
+            ''', (str(ib_order_id),))
+            
+            row = cursor.fetchone()
+            conn.close()
+            
+            return dict(row) if row else None
+            
+        except Exception as e:
+            print(f"Error getting order by IB order ID: {str(e)}")
+            return None
+            
     def get_orders(self, status=None, executed=None, ticker=None, limit=50, status_filter=None, isRollover=None):
         """
         Get orders from the database with flexible filtering
@@ -548,4 +594,98 @@ class OptionsDatabase:
             return orders
         except Exception as e:
             print(f"Error getting orders: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
+
+    def get_cached_contract(self, cache_key):
+        """
+        Get a cached qualified contract
+        
+        Args:
+            cache_key (str): Contract cache key
+            
+        Returns:
+            dict: Contract fields or None if not cached
+        """
+        try:
+            conn = sqlite3.connect(self._get_db_path_str())
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT details FROM contracts
+                WHERE cache_key = ?
+            ''', (cache_key,))
+            
+            row = cursor.fetchone()
+            conn.close()
+            
+            return json.loads(row[0]) if row else None
+        except Exception as e:
+            print(f"Error getting cached contract: {str(e)}")
+            return None
+    
+    def save_cached_contracts(self, entries):
+        """
+        Insert or replace qualified contracts in the cache
+        
+        Args:
+            entries (list): Tuples of (cache_key, contract_fields)
+            
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        try:
+            conn = sqlite3.connect(self._get_db_path_str())
+            cursor = conn.cursor()
+            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            
+            cursor.executemany('''
+                INSERT OR REPLACE INTO contracts
+                (cache_key, symbol, sec_type, expiration, con_id, details, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [
+                (
+                    cache_key,
+                    fields.get('symbol', ''),
+                    fields.get('secType', ''),
+                    fields.get('lastTradeDateOrContractMonth', ''),
+                    fields.get('conId', 0),
+                    json.dumps(fields),
+                    timestamp
+                )
+                for cache_key, fields in entries
+            ])
+            
+            conn.commit()
+            conn.close()
+            return True
+        except Exception as e:
+            print(f"Error saving cached contracts: {str(e)}")
+            return False
+    
+    def delete_expired_contracts(self, today):
+        """
+        Delete cached contracts whose expiration date has passed
+        
+        Args:
+            today (str): Current date in YYYYMMDD format
+            
+        Returns:
+            int: Number of contracts deleted
+        """
+        try:
+            conn = sqlite3.connect(self._get_db_path_str())
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                DELETE FROM contracts
+                WHERE expiration IS NOT NULL AND expiration != '' AND expiration < ?
+            ''', (today,))
+            
+            affected_rows = cursor.rowcount
+            conn.commit()
+            conn.close()
+            
+            return affected_rows
+        except Exception as e:
+            print(f"Error deleting expired contracts: {str(e)}")
+            return 0
@@ -137,6 +137,60 @@ async function fetchOptionData(ticker, otmPercentage = 10, optionType = null, ex
     }
 }
 
+/**
+ * Fetch option data for many tickers with one batch request
+ * Results are streamed back as NDJSON and handed to onResult as each one finishes
+ * @param {Array} requests - Objects with ticker, optionType, otm and expiration ('nearest' for the first listed expiration)
+ * @param {Function} onResult - Called with each result ({index, ticker, option_type, otm_percentage, expiration, data})
+ * @returns {Promise<Object>} Promise with the final summary line ({done, count, elapsed})
+ */
+async function fetchOptionDataBatch(requests, onResult) {
+    const response = await fetch('/api/options/otm/batch', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Cache-Control': 'no-cache, no-store, must-revalidate'
+        },
+        body: JSON.stringify({ requests })
+    });
+    
+    if (!response.ok) {
+        throw new Error(`HTTP error ${response.status}`);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    let summary = null;
+    
+    const handleLine = (line) => {
+        if (!line.trim()) {
+            return;
+        }
+        // Replace any NaN values with null for proper JSON parsing
+        const result = JSON.parse(line.replace(/:\s?NaN/g, ':null'));
+        if (result.done) {
+            summary = result;
+        } else {
+            onResult(result);
+        }
+    };
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop();
+        lines.forEach(handleLine);
+    }
+    handleLine(buffered + decoder.decode());
+    
+    return summary;
+}
+
 /**
  * Fetch all tickers for stock positions only
  * @returns {Promise} Promise with tickers data
@@ -248,7 +302,7 @@ async function cancelOrder(orderId) {
 }
 
 /**
- * Check status of pending/processing orders with TWS
+ * Get the current status of submitted orders (synced from TWS by the server)
  * @returns {Promise} Promise with updated orders
  */
 async function checkOrderStatus() {
@@ -374,6 +428,7 @@ export {
     fetchPositions,
     fetchWeeklyOptionIncome,
     fetchOptionData,
+    fetchOptionDataBatch,
     fetchTickers,
     fetchPendingOrders,
     saveOptionOrder,
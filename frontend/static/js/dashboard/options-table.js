@@ -1,7 +1,7 @@
 /**
  * Options Table module for handling options display and interaction
  */
-import { fetchOptionData, fetchTickers, saveOptionOrder, fetchAccountData, fetchOptionExpirations, fetchStockPrices } from './api.js';
+import { fetchOptionData, fetchOptionDataBatch, fetchTickers, saveOptionOrder, fetchAccountData, fetchOptionExpirations, fetchStockPrices } from './api.js';
 import { showAlert } from '../utils/alerts.js';
 import { formatCurrency, formatPercentage } from './account.js';
 
@@ -1396,30 +1396,53 @@ async function refreshAllOptions(optionType) {
         
         console.log(`Refreshing ${optionType || 'all'} options for ${tickersToRefresh.length} tickers`);
         
-        // Process each ticker sequentially to provide visual feedback
-        for (let i = 0; i < tickersToRefresh.length; i++) {
-            const ticker = tickersToRefresh[i];
-            
-            // Update the button text to show progress
-            const button = document.getElementById(buttonId);
-            if (button) {
-                const progressText = `Refreshing ${ticker} (${i+1}/${tickersToRefresh.length})`;
-                button.innerHTML = `<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> ${progressText}`;
-            }
-            
-            console.log(`Refreshing options for ticker ${ticker} (${optionType || 'all'})`);
-            
-            // Always use refreshOptionsForTickerByType for specific refresh
-            if (optionType) {
-                await refreshOptionsForTickerByType(ticker, optionType, false);
-            } else {
-                // If refreshing all, call for both CALL and PUT
-                await refreshOptionsForTickerByType(ticker, 'CALL', false);
-                await refreshOptionsForTickerByType(ticker, 'PUT', false);
-            }
-            
-            // Short delay to prevent UI freezing
-            await new Promise(resolve => setTimeout(resolve, 50));
+        // Build one batch request per ticker and option type, with each ticker's
+        // own OTM percentage and selected expiration (or the nearest listed one)
+        const optionTypes = optionType ? [optionType] : ['CALL', 'PUT'];
+        const requests = [];
+        tickersToRefresh.forEach(ticker => {
+            optionTypes.forEach(type => {
+                const otm = type === 'CALL'
+                    ? tickersData[ticker]?.callOtmPercentage || 10
+                    : tickersData[ticker]?.putOtmPercentage || 10;
+                requests.push({
+                    ticker: ticker,
+                    optionType: type,
+                    otm: otm,
+                    expiration: tickersData[ticker]?.selectedExpiration || 'nearest'
+                });
+            });
+        });
+        
+        console.log(`Refreshing ${requests.length} option requests for ${tickersToRefresh.length} tickers in one batch`);
+        
+        // Results stream in as each ticker finishes; fill the table as they arrive,
+        // rebuilding it at most every 250 ms
+        let completed = 0;
+        let tableUpdateTimer = null;
+        const button = document.getElementById(buttonId);
+        
+        if (requests.length > 0) {
+            await fetchOptionDataBatch(requests, (result) => {
+                completed++;
+                mergeOptionResult(result);
+                
+                if (button) {
+                    const progressText = `Refreshed ${result.ticker} (${completed}/${requests.length})`;
+                    button.innerHTML = `<span class="spinner-border spinner-border-sm" role="status" aria-hidden="true"></span> ${progressText}`;
+                }
+                
+                if (!tableUpdateTimer) {
+                    tableUpdateTimer = setTimeout(() => {
+                        tableUpdateTimer = null;
+                        updateOptionsTable();
+                    }, 250);
+                }
+            });
+        }
+        
+        if (tableUpdateTimer) {
+            clearTimeout(tableUpdateTimer);
         }
         
         // If we're refreshing PUT options specifically, set the PUT tab as active before updating
@@ -1467,6 +1490,58 @@ async function refreshAllOptions(optionType) {
     }
 }
 
+/**
+ * Merge one result of a batch option request into tickersData
+ * @param {Object} result - Batch result with ticker, option_type, otm_percentage, data and, for 'nearest', expirations
+ */
+function mergeOptionResult(result) {
+    const ticker = result.ticker;
+    const optionType = result.option_type;
+    
+    // Make sure tickersData is initialized for this ticker
+    if (!tickersData[ticker]) {
+        tickersData[ticker] = {
+            data: {
+                data: {}
+            },
+            callOtmPercentage: optionType === 'CALL' ? result.otm_percentage : 10,
+            putOtmPercentage: optionType === 'PUT' ? result.otm_percentage : 10,
+            putQuantity: optionType === 'PUT' ? 1 : 0
+        };
+    }
+    // Store the expirations listed when the server resolved 'nearest', as the per-ticker refresh does
+    if (result.expirations && result.expirations.length > 0 && !tickersData[ticker].expirations) {
+        tickersData[ticker].expirations = result.expirations;
+    }
+    tickersData[ticker].data = tickersData[ticker].data || { data: {} };
+    tickersData[ticker].data.data = tickersData[ticker].data.data || {};
+    tickersData[ticker].data.data[ticker] = tickersData[ticker].data.data[ticker] || {
+        stock_price: 0,
+        position: 0,
+        calls: [],
+        puts: []
+    };
+    
+    const tickerData = result.data;
+    if (!tickerData || tickerData.error) {
+        console.log(`No valid ${optionType} data received for ${ticker}:`, tickerData?.error);
+        return;
+    }
+    
+    const target = tickersData[ticker].data.data[ticker];
+    if (tickerData.stock_price) {
+        target.stock_price = tickerData.stock_price;
+    }
+    if (tickerData.position) {
+        target.position = tickerData.position;
+    }
+    if (optionType === 'CALL') {
+        target.calls = tickerData.calls || [];
+    } else {
+        target.puts = tickerData.puts || [];
+    }
+}
+
 /**
  * Refresh options data for a specific ticker and option type
  * @param {string} ticker - The ticker symbol to refresh options for
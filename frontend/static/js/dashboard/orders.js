@@ -506,7 +506,7 @@ async function loadFilledOrders() {
 }
 
 /**
- * Check for order status updates with TWS
+ * Check for order status updates synced from TWS
  */
 async function checkOrdersStatus() {
     try {
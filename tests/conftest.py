@@ -17,6 +17,15 @@ sys.path.insert(0, str(project_root))
 from db.database import OptionsDatabase
 from api import create_app
 from config import Config
+from core.response_cache import clear_response_caches
+
+
+@pytest.fixture(autouse=True)
+def empty_response_caches():
+    """Start every test without API responses cached by earlier tests"""
+    clear_response_caches()
+    yield
+    clear_response_caches()
 
 
 @pytest.fixture
@@ -0,0 +1,58 @@
+"""
+Integration tests for metrics API endpoints
+"""
+
+import json
+import logging
+
+import pytest
+
+from core.metrics import get_metrics
+
+
+@pytest.fixture
+def metrics():
+    """Shared metrics registry, emptied around each test"""
+    registry = get_metrics()
+    registry.reset()
+    yield registry
+    registry.reset()
+
+
+class TestMetricsAPI:
+    """Tests for /api/metrics endpoints"""
+
+    def test_get_metrics(self, client, metrics):
+        """Should return histograms and counters per operation and symbol"""
+        metrics.observe('get_option_chain', 0.25, 'AAPL')
+        metrics.increment('partial', 'option_snapshot', 'AAPL', 2)
+
+        response = client.get('/api/metrics')
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['operations']['get_option_chain']['count'] == 1
+        assert data['operations']['get_option_chain']['symbols']['AAPL']['p99_ms'] == 250.0
+        assert data['operations']['option_snapshot']['partial'] == 2
+
+    def test_get_metrics_filtered(self, client, metrics):
+        """Should filter by operation and leave out symbols on request"""
+        metrics.observe('get_option_chain', 0.25, 'AAPL')
+        metrics.observe('qualify', 0.01)
+
+        data = json.loads(client.get('/api/metrics?operation=get_option_chain&symbols=false').data)
+
+        assert list(data['operations']) == ['get_option_chain']
+        assert 'symbols' not in data['operations']['get_option_chain']
+
+    def test_log_and_reset(self, client, metrics, caplog):
+        """Should dump the summary to the log and then clear it"""
+        metrics.observe('qualify', 0.01)
+
+        with caplog.at_level(logging.INFO, logger='autotrader.metrics'):
+            response = client.post('/api/metrics/log')
+        assert json.loads(response.data) == {'success': True, 'operations': 1}
+        assert 'qualify: n=1' in caplog.text
+
+        client.post('/api/metrics/reset')
+        assert json.loads(client.get('/api/metrics').data)['operations'] == {}
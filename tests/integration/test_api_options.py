@@ -4,8 +4,17 @@ Integration tests for options API endpoints
 
 import pytest
 import json
+import time
+from datetime import date
 from unittest.mock import patch, MagicMock
 
+import numpy as np
+from ib_async import Stock
+
+from core.connection import PRIORITY_SCREENER
+from core.io_thread import current_priority
+from core.portfolio_model import PositionIndex
+
 
 class TestOptionsAPI:
     """Tests for /api/options endpoints"""
@@ -19,6 +28,95 @@ class TestOptionsAPI:
             data = json.loads(response.data)
             assert 'data' in data or 'options' in data or 'error' in data
     
+    def test_get_otm_options_processes_tickers_concurrently(self, client, mock_ib_connection):
+        """Should process a comma-separated list concurrently at the screener priority"""
+        tickers = ['AAPL', 'MSFT', 'NVDA', 'AMD', 'TSLA']
+        priorities = []
+        
+        def quote(ticker):
+            priorities.append(current_priority.get())
+            time.sleep(0.2)
+            return 150.0
+        
+        mock_ib_connection.get_stock_price.side_effect = quote
+        with patch('api.services.options_service.OptionsService._ensure_connection', return_value=mock_ib_connection), \
+             patch('api.services.options_service.OptionsService._get_position_index',
+                   return_value=PositionIndex({'MSFT': {'shares': 200, 'security_type': 'STK',
+                                                        'contract': Stock('MSFT', 'SMART', 'USD')}})) as get_positions:
+            started = time.monotonic()
+            response = client.get(f"/api/options/otm?tickers={','.join(tickers)}&otm=10&optionType=PUT")
+            elapsed = time.monotonic() - started
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)['data']
+        assert set(data) == set(tickers)
+        assert data['MSFT']['position'] == 200
+        assert data['AAPL']['position'] == 0
+        get_positions.assert_called_once()
+        assert priorities == [PRIORITY_SCREENER] * len(tickers)
+        # Five 0.2s quotes back to back would take a second
+        assert elapsed < 0.6
+    
+    def test_get_otm_options_reuses_cached_response(self, client, mock_ib_connection):
+        """Should answer a repeated request from the OTM cache with the current position"""
+        positions = [PositionIndex({}),
+                     PositionIndex({'AAPL': {'shares': 300, 'security_type': 'STK',
+                                             'contract': Stock('AAPL', 'SMART', 'USD')}})]
+        with patch('api.services.options_service.OptionsService._ensure_connection', return_value=mock_ib_connection), \
+             patch('api.services.options_service.OptionsService._get_position_index', side_effect=positions), \
+             patch('api.services.options_service.get_closest_friday', return_value=date(2025, 1, 17)):
+            first = json.loads(client.get('/api/options/otm?tickers=AAPL&otm=10&optionType=PUT').data)
+            second = json.loads(client.get('/api/options/otm?tickers=AAPL&otm=10&optionType=PUT').data)
+        
+        assert 'error' not in first['data']['AAPL']
+        assert mock_ib_connection.get_stock_price.call_count == 1
+        assert first['data']['AAPL']['position'] == 0
+        assert second['data']['AAPL']['position'] == 300
+        assert second['data']['AAPL']['puts'] == first['data']['AAPL']['puts']
+    
+    def test_otm_batch_streams_ndjson(self, client, mock_ib_connection):
+        """Should stream one line per request as it finishes, then a summary line"""
+        def quote(ticker):
+            time.sleep(0.3 if ticker == 'AAPL' else 0.0)
+            return 150.0
+        
+        mock_ib_connection.get_stock_price.side_effect = quote
+        expirations = [{'value': '20250124', 'label': '2025-01-24'}]
+        body = {'requests': [
+            {'ticker': 'AAPL', 'optionType': 'CALL', 'otm': 5, 'expiration': 'nearest'},
+            {'ticker': 'msft', 'optionType': 'PUT', 'otm': 15, 'expiration': '20250117'},
+        ]}
+        with patch('api.services.options_service.OptionsService._ensure_connection', return_value=mock_ib_connection), \
+             patch('api.services.options_service.OptionsService._get_position_index', return_value=PositionIndex({})) as get_positions, \
+             patch('api.services.options_service.OptionsService.get_option_expirations',
+                   return_value={'expirations': expirations}):
+            response = client.post('/api/options/otm/batch', json=body)
+            lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        get_positions.assert_called_once()
+        # The slow AAPL quote finishes last
+        assert [line.get('ticker') for line in lines] == ['MSFT', 'AAPL', None]
+        assert lines[0]['index'] == 1
+        assert lines[0]['option_type'] == 'PUT'
+        assert lines[0]['otm_percentage'] == 15
+        assert lines[0]['expiration'] == '20250117'
+        assert lines[0]['data']['stock_price'] == 150.0
+        assert 'expirations' not in lines[0]
+        # 'nearest' is resolved to the first listed expiration, and the list is passed on
+        assert lines[1]['expiration'] == '20250124'
+        assert lines[1]['expirations'] == expirations
+        assert lines[-1]['done'] is True and lines[-1]['count'] == 2
+    
+    def test_otm_batch_rejects_invalid_requests(self, client):
+        """Should return 400 for an empty batch, a missing ticker or a bad option type"""
+        assert client.post('/api/options/otm/batch', json={'requests': []}).status_code == 400
+        assert client.post('/api/options/otm/batch', json={'requests': [{'otm': 10}]}).status_code == 400
+        response = client.post('/api/options/otm/batch', json={'requests': [{'ticker': 'AAPL', 'optionType': 'X'}]})
+        assert response.status_code == 400
+        assert 'error' in json.loads(response.data)
+    
     def test_get_otm_options_invalid_option_type(self, client):
         """Should return 400 for invalid option type"""
         response = client.get('/api/options/otm?tickers=AAPL&optionType=INVALID')
@@ -57,6 +155,68 @@ class TestOptionsAPI:
         data = json.loads(response.data)
         assert 'error' in data
     
+    def test_get_option_surface(self, client, mock_ib_connection):
+        """Should pass the expirations, rights and strike selection to the connection"""
+        mock_ib_connection.get_option_surface.return_value = {
+            'symbol': 'AAPL', 'stock_price': 150.0, 'expirations': ['20241220'],
+            'strikes': [150.0], 'grid': {'P': {'bid': [[2.5]]}}
+        }
+        with patch('api.services.options_service.OptionsService._ensure_connection', return_value=mock_ib_connection):
+            response = client.get('/api/options/surface?ticker=AAPL&expirations=20241220,20241227'
+                                  '&optionType=PUT&window=10&minDelta=0.2&maxDelta=0.3')
+        
+        assert response.status_code == 200
+        assert json.loads(response.data)['grid']['P']['bid'] == [[2.5]]
+        args, kwargs = mock_ib_connection.get_option_surface.call_args
+        assert args == ('AAPL', ['20241220', '20241227'], ('P',))
+        assert kwargs['strike_window_pct'] == 10
+        assert kwargs['delta_band'] == (0.2, 0.3)
+    
+    def test_get_option_surface_requires_ticker(self, client):
+        """Should return 400 when no ticker is provided"""
+        response = client.get('/api/options/surface')
+        
+        assert response.status_code == 400
+    
+    def test_get_volatility_stats(self, client, mock_ib_connection):
+        """Should compute realized volatility and IV rank from the connection's daily bars"""
+        closes = np.linspace(100, 110, 80)
+        ivs = np.array([0.2, 0.4, 0.3])
+        mock_ib_connection.get_historical_bars.side_effect = lambda ticker, days, what_to_show='TRADES': (
+            {'time': np.arange(3) * 86400, 'close': ivs} if what_to_show == 'OPTION_IMPLIED_VOLATILITY'
+            else {'time': np.arange(80) * 86400, 'close': closes})
+        with patch('api.services.options_service.OptionsService._ensure_connection', return_value=mock_ib_connection):
+            response = client.get('/api/options/volatility?ticker=AAPL&windows=10,20')
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert set(data['realized_volatility']) == {'10', '20'}
+        assert data['implied_volatility']['iv_rank'] == pytest.approx(50.0)
+        assert data['bars'] == 80
+    
+    def test_get_volatility_stats_rejects_bad_windows(self, client):
+        """Should return 400 for windows shorter than two bars"""
+        response = client.get('/api/options/volatility?ticker=AAPL&windows=1')
+        
+        assert response.status_code == 400
+    
+    def test_check_orders_reads_database_only(self, client, temp_db, sample_order_data):
+        """Should return submitted orders from the database without contacting TWS"""
+        order_id = temp_db.save_order(sample_order_data)
+        temp_db.update_order_status(order_id, 'executed', executed=True,
+                                    execution_details={'ib_order_id': 42, 'ib_status': 'Filled'})
+        temp_db.save_order(sample_order_data)
+        
+        with patch('api.routes.options.options_service.db', temp_db), \
+             patch('api.services.options_service.OptionsService._ensure_connection') as ensure_connection:
+            response = client.post('/api/options/check-orders')
+        
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert [order['id'] for order in data['updated_orders']] == [order_id]
+        assert data['updated_orders'][0]['status'] == 'executed'
+        ensure_connection.assert_not_called()
+    
     def test_save_order_success(self, client, sample_order_data):
         """Should save order successfully"""
         response = client.post(
@@ -259,3 +419,38 @@ class TestOptionsAPI:
         
         assert response.status_code == 404
 
+    
+    def test_process_options_chain_cleans_and_sorts_columns(self, flask_app):
+        """Should fill missing quotes and greeks, scale IV and sort each type by strike"""
+        from api.routes.options import options_service
+        
+        def option(strike, right, **fields):
+            data = {'strike': strike, 'expiration': '20250117', 'option_type': right, 'bid': 0, 'ask': 0, 'last': 0,
+                    'open_interest': 0, 'implied_volatility': float('nan'), 'delta': None, 'gamma': None,
+                    'theta': None, 'vega': None}
+            data.update(fields)
+            return data
+        
+        chains = [
+            {'options': [option(110.0, 'CALL', bid=1.0, ask=1.5, implied_volatility=0.2534, delta=0.312345678),
+                         option(105.0, 'CALL', last=2.0, open_interest=float('nan'))]},
+            {'options': [option(90.0, 'PUT', implied_volatility=31.256)]},
+            None,
+        ]
+        result = options_service._process_options_chain(chains, 'AAPL', 100.0, 10)
+        
+        calls, puts = result['calls'], result['puts']
+        assert [call['strike'] for call in calls] == [105.0, 110.0]
+        assert calls[1]['symbol'] == 'AAPL20250117C110'
+        assert calls[1]['last'] == 1.25  # mid price without a last price
+        assert calls[1]['implied_volatility'] == 25.34
+        assert calls[1]['delta'] == 0.31235
+        assert calls[1]['earnings_premium_per_contract'] == 125.0
+        assert calls[1]['earnings_return_on_capital'] == round(125.0 / 11000.0 * 100, 2)
+        assert calls[0]['open_interest'] == 0 and calls[0]['gamma'] == 0
+        assert puts[0]['last'] == 0.1  # nominal price without quotes
+        assert puts[0]['implied_volatility'] == 31.26
+        assert puts[0]['earnings_return_on_cash'] == 0.11
+        
+        only_puts = options_service._process_options_chain(chains, 'AAPL', 100.0, 10, 'PUT')
+        assert only_puts['calls'] == [] and len(only_puts['puts']) == 1
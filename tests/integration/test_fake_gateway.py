@@ -0,0 +1,120 @@
+"""
+End-to-end tests of IBConnection against the local fake gateway
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from core.connection import IBConnection, ClientIdInUseError
+from core.metrics import get_metrics
+from tools.fake_gateway import FakeGateway
+
+
+@pytest.fixture
+def gateway():
+    """Fake gateway on a free localhost port"""
+    gateway = FakeGateway(positions={'AAPL': (100, 150.0)}, tick_interval=0.05, fill_delay=0.05, seed=1)
+    gateway.start_in_thread()
+    yield gateway
+    gateway.stop_thread()
+
+
+@pytest.fixture
+def connection(gateway):
+    """IBConnection connected to the fake gateway"""
+    conn = IBConnection(port=gateway.port, client_id=11, timeout=5)
+    assert conn.connect() is True
+    yield conn
+    conn.disconnect()
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+
+class TestFakeGateway:
+    """Tests for IBConnection over the TWS API socket protocol"""
+
+    def test_stock_price_and_portfolio(self, connection):
+        """Should quote stocks and serve the portfolio from account updates"""
+        assert connection.get_stock_price('AAPL') == pytest.approx(190, rel=0.05)
+
+        portfolio = connection.get_portfolio()
+        assert portfolio['account_id'] == 'DU0000001'
+        assert portfolio['available_cash'] == pytest.approx(100000)
+        assert portfolio['positions']['AAPL']['shares'] == 100
+
+    def test_option_chain_with_greeks(self, gateway, connection):
+        """Should qualify and snapshot the selected strikes with model greeks"""
+        expiration = gateway.securities['AAPL'].expirations[1]
+
+        chain = connection.get_option_chain('AAPL', expiration, 'P', strike_window_pct=3, snapshot_timeout=2)
+
+        assert chain['expiration'] == expiration
+        assert [o['strike'] for o in chain['options']] == [185.0, 187.5, 190.0, 192.5, 195.0]
+        assert all(not o['partial'] and o['delta'] < 0 and o['implied_volatility'] > 0 for o in chain['options'])
+
+    def test_option_chain_phases_are_timed(self, gateway, connection):
+        """Should record the chain request and its qualification, first tick and greeks phases"""
+        metrics = get_metrics()
+        metrics.reset()
+        expiration = gateway.securities['AAPL'].expirations[1]
+
+        connection.get_option_chain('AAPL', expiration, 'C', strike_window_pct=3, snapshot_timeout=2)
+
+        operations = metrics.snapshot()['operations']
+        for operation in ('get_option_chain', 'qualify', 'first_tick', 'get_option_params',
+                          'sec_def_opt_params', 'option_snapshot', 'greeks_wait'):
+            assert operations[operation]['count'] >= 1, operation
+        assert operations['get_option_chain']['symbols']['AAPL']['count'] == 1
+        metrics.reset()
+
+    def test_historical_bars_fetch_only_missing_ranges(self, connection):
+        """Should store daily bars and only request the span not fetched before"""
+        metrics = get_metrics()
+        metrics.reset()
+
+        year = connection.get_historical_bars('AAPL', days=365)
+        assert len(year['close']) > 250
+        assert (np.diff(year['time']) > 0).all()
+        assert connection.get_historical_bars('AAPL', days=365)['close'].tolist() == year['close'].tolist()
+        two_years = connection.get_historical_bars('AAPL', days=730)
+
+        assert len(two_years['close']) > 2 * 250
+        assert two_years['close'][-len(year['close']):].tolist() == year['close'].tolist()
+        # One request for the first year, none for the repeat, one for the year before it
+        assert metrics.snapshot(operation='historical_request')['operations']['historical_request']['count'] == 2
+        metrics.reset()
+
+    def test_order_fill_updates_index_and_portfolio(self, connection):
+        """Should report fills through order status events and account updates"""
+        contract = connection.create_option_contract('AAPL', connection.get_option_params('AAPL')['expirations'][1], 180, 'P')
+        result = connection.place_order(contract, connection.create_order('SELL', 2, 'LMT', 1.25))
+
+        assert wait_until(lambda: (connection.check_order_status(result['order_id']) or {}).get('status') == 'Filled')
+        status = connection.check_order_status(result['order_id'])
+        assert status['filled'] == 2
+        assert status['avg_fill_price'] == 1.25
+        assert wait_until(lambda: len(connection.get_portfolio()['positions']) == 2)
+
+    def test_cancel_working_order(self, gateway, connection):
+        """Should cancel orders that have not filled"""
+        gateway.fill_delay = None
+        contract = connection.create_option_contract('AAPL', connection.get_option_params('AAPL')['expirations'][0], 170, 'P')
+        result = connection.place_order(contract, connection.create_order('SELL', 1, 'LMT', 9.0))
+
+        connection.cancel_order(result['order_id'])
+
+        assert wait_until(lambda: connection.check_order_status(result['order_id'])['status'] == 'Cancelled')
+
+    def test_client_id_in_use(self, gateway, connection):
+        """Should detect a client ID already connected to the gateway"""
+        other = IBConnection(port=gateway.port, client_id=11, timeout=5)
+
+        assert other.connect() is False
+        assert isinstance(other.last_error, ClientIdInUseError)
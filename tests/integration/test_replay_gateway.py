@@ -0,0 +1,86 @@
+"""
+End-to-end tests of recording an IBConnection session and replaying it
+"""
+
+import glob
+
+import pytest
+
+from core.connection import IBConnection
+from tools.fake_gateway import FakeGateway
+from tools.replay_gateway import ReplayGateway, request_key
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """Recorded session of a quote, a put chain and the portfolio, with the live results"""
+    gateway = FakeGateway(positions={'AAPL': (100, 150.0)}, tick_interval=0.05, seed=1)
+    gateway.start_in_thread()
+    expiration = gateway.securities['AAPL'].expirations[1]
+    conn = IBConnection(port=gateway.port, client_id=11, timeout=5, record_dir=str(tmp_path))
+    try:
+        assert conn.connect() is True
+        live = {
+            'price': conn.get_stock_price('AAPL'),
+            'chain': conn.get_option_chain('AAPL', expiration, 'P', strike_window_pct=3, snapshot_timeout=2),
+        }
+    finally:
+        conn.disconnect()
+        gateway.stop_thread()
+    paths = glob.glob(str(tmp_path / 'ib_session_11_*.jsonl.gz'))
+    assert len(paths) == 1
+    return paths[0], expiration, live
+
+
+def replay(path, expiration, speed=None):
+    gateway = ReplayGateway(path, speed=speed, match_timeout=1.0)
+    gateway.start_in_thread()
+    conn = IBConnection(port=gateway.port, client_id=12, timeout=5)
+    try:
+        assert conn.connect() is True
+        price = conn.get_stock_price('AAPL')
+        chain = conn.get_option_chain('AAPL', expiration, 'P', strike_window_pct=3, snapshot_timeout=2)
+        portfolio = conn.get_portfolio()
+    finally:
+        conn.disconnect()
+        gateway.stop_thread()
+    return gateway, price, chain, portfolio
+
+
+class TestReplayGateway:
+    """Tests for replaying recorded sessions to IBConnection"""
+
+    def test_request_key_ignores_request_ids(self):
+        """Should match the same request made with a different request ID"""
+        assert request_key(['1', '11', '5', '265598', 'AAPL']) == request_key(['1', '11', '9', '265598', 'AAPL'])
+        assert request_key(['1', '11', '5', '265598', 'AAPL']) != request_key(['1', '11', '5', '272093', 'MSFT'])
+
+    @pytest.mark.parametrize('speed', [None, 1.0])
+    def test_replay_reproduces_live_results(self, recording, speed):
+        """Should serve the recorded quotes, chain and account to a new client"""
+        path, expiration, live = recording
+
+        gateway, price, chain, portfolio = replay(path, expiration, speed=speed)
+
+        assert price == live['price']
+        assert chain['options'] == live['chain']['options']
+        assert portfolio['positions']['AAPL']['shares'] == 100
+        assert gateway.stats['matched'] > 0
+        assert gateway.stats['skipped'] == 0
+
+    def test_requests_served_from_cache_are_skipped(self, recording):
+        """Should skip recorded requests the client no longer makes without waiting for them"""
+        path, expiration, live = recording
+        gateway = ReplayGateway(path, match_timeout=5.0)
+        gateway.start_in_thread()
+        conn = IBConnection(port=gateway.port, client_id=12, timeout=5)
+        try:
+            assert conn.connect() is True
+            # Skip the quote: the next request the client makes is recorded later
+            chain = conn.get_option_chain('AAPL', expiration, 'P', strike_window_pct=3, snapshot_timeout=2)
+        finally:
+            conn.disconnect()
+            gateway.stop_thread()
+
+        assert [o['strike'] for o in chain['options']] == [o['strike'] for o in live['chain']['options']]
+        assert gateway.stats['skipped'] > 0
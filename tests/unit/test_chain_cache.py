@@ -0,0 +1,75 @@
+"""
+Unit tests for core.chain_cache module
+"""
+
+import asyncio
+import pytz
+from datetime import datetime
+from unittest.mock import AsyncMock
+from core.chain_cache import OptionChainCache
+
+
+eastern = pytz.timezone('US/Eastern')
+PARAMS = {'expirations': ['20240119'], 'strikes': [150.0]}
+
+
+class TestOptionChainCache:
+    """Tests for OptionChainCache class"""
+    
+    def test_get_returns_cached_params(self):
+        """Should return the stored params for the same symbol and exchange"""
+        cache = OptionChainCache()
+        now = eastern.localize(datetime(2024, 1, 10, 10, 0))
+        
+        cache.put('aapl', 'SMART', PARAMS, now=now)
+        
+        assert cache.get('AAPL', 'SMART', now=now) is PARAMS
+        assert cache.get('AAPL', 'CBOE', now=now) is None
+    
+    def test_entries_expire_after_ttl(self):
+        """Should drop entries once the TTL has passed"""
+        cache = OptionChainCache(ttl=60)
+        now = eastern.localize(datetime(2024, 1, 10, 10, 0))
+        
+        cache.put('AAPL', 'SMART', PARAMS, now=now)
+        
+        assert cache.get('AAPL', 'SMART', now=eastern.localize(datetime(2024, 1, 10, 10, 0, 59))) is PARAMS
+        assert cache.get('AAPL', 'SMART', now=eastern.localize(datetime(2024, 1, 10, 10, 1, 1))) is None
+        assert len(cache) == 0
+    
+    def test_entries_expire_at_next_market_open(self):
+        """Should not serve yesterday's listings after the next open"""
+        cache = OptionChainCache(ttl=7 * 24 * 3600)
+        cache.put('AAPL', 'SMART', PARAMS, now=eastern.localize(datetime(2024, 1, 12, 17, 0)))
+        
+        assert cache.get('AAPL', 'SMART', now=eastern.localize(datetime(2024, 1, 15, 9, 29))) is PARAMS
+        assert cache.get('AAPL', 'SMART', now=eastern.localize(datetime(2024, 1, 15, 9, 30))) is None
+    
+    def test_pre_open_refresh_survives_the_open(self):
+        """Should keep entries stored before the open through that session"""
+        cache = OptionChainCache(ttl=24 * 3600)
+        cache.put('AAPL', 'SMART', PARAMS, now=eastern.localize(datetime(2024, 1, 10, 9, 0)))
+        
+        assert cache.get('AAPL', 'SMART', now=eastern.localize(datetime(2024, 1, 10, 9, 31))) is PARAMS
+        assert cache.get('AAPL', 'SMART', now=eastern.localize(datetime(2024, 1, 11, 9, 30))) is None
+    
+    def test_refresh_reloads_every_cached_key(self):
+        """Should fetch fresh params for each cached symbol"""
+        cache = OptionChainCache()
+        cache.put('AAPL', 'SMART', PARAMS)
+        cache.put('MSFT', 'SMART', PARAMS)
+        fresh = {'expirations': ['20240126'], 'strikes': [155.0]}
+        fetch = AsyncMock(side_effect=lambda symbol, exchange: fresh if symbol == 'AAPL' else None)
+        
+        assert asyncio.run(cache.refresh(fetch)) == {'AAPL': True, 'MSFT': False}
+        assert cache.get('AAPL', 'SMART') is fresh
+    
+    def test_invalidate_by_symbol(self):
+        """Should only drop entries for the given symbol"""
+        cache = OptionChainCache()
+        cache.put('AAPL', 'SMART', PARAMS)
+        cache.put('MSFT', 'SMART', PARAMS)
+        
+        cache.invalidate('aapl')
+        
+        assert cache.keys() == [('MSFT', 'SMART')]
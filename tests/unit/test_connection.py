@@ -2,9 +2,13 @@
 Unit tests for core.connection module (mocked)
 """
 
+import time
 import pytest
-from unittest.mock import Mock, MagicMock, patch, PropertyMock
-from core.connection import IBConnection, suppress_ib_logs
+from unittest.mock import Mock, MagicMock, AsyncMock, patch, PropertyMock
+from ib_async import LimitOrder, OrderStatus, Ticker, Trade, util
+from datetime import datetime, timedelta
+from core.connection import IBConnection, OPTION_MODEL_FIELDS, OPTION_QUOTE_FIELDS, suppress_ib_logs
+from core.greeks import bs_greeks, years_to_expiry
 
 
 class TestSuppressIBLogs:
@@ -58,15 +62,16 @@ class TestIBConnection:
         mock_ib.isConnected.return_value = True
         mock_ib_class.return_value = mock_ib
         
+        mock_ib.connectAsync = AsyncMock()
+        
         conn = IBConnection()
         conn.ib = mock_ib
         
-        with patch.object(conn, '_ensure_event_loop'):
-            result = conn.connect()
-            
-            assert result is True
-            assert conn._connected is True
-            mock_ib.connect.assert_called_once()
+        result = conn.connect()
+        
+        assert result is True
+        assert conn._connected is True
+        mock_ib.connectAsync.assert_awaited_once()
     
     @patch('core.connection.IB')
     def test_connect_failure(self, mock_ib_class):
@@ -75,14 +80,39 @@ class TestIBConnection:
         mock_ib.isConnected.return_value = False
         mock_ib_class.return_value = mock_ib
         
+        mock_ib.connectAsync = AsyncMock()
+        
         conn = IBConnection()
         conn.ib = mock_ib
         
-        with patch.object(conn, '_ensure_event_loop'):
-            result = conn.connect()
-            
-            assert result is False
-            assert conn._connected is False
+        result = conn.connect()
+        
+        assert result is False
+        assert conn._connected is False
+    
+    def test_connect_detects_client_id_in_use(self):
+        """Should fail fast with ClientIdInUseError when TWS rejects the client ID"""
+        import asyncio
+        from eventkit import Event
+        from core.connection import ClientIdInUseError
+        
+        conn = IBConnection(timeout=20)
+        conn.ib = MagicMock()
+        conn.ib.isConnected.return_value = False
+        conn.ib.errorEvent = Event('errorEvent')
+        conn.ib.client.apiError = Event('apiError')
+        
+        async def rejected(*args, **kwargs):
+            conn.ib.errorEvent.emit(-1, 326, 'client id is already in use', None)
+            await asyncio.sleep(20)
+        
+        conn.ib.connectAsync = AsyncMock(side_effect=rejected)
+        
+        start = time.time()
+        assert conn.connect() is False
+        assert time.time() - start < 5
+        assert isinstance(conn.last_error, ClientIdInUseError)
+        assert len(conn.ib.errorEvent) == 0
     
     @patch('core.connection.IB')
     def test_connect_already_connected(self, mock_ib_class):
@@ -98,7 +128,7 @@ class TestIBConnection:
         result = conn.connect()
         
         assert result is True
-        mock_ib.connect.assert_not_called()
+        mock_ib.connectAsync.assert_not_called()
     
     @patch('core.connection.IB')
     def test_disconnect(self, mock_ib_class):
@@ -189,9 +219,8 @@ class TestIBConnection:
         mock_ticker.bid = 149.95
         mock_ticker.ask = 150.05
         
-        mock_ib.qualifyContracts.return_value = [MagicMock()]
+        mock_ib.qualifyContractsAsync = AsyncMock(return_value=[MagicMock()])
         mock_ib.reqMktData.return_value = mock_ticker
-        mock_ib.sleep = lambda x: None
         
         mock_ib_class.return_value = mock_ib
         
@@ -199,13 +228,40 @@ class TestIBConnection:
         conn.ib = mock_ib
         conn._connected = True
         
-        with patch.object(conn, '_ensure_event_loop'):
-            with patch.object(conn, 'set_market_data_type'):
-                price = conn.get_stock_price('AAPL')
-                
-                assert price == 150.0
-                mock_ib.reqMktData.assert_called()
-                mock_ib.cancelMktData.assert_called()
+        with patch.object(conn, 'set_market_data_type'):
+            price = conn.get_stock_price('AAPL')
+            
+            assert price == 150.0
+            mock_ib.reqMktData.assert_called()
+            # The subscription keeps streaming for the next lookup
+            mock_ib.cancelMktData.assert_not_called()
+            assert len(conn.market_data) == 1
+    
+    @patch('core.connection.IB')
+    @patch('core.connection.is_market_hours')
+    def test_get_stock_price_skips_nan_fields(self, mock_market_hours, mock_ib_class):
+        """Should fall back to the bid/ask midpoint when last and close have no data yet"""
+        mock_market_hours.return_value = True
+        
+        mock_ib = MagicMock()
+        mock_ticker = MagicMock()
+        mock_ticker.marketPrice.return_value = 150.0
+        mock_ticker.last = float('nan')
+        mock_ticker.close = float('nan')
+        mock_ticker.bid = 149.9
+        mock_ticker.ask = 150.1
+        mock_ticker.lastRTHTrade = None
+        
+        mock_ib.qualifyContractsAsync = AsyncMock(return_value=[MagicMock()])
+        mock_ib.reqMktData.return_value = mock_ticker
+        mock_ib_class.return_value = mock_ib
+        
+        conn = IBConnection()
+        conn.ib = mock_ib
+        conn._connected = True
+        
+        with patch.object(conn, 'set_market_data_type'):
+            assert conn.get_stock_price('AAPL') == pytest.approx(150.0)
     
     @patch('core.connection.IB')
     def test_get_stock_price_not_connected(self, mock_ib_class):
@@ -217,7 +273,7 @@ class TestIBConnection:
         conn.ib = mock_ib
         conn._connected = False
         
-        with patch.object(conn, 'connect', return_value=False):
+        with patch.object(conn, 'connect_async', AsyncMock(return_value=False)):
             price = conn.get_stock_price('AAPL')
             
             assert price is None
@@ -321,6 +377,34 @@ class TestIBConnection:
         
         assert result is None
     
+    @patch('core.connection.IB')
+    def test_place_order_waits_for_status_event(self, mock_ib_class):
+        """Should return as soon as a status event assigns the order ID"""
+        trade = Trade(order=LimitOrder('SELL', 1, 1.5), orderStatus=OrderStatus(status='PendingSubmit'))
+        mock_ib = MagicMock()
+        mock_ib.isConnected.return_value = True
+        mock_ib.placeOrder.return_value = trade
+        mock_ib_class.return_value = mock_ib
+        
+        conn = IBConnection()
+        conn.ib = mock_ib
+        conn._connected = True
+        
+        def acknowledge():
+            trade.orderStatus.orderId = 7
+            trade.orderStatus.status = 'Submitted'
+            trade.statusEvent.emit(trade)
+        
+        conn.io_thread.start()
+        conn.io_thread.loop.call_soon_threadsafe(conn.io_thread.loop.call_later, 0.05, acknowledge)
+        start = time.time()
+        result = conn.place_order(MagicMock(), trade.order)
+        
+        assert result['order_id'] == 7
+        assert result['status'] == 'Submitted'
+        assert time.time() - start < 1
+        assert len(trade.statusEvent) == 0
+    
     @patch('core.connection.IB')
     def test_cancel_order_not_connected(self, mock_ib_class):
         """Should return error when not connected"""
@@ -335,4 +419,640 @@ class TestIBConnection:
         
         assert result['success'] is False
         assert 'Not connected' in result['error']
+    
+    def test_check_order_status_reads_order_index(self):
+        """Should answer from the order state index without scanning TWS lists"""
+        from ib_async import Contract, Order, OrderStatus, Trade
+        
+        conn = IBConnection()
+        conn.ib = MagicMock()
+        conn.ib.isConnected.return_value = True
+        conn._connected = True
+        conn.orders.track(Trade(Contract(symbol='AAPL'), Order(orderId=42, totalQuantity=1),
+                                OrderStatus(orderId=42, status='Submitted', remaining=1)))
+        
+        assert conn.check_order_status(42)['status'] == 'Submitted'
+        assert conn.check_order_status(43)['status'] == 'NotFound'
+        conn.ib.openOrders.assert_not_called()
+        conn.ib.executions.assert_not_called()
+    
+    def test_cancel_order_uses_indexed_trade(self):
+        """Should cancel the order held by the order state index"""
+        from ib_async import Contract, Order, OrderStatus, Trade
+        
+        conn = IBConnection()
+        conn.ib = MagicMock()
+        conn.ib.isConnected.return_value = True
+        conn._connected = True
+        trade = Trade(Contract(symbol='AAPL'), Order(orderId=42, totalQuantity=1), OrderStatus(status='Submitted'))
+        conn.orders.track(trade)
+        
+        assert conn.cancel_order(42)['success'] is True
+        conn.ib.cancelOrder.assert_called_once_with(trade.order)
+
+
 
+class TestOptionChainSnapshot:
+    """Tests for batched option chain snapshots"""
+    
+    def _make_option_ticker(self, with_greeks=True):
+        ticker = MagicMock()
+        ticker.bid = 2.45
+        ticker.ask = 2.55
+        ticker.last = 2.50
+        ticker.volume = 100
+        ticker.openInterest = 1000
+        if with_greeks:
+            ticker.impliedVolatility = 0.25
+            ticker.modelGreeks = MagicMock(delta=-0.25, gamma=0.02, theta=-0.15, vega=0.30)
+        else:
+            ticker.impliedVolatility = None
+            ticker.modelGreeks = None
+        return ticker
+    
+    def _make_contract(self, strike):
+        contract = MagicMock()
+        contract.symbol = 'AAPL'
+        contract.lastTradeDateOrContractMonth = '20241220'
+        contract.strike = strike
+        contract.right = 'P'
+        return contract
+    
+    @patch('core.connection.IB')
+    def test_snapshot_qualifies_all_contracts_in_one_call(self, mock_ib_class):
+        """Should qualify all contracts at once and open all requests before waiting"""
+        mock_ib = MagicMock()
+        contracts = [self._make_contract(strike) for strike in (140.0, 145.0, 150.0)]
+        mock_ib.qualifyContractsAsync = AsyncMock(side_effect=lambda *c: list(c))
+        mock_ib.reqMktData.side_effect = lambda *args: self._make_option_ticker()
+        
+        conn = IBConnection()
+        conn.ib = mock_ib
+        
+        options = conn.io_thread.call(conn._snapshot_option_contracts_async(contracts, timeout=1.0))
+        
+        mock_ib.qualifyContractsAsync.assert_awaited_once_with(*contracts)
+        assert mock_ib.reqMktData.call_count == 3
+        assert len(conn.market_data) == 3
+        assert [o['strike'] for o in options] == [140.0, 145.0, 150.0]
+        assert all(o['partial'] is False for o in options)
+        assert options[0]['delta'] == -0.25
+    
+    @patch('core.connection.IB')
+    def test_snapshot_marks_incomplete_contracts_partial(self, mock_ib_class):
+        """Should return contracts missing greeks at the deadline as partial"""
+        mock_ib = MagicMock()
+        contracts = [self._make_contract(140.0), self._make_contract(150.0)]
+        tickers = iter([self._make_option_ticker(), self._make_option_ticker(with_greeks=False)])
+        mock_ib.qualifyContractsAsync = AsyncMock(side_effect=lambda *c: list(c))
+        mock_ib.reqMktData.side_effect = lambda *args: next(tickers)
+        
+        conn = IBConnection()
+        conn.ib = mock_ib
+        
+        options = conn.io_thread.call(conn._snapshot_option_contracts_async(contracts, timeout=0))
+        
+        assert [o['partial'] for o in options] == [False, True]
+        assert options[1]['delta'] is None
+        assert options[1]['bid'] == 2.45
+    
+    @patch('core.connection.IB')
+    def test_snapshot_fills_missing_greeks_locally(self, mock_ib_class):
+        """Should compute greeks for options without model greeks from the underlying price"""
+        mock_ib = MagicMock()
+        contracts = [self._make_contract(140.0), self._make_contract(150.0)]
+        for contract in contracts:
+            contract.lastTradeDateOrContractMonth = '20991215'
+        unquoted = self._make_option_ticker(with_greeks=False)
+        unquoted.bid = unquoted.ask = unquoted.last = 0
+        tickers = iter([self._make_option_ticker(), unquoted])
+        mock_ib.qualifyContractsAsync = AsyncMock(side_effect=lambda *c: list(c))
+        mock_ib.reqMktData.side_effect = lambda *args: next(tickers)
+        
+        conn = IBConnection()
+        conn.ib = mock_ib
+        
+        options = conn.io_thread.call(conn._snapshot_option_contracts_async(
+            contracts, timeout=0, underlying_price=150.0, wait_for_greeks=False))
+        
+        assert [o['greeks_source'] for o in options] == ['model', 'local']
+        assert options[1]['iv_source'] is None
+        assert options[0]['delta'] == -0.25
+        # At the money put, priced with the 25% implied volatility of the other strike
+        assert -0.5 < options[1]['delta'] < 0
+        assert options[1]['gamma'] > 0 and options[1]['vega'] > 0 and options[1]['theta'] < 0
+    
+    @patch('core.connection.IB')
+    def test_snapshot_fills_nan_model_greeks_at_risk_free_rate(self, mock_ib_class):
+        """Should treat NaN model greeks as missing and price them at the connection's rate"""
+        expiration = (datetime.now() + timedelta(days=60)).strftime('%Y%m%d')
+        contract = self._make_contract(150.0)
+        contract.lastTradeDateOrContractMonth = expiration
+        ticker = self._make_option_ticker()
+        nan = float('nan')
+        ticker.modelGreeks = MagicMock(delta=nan, gamma=nan, theta=nan, vega=nan)
+        conn = IBConnection(risk_free_rate=0.05)
+        conn.ib = MagicMock()
+        conn.ib.qualifyContractsAsync = AsyncMock(side_effect=lambda *c: list(c))
+        conn.ib.reqMktData.return_value = ticker
+        
+        option, = conn.io_thread.call(conn._snapshot_option_contracts_async(
+            [contract], timeout=0, underlying_price=150.0, wait_for_greeks=False))
+        
+        expected = bs_greeks(150.0, [150.0], years_to_expiry(expiration), [0.25], 'P', rate=0.05)
+        assert option['greeks_source'] == 'local'
+        assert option['delta'] == round(float(expected['delta'][0]), 3)
+        assert option['theta'] == round(float(expected['theta'][0]), 5)
+        assert option['theta'] != round(float(bs_greeks(150.0, [150.0], years_to_expiry(expiration),
+                                                        [0.25], 'P')['theta'][0]), 5)
+    
+    @patch('core.connection.IB')
+    def test_snapshot_solves_missing_implied_volatility(self, mock_ib_class):
+        """Should invert frozen quotes into implied volatilities and greeks"""
+        expiration = (datetime.now() + timedelta(days=60)).strftime('%Y%m%d')
+        strikes = [140.0, 150.0, 160.0]
+        volatilities = [0.35, 0.30, 0.28]
+        prices = bs_greeks(150.0, strikes, years_to_expiry(expiration), volatilities, 'P')['price']
+        
+        def frozen_ticker(price):
+            ticker = self._make_option_ticker(with_greeks=False)
+            ticker.bid = round(price * 0.98, 4)
+            ticker.ask = round(price * 1.02, 4)
+            ticker.impliedVolatility = float('nan')
+            return ticker
+        
+        contracts = [self._make_contract(strike) for strike in strikes]
+        for contract in contracts:
+            contract.lastTradeDateOrContractMonth = expiration
+        tickers = iter([frozen_ticker(price) for price in prices])
+        conn = IBConnection()
+        conn.ib = MagicMock()
+        conn.ib.qualifyContractsAsync = AsyncMock(side_effect=lambda *c: list(c))
+        conn.ib.reqMktData.side_effect = lambda *args: next(tickers)
+        
+        options = conn.io_thread.call(conn._snapshot_option_contracts_async(
+            contracts, timeout=0, underlying_price=150.0, wait_for_greeks=False))
+        
+        for option, volatility in zip(options, volatilities):
+            assert option['iv_source'] == 'local'
+            assert option['implied_volatility'] == pytest.approx(volatility, abs=2e-3)
+            assert option['bid_iv'] < option['implied_volatility'] < option['ask_iv']
+            assert option['greeks_source'] == 'local'
+    
+    @patch('core.connection.IB')
+    def test_snapshot_waits_for_quotes_only_without_greeks(self, mock_ib_class):
+        """Should not wait for model greeks when they can be computed locally"""
+        conn = IBConnection()
+        conn.ib = MagicMock()
+        conn.ib.qualifyContractsAsync = AsyncMock(side_effect=lambda *c: list(c))
+        conn.ib.reqMktData.side_effect = lambda *args: self._make_option_ticker(with_greeks=False)
+        conn.wait_for_tickers_async = AsyncMock(side_effect=lambda tickers, fields, timeout: [True] * len(tickers))
+        
+        conn.io_thread.call(conn._snapshot_option_contracts_async(
+            [self._make_contract(140.0)], underlying_price=150.0, wait_for_greeks=False))
+        assert conn.wait_for_tickers_async.await_args.args[1] == OPTION_QUOTE_FIELDS
+        
+        conn.io_thread.call(conn._snapshot_option_contracts_async(
+            [self._make_contract(140.0)], underlying_price=150.0))
+        assert conn.wait_for_tickers_async.await_args.args[1] == OPTION_MODEL_FIELDS
+    
+    @patch('core.connection.IB')
+    def test_snapshot_skips_unqualified_contracts(self, mock_ib_class):
+        """Should drop contracts that fail qualification"""
+        mock_ib = MagicMock()
+        contracts = [self._make_contract(140.0), self._make_contract(150.0)]
+        mock_ib.qualifyContractsAsync = AsyncMock(return_value=[contracts[0], None])
+        mock_ib.reqMktData.side_effect = lambda *args: self._make_option_ticker()
+        
+        conn = IBConnection()
+        conn.ib = mock_ib
+        
+        options = conn.io_thread.call(conn._snapshot_option_contracts_async(contracts, timeout=1.0))
+        
+        assert len(options) == 1
+        mock_ib.reqMktData.assert_called_once()
+
+
+
+class TestOptionChainStrikeSelection:
+    """Tests for narrowing strikes in get_option_chain before requesting market data"""
+    
+    def _make_connection(self, strikes):
+        conn = IBConnection()
+        conn.ib = MagicMock()
+        conn.is_connected = MagicMock(return_value=True)
+        conn.qualify_contracts_async = AsyncMock()
+        conn._get_underlying_price_async = AsyncMock(return_value=100.0)
+        conn.get_option_params_async = AsyncMock(return_value={
+            'expirations': ['20991215'], 'strikes': strikes
+        })
+        conn._snapshot_option_contracts_async = AsyncMock(
+            side_effect=lambda contracts, timeout, **kwargs: [{'strike': c.strike} for c in contracts])
+        return conn
+    
+    def _requested_strikes(self, conn):
+        contracts = conn._snapshot_option_contracts_async.await_args.args[0]
+        return [contract.strike for contract in contracts]
+    
+    @patch('core.connection.IB')
+    def test_all_strikes_without_selection(self, mock_ib_class):
+        """Should keep every listed strike when no selection is given"""
+        conn = self._make_connection([float(s) for s in range(50, 155, 5)])
+        
+        result = conn.io_thread.call(conn.get_option_chain_async('AAPL', '20991215', 'P'))
+        
+        assert len(result['options']) == 21
+    
+    @patch('core.connection.IB')
+    def test_window_and_nearest_strikes(self, mock_ib_class):
+        """Should only request the strikes inside the window and nearest the target"""
+        conn = self._make_connection([float(s) for s in range(50, 155, 5)])
+        
+        conn.io_thread.call(conn.get_option_chain_async('AAPL', '20991215', 'P', strike_window_pct=10))
+        assert self._requested_strikes(conn) == [90.0, 95.0, 100.0, 105.0, 110.0]
+        
+        conn.io_thread.call(conn.get_option_chain_async('AAPL', '20991215', 'P', target_strike=91, max_strikes=3))
+        assert self._requested_strikes(conn) == [85.0, 90.0, 95.0]
+    
+    @patch('core.connection.IB')
+    def test_target_strike_keeps_closest(self, mock_ib_class):
+        """Should keep only the closest strike to the target by default"""
+        conn = self._make_connection([90.0, 95.0, 100.0])
+        
+        result = conn.io_thread.call(conn.get_option_chain_async('AAPL', '20991215', 'C', target_strike=96))
+        
+        assert [o['strike'] for o in result['options']] == [95.0]
+    
+    @patch('core.connection.IB')
+    def test_empty_selection_skips_market_data(self, mock_ib_class):
+        """Should return None without requesting market data when nothing matches"""
+        conn = self._make_connection([50.0, 150.0])
+        
+        result = conn.io_thread.call(conn.get_option_chain_async('AAPL', '20991215', 'C', strike_window_pct=5))
+        
+        assert result is None
+        conn._snapshot_option_contracts_async.assert_not_awaited()
+    
+    @patch('core.connection.IB')
+    def test_surface_builds_grid_from_one_batch(self, mock_ib_class):
+        """Should quote the underlying once and snapshot all expirations together"""
+        conn = self._make_connection([90.0, 95.0, 100.0, 105.0, 110.0])
+        conn.get_option_params_async.return_value = {
+            'expirations': ['20991208', '20991215'], 'strikes': [90.0, 95.0, 100.0, 105.0, 110.0]
+        }
+        conn._snapshot_option_contracts_async.side_effect = lambda contracts, timeout, **kwargs: [
+            {'strike': c.strike, 'expiration': c.lastTradeDateOrContractMonth,
+             'option_type': 'CALL' if c.right == 'C' else 'PUT', 'bid': c.strike / 100,
+             'delta': float('nan'), 'partial': False}
+            for c in contracts if not (c.right == 'P' and c.strike == 105.0)]
+        
+        surface = conn.io_thread.call(conn.get_option_surface_async(
+            'AAPL', ['20991215', '20991208', '20990101'], strike_window_pct=5))
+        
+        conn._get_underlying_price_async.assert_awaited_once()
+        conn._snapshot_option_contracts_async.assert_awaited_once()
+        assert len(self._requested_strikes(conn)) == 12
+        assert surface['expirations'] == ['20991208', '20991215']
+        assert surface['strikes'] == [95.0, 100.0, 105.0]
+        assert surface['grid']['C']['bid'] == [[0.95, 1.0, 1.05], [0.95, 1.0, 1.05]]
+        assert surface['grid']['P']['bid'][1] == [0.95, 1.0, None]
+        assert surface['grid']['C']['delta'][0] == [None, None, None]
+        assert surface['grid']['C']['ask'][0] == [None, None, None]
+    
+    @patch('core.connection.IB')
+    def test_surface_without_listed_expirations(self, mock_ib_class):
+        """Should return None when no requested expiration is listed"""
+        conn = self._make_connection([100.0])
+        
+        assert conn.io_thread.call(conn.get_option_surface_async('AAPL', ['20990101'])) is None
+        conn._snapshot_option_contracts_async.assert_not_awaited()
+
+class TestPortfolio:
+    """Tests for the event-driven portfolio"""
+    
+    def _make_connection(self):
+        from eventkit import Event
+        from ib_async import AccountValue
+        
+        conn = IBConnection()
+        conn.ib = MagicMock()
+        conn.ib.isConnected.return_value = True
+        conn._connected = True
+        conn.ib.managedAccounts.return_value = ['DU1']
+        conn.ib.accountValueEvent = Event('accountValueEvent')
+        conn.ib.updatePortfolioEvent = Event('updatePortfolioEvent')
+        conn.ib.accountValues.return_value = [AccountValue('DU1', 'NetLiquidation', '100000', 'USD', '')]
+        conn.ib.portfolio.return_value = []
+        return conn
+    
+    @patch('core.connection.is_market_hours', return_value=True)
+    def test_first_call_seeds_model_then_reads_memory(self, mock_market_hours):
+        """Should seed the portfolio model once and serve later calls from it"""
+        conn = self._make_connection()
+        
+        first = conn.get_portfolio()
+        with patch.object(conn.io_thread, 'call', side_effect=AssertionError("should not use the I/O thread")):
+            second = conn.get_portfolio()
+        
+        assert first['account_value'] == 100000
+        assert second['account_value'] == 100000
+        assert second['is_frozen'] is False
+        conn.ib.accountValues.assert_called_once()
+    
+    @patch('core.connection.is_market_hours', return_value=True)
+    def test_requests_account_updates_when_not_streaming(self, mock_market_hours):
+        """Should subscribe to account updates if ib_async has no account values yet"""
+        conn = self._make_connection()
+        values = conn.ib.accountValues.return_value
+        conn.ib.accountValues.return_value = []
+        
+        async def subscribe(account):
+            conn.ib.accountValues.return_value = values
+        
+        conn.ib.reqAccountUpdatesAsync = AsyncMock(side_effect=subscribe)
+        
+        assert conn.get_portfolio()['account_value'] == 100000
+        conn.ib.reqAccountUpdatesAsync.assert_awaited_once_with('DU1')
+
+
+class TestIdleEviction:
+    """Tests for releasing idle market data lines"""
+    
+    def test_evict_idle_market_data_cancels_on_io_thread(self):
+        """Should cancel expired subscriptions from the I/O thread"""
+        import threading
+        
+        conn = IBConnection(subscription_ttl=0)
+        conn.ib = MagicMock()
+        threads = []
+        conn.ib.cancelMktData.side_effect = lambda contract: threads.append(threading.current_thread().name)
+        conn.market_data.acquire(MagicMock(conId=1, symbol='AAPL'))
+        conn.market_data.release(MagicMock(conId=1, symbol='AAPL'))
+        
+        assert conn.evict_idle_market_data() == 1
+        assert threads == [conn.io_thread.name]
+        assert len(conn.market_data) == 0
+
+
+class TestTickerReadiness:
+    """Tests for event-driven ticker readiness waits"""
+    
+    def test_wait_returns_immediately_when_ready(self):
+        """Should not wait for an update if fields are already present"""
+        conn = IBConnection()
+        ticker = Ticker()
+        ticker.bid = 1.0
+        ticker.ask = 1.1
+        
+        start = time.time()
+        assert conn.wait_for_ticker(ticker, ('bid', 'ask'), timeout=5) is True
+        assert time.time() - start < 1
+    
+    def test_wait_returns_on_update_event(self):
+        """Should return as soon as the ticker update event delivers the fields"""
+        conn = IBConnection()
+        ticker = Ticker()
+        
+        def deliver():
+            ticker.bid = 1.0
+            ticker.updateEvent.emit(ticker)
+        
+        # Ticker updates arrive on the I/O thread's event loop
+        conn.io_thread.start()
+        conn.io_thread.loop.call_soon_threadsafe(conn.io_thread.loop.call_later, 0.05, deliver)
+        start = time.time()
+        ready = conn.wait_for_tickers([ticker], ('bid',), timeout=5)
+        
+        assert ready == [True]
+        assert time.time() - start < 1
+    
+    def test_wait_reports_tickers_missing_at_deadline(self):
+        """Should flag tickers that never become ready"""
+        conn = IBConnection()
+        ready_ticker = Ticker()
+        ready_ticker.bid = 1.0
+        empty_ticker = Ticker()
+        
+        ready = conn.wait_for_tickers([ready_ticker, empty_ticker], ('bid',), timeout=0.05)
+        
+        assert ready == [True, False]
+
+
+class TestQualifyContracts:
+    """Tests for cached contract qualification"""
+    
+    def test_second_qualification_skips_tws(self):
+        """Should only send cache misses to TWS"""
+        from ib_async import Stock
+        
+        def qualify(*contracts):
+            for i, contract in enumerate(contracts):
+                contract.conId = 1000 + i
+            return list(contracts)
+        
+        conn = IBConnection()
+        conn.ib = MagicMock()
+        conn.ib.qualifyContractsAsync = AsyncMock(side_effect=qualify)
+        
+        first = conn.qualify_contracts(Stock('AAPL', 'SMART', 'USD'))
+        second = conn.qualify_contracts(Stock('AAPL', 'SMART', 'USD'), Stock('MSFT', 'SMART', 'USD'))
+        
+        assert first[0].conId == 1000
+        assert second[0].conId == 1000
+        assert second[1].conId == 1000
+        assert conn.ib.qualifyContractsAsync.call_count == 2
+        # Only MSFT was sent on the second call
+        assert [c.symbol for c in conn.ib.qualifyContractsAsync.call_args[0]] == ['MSFT']
+    
+    def test_failed_qualification_returns_none(self):
+        """Should keep result positions aligned with the input"""
+        from ib_async import Stock
+        
+        conn = IBConnection()
+        conn.ib = MagicMock()
+        conn.ib.qualifyContractsAsync = AsyncMock(return_value=[None])
+        
+        assert conn.qualify_contracts(Stock('BAD', 'SMART', 'USD')) == [None]
+
+
+class TestOptionParams:
+    """Tests for cached option chain metadata"""
+    
+    def _make_connection(self, chains):
+        conn = IBConnection()
+        conn.ib = MagicMock()
+        conn.ib.isConnected.return_value = True
+        conn._connected = True
+        conn.ib.qualifyContractsAsync = AsyncMock(side_effect=lambda *contracts: list(contracts))
+        conn.ib.reqSecDefOptParamsAsync = AsyncMock(return_value=chains)
+        return conn
+    
+    def test_repeat_lookups_are_served_from_cache(self):
+        """Should only call reqSecDefOptParamsAsync once per symbol and exchange"""
+        from ib_async import OptionChain
+        
+        chains = [
+            OptionChain('CBOE', 1, 'AAPL', '100', ['20240119'], [150.0]),
+            OptionChain('SMART', 1, 'AAPL', '100', ['20240126', '20240119'], [155.0, 150.0]),
+        ]
+        conn = self._make_connection(chains)
+        
+        first = conn.get_option_params('AAPL')
+        second = conn.get_option_params('AAPL')
+        
+        assert first is second
+        assert first['exchange'] == 'SMART'
+        assert first['expirations'] == ['20240119', '20240126']
+        assert first['strikes'] == [150.0, 155.0]
+        conn.ib.reqSecDefOptParamsAsync.assert_awaited_once()
+    
+    def test_refresh_reloads_cached_symbols(self):
+        """Should bypass the cache when refreshing ahead of the open"""
+        from ib_async import OptionChain
+        
+        conn = self._make_connection([OptionChain('SMART', 1, 'AAPL', '100', ['20240119'], [150.0])])
+        conn.get_option_params('AAPL')
+        
+        assert conn.refresh_option_params() == {'AAPL': True}
+        assert conn.ib.reqSecDefOptParamsAsync.call_count == 2
+    
+    def test_concurrent_requests_overlap_on_the_io_loop(self):
+        """Should not serialize requests from different callers behind each other"""
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        from ib_async import OptionChain
+        
+        conn = self._make_connection([])
+        
+        async def slow_chains(*args):
+            await asyncio.sleep(0.3)
+            return [OptionChain('SMART', 1, args[0], '100', ['20240119'], [150.0])]
+        
+        conn.ib.reqSecDefOptParamsAsync = AsyncMock(side_effect=slow_chains)
+        
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(conn.get_option_params, ['AAPL', 'MSFT', 'IBM', 'SPY']))
+        
+        assert all(results)
+        assert time.time() - start < 0.9
+    
+    def test_no_chains_returns_none(self):
+        """Should return None and cache nothing when TWS lists no chains"""
+        conn = self._make_connection([])
+        
+        assert conn.get_option_params('AAPL') is None
+        assert len(conn.chain_cache) == 0
+
+
+class FakeClock:
+    """Clock whose sleep advances time instantly"""
+    
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestRequestPacer:
+    """Tests for RequestPacer class"""
+    
+    def test_burst_within_budget_does_not_wait(self):
+        """Should send a burst up to the bucket capacity immediately"""
+        from core.connection import RequestPacer
+        clock = FakeClock()
+        pacer = RequestPacer({'mktdata': (10, 1.0)}, sleep=clock.sleep, clock=clock)
+        
+        for _ in range(10):
+            pacer.acquire('mktdata')
+        
+        assert clock.slept == []
+    
+    def test_sustained_load_is_paced_to_budget(self):
+        """Should wait for tokens once the burst allowance is used up"""
+        from core.connection import RequestPacer
+        clock = FakeClock()
+        pacer = RequestPacer({'mktdata': (10, 1.0)}, sleep=clock.sleep, clock=clock)
+        
+        for _ in range(30):
+            pacer.acquire('mktdata')
+        
+        # 10 immediately, then 20 more at 10 per second
+        assert clock.now == pytest.approx(2.0, abs=0.01)
+    
+    def test_total_budget_caps_all_kinds(self):
+        """Should meter every request kind against the shared total budget"""
+        from core.connection import RequestPacer
+        clock = FakeClock()
+        pacer = RequestPacer({'total': (5, 1.0), 'mktdata': (10, 1.0), 'qualify': (10, 1.0)},
+                             sleep=clock.sleep, clock=clock)
+        
+        for _ in range(5):
+            pacer.acquire('mktdata')
+        pacer.acquire('qualify')
+        
+        assert clock.now == pytest.approx(0.2)
+        assert pacer.capacity('qualify') == 5
+    
+    def test_qualify_batches_follow_budget(self):
+        """Should split large qualifications into budget-sized requests"""
+        from ib_async import Stock
+        
+        conn = IBConnection(request_budgets={'qualify': (2, 1.0)})
+        conn.ib = MagicMock()
+        conn.ib.qualifyContractsAsync = AsyncMock(side_effect=lambda *contracts: list(contracts))
+        conn.pacer.clock = clock = FakeClock()
+        
+        async def sleep(seconds):
+            clock.sleep(seconds)
+        
+        with patch('core.connection.asyncio.sleep', sleep):
+            conn.qualify_contracts(*[Stock(s, 'SMART', 'USD') for s in ('A', 'B', 'C', 'D', 'E')])
+        
+        assert [len(c[0]) for c in conn.ib.qualifyContractsAsync.call_args_list] == [2, 2, 1]
+
+
+class TestRequestPriority:
+    """Tests for prioritized scheduling on the I/O thread"""
+    
+    def test_higher_priority_jobs_run_first(self):
+        """Should run queued order requests before screener requests"""
+        from core.io_thread import IBIOThread
+        from core.connection import request_priority, PRIORITY_ORDERS, PRIORITY_PORTFOLIO, PRIORITY_SCREENER
+        
+        io_thread = IBIOThread(name='test-priority')
+        order = []
+        futures = []
+        
+        def enqueue():
+            # Queued from the loop itself, so all three wait for the same dispatch pass
+            for priority in (PRIORITY_SCREENER, PRIORITY_PORTFOLIO, PRIORITY_ORDERS):
+                with request_priority(priority):
+                    futures.append(io_thread.submit(order.append, priority))
+        
+        try:
+            io_thread.call(enqueue)
+            for future in futures:
+                future.result(timeout=5)
+        finally:
+            io_thread.stop()
+        
+        assert order == [PRIORITY_ORDERS, PRIORITY_PORTFOLIO, PRIORITY_SCREENER]
+    
+    def test_priority_decorator_restores_context(self):
+        """Should only apply the priority inside the decorated call"""
+        from core.io_thread import current_priority
+        from core.connection import request_priority, PRIORITY_SCREENER, PRIORITY_BACKGROUND
+        
+        @request_priority(PRIORITY_SCREENER)
+        def inner():
+            return current_priority.get()
+        
+        assert inner() == PRIORITY_SCREENER
+        assert current_priority.get() == PRIORITY_BACKGROUND
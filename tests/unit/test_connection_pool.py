@@ -0,0 +1,170 @@
+"""
+Unit tests for core.connection_pool module
+"""
+
+import pytest
+from core.connection import ClientIdInUseError
+from core.connection_pool import IBConnectionPool
+
+
+class FakeConnection:
+    """Connection stub that only accepts the given client IDs, or fails with `error`"""
+    
+    def __init__(self, accepted_ids, error=None, **kwargs):
+        self.accepted_ids = accepted_ids
+        self.error = error
+        self.client_id = kwargs.get('client_id')
+        self.kwargs = kwargs
+        self.connected = False
+        self.last_error = None
+        self.attempts = []
+    
+    def connect(self):
+        self.attempts.append(self.client_id)
+        if self.error is not None:
+            self.last_error = self.error
+            return False
+        self.connected = self.client_id in self.accepted_ids
+        self.last_error = None if self.connected else ClientIdInUseError(f"Client ID {self.client_id} is already in use")
+        return self.connected
+    
+    def is_connected(self):
+        return self.connected
+    
+    def disconnect(self):
+        self.connected = False
+    
+    def evict_idle_market_data(self):
+        self.evictions = getattr(self, 'evictions', 0) + 1
+        return 0
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def make_pool(accepted_ids, error=None, **kwargs):
+    created = []
+    
+    def factory(**conn_kwargs):
+        conn = FakeConnection(accepted_ids, error, **conn_kwargs)
+        created.append(conn)
+        return conn
+    
+    kwargs.setdefault('clock', FakeClock())
+    pool = IBConnectionPool(base_client_id=10, max_client_ids=4, connection_factory=factory, **kwargs)
+    return pool, created
+
+
+class TestIBConnectionPool:
+    """Tests for IBConnectionPool class"""
+    
+    def test_leases_first_free_client_id(self):
+        """Should walk up from the base client ID until TWS accepts one"""
+        pool, created = make_pool({12, 13})
+        
+        conn = pool.get()
+        
+        assert conn is created[0]
+        assert pool.client_id == 12
+        assert conn.attempts == [10, 11, 12]
+    
+    def test_connection_is_shared(self):
+        """Should hand every caller the same connection without reconnecting"""
+        pool, created = make_pool({10})
+        
+        assert pool.get() is pool.get()
+        assert len(created) == 1
+        assert created[0].attempts == [10]
+    
+    def test_warm_reconnect_keeps_client_id(self):
+        """Should reconnect the same object with the leased client ID"""
+        pool, created = make_pool({11})
+        conn = pool.get()
+        conn.disconnect()
+        
+        assert pool.check_health() is True
+        assert pool.get() is conn
+        assert conn.attempts[-1] == 11
+    
+    def test_refused_connection_stops_probing(self):
+        """Should not try other client IDs when TWS is not listening"""
+        pool, created = make_pool(set(), error=ConnectionRefusedError())
+        
+        assert pool.get() is None
+        assert created[0].attempts == [10]
+    
+    def test_timeout_stops_probing(self):
+        """Should only move to the next client ID when TWS reports the ID in use"""
+        pool, created = make_pool({12}, error=TimeoutError())
+        
+        assert pool.get() is None
+        assert created[0].attempts == [10]
+    
+    def test_failed_connect_backs_off(self):
+        """Should not contact TWS from get() again until the backoff has passed"""
+        clock = FakeClock()
+        pool, created = make_pool(set(), error=TimeoutError(), clock=clock, retry_backoff=1.0)
+        
+        pool.get()
+        pool.get()
+        assert created[0].attempts == [10]
+        
+        clock.now = 1.0
+        pool.get()
+        assert created[0].attempts == [10, 10]
+        
+        # The backoff doubles after each failure
+        clock.now = 2.5
+        pool.get()
+        assert created[0].attempts == [10, 10]
+    
+    def test_health_check_ignores_backoff(self):
+        """Should let the health check retry during the backoff and clear it on success"""
+        pool, created = make_pool({10}, error=TimeoutError())
+        pool.get()
+        
+        created[0].error = None
+        assert pool.check_health() is True
+        assert pool.get() is created[0]
+        assert pool._retry_at == 0.0
+    
+    def test_warm_reconnect_leases_again_when_id_taken(self):
+        """Should lease a new client ID if another session took the leased one"""
+        pool, created = make_pool({10, 11})
+        conn = pool.get()
+        conn.disconnect()
+        conn.accepted_ids = {11}
+        
+        assert pool.get() is conn
+        assert pool.client_id == 11
+    
+    def test_no_free_client_id(self):
+        """Should give up after the configured number of client IDs"""
+        pool, created = make_pool(set())
+        
+        assert pool.get() is None
+        assert created[0].attempts == [10, 11, 12, 13]
+    
+    def test_passes_connection_settings_to_factory(self):
+        """Should build the connection with the pool's settings"""
+        pool, created = make_pool({10}, readonly=False)
+        pool.get()
+        
+        assert created[0].kwargs['readonly'] is False
+        assert created[0].kwargs['port'] == 7497
+    
+    def test_health_check_evicts_idle_market_data(self):
+        """Should release idle subscriptions on every health check"""
+        pool, created = make_pool({10})
+        
+        pool.check_health()
+        pool.check_health()
+        
+        assert created[0].evictions == 2
@@ -0,0 +1,84 @@
+"""
+Unit tests for core.contract_cache module
+"""
+
+import pytest
+from ib_async import Option, Stock
+from core.contract_cache import ContractCache
+
+
+def qualified_option(expiry='20991217', strike=150.0, right='P', con_id=1001):
+    option = Option('AAPL', expiry, strike, right, 'SMART', currency='USD')
+    option.conId = con_id
+    option.localSymbol = f"AAPL  {expiry[2:]}{right}00150000"
+    option.multiplier = '100'
+    return option
+
+
+class TestContractCache:
+    """Tests for ContractCache class"""
+    
+    def test_make_key_normalizes_right_and_strike(self):
+        """Should produce the same key for equivalent contract requests"""
+        a = Option('AAPL', '20241220', 150, 'PUT', 'SMART', currency='USD')
+        b = Option('aapl', '20241220', 150.0, 'P', 'SMART', currency='USD')
+        
+        assert ContractCache.make_key(a) == ContractCache.make_key(b)
+    
+    def test_memory_only_round_trip(self):
+        """Should return stored fields for a matching request"""
+        cache = ContractCache()
+        request = Option('AAPL', '20991217', 150.0, 'P', 'SMART', currency='USD')
+        
+        cache.put_many([ContractCache.make_key(request)], [qualified_option()])
+        fields = cache.get(Option('AAPL', '20991217', 150.0, 'P', 'SMART', currency='USD'))
+        
+        assert fields['conId'] == 1001
+        assert fields['multiplier'] == '100'
+    
+    def test_miss_returns_none(self):
+        """Should return None for unknown contracts"""
+        assert ContractCache().get(Stock('AAPL', 'SMART', 'USD')) is None
+    
+    def test_skips_unqualified_contracts(self):
+        """Should not cache contracts without a conId"""
+        cache = ContractCache()
+        request = Stock('AAPL', 'SMART', 'USD')
+        
+        cache.put_many([request], [None])
+        cache.put_many([request], [Stock('AAPL', 'SMART', 'USD')])
+        
+        assert len(cache) == 0
+    
+    def test_persists_to_database(self, temp_db):
+        """Should serve contracts from SQLite after a restart"""
+        request = Option('AAPL', '20991217', 150.0, 'P', 'SMART', currency='USD')
+        ContractCache(temp_db).put_many([ContractCache.make_key(request)], [qualified_option()])
+        
+        fresh_cache = ContractCache(temp_db)
+        fields = fresh_cache.get(request)
+        
+        assert fields is not None
+        assert fields['conId'] == 1001
+    
+    def test_lru_eviction(self):
+        """Should evict the least recently used entry when full"""
+        cache = ContractCache(max_entries=2)
+        requests = [Option('AAPL', '20991217', strike, 'P', 'SMART', currency='USD') for strike in (140.0, 145.0, 150.0)]
+        for i, request in enumerate(requests[:2]):
+            cache.put_many([ContractCache.make_key(request)], [qualified_option(strike=request.strike, con_id=i + 1)])
+        cache.get(requests[0])
+        cache.put_many([ContractCache.make_key(requests[2])], [qualified_option(strike=150.0, con_id=3)])
+        
+        assert cache.get(requests[0]) is not None
+        assert cache.get(requests[1]) is None
+        assert cache.get(requests[2]) is not None
+    
+    def test_purge_expired_options(self, temp_db):
+        """Should drop expired options from memory and the database"""
+        cache = ContractCache(temp_db)
+        request = Option('AAPL', '20240105', 150.0, 'P', 'SMART', currency='USD')
+        cache.put_many([ContractCache.make_key(request)], [qualified_option(expiry='20240105')])
+        
+        assert cache.purge_expired(today='20240110') == 1
+        assert cache.get(request) is None
@@ -7,6 +7,14 @@ from unittest.mock import Mock, patch
 from core.currency import CurrencyHelper, BASE_CURRENCY
 
 
+@pytest.fixture(autouse=True)
+def clear_rate_cache():
+    """Start every test without cached exchange rates"""
+    CurrencyHelper.clear_cache()
+    yield
+    CurrencyHelper.clear_cache()
+
+
 class TestCurrencyHelper:
     """Tests for CurrencyHelper class"""
     
@@ -82,4 +90,48 @@ class TestCurrencyHelper:
     def test_base_currency_constant(self):
         """Should have USD as base currency"""
         assert BASE_CURRENCY == 'USD'
-
+    
+    @patch('core.currency.CurrencyHelper.converter')
+    def test_rates_are_cached_for_the_trading_day(self, mock_converter):
+        """Should look each currency up once per trading day"""
+        mock_converter.convert.return_value = 1.10
+        
+        CurrencyHelper.get_exchange_rate('EUR', 'USD')
+        CurrencyHelper.get_exchange_rate('EUR', 'USD')
+        assert mock_converter.convert.call_count == 1
+        
+        with patch.object(CurrencyHelper, '_trading_day', return_value='next day'):
+            CurrencyHelper.get_exchange_rate('EUR', 'USD')
+        assert mock_converter.convert.call_count == 2
+    
+    @patch('core.currency.CurrencyHelper.converter')
+    def test_ib_exchange_rates_take_precedence(self, mock_converter):
+        """Should derive rates from IB's ExchangeRate values relative to USD"""
+        # Account base currency is CHF
+        CurrencyHelper.update_from_ib('EUR', 0.95)
+        CurrencyHelper.update_from_ib('USD', 0.88)
+        
+        assert CurrencyHelper.get_exchange_rate('EUR', 'USD') == pytest.approx(0.95 / 0.88)
+        mock_converter.convert.assert_not_called()
+    
+    def test_converter_is_created_lazily(self):
+        """Should not parse the ECB rate file until a rate is needed"""
+        with patch('core.currency.CurrencyConverter') as converter_class:
+            CurrencyHelper.converter = None
+            CurrencyHelper.get_exchange_rate('USD', 'USD')
+            converter_class.assert_not_called()
+            
+            converter_class.return_value.convert.return_value = 1.10
+            assert CurrencyHelper.get_exchange_rate('EUR', 'USD') == 1.10
+            converter_class.assert_called_once()
+        CurrencyHelper.converter = None
+    
+    @patch.object(CurrencyHelper, 'get_exchange_rate')
+    def test_convert_array_looks_up_each_currency_once(self, mock_get_rate):
+        """Should convert whole position arrays with one lookup per currency"""
+        mock_get_rate.side_effect = lambda currency, to_currency: {'EUR': 1.10, 'USD': 1.0}[currency]
+        
+        result = CurrencyHelper.convert_array([[10.0, 20.0], [10.0, 20.0], [5.0, 1.0]], ['EUR', '', 'EUR'])
+        
+        assert result.ravel().tolist() == pytest.approx([11.0, 22.0, 10.0, 20.0, 5.5, 1.1])
+        assert mock_get_rate.call_count == 2
@@ -310,4 +310,36 @@ class TestOptionsDatabase:
         
         assert len(executed) >= 1
         assert all(o['executed'] == 1 for o in executed)
+    
+    def test_get_order_by_ib_order_id(self, temp_db, sample_order_data):
+        """Should find the order submitted under an IB order ID"""
+        order_id = temp_db.save_order(sample_order_data)
+        temp_db.update_order_status(order_id, 'processing', execution_details={'ib_order_id': 42})
+        
+        assert temp_db.get_order_by_ib_order_id(42)['id'] == order_id
+        assert temp_db.get_order_by_ib_order_id('42')['id'] == order_id
+        assert temp_db.get_order_by_ib_order_id(43) is None
 
+    
+    def test_save_and_get_cached_contract(self, temp_db):
+        """Should persist qualified contract details by cache key"""
+        fields = {'conId': 265598, 'symbol': 'AAPL', 'secType': 'STK', 'exchange': 'SMART', 'currency': 'USD'}
+        
+        assert temp_db.save_cached_contracts([('AAPL|STK||0||SMART|USD', fields)]) is True
+        
+        assert temp_db.get_cached_contract('AAPL|STK||0||SMART|USD') == fields
+        assert temp_db.get_cached_contract('MSFT|STK||0||SMART|USD') is None
+    
+    def test_delete_expired_contracts(self, temp_db):
+        """Should delete only contracts that expired before the given date"""
+        expired = {'conId': 1, 'symbol': 'AAPL', 'secType': 'OPT', 'lastTradeDateOrContractMonth': '20240105'}
+        live = {'conId': 2, 'symbol': 'AAPL', 'secType': 'OPT', 'lastTradeDateOrContractMonth': '20240119'}
+        stock = {'conId': 3, 'symbol': 'AAPL', 'secType': 'STK'}
+        temp_db.save_cached_contracts([('expired', expired), ('live', live), ('stock', stock)])
+        
+        deleted = temp_db.delete_expired_contracts('20240110')
+        
+        assert deleted == 1
+        assert temp_db.get_cached_contract('expired') is None
+        assert temp_db.get_cached_contract('live') == live
+        assert temp_db.get_cached_contract('stock') == stock
@@ -0,0 +1,159 @@
+"""
+Unit tests for core.greeks module
+"""
+
+from datetime import datetime
+
+import pytest
+import pytz
+
+import numpy as np
+
+from core.greeks import (bs_delta, bs_greeks, implied_volatility, norm_cdf, norm_cdf_array, select_strikes,
+                         years_to_expiry, MIN_YEARS)
+from tools.fake_gateway import black_scholes
+
+
+EASTERN = pytz.timezone('US/Eastern')
+NOW = EASTERN.localize(datetime(2025, 1, 2, 16, 0))
+
+
+class TestBlackScholes:
+    """Tests for the Black-Scholes helpers"""
+
+    def test_norm_cdf(self):
+        """Should match known values of the standard normal CDF"""
+        assert norm_cdf(0) == pytest.approx(0.5)
+        assert norm_cdf(1.96) == pytest.approx(0.975, abs=1e-3)
+
+    def test_years_to_expiry(self):
+        """Should measure to the close on the expiration date, with a floor"""
+        assert years_to_expiry('20250103', NOW) == pytest.approx(1 / 365)
+        assert years_to_expiry('20250102', NOW) == MIN_YEARS
+        assert years_to_expiry('20241231', NOW) == MIN_YEARS
+
+    def test_delta_matches_reference(self):
+        """Should match a textbook Black-Scholes delta"""
+        # S=100, K=100, T=1, sigma=0.2, r=0.05 -> call delta 0.6368
+        assert bs_delta(100, 100, 1.0, 0.2, 'C', 0.05) == pytest.approx(0.6368, abs=1e-4)
+        assert bs_delta(100, 100, 1.0, 0.2, 'P', 0.05) == pytest.approx(0.6368 - 1, abs=1e-4)
+
+    def test_delta_moneyness(self):
+        """Should give deep ITM options a delta near 1 and far OTM options near 0"""
+        assert bs_delta(100, 50, 0.1, 0.3, 'C') > 0.99
+        assert abs(bs_delta(100, 150, 0.1, 0.3, 'P')) > 0.99
+        assert bs_delta(100, 150, 0.1, 0.3, 'C') < 0.01
+
+
+class TestVectorizedGreeks:
+    """Tests for the vectorized Black-Scholes engine"""
+
+    def test_norm_cdf_array_matches_scalar(self):
+        """Should agree with the erf-based CDF across the range"""
+        x = np.linspace(-6, 6, 241)
+        assert np.allclose(norm_cdf_array(x), [norm_cdf(value) for value in x], atol=1e-7)
+
+    def test_matches_scalar_pricing(self):
+        """Should match the scalar Black-Scholes for every option in a chain"""
+        strikes = [80.0, 95.0, 100.0, 105.0, 120.0]
+        rights = ['C', 'P', 'C', 'P', 'C']
+        years = [0.02, 0.1, 0.25, 0.5, 1.0]
+        vols = [0.6, 0.3, 0.25, 0.2, 0.4]
+        greeks = bs_greeks(100.0, strikes, years, vols, rights, rate=0.03)
+        for i, strike in enumerate(strikes):
+            price, delta, gamma, vega, theta = black_scholes(100.0, strike, years[i], vols[i], rights[i], 0.03)
+            assert greeks['price'][i] == pytest.approx(price, abs=1e-5)
+            assert greeks['delta'][i] == pytest.approx(delta, abs=1e-6)
+            assert greeks['gamma'][i] == pytest.approx(gamma, rel=1e-9)
+            assert greeks['vega'][i] == pytest.approx(vega, rel=1e-9)
+            assert greeks['theta'][i] == pytest.approx(theta, abs=1e-6)
+            assert greeks['delta'][i] == pytest.approx(bs_delta(100.0, strike, years[i], vols[i], rights[i], 0.03), abs=1e-6)
+
+    def test_put_call_parity(self):
+        """Should price calls and puts consistently"""
+        strikes = np.arange(50.0, 155.0, 5.0)
+        calls = bs_greeks(100.0, strikes, 0.5, 0.3, 'C', rate=0.05)
+        puts = bs_greeks(100.0, strikes, 0.5, 0.3, 'P', rate=0.05)
+        assert np.allclose(calls['price'] - puts['price'], 100.0 - strikes * np.exp(-0.05 * 0.5), atol=1e-6)
+        assert np.allclose(calls['delta'] - puts['delta'], 1.0)
+
+    def test_broadcasts_scalars(self):
+        """Should broadcast scalar inputs to the shape of the array inputs"""
+        greeks = bs_greeks(100.0, 100.0, 0.0, 0.3, ['C', 'P'])
+        assert greeks['gamma'].shape == (2,)
+        assert np.all(np.isfinite(greeks['theta']))
+
+
+class TestImpliedVolatility:
+    """Tests for the vectorized implied volatility solver"""
+
+    def test_recovers_volatility_across_chain(self):
+        """Should invert prices of calls and puts across strikes, expiries and volatilities"""
+        strikes = np.arange(80.0, 125.0, 2.5)
+        rights = np.where(strikes < 100, 'P', 'C')
+        years = np.linspace(0.25, 2.0, strikes.size)
+        volatilities = np.linspace(0.3, 1.5, strikes.size)
+        prices = bs_greeks(100.0, strikes, years, volatilities, rights, rate=0.04)['price']
+        solved = implied_volatility(prices, 100.0, strikes, years, rights, rate=0.04)
+        assert np.allclose(solved, volatilities, atol=1e-4)
+
+    def test_solves_bid_ask_and_mid_together(self):
+        """Should broadcast a stack of price rows against one set of contracts"""
+        strikes = [95.0, 100.0, 105.0]
+        mids = bs_greeks(100.0, strikes, 0.25, 0.3, 'C')['price']
+        solved = implied_volatility([mids * 0.95, mids * 1.05, mids], 100.0, strikes, 0.25, 'C')
+        assert solved.shape == (3, 3)
+        assert np.allclose(solved[2], 0.3, atol=1e-5)
+        assert np.all(solved[0] < solved[2]) and np.all(solved[2] < solved[1])
+
+    def test_unsolvable_prices_are_nan(self):
+        """Should return NaN for missing prices and prices outside the no-arbitrage range"""
+        solved = implied_volatility([0.0, float('nan'), 0.5, 150.0], 100.0, [100.0, 100.0, 50.0, 50.0], 0.5, 'C')
+        assert np.isnan(solved).all()
+
+    def test_deep_in_the_money_falls_back_to_bisection(self):
+        """Should converge where vega is too small for Newton steps"""
+        price = bs_greeks(100.0, 40.0, 0.1, 0.9, 'C')['price']
+        assert implied_volatility(price, 100.0, 40.0, 0.1, 'C') == pytest.approx(0.9, abs=1e-3)
+
+
+class TestSelectStrikes:
+    """Tests for select_strikes"""
+
+    STRIKES = [float(s) for s in range(50, 155, 5)]
+
+    def test_no_filters_returns_sorted_strikes(self):
+        """Should keep every positive strike, sorted"""
+        assert select_strikes([110.0, 0, 90.0, 100.0], 100) == [90.0, 100.0, 110.0]
+
+    def test_window(self):
+        """Should keep strikes within the percentage window around spot"""
+        assert select_strikes(self.STRIKES, 100, window_pct=10) == [90.0, 95.0, 100.0, 105.0, 110.0]
+
+    def test_nearest_to_spot_and_center(self):
+        """Should keep the N strikes nearest to center, defaulting to spot"""
+        assert select_strikes(self.STRIKES, 101, max_strikes=3) == [95.0, 100.0, 105.0]
+        assert select_strikes(self.STRIKES, 101, max_strikes=2, center=82) == [80.0, 85.0]
+
+    def test_delta_band(self):
+        """Should keep OTM puts whose estimated delta is within the band"""
+        selected = select_strikes(self.STRIKES, 100, 'P', '20250131', delta_band=(0.15, 0.35),
+                                  volatility=0.3, now=NOW)
+
+        assert selected
+        assert all(strike < 100 for strike in selected)
+        years = years_to_expiry('20250131', NOW)
+        for strike in selected:
+            assert 0.15 <= abs(bs_delta(100, strike, years, 0.3, 'P')) <= 0.35
+
+    def test_delta_band_requires_expiration(self):
+        """Should refuse to estimate delta without an expiration"""
+        with pytest.raises(ValueError):
+            select_strikes(self.STRIKES, 100, delta_band=(0.2, 0.3))
+
+    def test_filters_combine(self):
+        """Should apply window, delta band and nearest count together"""
+        selected = select_strikes(self.STRIKES, 100, 'C', '20250131', window_pct=20,
+                                  delta_band=(0.05, 0.6), max_strikes=2, center=110, now=NOW)
+
+        assert selected == [105.0, 110.0]
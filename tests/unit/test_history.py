@@ -0,0 +1,107 @@
+"""
+Unit tests for core.history module
+"""
+
+from datetime import date, datetime, timezone
+import math
+
+import numpy as np
+import pytest
+from ib_async import BarData, Option, Stock
+
+from core.history import (BarStore, bar_time, bars_to_columns, duration_string, iv_rank, realized_volatility,
+                          series_key)
+
+DAY = 86400
+
+
+def make_columns(times, closes):
+    closes = np.asarray(closes, dtype=float)
+    return {'time': np.asarray(times, dtype=np.int64), 'open': closes, 'high': closes,
+            'low': closes, 'close': closes, 'volume': np.zeros(len(closes))}
+
+
+class TestHelpers:
+    """Tests for keys, durations and bar conversion"""
+
+    def test_series_key(self):
+        """Should name stock and option series distinctly and file-name safely"""
+        assert series_key(Stock('AAPL', 'SMART', 'USD')) == 'AAPL_STK_1day_TRADES_rth'
+        option = Option('AAPL', '20250117', 150.0, 'P', 'SMART')
+        assert series_key(option, '5 mins', 'MIDPOINT', use_rth=False) == 'AAPL_OPT_20250117_150_P_5mins_MIDPOINT_all'
+
+    def test_duration_string(self):
+        """Should use seconds for short intraday spans and days or years otherwise"""
+        assert duration_string(3600, '5 mins') == '3600 S'
+        assert duration_string(3 * DAY, '5 mins') == '3 D'
+        assert duration_string(DAY + 1, '1 day') == '2 D'
+        assert duration_string(400 * DAY, '1 day') == '2 Y'
+
+    def test_bars_to_columns(self):
+        """Should sort bars and convert daily dates and intraday datetimes to epoch seconds"""
+        bars = [BarData(date=date(2025, 1, 3), close=2.0), BarData(date=date(2025, 1, 2), close=1.0)]
+        columns = bars_to_columns(bars)
+        assert columns['close'].tolist() == [1.0, 2.0]
+        assert columns['time'][0] == bar_time(datetime(2025, 1, 2, tzinfo=timezone.utc))
+        assert columns['time'].dtype == np.int64
+
+
+class TestBarStore:
+    """Tests for BarStore"""
+
+    def test_missing_ranges(self):
+        """Should only report the parts of a span outside the fetched span"""
+        store = BarStore()
+        assert store.missing_ranges('k', 0, 100 * DAY, DAY) == [(0, 100 * DAY)]
+
+        store.merge('k', make_columns([50 * DAY], [1.0]), 40 * DAY, 80 * DAY)
+        assert store.missing_ranges('k', 40 * DAY, 80 * DAY + 3600, DAY) == []
+        # The tail is fetched again from one bar before the end of the fetched span
+        assert store.missing_ranges('k', 0, 100 * DAY, DAY) == [(0, 40 * DAY), (79 * DAY, 100 * DAY)]
+
+    def test_merge_replaces_overlapping_bars(self):
+        """Should keep one bar per time, preferring the freshly fetched one"""
+        store = BarStore()
+        store.merge('k', make_columns([1 * DAY, 2 * DAY], [1.0, 2.0]), 0, 2 * DAY)
+        store.merge('k', make_columns([2 * DAY, 3 * DAY], [2.5, 3.0]), 2 * DAY, 3 * DAY)
+        assert store.get('k')['close'].tolist() == [1.0, 2.5, 3.0]
+        assert store.span('k') == (0, 3 * DAY)
+        assert store.get('k', start=2 * DAY)['time'].tolist() == [2 * DAY, 3 * DAY]
+
+    def test_disjoint_merge_keeps_longer_span(self):
+        """Should not claim a gap between two fetched ranges as fetched"""
+        store = BarStore()
+        store.merge('k', make_columns([], []), 0, 10 * DAY)
+        store.merge('k', make_columns([], []), 20 * DAY, 25 * DAY)
+        assert store.span('k') == (0, 10 * DAY)
+
+    def test_persists_series(self, tmp_path):
+        """Should reload bars and spans written by another store"""
+        directory = str(tmp_path / 'history')
+        BarStore(directory).merge('AAPL_STK_1day_TRADES_rth', make_columns([DAY, 2 * DAY], [1.0, 2.0]), 0, 2 * DAY)
+
+        store = BarStore(directory)
+        assert store.keys() == ['AAPL_STK_1day_TRADES_rth']
+        assert store.span('AAPL_STK_1day_TRADES_rth') == (0, 2 * DAY)
+        assert store.get('AAPL_STK_1day_TRADES_rth')['close'].tolist() == [1.0, 2.0]
+        assert not [name for name in (tmp_path / 'history').iterdir() if name.suffix == '.tmp']
+
+
+class TestAnalytics:
+    """Tests for realized volatility and IV rank"""
+
+    def test_realized_volatility(self):
+        """Should annualize the standard deviation of log returns over the window"""
+        returns = np.array([0.01, -0.01] * 10)
+        closes = 100 * np.exp(np.concatenate([[0], np.cumsum(returns)]))
+        assert realized_volatility(closes, window=20) == pytest.approx(np.std(returns, ddof=1) * math.sqrt(252))
+        assert realized_volatility(closes[:5], window=20) is None
+
+    def test_iv_rank(self):
+        """Should place the current IV between the low and high and count the days below it"""
+        stats = iv_rank([0.2, 0.4, 0.3, 0.25])
+        assert stats['low'] == 0.2 and stats['high'] == 0.4
+        assert stats['iv_rank'] == pytest.approx(25.0)
+        assert stats['iv_percentile'] == pytest.approx(25.0)
+        assert iv_rank([0.2, 0.4], current=0.5)['iv_rank'] == 100.0
+        assert iv_rank([float('nan')]) is None
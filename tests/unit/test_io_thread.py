@@ -0,0 +1,82 @@
+"""
+Unit tests for core.io_thread module
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from core.io_thread import IBIOThread, get_io_thread, on_io_thread
+
+
+@pytest.fixture
+def io_thread():
+    thread = IBIOThread(name='test-io')
+    yield thread
+    thread.stop()
+
+
+class TestIBIOThread:
+    """Tests for IBIOThread class"""
+    
+    def test_call_runs_on_io_thread(self, io_thread):
+        """Should run submitted callables on the dedicated thread"""
+        assert io_thread.call(lambda: threading.current_thread().name) == 'test-io'
+    
+    def test_call_reraises_exceptions(self, io_thread):
+        """Should surface exceptions from the job in the caller"""
+        def fail():
+            raise ValueError("boom")
+        
+        with pytest.raises(ValueError, match="boom"):
+            io_thread.call(fail)
+    
+    def test_jobs_share_one_event_loop(self, io_thread):
+        """Should run every job against the same long-lived loop"""
+        loops = {io_thread.call(asyncio.get_event_loop) for _ in range(3)}
+        
+        assert loops == {io_thread.loop}
+    
+    def test_coroutines_overlap(self, io_thread):
+        """Should schedule coroutines as tasks so they run concurrently"""
+        async def nap():
+            await asyncio.sleep(0.2)
+            return True
+        
+        start = time.time()
+        futures = [io_thread.submit(nap) for _ in range(5)]
+        
+        assert all(f.result(timeout=5) for f in futures)
+        assert time.time() - start < 0.9
+    
+    def test_nested_calls_run_inline(self, io_thread):
+        """Should not deadlock when a job calls back into the I/O thread"""
+        assert io_thread.call(lambda: io_thread.call(lambda: 42)) == 42
+    
+    def test_many_caller_threads(self, io_thread):
+        """Should serve calls from many threads concurrently"""
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: io_thread.call(lambda: i * 2), range(50)))
+        
+        assert results == [i * 2 for i in range(50)]
+
+
+class TestOnIOThread:
+    """Tests for on_io_thread decorator"""
+    
+    def test_method_runs_on_owner_io_thread(self, io_thread):
+        """Should dispatch decorated methods to the object's I/O thread"""
+        class Client:
+            def __init__(self):
+                self.io_thread = io_thread
+            
+            @on_io_thread
+            def whoami(self):
+                return threading.current_thread().name
+        
+        assert Client().whoami() == 'test-io'
+    
+    def test_shared_io_thread_is_singleton(self):
+        """Should hand out the same process-wide thread"""
+        assert get_io_thread() is get_io_thread()
@@ -0,0 +1,123 @@
+"""
+Unit tests for core.market_data module
+"""
+
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from core.market_data import MarketDataSubscriptions
+
+
+def make_contract(con_id, symbol='AAPL'):
+    contract = MagicMock()
+    contract.conId = con_id
+    contract.symbol = symbol
+    return contract
+
+
+@pytest.fixture
+def connection():
+    conn = MagicMock()
+    conn.ib.reqMktData.side_effect = lambda contract, *args: MagicMock(contract=contract)
+    return conn
+
+
+class TestMarketDataSubscriptions:
+    """Tests for MarketDataSubscriptions class"""
+    
+    def test_acquire_subscribes_once(self, connection):
+        """Should reuse the streaming ticker for repeat lookups"""
+        subs = MarketDataSubscriptions(connection)
+        contract = make_contract(1)
+        
+        first = subs.acquire(contract)
+        subs.release(contract)
+        second = subs.acquire(contract)
+        
+        assert first is second
+        connection.ib.reqMktData.assert_called_once()
+        connection.ib.cancelMktData.assert_not_called()
+    
+    def test_generic_ticks_are_separate_subscriptions(self, connection):
+        """Should key subscriptions by contract and generic tick list"""
+        subs = MarketDataSubscriptions(connection)
+        contract = make_contract(1)
+        
+        subs.acquire(contract)
+        subs.acquire(contract, '106')
+        
+        assert len(subs) == 2
+    
+    def test_evicts_idle_subscriptions_after_ttl(self, connection):
+        """Should cancel unreferenced subscriptions once idle past the TTL"""
+        subs = MarketDataSubscriptions(connection, idle_ttl=10)
+        contract = make_contract(1)
+        
+        with subs.subscription(contract):
+            pass
+        
+        assert subs.evict_idle(now=subs._subscriptions[(1, '')]['last_used'] + 5) == 0
+        assert subs.evict_idle(now=subs._subscriptions[(1, '')]['last_used'] + 11) == 1
+        connection.ib.cancelMktData.assert_called_once_with(contract)
+        assert subs.get_ticker(contract) is None
+    
+    def test_referenced_subscriptions_are_not_evicted(self, connection):
+        """Should keep subscriptions that still have users"""
+        subs = MarketDataSubscriptions(connection, idle_ttl=0)
+        contract = make_contract(1)
+        
+        subs.acquire(contract)
+        
+        assert subs.evict_idle(now=1e12) == 0
+        assert len(subs) == 1
+    
+    def test_line_limit_evicts_least_recently_used(self, connection):
+        """Should free the least recently used idle line when at the limit"""
+        subs = MarketDataSubscriptions(connection, max_lines=2)
+        a, b, c = make_contract(1, 'A'), make_contract(2, 'B'), make_contract(3, 'C')
+        
+        for contract in (a, b):
+            with subs.subscription(contract):
+                pass
+        # Touch A so that B becomes least recently used
+        with subs.subscription(a):
+            pass
+        subs.acquire(c)
+        
+        connection.ib.cancelMktData.assert_called_once_with(b)
+        assert subs.get_ticker(a) is not None
+        assert subs.get_ticker(c) is not None
+    
+    def test_line_limit_reached_with_all_lines_in_use(self, connection):
+        """Should return None when every line is referenced"""
+        subs = MarketDataSubscriptions(connection, max_lines=1)
+        
+        subs.acquire(make_contract(1))
+        
+        assert subs.acquire(make_contract(2)) is None
+        connection.ib.cancelMktData.assert_not_called()
+    
+    def test_clear_cancels_everything(self, connection):
+        """Should cancel all subscriptions"""
+        subs = MarketDataSubscriptions(connection)
+        subs.acquire(make_contract(1))
+        subs.acquire(make_contract(2))
+        
+        subs.clear()
+        
+        assert len(subs) == 0
+        assert connection.ib.cancelMktData.call_count == 2
+    
+    def test_acquire_async_paces_new_subscriptions_only(self, connection):
+        """Should wait for the mktdata budget before subscribing, but not for reuse"""
+        connection.pacer.acquire_async = AsyncMock(return_value=0.0)
+        subs = MarketDataSubscriptions(connection)
+        contract = make_contract(1)
+        
+        first = asyncio.run(subs.acquire_async(contract))
+        subs.release(contract)
+        second = asyncio.run(subs.acquire_async(contract))
+        
+        assert first is second
+        connection.pacer.acquire_async.assert_awaited_once_with('mktdata')
+        connection.pacer.charge.assert_not_called()
@@ -0,0 +1,145 @@
+"""
+Unit tests for core.metrics module
+"""
+
+import asyncio
+import logging
+from unittest.mock import patch
+
+import pytest
+from ib_async import Stock
+
+from core.metrics import LatencyHistogram, LatencyMetrics, OTHER_SYMBOL, timed
+
+
+class TestLatencyHistogram:
+    """Tests for LatencyHistogram"""
+
+    def test_percentiles_within_bucket_resolution(self):
+        """Should estimate percentiles to within one bucket of the true value"""
+        histogram = LatencyHistogram()
+        for ms in range(1, 101):
+            histogram.observe(ms / 1000)
+
+        summary = histogram.summary()
+        assert summary['count'] == 100
+        assert summary['mean_ms'] == pytest.approx(50.5)
+        assert summary['min_ms'] == 1.0
+        assert summary['max_ms'] == 100.0
+        assert 50 <= summary['p50_ms'] <= 50 * 1.42
+        assert 99 <= summary['p99_ms'] <= 100
+
+    def test_empty_histogram(self):
+        """Should report no percentiles before anything is recorded"""
+        summary = LatencyHistogram().summary()
+
+        assert summary['count'] == 0
+        assert summary['p50_ms'] is None and summary['mean_ms'] is None
+
+    def test_durations_beyond_last_bucket(self):
+        """Should cap percentiles at the largest observation"""
+        histogram = LatencyHistogram()
+        histogram.observe(500.0)
+
+        assert histogram.percentile(99) == 500.0
+
+
+class TestLatencyMetrics:
+    """Tests for LatencyMetrics"""
+
+    def test_per_operation_and_symbol(self):
+        """Should record each observation for the operation and for its symbol"""
+        metrics = LatencyMetrics()
+        metrics.observe('get_stock_price', 0.010, 'AAPL')
+        metrics.observe('get_stock_price', 0.020, 'MSFT')
+        metrics.increment('timeouts', 'first_tick', 'AAPL')
+
+        snapshot = metrics.snapshot()['operations']
+        assert snapshot['get_stock_price']['count'] == 2
+        assert snapshot['get_stock_price']['symbols']['AAPL']['count'] == 1
+        assert snapshot['first_tick']['timeouts'] == 1
+        assert snapshot['first_tick']['symbols']['AAPL']['timeouts'] == 1
+
+    def test_snapshot_filters(self):
+        """Should filter by operation and symbol and optionally drop the symbol breakdown"""
+        metrics = LatencyMetrics()
+        metrics.observe('get_stock_price', 0.010, 'AAPL')
+        metrics.observe('get_option_chain', 0.100, 'AAPL')
+
+        assert list(metrics.snapshot(operation='get_option_chain')['operations']) == ['get_option_chain']
+        assert metrics.snapshot(symbol='AAPL')['operations']['get_stock_price']['count'] == 1
+        assert 'symbols' not in metrics.snapshot(include_symbols=False)['operations']['get_stock_price']
+
+    def test_symbol_limit(self):
+        """Should file symbols beyond the limit under a shared series"""
+        metrics = LatencyMetrics(max_symbols=2)
+        for symbol in ('AAPL', 'MSFT', 'NVDA', 'SPY'):
+            metrics.observe('get_stock_price', 0.01, symbol)
+
+        symbols = metrics.snapshot()['operations']['get_stock_price']['symbols']
+        assert set(symbols) == {'AAPL', 'MSFT', OTHER_SYMBOL}
+        assert symbols[OTHER_SYMBOL]['count'] == 2
+
+    def test_timer_counts_timeouts_and_errors(self):
+        """Should time failed blocks and count them by kind"""
+        metrics = LatencyMetrics()
+        with pytest.raises(asyncio.TimeoutError):
+            with metrics.timer('portfolio_load'):
+                raise asyncio.TimeoutError()
+        with pytest.raises(ValueError):
+            with metrics.timer('portfolio_load'):
+                raise ValueError()
+
+        summary = metrics.snapshot()['operations']['portfolio_load']
+        assert summary['count'] == 2
+        assert summary['timeouts'] == 1
+        assert summary['errors'] == 1
+
+    def test_log_summary(self, caplog):
+        """Should log one line per operation"""
+        metrics = LatencyMetrics()
+        metrics.observe('qualify', 0.004)
+        metrics.increment('cache_hits', 'qualify', count=3)
+        log = logging.getLogger('test.metrics')
+
+        with caplog.at_level(logging.INFO, logger='test.metrics'):
+            assert metrics.log_summary(log) == 1
+
+        assert 'qualify: n=1' in caplog.text
+        assert 'cache_hits=3' in caplog.text
+
+    def test_reset(self):
+        """Should discard recorded metrics"""
+        metrics = LatencyMetrics()
+        metrics.observe('qualify', 0.004)
+
+        metrics.reset()
+
+        assert metrics.snapshot()['operations'] == {}
+
+
+class TestTimed:
+    """Tests for the timed decorator"""
+
+    def test_times_coroutines_by_symbol_or_contract(self):
+        """Should take the symbol from a string or contract argument"""
+        metrics = LatencyMetrics()
+
+        class Client:
+            @timed('get_stock_price', 'symbol')
+            async def get_stock_price_async(self, symbol):
+                return 1.0
+
+            @timed('place_order', 'contract')
+            def place_order(self, contract, order=None):
+                return 'ok'
+
+        client = Client()
+        with patch('core.metrics.get_metrics', return_value=metrics):
+            assert asyncio.run(client.get_stock_price_async('AAPL')) == 1.0
+            assert client.place_order(contract=Stock('MSFT', 'SMART', 'USD')) == 'ok'
+
+        operations = metrics.snapshot()['operations']
+        assert list(operations['get_stock_price']['symbols']) == ['AAPL']
+        assert list(operations['place_order']['symbols']) == ['MSFT']
+        assert Client.get_stock_price_async.__name__ == 'get_stock_price_async'
@@ -0,0 +1,105 @@
+"""
+Unit tests for core.order_state module
+"""
+
+from datetime import datetime
+from unittest.mock import MagicMock
+
+from eventkit import Event
+from ib_async import CommissionReport, Contract, Execution, Fill, Order, OrderStatus, Trade
+
+from core.order_state import OrderStateIndex
+
+
+def make_ib(trades=(), fills=()):
+    ib = MagicMock()
+    ib.openOrderEvent = Event('openOrderEvent')
+    ib.orderStatusEvent = Event('orderStatusEvent')
+    ib.execDetailsEvent = Event('execDetailsEvent')
+    ib.commissionReportEvent = Event('commissionReportEvent')
+    ib.trades.return_value = list(trades)
+    ib.fills.return_value = list(fills)
+    return ib
+
+
+def make_trade(order_id, perm_id=0, quantity=2, status='', filled=0.0, remaining=0.0):
+    return Trade(Contract(symbol='AAPL'), Order(orderId=order_id, permId=perm_id, totalQuantity=quantity),
+                 OrderStatus(orderId=order_id, status=status, filled=filled, remaining=remaining))
+
+
+def make_fill(order_id, exec_id, shares, price, commission=0.0, perm_id=0):
+    return Fill(Contract(symbol='AAPL'),
+                Execution(execId=exec_id, orderId=order_id, permId=perm_id, shares=shares, price=price),
+                CommissionReport(execId=exec_id, commission=commission), datetime.now())
+
+
+class TestOrderStateIndex:
+    """Tests for OrderStateIndex class"""
+    
+    def test_seeds_from_existing_trades(self):
+        """Should index the trades ib_async already knows on attach"""
+        index = OrderStateIndex()
+        index.attach(make_ib(trades=[make_trade(7, perm_id=700, status='Submitted', remaining=2)]))
+        
+        assert index.get(7)['status'] == 'Submitted'
+        assert index.get_by_perm_id(700)['remaining'] == 2
+        assert index.get(8) is None
+    
+    def test_status_events_update_state(self):
+        """Should reflect order status events without querying TWS"""
+        ib = make_ib()
+        index = OrderStateIndex()
+        index.attach(ib)
+        trade = make_trade(7, quantity=2)
+        
+        ib.openOrderEvent.emit(trade)
+        assert index.get(7)['remaining'] == 2
+        
+        trade.orderStatus.status = 'Filled'
+        trade.orderStatus.filled = 2
+        trade.orderStatus.remaining = 0
+        trade.orderStatus.avgFillPrice = 1.25
+        ib.orderStatusEvent.emit(trade)
+        
+        state = index.get('7')
+        assert state['status'] == 'Filled'
+        assert state['avg_fill_price'] == 1.25
+        ib.openOrders.assert_not_called()
+    
+    def test_commission_reports_are_summed(self):
+        """Should total the commission of every fill of a trade"""
+        ib = make_ib()
+        index = OrderStateIndex()
+        index.attach(ib)
+        trade = make_trade(7, status='Filled', filled=2)
+        for exec_id in ('e1', 'e2'):
+            fill = make_fill(7, exec_id, 1, 1.25, commission=0.65)
+            trade.fills.append(fill)
+            ib.commissionReportEvent.emit(trade, fill, fill.commissionReport)
+        
+        assert index.get(7)['commission'] == 1.3
+    
+    def test_executions_without_trade_are_indexed(self):
+        """Should report orders filled before this session from their executions"""
+        fills = [make_fill(9, 'e1', 1, 1.0, commission=0.5, perm_id=900),
+                 make_fill(9, 'e2', 3, 2.0, commission=0.5, perm_id=900)]
+        index = OrderStateIndex()
+        index.attach(make_ib(fills=fills))
+        
+        state = index.get_by_perm_id(900)
+        assert state['status'] == 'Filled'
+        assert state['filled'] == 4
+        assert state['avg_fill_price'] == 1.75
+        assert state['commission'] == 1.0
+        assert index.get_trade(9) is None
+    
+    def test_detach_stops_updates(self):
+        """Should ignore events once detached"""
+        ib = make_ib()
+        index = OrderStateIndex()
+        index.attach(ib)
+        index.detach()
+        
+        ib.openOrderEvent.emit(make_trade(7))
+        
+        assert index.get(7) is None
@@ -0,0 +1,120 @@
+"""
+Unit tests for core.order_sync module
+"""
+
+import time
+from types import SimpleNamespace
+
+from ib_async import Contract, Order, OrderStatus, Trade
+
+from core.order_state import OrderStateIndex
+from core.order_sync import OrderSyncWorker, map_ib_status
+
+
+def make_trade(order_id, status, filled=0.0, remaining=1.0, avg_fill_price=0.0):
+    return Trade(Contract(symbol='AAPL'), Order(orderId=order_id, totalQuantity=1),
+                 OrderStatus(orderId=order_id, status=status, filled=filled,
+                             remaining=remaining, avgFillPrice=avg_fill_price))
+
+
+def save_submitted_order(db, order_data, ib_order_id):
+    order_id = db.save_order(order_data)
+    db.update_order_status(order_id, 'processing', execution_details={'ib_order_id': ib_order_id})
+    return order_id
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class TestMapIBStatus:
+    """Tests for map_ib_status function"""
+    
+    def test_maps_terminal_statuses(self):
+        """Should mark filled and cancelled orders as executed"""
+        assert map_ib_status('Filled') == ('executed', True)
+        assert map_ib_status('Cancelled') == ('canceled', True)
+        assert map_ib_status('ApiCancelled') == ('canceled', True)
+        assert map_ib_status('Submitted') == ('processing', False)
+
+
+class TestOrderSyncWorker:
+    """Tests for OrderSyncWorker class"""
+    
+    def test_fill_is_written_to_database(self, temp_db, sample_order_data):
+        """Should write the transition when the index reports a fill"""
+        order_id = save_submitted_order(temp_db, sample_order_data, 42)
+        index = OrderStateIndex()
+        worker = OrderSyncWorker(temp_db, SimpleNamespace(connection=SimpleNamespace(orders=index)))
+        worker.subscribe()
+        
+        index.track(make_trade(42, 'Filled', filled=1, remaining=0, avg_fill_price=2.5))
+        order_id_42, state = worker._queue.get_nowait()
+        assert worker.sync(order_id_42, state) is True
+        
+        order = temp_db.get_order(order_id)
+        assert order['status'] == 'executed'
+        assert order['executed'] == 1
+        assert order['ib_status'] == 'Filled'
+        assert order['avg_fill_price'] == 2.5
+    
+    def test_unchanged_state_is_not_rewritten(self, temp_db, sample_order_data):
+        """Should skip writes when the row already matches the IB state"""
+        save_submitted_order(temp_db, sample_order_data, 42)
+        worker = OrderSyncWorker(temp_db, SimpleNamespace(connection=None))
+        state = {'status': 'Submitted', 'filled': 0, 'remaining': 1, 'avg_fill_price': 0.0}
+        
+        assert worker.sync(42, state) is True
+        assert worker.sync(42, state) is False
+    
+    def test_subscribe_reconciles_open_orders(self, temp_db, sample_order_data):
+        """Should catch up on changes made while the worker was not listening"""
+        order_id = save_submitted_order(temp_db, sample_order_data, 42)
+        index = OrderStateIndex()
+        index.track(make_trade(42, 'Cancelled'))
+        worker = OrderSyncWorker(temp_db, SimpleNamespace(connection=SimpleNamespace(orders=index)))
+        
+        assert worker.subscribe() is True
+        
+        assert temp_db.get_order(order_id)['status'] == 'canceled'
+    
+    def test_unmatched_orders_are_retried_until_ttl(self, temp_db, sample_order_data):
+        """Should apply updates that arrive before the order is saved with its IB ID"""
+        clock = FakeClock()
+        worker = OrderSyncWorker(temp_db, SimpleNamespace(connection=None), unmatched_ttl=10, clock=clock)
+        state = {'status': 'Filled', 'filled': 1, 'remaining': 0, 'avg_fill_price': 2.5}
+        
+        assert worker.sync(42, state) is False
+        order_id = save_submitted_order(temp_db, sample_order_data, 42)
+        worker._retry_unmatched()
+        assert temp_db.get_order(order_id)['status'] == 'executed'
+        
+        worker.sync(43, state)
+        clock.now = 10
+        worker._retry_unmatched()
+        assert worker._unmatched == {}
+    
+    def test_worker_thread_syncs_events(self, temp_db, sample_order_data):
+        """Should process order events on its own thread"""
+        order_id = save_submitted_order(temp_db, sample_order_data, 42)
+        index = OrderStateIndex()
+        worker = OrderSyncWorker(temp_db, SimpleNamespace(connection=SimpleNamespace(orders=index)),
+                                 poll_interval=0.01)
+        worker.start()
+        try:
+            deadline = time.time() + 5
+            while worker._index is None and time.time() < deadline:
+                time.sleep(0.01)
+            index.track(make_trade(42, 'Filled', filled=1, remaining=0))
+            while temp_db.get_order(order_id)['status'] != 'executed' and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            worker.stop()
+        
+        assert temp_db.get_order(order_id)['status'] == 'executed'
@@ -0,0 +1,168 @@
+"""
+Unit tests for core.portfolio_model module
+"""
+
+from unittest.mock import MagicMock, patch
+
+from eventkit import Event
+from ib_async import AccountValue, Option, PortfolioItem, Stock
+
+from core.currency import CurrencyHelper
+from core.portfolio_model import PortfolioModel, PositionIndex, get_position_index
+
+
+def make_ib(values=(), items=()):
+    ib = MagicMock()
+    ib.accountValueEvent = Event('accountValueEvent')
+    ib.updatePortfolioEvent = Event('updatePortfolioEvent')
+    ib.accountValues.return_value = list(values)
+    ib.portfolio.return_value = list(items)
+    return ib
+
+
+def stock_item(symbol='AAPL', con_id=1, position=100, account='DU1'):
+    contract = Stock(symbol, 'SMART', 'USD', conId=con_id)
+    return PortfolioItem(contract, position, 150.0, 150.0 * position, 140.0, 1000.0, 0.0, account)
+
+
+class TestPortfolioModel:
+    """Tests for PortfolioModel class"""
+    
+    def test_seeds_from_existing_account_data(self):
+        """Should build a snapshot from the values ib_async already holds"""
+        ib = make_ib(values=[AccountValue('DU1', 'NetLiquidation', '100000', 'USD', ''),
+                             AccountValue('DU1', 'FullInitMarginReq', '25000', 'USD', '')],
+                     items=[stock_item()])
+        model = PortfolioModel()
+        model.attach(ib, 'DU1')
+        
+        snapshot = model.snapshot()
+        assert model.ready
+        assert snapshot['account_value'] == 100000
+        assert snapshot['leverage_percentage'] == 25
+        assert snapshot['positions']['AAPL']['security_type'] == 'STK'
+    
+    def test_snapshot_is_reused_until_next_update(self):
+        """Should only rebuild the snapshot after an update"""
+        ib = make_ib(values=[AccountValue('DU1', 'TotalCashValue', '5000', 'USD', '')])
+        model = PortfolioModel()
+        model.attach(ib, 'DU1')
+        first = model.snapshot()
+        
+        assert model.snapshot() is first
+        
+        ib.accountValueEvent.emit(AccountValue('DU1', 'TotalCashValue', '6000', 'USD', ''))
+        second = model.snapshot()
+        assert second is not first
+        assert second['available_cash'] == 6000
+        assert second['version'] > first['version']
+    
+    def test_portfolio_events_update_positions(self):
+        """Should add option positions by contract key and drop closed ones"""
+        ib = make_ib()
+        model = PortfolioModel()
+        model.attach(ib, 'DU1')
+        option = Option('AAPL', '20241220', 150.0, 'P', 'SMART', currency='USD', conId=2)
+        
+        ib.updatePortfolioEvent.emit(PortfolioItem(option, -1, 2.5, -250.0, 300.0, 50.0, 0.0, 'DU1'))
+        assert 'AAPL_20241220_150.0_P' in model.snapshot()['positions']
+        
+        ib.updatePortfolioEvent.emit(PortfolioItem(option, 0, 2.5, 0.0, 300.0, 0.0, 50.0, 'DU1'))
+        assert model.snapshot()['positions'] == {}
+    
+    def test_ignores_other_accounts(self):
+        """Should skip updates for other accounts"""
+        ib = make_ib()
+        model = PortfolioModel()
+        model.attach(ib, 'DU1')
+        
+        ib.accountValueEvent.emit(AccountValue('DU2', 'NetLiquidation', '999', 'USD', ''))
+        ib.updatePortfolioEvent.emit(stock_item(account='DU2'))
+        
+        assert not model.ready
+        assert model.snapshot()['positions'] == {}
+    
+    def test_sums_per_currency_values(self):
+        """Should total values sent once per currency instead of keeping the last currency"""
+        ib = make_ib(values=[AccountValue('DU1', 'TotalCashValue', '1000', 'USD', ''),
+                             AccountValue('DU1', 'TotalCashValue', '500', 'EUR', ''),
+                             AccountValue('DU1', 'TotalCashValue', '2000', 'BASE', '')])
+        model = PortfolioModel()
+        model.attach(ib, 'DU1')
+        ib.accountValueEvent.emit(AccountValue('DU1', 'TotalCashValue', '600', 'EUR', ''))
+        
+        with patch.object(CurrencyHelper, 'get_exchange_rate', side_effect=lambda c, to='USD': 2.0 if c == 'EUR' else 1.0):
+            assert model.snapshot()['available_cash'] == 2200
+    
+    def test_converts_values_to_usd(self):
+        """Should convert amounts in other currencies with the converter"""
+        ib = make_ib(values=[AccountValue('DU1', 'NetLiquidation', '1000', 'EUR', '')])
+        model = PortfolioModel()
+        model.attach(ib, 'DU1')
+        
+        with patch.object(CurrencyHelper, 'get_exchange_rate', side_effect=lambda c, to='USD': 2.0 if c == 'EUR' else 1.0):
+            assert model.snapshot()['account_value'] == 2000
+    
+    def test_positions_converted_in_bulk(self):
+        """Should convert all position amounts in one call"""
+        eur_item = stock_item('SAP', con_id=3)
+        eur_item.contract.currency = 'EUR'
+        ib = make_ib(items=[stock_item(), eur_item])
+        model = PortfolioModel()
+        model.attach(ib, 'DU1')
+        
+        with patch.object(CurrencyHelper, 'convert_array', wraps=CurrencyHelper.convert_array) as convert_array, \
+             patch.object(CurrencyHelper, 'get_exchange_rate', side_effect=lambda c, to='USD': 2.0 if c == 'EUR' else 1.0):
+            positions = model.snapshot()['positions']
+        
+        convert_array.assert_called_once()
+        assert positions['AAPL']['market_price'] == 150.0
+        assert positions['SAP']['market_price'] == 300.0
+        assert positions['SAP']['avg_cost'] == 280.0
+    
+    def test_exchange_rate_values_feed_currency_helper(self):
+        """Should pass IB's ExchangeRate account values to the rate provider"""
+        rates = MagicMock()
+        ib = make_ib(values=[AccountValue('DU1', 'ExchangeRate', '1.08', 'EUR', '')])
+        model = PortfolioModel(rates=rates)
+        model.attach(ib, 'DU1')
+        
+        rates.update_from_ib.assert_called_once_with('EUR', 1.08)
+
+
+class TestPositionIndex:
+    """Tests for PositionIndex and get_position_index"""
+    
+    def make_model(self):
+        option = Option('AAPL', '20250117', 150.0, 'P', 'SMART', conId=2)
+        ib = make_ib(values=[AccountValue('DU1', 'NetLiquidation', '100000', 'USD', '')],
+                     items=[PortfolioItem(option, -2, 3.0, -600.0, 350.0, 100.0, 0.0, 'DU1'),
+                            stock_item('AAPL', con_id=1, position=300)])
+        model = PortfolioModel()
+        model.attach(ib, 'DU1')
+        return model, ib
+    
+    def test_looks_up_stocks_and_options(self):
+        """Should key stocks by symbol and options by contract, regardless of portfolio order"""
+        model, _ = self.make_model()
+        index = PositionIndex(model.snapshot()['positions'])
+        
+        assert len(index) == 2
+        assert index.shares('AAPL') == 300
+        assert index.shares('MSFT') == 0
+        assert index.option('AAPL', '20250117', 150, 'PUT')['position'] == -2
+        assert index.option('AAPL', '20250117', 150, 'C') is None
+        assert [record['security_type'] for record in index.positions('OPT')] == ['OPT']
+        assert index.positions('OPT')[0]['option_type'] == 'PUT'
+    
+    def test_index_built_once_per_snapshot_version(self):
+        """Should reuse the index until the portfolio changes"""
+        model, ib = self.make_model()
+        first = get_position_index(model.snapshot())
+        
+        assert get_position_index({**model.snapshot(), 'is_frozen': True}) is first
+        
+        ib.updatePortfolioEvent.emit(stock_item('AAPL', con_id=1, position=500))
+        second = get_position_index(model.snapshot())
+        assert second is not first
+        assert second.shares('AAPL') == 500
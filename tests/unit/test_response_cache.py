@@ -0,0 +1,130 @@
+"""
+Unit tests for core.response_cache module
+"""
+
+from datetime import datetime
+import threading
+
+import pytest
+import pytz
+
+from core.metrics import get_metrics
+from core.response_cache import ResponseCache, get_response_cache
+from core.utils import get_next_market_open
+
+EASTERN = pytz.timezone('US/Eastern')
+
+
+def at(year, month, day, hour, minute=0):
+    return EASTERN.localize(datetime(year, month, day, hour, minute)).timestamp()
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestResponseCache:
+    """Tests for ResponseCache class"""
+    
+    def setup_method(self):
+        get_metrics().reset()
+    
+    def counters(self, name):
+        return get_metrics().snapshot(name)['operations'].get(name, {})
+    
+    def test_fresh_for_ttl_while_market_open(self):
+        """Should serve a hit within the TTL and reload once it has passed"""
+        clock = Clock(at(2025, 1, 8, 11))  # Wednesday 11:00 ET
+        cache = ResponseCache('test_cache', ttl=10, stale_ttl=0, clock=clock)
+        loads = []
+        
+        def loader():
+            loads.append(clock.now)
+            return {'price': len(loads)}
+        
+        assert cache.get(('AAPL',), loader) == {'price': 1}
+        clock.now += 5
+        assert cache.get(('AAPL',), loader) == {'price': 1}
+        clock.now += 6
+        assert cache.get(('AAPL',), loader) == {'price': 2}
+        
+        counters = self.counters('test_cache')
+        assert counters['hits'] == 1 and counters['misses'] == 2
+    
+    def test_fresh_until_next_open_while_closed(self):
+        """Should keep responses computed outside market hours until the next open"""
+        saturday = at(2025, 1, 11, 12)
+        cache = ResponseCache('test_cache', ttl=10)
+        
+        expected = get_next_market_open(datetime.fromtimestamp(saturday, pytz.utc)).timestamp()
+        assert cache.fresh_until(saturday) == expected == at(2025, 1, 13, 9, 30)
+        assert cache.fresh_until(at(2025, 1, 13, 10)) == at(2025, 1, 13, 10) + 10
+    
+    def test_serves_stale_while_refreshing(self):
+        """Should return the stale response at once and reload it in the background"""
+        clock = Clock(at(2025, 1, 8, 11))
+        cache = ResponseCache('test_cache', ttl=10, stale_ttl=60, clock=clock)
+        cache.get(('AAPL',), lambda: 'old')
+        clock.now += 30
+        
+        release = threading.Event()
+        
+        def slow_loader():
+            release.wait(5)
+            return 'new'
+        
+        assert cache.get(('AAPL',), slow_loader) == 'old'
+        assert cache.get(('AAPL',), slow_loader) == 'old'  # one refresh at a time
+        release.set()
+        for _ in range(100):
+            if cache.get(('AAPL',), slow_loader) == 'new':
+                break
+            threading.Event().wait(0.01)
+        
+        counters = self.counters('test_cache')
+        assert counters['refreshes'] == 1
+        assert counters['stale_hits'] >= 2
+        assert cache.get(('AAPL',), slow_loader) == 'new'
+    
+    def test_does_not_cache_rejected_responses(self):
+        """Should reload responses the cacheable check rejects, and propagate loader errors"""
+        cache = ResponseCache('test_cache', clock=Clock(at(2025, 1, 8, 11)))
+        calls = []
+        
+        def loader():
+            calls.append(1)
+            return {'error': 'No options data available'}
+        
+        cacheable = lambda value: 'error' not in value
+        cache.get(('AAPL',), loader, cacheable=cacheable)
+        cache.get(('AAPL',), loader, cacheable=cacheable)
+        assert len(calls) == 2
+        assert len(cache) == 0
+        
+        with pytest.raises(ValueError):
+            cache.get(('MSFT',), lambda: (_ for _ in ()).throw(ValueError('boom')))
+        # The failed load does not leave the key locked
+        assert cache.get(('MSFT',), lambda: 'ok') == 'ok'
+    
+    def test_invalidate_and_lru_limit(self):
+        """Should drop entries by symbol and evict the least recently used beyond the limit"""
+        cache = ResponseCache('test_cache', max_entries=2, clock=Clock(at(2025, 1, 8, 11)))
+        cache.get(('AAPL', 10.0), lambda: 1)
+        cache.get(('MSFT', 10.0), lambda: 2)
+        cache.get(('AAPL', 10.0), lambda: 0)
+        cache.get(('NVDA', 10.0), lambda: 3)
+        assert len(cache) == 2
+        assert cache.get(('AAPL', 10.0), lambda: 0) == 1
+        
+        cache.invalidate('aapl')
+        assert cache.get(('AAPL', 10.0), lambda: 4) == 4
+        cache.invalidate()
+        assert len(cache) == 0
+    
+    def test_shared_by_name(self):
+        """Should return the same cache for the same name"""
+        assert get_response_cache('shared_test_cache') is get_response_cache('shared_test_cache', ttl=1)
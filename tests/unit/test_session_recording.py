@@ -0,0 +1,85 @@
+"""
+Unit tests for core.session_recording module
+"""
+
+import gzip
+
+import pytest
+from ib_async import IB
+
+from core.session_recording import (FrameSplitter, SessionRecorder, decode_fields, encode_message,
+                                    read_session, RECEIVED, SENT)
+
+
+def make_ib(on_data):
+    """IB whose client hands received socket data to on_data instead of decoding it"""
+    ib = IB()
+    ib.client.conn.hasData -= ib.client._onSocketHasData
+    ib.client._onSocketHasData = on_data
+    ib.client.conn.hasData += on_data
+    return ib
+
+
+class TestFraming:
+    """Tests for the TWS API frame helpers"""
+
+    def test_encode_decode_round_trip(self):
+        """Should length-prefix messages and split them back into fields"""
+        frame = encode_message(['1', '11', '', 'AAPL'])
+
+        assert frame[:4] == b'\x00\x00\x00\x0b'
+        assert decode_fields(frame[4:]) == ['1', '11', '', 'AAPL']
+
+    def test_splitter_reassembles_partial_reads(self):
+        """Should only return messages once all their bytes have arrived"""
+        data = encode_message(['9', '1', '5']) + encode_message(['15', '1', 'DU1'])
+        splitter = FrameSplitter()
+
+        assert splitter.feed(data[:6]) == []
+        assert splitter.feed(data[6:]) == [['9', '1', '5'], ['15', '1', 'DU1']]
+
+
+class TestSessionRecorder:
+    """Tests for SessionRecorder"""
+
+    def test_records_sent_and_received_messages(self, tmp_path):
+        """Should write the handshake, requests and responses in order with offsets"""
+        ib = make_ib(lambda data: None)
+        path = str(tmp_path / 'session.jsonl.gz')
+        recorder = SessionRecorder(path, clock=iter([100.0, 100.1, 100.2, 100.3]).__next__, client_id=7)
+
+        recorder.attach(ib)
+        ib.client.conn.sendMsg(b'API\0' + b'\x00\x00\x00\x09v157..178')
+        ib.client.conn.hasData.emit(encode_message(['157', '20250101 09:30:00 EST']))
+        ib.client.conn.sendMsg(encode_message(['71', '2', '7', '']))
+        recorder.close()
+
+        header, events = read_session(path)
+        assert header['client_id'] == 7
+        assert events == [
+            (0.1, SENT, ['API', 'v157..178']),
+            (0.2, RECEIVED, ['157', '20250101 09:30:00 EST']),
+            (0.3, SENT, ['71', '2', '7', '']),
+        ]
+        assert 'sendMsg' not in ib.client.conn.__dict__
+
+    def test_records_received_data_before_the_client_handles_it(self, tmp_path):
+        """Should record a response before the requests the client sends in reaction to it"""
+        recorded_when_handled = []
+        ib = make_ib(lambda data: recorded_when_handled.append(recorder.events))
+        recorder = SessionRecorder(str(tmp_path / 'session.jsonl.gz'))
+
+        recorder.attach(ib)
+        ib.client.conn.hasData.emit(encode_message(['9', '1', '5']))
+        recorder.close()
+
+        assert recorded_when_handled == [1]
+
+    def test_rejects_other_files(self, tmp_path):
+        """Should refuse files that are not session recordings"""
+        path = tmp_path / 'other.jsonl.gz'
+        with gzip.open(path, 'wt') as f:
+            f.write('{"format": "something-else"}\n')
+
+        with pytest.raises(ValueError):
+            read_session(str(path))
@@ -21,7 +21,8 @@ from core.utils import (
     format_currency,
     format_percentage,
     get_strikes_around_price,
-    is_market_hours
+    is_market_hours,
+    get_next_market_open
 )
 
 
@@ -353,3 +354,34 @@ class TestIsMarketHours:
         
         assert result is True
 
+
+
+class TestGetNextMarketOpen:
+    """Tests for get_next_market_open function"""
+    
+    def test_before_open_returns_same_day(self):
+        """Should return today's open before 9:30 AM on a weekday"""
+        eastern = pytz.timezone('US/Eastern')
+        now = eastern.localize(datetime(2024, 1, 10, 8, 0, 0))
+        
+        assert get_next_market_open(now) == eastern.localize(datetime(2024, 1, 10, 9, 30))
+    
+    def test_during_session_returns_next_day(self):
+        """Should return the next weekday's open once the session has started"""
+        eastern = pytz.timezone('US/Eastern')
+        now = eastern.localize(datetime(2024, 1, 10, 12, 0, 0))
+        
+        assert get_next_market_open(now) == eastern.localize(datetime(2024, 1, 11, 9, 30))
+    
+    def test_friday_after_close_skips_weekend(self):
+        """Should return Monday's open after Friday's close"""
+        eastern = pytz.timezone('US/Eastern')
+        now = eastern.localize(datetime(2024, 1, 12, 17, 0, 0))
+        
+        assert get_next_market_open(now) == eastern.localize(datetime(2024, 1, 15, 9, 30))
+    
+    def test_naive_time_is_treated_as_eastern(self):
+        """Should accept naive datetimes as US/Eastern local time"""
+        eastern = pytz.timezone('US/Eastern')
+        
+        assert get_next_market_open(datetime(2024, 1, 13, 10, 0)) == eastern.localize(datetime(2024, 1, 15, 9, 30))
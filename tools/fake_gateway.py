@@ -0,0 +1,986 @@
+"""
+Local stand-in for IB Gateway speaking the TWS API socket protocol
+
+The fake gateway accepts real ib_async clients (and therefore IBConnection)
+on localhost, so connection code can be exercised and benchmarked without
+TWS. It implements the requests the application makes: the API handshake,
+contract details, option chain parameters, streaming market data with model
+greeks, positions, account updates and summary, executions, and order
+placement, status and cancellation, and historical bars. Every response is delayed by a
+configurable latency plus random jitter.
+
+Usage:
+    python -m tools.fake_gateway --port 4002 --latency 0.02 --jitter 0.01
+
+Then point connection.json at the same host and port.
+"""
+
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+import itertools
+import logging
+import math
+import random
+import struct
+import threading
+import time
+import zlib
+
+from core.greeks import norm_cdf, years_to_expiry
+from core.history import BAR_SIZES
+
+logger = logging.getLogger('autotrader.fake_gateway')
+
+# Protocol version negotiated with clients (the lowest ib_async supports)
+SERVER_VERSION = 157
+
+# TWS error codes sent by the gateway
+NO_SECURITY_DEFINITION = 200
+ORDER_CANCELLED = 202
+CLIENT_ID_IN_USE = 326
+
+# Default universe: symbol -> (conId, price, annualized volatility, strike increment)
+DEFAULT_SECURITIES = {
+    'AAPL': (265598, 190.0, 0.25, 2.5),
+    'MSFT': (272093, 410.0, 0.22, 5.0),
+    'NVDA': (4815747, 120.0, 0.45, 1.0),
+    'SPY': (756733, 560.0, 0.15, 5.0),
+}
+
+# Tick types used in market data messages
+TICK_BID_SIZE, TICK_BID, TICK_ASK, TICK_ASK_SIZE, TICK_LAST, TICK_LAST_SIZE = 0, 1, 2, 3, 4, 5
+TICK_VOLUME, TICK_CLOSE, TICK_MODEL_GREEKS, TICK_OPTION_IV = 8, 9, 13, 24
+
+# Seconds per unit of historical data duration strings
+DURATION_UNITS = {'S': 1, 'D': 86400, 'W': 7 * 86400, 'M': 30 * 86400, 'Y': 365 * 86400}
+
+# Historical data types that report volatility instead of prices
+VOLATILITY_DATA = ('OPTION_IMPLIED_VOLATILITY', 'HISTORICAL_VOLATILITY')
+
+# Account values reported through account updates and the account summary
+ACCOUNT_TAGS = ('TotalCashValue', 'NetLiquidation', 'ExcessLiquidity', 'FullInitMarginReq', 'BuyingPower')
+
+
+def black_scholes(spot, strike, years, volatility, right, rate=0.0):
+    """
+    Black-Scholes price and greeks used to quote simulated options
+
+    Args:
+        spot (float): Underlying price
+        strike (float): Strike price
+        years (float): Time to expiry in years
+        volatility (float): Annualized volatility
+        right (str): 'C' or 'P'
+        rate (float, optional): Risk-free rate
+
+    Returns:
+        tuple: (price, delta, gamma, vega, theta); vega per volatility point and
+               theta per calendar day, as TWS reports them
+    """
+    sqrt_t = math.sqrt(years)
+    d1 = (math.log(spot / strike) + (rate + 0.5 * volatility ** 2) * years) / (volatility * sqrt_t)
+    d2 = d1 - volatility * sqrt_t
+    pdf = math.exp(-0.5 * d1 * d1) / math.sqrt(2 * math.pi)
+    discount = math.exp(-rate * years)
+    if right == 'C':
+        price = spot * norm_cdf(d1) - strike * discount * norm_cdf(d2)
+        delta = norm_cdf(d1)
+        theta = -spot * pdf * volatility / (2 * sqrt_t) - rate * strike * discount * norm_cdf(d2)
+    else:
+        price = strike * discount * norm_cdf(-d2) - spot * norm_cdf(-d1)
+        delta = norm_cdf(d1) - 1.0
+        theta = -spot * pdf * volatility / (2 * sqrt_t) + rate * strike * discount * norm_cdf(-d2)
+    gamma = pdf / (spot * volatility * sqrt_t)
+    vega = spot * pdf * sqrt_t / 100
+    return max(price, 0.0), delta, gamma, vega, theta / 365
+
+
+class FakeSecurity:
+    """
+    A simulated underlying and its listed options
+    """
+    def __init__(self, symbol, con_id, price, volatility, strike_increment, expirations):
+        self.symbol = symbol
+        self.con_id = con_id
+        self.price = price
+        self.close = price
+        self.base_price = price  # Fixed level the simulated history is drawn around
+        self.volatility = volatility
+        self.expirations = expirations
+        # Strikes from 50% to 150% of the starting price
+        low = math.ceil(price * 0.5 / strike_increment)
+        high = math.floor(price * 1.5 / strike_increment)
+        self.strikes = [round(i * strike_increment, 2) for i in range(low, high + 1)]
+
+    def option_volatility(self, strike):
+        """
+        Implied volatility with a simple smile around the current price
+        """
+        return self.volatility * (1 + 0.5 * abs(math.log(strike / self.price)))
+
+    def historical_price(self, seconds):
+        """
+        Deterministic price at a past time: a slow cycle plus daily noise
+
+        The same time always gives the same price, so overlapping historical
+        requests return consistent bars.
+        """
+        noise = random.Random(zlib.crc32(f"{self.con_id}:{int(seconds) // 86400}".encode())).gauss(0, 1)
+        cycle = 0.1 * math.sin(2 * math.pi * seconds / (90 * 86400))
+        return self.base_price * math.exp(cycle + self.volatility / math.sqrt(252) * noise)
+
+    def historical_volatility(self, seconds):
+        """
+        Deterministic implied volatility at a past time, cycling around the current level
+        """
+        return self.volatility * (1 + 0.3 * math.sin(2 * math.pi * seconds / (60 * 86400)))
+
+
+class FakeContract:
+    """
+    A contract known to the gateway
+    """
+    def __init__(self, security, sec_type='STK', expiration='', strike=0.0, right=''):
+        self.security = security
+        self.sec_type = sec_type
+        self.expiration = expiration
+        self.strike = strike
+        self.right = right
+        if sec_type == 'OPT':
+            self.local_symbol = f"{security.symbol:<6}{expiration[2:]}{right}{int(round(strike * 1000)):08d}"
+            # Stable across runs, so persisted contract caches stay valid
+            self.con_id = 100000000 + zlib.crc32(self.local_symbol.encode()) % 800000000
+            self.multiplier = '100'
+        else:
+            self.local_symbol = security.symbol
+            self.con_id = security.con_id
+            self.multiplier = ''
+
+    @property
+    def symbol(self):
+        return self.security.symbol
+
+    def fields(self, exchange='SMART', primary_exchange=True):
+        """
+        Contract fields as serialized in most messages (conId through tradingClass)
+        """
+        fields = [self.con_id, self.symbol, self.sec_type, self.expiration, self.strike,
+                  self.right, self.multiplier, exchange]
+        if primary_exchange:
+            fields.append('NASDAQ')
+        return fields + ['USD', self.local_symbol, self.symbol]
+
+    def historical_value(self, seconds, what_to_show):
+        """
+        Simulated historical value of the contract at a time in epoch seconds
+        """
+        if what_to_show in VOLATILITY_DATA:
+            return self.security.historical_volatility(seconds)
+        spot = self.security.historical_price(seconds)
+        if self.sec_type != 'OPT':
+            return spot
+        at = datetime.fromtimestamp(seconds, timezone.utc)
+        years = years_to_expiry(self.expiration, at)
+        return black_scholes(spot, self.strike, years, self.security.option_volatility(self.strike), self.right)[0]
+
+    def quote(self):
+        """
+        Current simulated quote
+
+        Returns:
+            dict: 'bid', 'ask', 'last' and, for options, 'iv' and model 'greeks'
+        """
+        spot = self.security.price
+        if self.sec_type != 'OPT':
+            spread = max(round(spot * 0.0002, 2), 0.01)
+            return {'bid': round(spot - spread, 2), 'ask': round(spot + spread, 2), 'last': round(spot, 2)}
+
+        years = years_to_expiry(self.expiration)
+        volatility = self.security.option_volatility(self.strike)
+        price, delta, gamma, vega, theta = black_scholes(spot, self.strike, years, volatility, self.right)
+        spread = max(round(price * 0.04, 2), 0.01)
+        bid = max(round(price - spread / 2, 2), 0.0)
+        return {
+            'bid': bid,
+            'ask': round(bid + spread, 2),
+            'last': round(price, 2),
+            'iv': volatility,
+            'greeks': (volatility, delta, price, gamma, vega, theta, spot)
+        }
+
+
+class FakeOrder:
+    """
+    An order placed with the gateway
+    """
+    def __init__(self, order_id, perm_id, client_id, contract, action, quantity, order_type, limit_price, order_ref=''):
+        self.order_id = order_id
+        self.perm_id = perm_id
+        self.client_id = client_id
+        self.contract = contract
+        self.action = action
+        self.quantity = quantity
+        self.order_type = order_type
+        self.limit_price = limit_price
+        self.order_ref = order_ref
+        self.status = 'Submitted'
+        self.filled = 0.0
+        self.avg_fill_price = 0.0
+        self.fill_task = None
+
+    @property
+    def remaining(self):
+        return self.quantity - self.filled
+
+
+class GatewayServer:
+    """
+    Localhost TCP server lifecycle shared by the gateway stand-ins
+
+    Run it on the current event loop with start()/stop(), or on its own
+    thread with start_in_thread()/stop_thread() when the caller is
+    synchronous (tests and benchmarks). Subclasses create one session per
+    client connection; sessions provide run() and close().
+    """
+    name = 'gateway'
+
+    def __init__(self, host='127.0.0.1', port=0):
+        """
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on; 0 picks a free port (see `port` after start)
+        """
+        self.host = host
+        self.port = port
+        self.loop = None
+        self._all_sessions = set()
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def create_session(self, reader, writer):
+        """
+        Build the session serving one client connection
+        """
+        raise NotImplementedError
+
+    async def start(self):
+        """
+        Start listening on the running event loop
+        """
+        self.loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(self._on_client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"{self.name.capitalize()} listening on {self.host}:{self.port}")
+
+    async def stop(self):
+        """
+        Stop listening and close every client connection
+        """
+        for session in list(self._all_sessions):
+            session.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def start_in_thread(self):
+        """
+        Run the gateway on its own thread and event loop
+
+        Returns:
+            GatewayServer: self, listening once this returns
+        """
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name.replace(' ', '-'), daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop_thread(self, timeout=5):
+        """
+        Stop a gateway started with start_in_thread()
+        """
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.stop(), self.loop).result(timeout)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(self.start())
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _on_client(self, reader, writer):
+        session = self.create_session(reader, writer)
+        self._all_sessions.add(session)
+        try:
+            await session.run()
+        except asyncio.CancelledError:
+            pass
+        finally:
+            session.close()
+            self._all_sessions.discard(session)
+
+
+class FakeGateway(GatewayServer):
+    """
+    TWS API server simulating a paper trading account
+    """
+    name = 'fake gateway'
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, tick_interval=0.25,
+                 fill_delay=0.05, securities=None, account='DU0000001', cash=100000.0,
+                 positions=None, weeks=8, seed=None):
+        """
+        Initialize the gateway (call start() or start_in_thread() to listen)
+
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on; 0 picks a free port (see `port` after start)
+            latency (float): Seconds added before every response
+            jitter (float): Maximum random seconds added to or removed from latency
+            tick_interval (float): Seconds between market data updates
+            fill_delay (float): Seconds before an order fills; None leaves orders working
+            securities (dict, optional): symbol -> (conId, price, volatility, strike increment)
+            account (str): Account ID reported to clients
+            cash (float): Starting cash balance
+            positions (dict, optional): symbol -> (shares, average cost) of stock held
+            weeks (int): Number of weekly expirations listed per underlying
+            seed (int, optional): Random seed for reproducible prices and jitter
+        """
+        super().__init__(host, port)
+        self.latency = latency
+        self.jitter = jitter
+        self.tick_interval = tick_interval
+        self.fill_delay = fill_delay
+        self.account = account
+        self.cash = cash
+        self.random = random.Random(seed)
+        self.order_ids = itertools.count(1)
+        self.perm_ids = itertools.count(1000000)
+        self.exec_ids = itertools.count(1)
+        self.sessions = {}  # clientId -> FakeSession
+        self.orders = {}  # permId -> FakeOrder
+        self.executions = []  # (FakeOrder, execId, shares, price, time, commission)
+
+        expirations = self._list_expirations(weeks)
+        self.securities = {
+            symbol: FakeSecurity(symbol, *spec, expirations)
+            for symbol, spec in (securities or DEFAULT_SECURITIES).items()
+        }
+        self.contracts = {}  # conId -> FakeContract
+        for security in self.securities.values():
+            self._register(FakeContract(security))
+        # conId -> [position, average cost]
+        self.positions = {
+            self.securities[symbol].con_id: [float(shares), float(avg_cost)]
+            for symbol, (shares, avg_cost) in (positions or {}).items()
+        }
+
+        self._market_task = None
+
+    @staticmethod
+    def _list_expirations(weeks):
+        """
+        List weekly Friday expirations starting this week
+        """
+        today = datetime.now().date()
+        friday = today + timedelta(days=(4 - today.weekday()) % 7)
+        return [(friday + timedelta(weeks=i)).strftime('%Y%m%d') for i in range(weeks)]
+
+    def _register(self, contract):
+        self.contracts.setdefault(contract.con_id, contract)
+        return self.contracts[contract.con_id]
+
+    def find_contracts(self, con_id=0, symbol='', sec_type='', expiration='', strike=0.0, right=''):
+        """
+        Find the contracts matching a (possibly partial) contract description
+
+        Returns:
+            list: Matching FakeContracts
+        """
+        if con_id:
+            contract = self.contracts.get(con_id)
+            return [contract] if contract else []
+        security = self.securities.get(symbol)
+        if security is None:
+            return []
+        if sec_type in ('', 'STK'):
+            return [self.contracts[security.con_id]] if sec_type == 'STK' or not expiration else []
+        if sec_type != 'OPT':
+            return []
+        matches = []
+        for exp in ([expiration] if expiration else security.expirations):
+            if exp not in security.expirations:
+                continue
+            for listed_strike in ([strike] if strike else security.strikes):
+                if listed_strike not in security.strikes:
+                    continue
+                for listed_right in ([right] if right else ['C', 'P']):
+                    matches.append(self._register(FakeContract(security, 'OPT', exp, listed_strike, listed_right)))
+        return matches
+
+    # Lifecycle
+
+    async def start(self):
+        """
+        Start listening and simulating prices on the running event loop
+        """
+        await super().start()
+        self._market_task = asyncio.ensure_future(self._move_prices())
+
+    async def stop(self):
+        """
+        Stop listening and close every client connection
+        """
+        if self._market_task is not None:
+            self._market_task.cancel()
+        await super().stop()
+
+    def create_session(self, reader, writer):
+        return FakeSession(self, reader, writer)
+
+    async def delay(self):
+        """
+        Wait for one response latency
+        """
+        seconds = self.latency + self.random.uniform(-self.jitter, self.jitter) if self.jitter else self.latency
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    async def _move_prices(self):
+        """
+        Random-walk every underlying's price
+        """
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            years = self.tick_interval / (252 * 6.5 * 3600)
+            for security in self.securities.values():
+                shock = self.random.gauss(0, security.volatility * math.sqrt(years))
+                security.price = round(security.price * math.exp(shock), 4)
+
+    # Account
+
+    def account_values(self):
+        """
+        Current account values as (tag, value, currency)
+        """
+        market_value = sum(self.market_value(con_id) for con_id in self.positions)
+        net_liquidation = self.cash + market_value
+        margin = sum(abs(self.market_value(con_id)) * 0.25 for con_id in self.positions)
+        values = {
+            'TotalCashValue': self.cash,
+            'NetLiquidation': net_liquidation,
+            'ExcessLiquidity': net_liquidation - margin,
+            'FullInitMarginReq': margin,
+            'BuyingPower': (net_liquidation - margin) * 4
+        }
+        return [(tag, f"{values[tag]:.2f}", 'USD') for tag in ACCOUNT_TAGS] + [('ExchangeRate', '1.00', 'USD')]
+
+    def market_value(self, con_id):
+        contract = self.contracts[con_id]
+        multiplier = float(contract.multiplier or 1)
+        return self.positions[con_id][0] * contract.quote()['last'] * multiplier
+
+    def portfolio_fields(self, con_id):
+        """
+        updatePortfolio message for a position
+        """
+        contract = self.contracts[con_id]
+        position, avg_cost = self.positions[con_id]
+        market_price = contract.quote()['last']
+        market_value = self.market_value(con_id)
+        fields = contract.fields(primary_exchange=False)
+        # updatePortfolio carries the primary exchange instead of the exchange
+        fields[7] = 'NASDAQ'
+        return [7, 8, *fields, position, market_price, market_value, avg_cost,
+                market_value - position * avg_cost, 0.0, self.account]
+
+    # Orders
+
+    def place_order(self, session, order):
+        """
+        Accept an order and schedule its fill
+        """
+        self.orders[order.perm_id] = order
+        if self.fill_delay is not None:
+            order.fill_task = asyncio.ensure_future(self._fill_later(session, order))
+
+    async def _fill_later(self, session, order):
+        await asyncio.sleep(self.fill_delay)
+        quote = order.contract.quote()
+        price = order.limit_price if order.order_type == 'LMT' and order.limit_price else (quote['bid'] + quote['ask']) / 2
+        self.fill(session, order, order.remaining, price)
+
+    def fill(self, session, order, shares, price):
+        """
+        Execute part or all of an order and report it to the placing client
+        """
+        if order.status in ('Filled', 'Cancelled') or shares <= 0:
+            return
+        contract = order.contract
+        multiplier = float(contract.multiplier or 1)
+        signed = shares if order.action == 'BUY' else -shares
+        commission = max(0.65 * shares, 1.0) if contract.sec_type == 'OPT' else max(0.005 * shares, 1.0)
+
+        order.avg_fill_price = (order.avg_fill_price * order.filled + price * shares) / (order.filled + shares)
+        order.filled += shares
+        order.status = 'Filled' if order.remaining <= 0 else 'Submitted'
+
+        position = self.positions.setdefault(contract.con_id, [0.0, 0.0])
+        new_position = position[0] + signed
+        if new_position and (position[0] == 0 or (new_position > 0) == (position[0] > 0)) and abs(new_position) > abs(position[0]):
+            position[1] = (position[1] * abs(position[0]) + price * multiplier * shares) / abs(new_position)
+        position[0] = new_position
+        self.cash -= signed * price * multiplier + commission
+
+        execution = (order, f"0000e0d5.{next(self.exec_ids):08d}.01.01", shares, price, datetime.now(), commission)
+        self.executions.append(execution)
+
+        if session is not None and not session.closed:
+            session.send(*session.exec_details_fields(-1, execution))
+            session.send(*session.commission_fields(execution))
+            session.send_order_status(order)
+            session.send(*session.open_order_fields(order))
+        for other in list(self.sessions.values()):
+            if other.account_updates:
+                other.send_account_update(contract.con_id)
+        if not position[0]:
+            self.positions.pop(contract.con_id, None)
+
+    def cancel_order(self, order):
+        """
+        Cancel a working order
+
+        Returns:
+            bool: True if the order was working
+        """
+        if order.status in ('Filled', 'Cancelled'):
+            return False
+        if order.fill_task is not None:
+            order.fill_task.cancel()
+        order.status = 'Cancelled'
+        return True
+
+
+class FakeSession:
+    """
+    One client connection to the fake gateway
+    """
+    def __init__(self, gateway, reader, writer):
+        self.gateway = gateway
+        self.reader = reader
+        self.writer = writer
+        self.client_id = None
+        self.closed = False
+        self.account_updates = False
+        self.subscriptions = {}  # reqId -> streaming task
+        self.handlers = {
+            1: self.req_mkt_data,
+            2: self.cancel_mkt_data,
+            3: self.place_order,
+            4: self.cancel_order,
+            5: self.req_open_orders,
+            6: self.req_account_updates,
+            7: self.req_executions,
+            8: self.req_ids,
+            9: self.req_contract_details,
+            20: self.req_historical_data,
+            49: self.req_current_time,
+            61: self.req_positions,
+            62: self.req_account_summary,
+            71: self.start_api,
+            76: self.req_account_updates_multi,
+            78: self.req_sec_def_opt_params,
+            99: self.req_completed_orders,
+        }
+
+    async def run(self):
+        """
+        Serve the client until it disconnects
+        """
+        prefix = await self.reader.readexactly(4)
+        if prefix != b'API\0':
+            logger.warning(f"Unexpected handshake {prefix!r}")
+            return
+        await self._read_message()  # supported client versions
+        self.send(SERVER_VERSION, datetime.now().strftime('%Y%m%d %H:%M:%S') + ' EST')
+
+        while not self.closed:
+            try:
+                fields = await self._read_message()
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+            handler = self.handlers.get(int(fields[0]))
+            if handler is None:
+                logger.debug(f"Ignoring unsupported message {fields[0]}")
+                continue
+            try:
+                result = handler(fields)
+                if asyncio.iscoroutine(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.error(f"Error handling message {fields}: {e}")
+
+    async def _read_message(self):
+        size = struct.unpack('>I', await self.reader.readexactly(4))[0]
+        data = await self.reader.readexactly(size)
+        return data.decode(errors='backslashreplace').split('\0')[:-1]
+
+    def send(self, *fields):
+        """
+        Serialize and send one message
+        """
+        if self.closed:
+            return
+        text = ''.join(self._format(field) + '\0' for field in fields).encode()
+        self.writer.write(struct.pack('>I', len(text)) + text)
+
+    @staticmethod
+    def _format(field):
+        if field is None:
+            return ''
+        if isinstance(field, bool):
+            return '1' if field else '0'
+        return str(field)
+
+    def error(self, req_id, code, message):
+        self.send(4, 2, req_id, code, message)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for task in self.subscriptions.values():
+            task.cancel()
+        self.subscriptions.clear()
+        if self.gateway.sessions.get(self.client_id) is self:
+            del self.gateway.sessions[self.client_id]
+        self.writer.close()
+
+    # Connection
+
+    def start_api(self, fields):
+        client_id = int(fields[2])
+        if client_id in self.gateway.sessions:
+            self.error(-1, CLIENT_ID_IN_USE,
+                       'Unable to connect as the client id is already in use. Retry with a unique client id.')
+            self.gateway.loop.call_later(0.05, self.close)
+            return
+        self.client_id = client_id
+        self.gateway.sessions[client_id] = self
+        self.send(9, 1, next(self.gateway.order_ids))
+        self.send(15, 1, self.gateway.account)
+
+    async def req_ids(self, fields):
+        await self.gateway.delay()
+        self.send(9, 1, next(self.gateway.order_ids))
+
+    async def req_current_time(self, fields):
+        await self.gateway.delay()
+        self.send(49, 1, int(time.time()))
+
+    # Contracts
+
+    async def req_contract_details(self, fields):
+        req_id = int(fields[2])
+        con_id, symbol, sec_type, expiration, strike, right = fields[3:9]
+        exchange = fields[10] or 'SMART'
+        await self.gateway.delay()
+        contracts = self.gateway.find_contracts(int(con_id or 0), symbol, sec_type, expiration,
+                                                float(strike or 0), right)
+        if not contracts:
+            self.error(req_id, NO_SECURITY_DEFINITION, 'No security definition has been found for the request')
+            return
+        for contract in contracts:
+            self.send(*self.contract_details_fields(req_id, contract, exchange))
+        self.send(52, 1, req_id)
+
+    @staticmethod
+    def contract_details_fields(req_id, contract, exchange):
+        security = contract.security
+        is_option = contract.sec_type == 'OPT'
+        return [
+            10, 8, req_id, contract.symbol, contract.sec_type, contract.expiration, contract.strike,
+            contract.right, exchange, 'USD', contract.local_symbol, contract.symbol, contract.symbol,
+            contract.con_id, 0.01, '', contract.multiplier, 'LMT,MKT', 'SMART,CBOE,NASDAQ', 1,
+            security.con_id if is_option else '', security.symbol, 'NASDAQ',
+            contract.expiration[:6] if is_option else '', '', '', '', 'US/Eastern', '', '', '', '', 0,
+            1, security.symbol if is_option else '', 'STK' if is_option else '', '26', contract.expiration,
+            '' if is_option else 'COMMON'
+        ]
+
+    async def req_sec_def_opt_params(self, fields):
+        req_id = int(fields[1])
+        symbol = fields[2]
+        await self.gateway.delay()
+        security = self.gateway.securities.get(symbol)
+        if security is not None:
+            for exchange in ('SMART', 'CBOE'):
+                self.send(75, req_id, exchange, security.con_id, symbol, 100,
+                          len(security.expirations), *security.expirations,
+                          len(security.strikes), *security.strikes)
+        self.send(76, req_id)
+
+    # Market data
+
+    def req_mkt_data(self, fields):
+        req_id = int(fields[2])
+        con_id = int(fields[3] or 0)
+        generic_ticks = fields[16]
+        snapshot = fields[17] == '1'
+        contracts = self.gateway.find_contracts(con_id, fields[4], fields[5], fields[6], float(fields[7] or 0), fields[8])
+        if len(contracts) != 1:
+            self.error(req_id, NO_SECURITY_DEFINITION, 'No security definition has been found for the request')
+            return
+        self.subscriptions[req_id] = asyncio.ensure_future(
+            self._stream(req_id, contracts[0], generic_ticks, snapshot))
+
+    def cancel_mkt_data(self, fields):
+        task = self.subscriptions.pop(int(fields[2]), None)
+        if task is not None:
+            task.cancel()
+
+    async def _stream(self, req_id, contract, generic_ticks, snapshot):
+        """
+        Send a contract's quote after one latency, then on every tick interval
+        """
+        await self.gateway.delay()
+        first = True
+        while not self.closed:
+            quote = contract.quote()
+            if first:
+                self.send(1, 6, req_id, TICK_CLOSE, contract.security.close if contract.sec_type != 'OPT' else quote['last'], 0, 0)
+                self.send(2, 6, req_id, TICK_VOLUME, self.gateway.random.randint(100, 10000))
+            self.send(1, 6, req_id, TICK_BID, quote['bid'], 10, 0)
+            self.send(1, 6, req_id, TICK_ASK, quote['ask'], 10, 0)
+            self.send(1, 6, req_id, TICK_LAST, quote['last'], 1, 0)
+            if 'greeks' in quote:
+                iv, delta, price, gamma, vega, theta, spot = quote['greeks']
+                self.send(21, req_id, TICK_MODEL_GREEKS, 0, iv, delta, price, 0, gamma, vega, theta, spot)
+                if '106' in generic_ticks.split(','):
+                    self.send(45, 6, req_id, TICK_OPTION_IV, quote['iv'])
+            if snapshot:
+                self.send(57, 1, req_id)
+                self.subscriptions.pop(req_id, None)
+                return
+            first = False
+            await asyncio.sleep(self.gateway.tick_interval)
+
+    # Historical data
+
+    async def req_historical_data(self, fields):
+        req_id = int(fields[1])
+        contracts = self.gateway.find_contracts(int(fields[2] or 0), fields[3], fields[4], fields[5],
+                                                float(fields[6] or 0), fields[7])
+        end_text, bar_size, duration, _, what_to_show, format_date = fields[15:21]
+        await self.gateway.delay()
+        if len(contracts) != 1 or bar_size not in BAR_SIZES:
+            self.error(req_id, NO_SECURITY_DEFINITION, 'No security definition has been found for the request')
+            return
+        # 'YYYYmmdd-HH:MM:SS' or 'YYYYmmdd HH:MM:SS UTC'; clients send UTC
+        end = (datetime.strptime(end_text[:8] + end_text[9:17], '%Y%m%d%H:%M:%S').replace(tzinfo=timezone.utc)
+               if end_text else datetime.now(timezone.utc))
+        amount, unit = duration.split()
+        start = end - timedelta(seconds=int(amount) * DURATION_UNITS[unit])
+        bar_seconds = BAR_SIZES[bar_size][0]
+
+        bars = []
+        bar_start = int(end.timestamp()) // bar_seconds * bar_seconds
+        while bar_start >= start.timestamp() - bar_seconds:
+            moment = datetime.fromtimestamp(bar_start, timezone.utc)
+            if moment.weekday() < 5:
+                close = contracts[0].historical_value(bar_start + bar_seconds, what_to_show)
+                open_ = contracts[0].historical_value(bar_start, what_to_show)
+                if bar_seconds >= 86400:
+                    label = moment.strftime('%Y%m%d')
+                else:
+                    label = str(bar_start) if format_date == '2' else moment.strftime('%Y%m%d %H:%M:%S UTC')
+                volume = 0 if what_to_show in VOLATILITY_DATA else 1000 + zlib.crc32(label.encode()) % 100000
+                bars.append((label, round(open_, 4), round(max(open_, close) * 1.002, 4),
+                             round(min(open_, close) * 0.998, 4), round(close, 4), volume,
+                             round((open_ + close) / 2, 4), 100))
+            bar_start -= bar_seconds
+        bars.reverse()
+        self.send(17, req_id, start.strftime('%Y%m%d %H:%M:%S'), end.strftime('%Y%m%d %H:%M:%S'), len(bars),
+                  *(field for bar in bars for field in bar))
+
+    # Account
+
+    async def req_positions(self, fields):
+        await self.gateway.delay()
+        for con_id, (position, avg_cost) in list(self.gateway.positions.items()):
+            self.send(61, 3, self.gateway.account, *self.gateway.contracts[con_id].fields(primary_exchange=False),
+                      position, avg_cost)
+        self.send(62, 1)
+
+    async def req_account_updates(self, fields):
+        subscribe = fields[2] == '1'
+        self.account_updates = subscribe
+        if not subscribe:
+            return
+        await self.gateway.delay()
+        for tag, value, currency in self.gateway.account_values():
+            self.send(6, 2, tag, value, currency, self.gateway.account)
+        for con_id in list(self.gateway.positions):
+            self.send(*self.gateway.portfolio_fields(con_id))
+        self.send(8, 1, datetime.now().strftime('%H:%M'))
+        self.send(54, 1, self.gateway.account)
+
+    def send_account_update(self, con_id):
+        """
+        Push the account values and a changed position to a subscribed client
+        """
+        for tag, value, currency in self.gateway.account_values():
+            self.send(6, 2, tag, value, currency, self.gateway.account)
+        if con_id in self.gateway.positions:
+            self.send(*self.gateway.portfolio_fields(con_id))
+        else:
+            fields = self.gateway.contracts[con_id].fields(primary_exchange=False)
+            fields[7] = 'NASDAQ'
+            self.send(7, 8, *fields, 0, 0, 0, 0, 0, 0, self.gateway.account)
+
+    async def req_account_updates_multi(self, fields):
+        req_id = int(fields[2])
+        await self.gateway.delay()
+        for tag, value, currency in self.gateway.account_values():
+            self.send(73, 1, req_id, self.gateway.account, '', tag, value, currency)
+        self.send(74, 1, req_id)
+
+    async def req_account_summary(self, fields):
+        req_id = int(fields[2])
+        tags = set(fields[4].split(','))
+        await self.gateway.delay()
+        for tag, value, currency in self.gateway.account_values():
+            if tag in tags or 'All' in tags:
+                self.send(63, 1, req_id, self.gateway.account, tag, value, currency)
+        self.send(64, 1, req_id)
+
+    # Orders
+
+    async def place_order(self, fields):
+        order_id = int(fields[1])
+        con_id, symbol, sec_type, expiration, strike, right = fields[2:8]
+        action, quantity, order_type, limit_price = fields[16:20]
+        await self.gateway.delay()
+        contracts = self.gateway.find_contracts(int(con_id or 0), symbol, sec_type, expiration, float(strike or 0), right)
+        if len(contracts) != 1:
+            self.error(order_id, NO_SECURITY_DEFINITION, 'No security definition has been found for the request')
+            return
+        order = FakeOrder(order_id, next(self.gateway.perm_ids), self.client_id, contracts[0], action,
+                          float(quantity), order_type, float(limit_price or 0), fields[26])
+        self.send(*self.open_order_fields(order))
+        self.send_order_status(order)
+        self.gateway.place_order(self, order)
+
+    async def cancel_order(self, fields):
+        order_id = int(fields[2])
+        await self.gateway.delay()
+        for order in self.gateway.orders.values():
+            if order.order_id == order_id and order.client_id == self.client_id:
+                if self.gateway.cancel_order(order):
+                    self.send_order_status(order)
+                    self.error(order_id, ORDER_CANCELLED, 'Order Canceled - reason:')
+                return
+
+    async def req_open_orders(self, fields):
+        await self.gateway.delay()
+        for order in self.gateway.orders.values():
+            if order.client_id == self.client_id and order.status not in ('Filled', 'Cancelled'):
+                self.send(*self.open_order_fields(order))
+                self.send_order_status(order)
+        self.send(53, 1)
+
+    async def req_completed_orders(self, fields):
+        await self.gateway.delay()
+        self.send(102)
+
+    async def req_executions(self, fields):
+        req_id = int(fields[2])
+        await self.gateway.delay()
+        for execution in self.gateway.executions:
+            self.send(*self.exec_details_fields(req_id, execution))
+            self.send(*self.commission_fields(execution))
+        self.send(55, 1, req_id)
+
+    def send_order_status(self, order):
+        self.send(3, order.order_id, order.status, order.filled, order.remaining, order.avg_fill_price,
+                  order.perm_id, 0, order.avg_fill_price, order.client_id, '', 0.0)
+
+    def open_order_fields(self, order):
+        """
+        openOrder message for an order, in the field layout of SERVER_VERSION
+        """
+        contract = order.contract
+        limit_price = order.limit_price if order.order_type == 'LMT' else ''
+        return [
+            5, order.order_id, *contract.fields(primary_exchange=False),
+            order.action, order.quantity, order.order_type, limit_price, '', 'DAY', '', self.gateway.account,
+            'O', 0, order.order_ref, order.client_id, order.perm_id,
+            0, 0, 0, '', '', '', '', '', '',  # outsideRth through faProfile
+            '', '', '', '', '', 0, '', '', '', '', '', '', '', '',  # modelCode through stockRangeUpper
+            0, 0, 0, 0, '', 0, 0, 0, 0, 0, 0, '', 0, '', '',  # displaySize through deltaNeutralAuxPrice
+            0, 0, '', '', '', '', '',  # continuousUpdate through comboLegsDescrip
+            0, 0, 0,  # combo legs, order combo legs, smart combo routing params
+            '', '', '',  # scale order sizes and price increment
+            '',  # hedgeType
+            0, '', '', 0, 0,  # optOutSmartRouting through deltaNeutralContract flag
+            '',  # algoStrategy
+            0, 0, order.status, '', '', '', '', '', '', '', '', '',  # solicited, whatIf, order state margins
+            '', '', '', 'USD', '', 0, 0,  # commissions through randomizePrice
+            0,  # conditions
+            '', '', '', '', '', '', '', 0, '', '', '', '', 0, 0, 0, ''  # adjusted order through usePriceMgmtAlgo
+        ]
+
+    def exec_details_fields(self, req_id, execution):
+        order, exec_id, shares, price, executed_at, _ = execution
+        side = 'BOT' if order.action == 'BUY' else 'SLD'
+        return [
+            11, req_id, order.order_id, *order.contract.fields(primary_exchange=False), exec_id,
+            executed_at.strftime('%Y%m%d  %H:%M:%S'), self.gateway.account, 'SMART', side, shares, price,
+            order.perm_id, order.client_id, 0, order.filled, order.avg_fill_price, order.order_ref, '', '', '', 1
+        ]
+
+    @staticmethod
+    def commission_fields(execution):
+        _, exec_id, _, _, _, commission = execution
+        return [59, 1, exec_id, commission, 'USD', '', '', '']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local IB Gateway stand-in')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=4002, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added before every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Maximum random seconds added to or removed from latency')
+    parser.add_argument('--tick-interval', type=float, default=0.25, help='Seconds between market data updates')
+    parser.add_argument('--fill-delay', type=float, default=0.05, help='Seconds before orders fill; negative to never fill')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    gateway = FakeGateway(args.host, args.port, latency=args.latency, jitter=args.jitter,
+                          tick_interval=args.tick_interval,
+                          fill_delay=None if args.fill_delay < 0 else args.fill_delay, seed=args.seed)
+
+    async def serve():
+        await gateway.start()
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
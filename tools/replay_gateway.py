@@ -0,0 +1,333 @@
+"""
+TWS API server that plays back a recorded IB session
+
+Sessions recorded by IBConnection (the `record_dir` setting, see
+core/session_recording.py) are served back to real ib_async clients, so a
+workload can be rerun against the market data, account values and order
+events of a real session without a broker.
+
+Each client connection walks the recording in order. A recorded request is
+matched to the next live request with the same fields, ignoring request
+IDs; the messages received after it are then sent with the recorded request
+IDs rewritten to the live ones. Responses are paced at the recorded delay
+after their request, scaled by `speed`, or sent immediately at maximum
+speed. Recorded requests the client does not repeat within `match_timeout`
+are skipped together with their responses. The client must make the same
+requests as the recorded one; requests that depend on today's date, such as
+default expirations, only match recordings from the same week.
+
+Usage:
+    python -m tools.replay_gateway recordings/ib_session_1_20250101_093000_000000.jsonl.gz --port 4002 --speed 0
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+import logging
+import struct
+
+from core.session_recording import (HANDSHAKE_PREFIX, RECEIVED, SENT, decode_fields, encode_message,
+                                    read_session)
+from tools.fake_gateway import GatewayServer
+
+logger = logging.getLogger('autotrader.replay_gateway')
+
+# Positions of request and order IDs in client messages, by message ID. These
+# are matched loosely and mapped from recorded to live values.
+REQUEST_ID_FIELDS = {
+    1: (2,),    # reqMktData
+    2: (2,),    # cancelMktData
+    3: (1,),    # placeOrder
+    4: (2,),    # cancelOrder
+    7: (2,),    # reqExecutions
+    9: (2,),    # reqContractDetails
+    20: (1,),   # reqHistoricalData
+    25: (2,),   # cancelHistoricalData
+    62: (2,),   # reqAccountSummary
+    63: (2,),   # cancelAccountSummary
+    76: (2,),   # reqAccountUpdatesMulti
+    77: (2,),   # cancelAccountUpdatesMulti
+    78: (1,),   # reqSecDefOptParams
+}
+
+# Client message fields ignored when matching but not mapped (startApi client ID)
+IGNORED_REQUEST_FIELDS = {
+    71: (2,),
+}
+
+# Positions of request and order IDs in server messages, by message ID
+RESPONSE_ID_FIELDS = {
+    1: (2,),       # tickPrice
+    2: (2,),       # tickSize
+    3: (1,),       # orderStatus
+    4: (2,),       # error
+    5: (1,),       # openOrder
+    10: (2,),      # contractDetails (before server version 164)
+    11: (1, 2),    # execDetails: reqId, orderId
+    17: (1,),      # historicalData
+    21: (1,),      # tickOptionComputation
+    45: (2,),      # tickGeneric
+    46: (2,),      # tickString
+    52: (2,),      # contractDetailsEnd
+    55: (2,),      # execDetailsEnd
+    57: (2,),      # tickSnapshotEnd
+    58: (2,),      # marketDataType
+    63: (2,),      # accountSummary
+    64: (2,),      # accountSummaryEnd
+    73: (2,),      # accountUpdateMulti
+    74: (2,),      # accountUpdateMultiEnd
+    75: (1,),      # securityDefinitionOptionParameter
+    76: (1,),      # securityDefinitionOptionParameterEnd
+    81: (1,),      # tickReqParams
+}
+
+# Server version from which contractDetails no longer carries a version field
+CONTRACT_DETAILS_NO_VERSION = 164
+
+
+def response_id_fields(msg_id, server_version):
+    """
+    Get the positions of request IDs in a server message
+
+    Args:
+        msg_id (int): Server message ID
+        server_version (int): Negotiated protocol version
+
+    Returns:
+        tuple: Field positions
+    """
+    if msg_id == 10 and server_version >= CONTRACT_DETAILS_NO_VERSION:
+        return (1,)
+    return RESPONSE_ID_FIELDS.get(msg_id, ())
+
+
+def request_key(fields):
+    """
+    Matching key of a client message: its fields with request IDs blanked
+
+    Args:
+        fields (list): Message fields
+
+    Returns:
+        tuple: Key that is equal for the same request made with different IDs
+    """
+    msg_id = int(fields[0]) if fields and fields[0].isdigit() else None
+    ignored = REQUEST_ID_FIELDS.get(msg_id, ()) + IGNORED_REQUEST_FIELDS.get(msg_id, ())
+    return tuple('' if i in ignored else field for i, field in enumerate(fields))
+
+
+class ReplayGateway(GatewayServer):
+    """
+    TWS API server replaying one recorded session to every client that connects
+    """
+    name = 'replay gateway'
+
+    def __init__(self, path, host='127.0.0.1', port=0, speed=1.0, match_timeout=5.0):
+        """
+        Load the recording (call start() or start_in_thread() to listen)
+
+        Args:
+            path (str): Recording written by SessionRecorder
+            host (str): Interface to listen on
+            port (int): Port to listen on; 0 picks a free port (see `port` after start)
+            speed (float): Playback speed relative to the recording; None or 0
+                           sends every response as soon as its request arrives
+            match_timeout (float): Seconds to wait for the client to repeat a
+                                   recorded request before skipping it
+        """
+        super().__init__(host, port)
+        self.path = path
+        self.speed = speed or None
+        self.match_timeout = match_timeout
+        self.header, self.events = read_session(path)
+        # Matching key of every recorded request, None for received messages
+        self.keys = [request_key(fields) if direction == SENT else None
+                     for _, direction, fields in self.events]
+        # Totals over all sessions: matched, skipped and unexpected requests, sent messages
+        self.stats = Counter()
+
+    def create_session(self, reader, writer):
+        return ReplaySession(self, reader, writer)
+
+
+class ReplaySession:
+    """
+    One client connection to the replay gateway
+    """
+    def __init__(self, gateway, reader, writer):
+        self.gateway = gateway
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+        self.server_version = 0
+        self.ids = {}  # recorded request/order ID -> live ID
+        self.skipped = set()  # recorded IDs of requests the client did not repeat
+        self.backlog = []  # live requests not matched yet
+        self.pending = Counter(key for key in gateway.keys if key is not None)  # recorded requests still ahead
+        self.incoming = asyncio.Queue()
+        self._reader_task = None
+        self._anchor = (0.0, 0.0)  # (recorded seconds, loop time) of the last matched request
+
+    async def run(self):
+        """
+        Play the recording to the client, then serve it until it disconnects
+        """
+        loop = asyncio.get_running_loop()
+        prefix = await self.reader.readexactly(4)
+        if prefix != HANDSHAKE_PREFIX:
+            logger.warning(f"Unexpected handshake {prefix!r}")
+            return
+        await self._read_message()  # supported client versions
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+        self._anchor = (0.0, loop.time())
+
+        for (seconds, direction, fields), key in zip(self.gateway.events, self.gateway.keys):
+            if self.closed:
+                return
+            if direction == SENT:
+                self.pending[key] -= 1
+                if fields[:1] == ['API']:
+                    continue  # the handshake was read above
+                if await self._expect(fields, key):
+                    self._anchor = (seconds, loop.time())
+            elif direction == RECEIVED:
+                await self._wait_until(seconds)
+                self._emit(fields)
+
+        # Recording exhausted; count what else the client asks for until it leaves
+        self.gateway.stats['unexpected'] += len(self.backlog)
+        self.backlog.clear()
+        while await self.incoming.get() is not None:
+            self.gateway.stats['unexpected'] += 1
+
+    async def _read_message(self):
+        size = struct.unpack('>I', await self.reader.readexactly(4))[0]
+        return decode_fields(await self.reader.readexactly(size))
+
+    async def _read_loop(self):
+        try:
+            while True:
+                self.incoming.put_nowait(await self._read_message())
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.incoming.put_nowait(None)
+
+    async def _expect(self, recorded, key):
+        """
+        Wait for the live request matching a recorded one and map its IDs
+
+        The recorded request is skipped after match_timeout, or as soon as the
+        client makes a request recorded later (e.g. because it was served from
+        a cache this time).
+
+        Returns:
+            bool: True if matched, False if skipped or the client disconnected
+        """
+        for i, live in enumerate(self.backlog):
+            if request_key(live) == key:
+                del self.backlog[i]
+                self._map_ids(recorded, live)
+                return True
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.gateway.match_timeout
+        while not any(self.pending[request_key(live)] > 0 for live in self.backlog):
+            try:
+                live = await asyncio.wait_for(self.incoming.get(), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                break
+            if live is None:
+                self.closed = True
+                return False
+            if request_key(live) == key:
+                self._map_ids(recorded, live)
+                return True
+            self.backlog.append(live)
+
+        self.gateway.stats['skipped'] += 1
+        for position in REQUEST_ID_FIELDS.get(int(recorded[0]), ()):
+            if position < len(recorded):
+                self.skipped.add(recorded[position])
+        logger.debug(f"Client did not repeat recorded request {recorded}; skipping it")
+        return False
+
+    def _map_ids(self, recorded, live):
+        self.gateway.stats['matched'] += 1
+        for position in REQUEST_ID_FIELDS.get(int(recorded[0]), ()):
+            if position < len(recorded):
+                self.ids[recorded[position]] = live[position]
+
+    async def _wait_until(self, seconds):
+        """
+        Sleep until a recorded message is due, relative to the last matched request
+        """
+        if self.gateway.speed is None:
+            return
+        recorded_at, matched_at = self._anchor
+        loop = asyncio.get_running_loop()
+        delay = matched_at + (seconds - recorded_at) / self.gateway.speed - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _emit(self, fields):
+        """
+        Send a recorded server message with its request IDs mapped to the live ones
+        """
+        if not self.server_version:
+            # The first message received is the handshake reply: [version, connection time]
+            self.server_version = int(fields[0])
+            self.send(fields)
+            return
+        fields = list(fields)
+        for position in response_id_fields(int(fields[0]), self.server_version):
+            if position >= len(fields):
+                continue
+            if fields[position] in self.skipped:
+                return
+            fields[position] = self.ids.get(fields[position], fields[position])
+        self.send(fields)
+
+    def send(self, fields):
+        if self.closed:
+            return
+        self.writer.write(encode_message(fields))
+        self.gateway.stats['sent'] += 1
+
+    def close(self):
+        self.closed = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if not self.writer.is_closing():
+            self.writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded IB session as a local IB Gateway')
+    parser.add_argument('recording', help='Recording written by IBConnection (record_dir setting)')
+    parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on')
+    parser.add_argument('--port', type=int, default=4002, help='Port to listen on')
+    parser.add_argument('--speed', type=float, default=1.0, help='Playback speed; 0 for maximum speed')
+    parser.add_argument('--match-timeout', type=float, default=5.0,
+                        help='Seconds to wait for the client to repeat a recorded request')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    gateway = ReplayGateway(args.recording, args.host, args.port, speed=args.speed,
+                            match_timeout=args.match_timeout)
+
+    async def serve():
+        await gateway.start()
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info(f"Replay stats: {dict(gateway.stats)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark the options service against recorded IB sessions
+
+`record` runs the workload against TWS (or the fake gateway) with session
+recording enabled; `replay` runs the same workload against the replay
+gateway and reports how long each call took. Replay at maximum speed
+(`--speed 0`) measures the application's own overhead; `--max-seconds`
+makes the command fail when the workload gets slower, for use in CI.
+
+Usage:
+    python -m tools.session_benchmark record --port 7497 --tickers AAPL,MSFT --out recordings
+    python -m tools.session_benchmark replay recordings/ib_session_1_...jsonl.gz --tickers AAPL,MSFT --speed 0
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from config import Config
+from core.connection_pool import get_connection_pool
+from tools.replay_gateway import ReplayGateway
+
+logger = logging.getLogger('autotrader.session_benchmark')
+
+
+def run_workload(tickers, otm_percentage=10):
+    """
+    Time OptionsService.get_otm_options for each ticker, then check_pending_orders
+
+    Args:
+        tickers (list): Ticker symbols
+        otm_percentage (float): OTM percentage passed to get_otm_options
+
+    Returns:
+        dict: Seconds taken by each call, keyed by call name
+    """
+    # Imported here so the pool is configured before the service first uses it
+    from api.services.options_service import OptionsService
+
+    service = OptionsService()
+    timings = {}
+    for ticker in tickers:
+        started = time.perf_counter()
+        result = service.get_otm_options(ticker, otm_percentage)
+        timings[f"get_otm_options:{ticker}"] = time.perf_counter() - started
+        error = result.get('error') or result.get('data', {}).get(ticker, {}).get('error')
+        if error:
+            logger.warning(f"get_otm_options({ticker}) failed: {error}")
+
+    started = time.perf_counter()
+    service.check_pending_orders()
+    timings['check_pending_orders'] = time.perf_counter() - started
+    return timings
+
+
+def run_against(host, port, tickers, otm_percentage, record_dir=None):
+    """
+    Run the workload on the shared connection pool pointed at host:port
+
+    Contracts are qualified into an empty cache, so recording and replay
+    make the same requests regardless of what options.db already holds.
+    """
+    config = Config()
+    config.set('host', host)
+    config.set('port', port)
+    config.set('record_dir', record_dir)
+    config.set('db_path', os.path.join(tempfile.mkdtemp(prefix='session_benchmark_'), 'contracts.db'))
+    pool = get_connection_pool(config)
+    try:
+        return run_workload(tickers, otm_percentage)
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the options service against recorded IB sessions')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', help='Run the workload against TWS and record the session')
+    record.add_argument('--host', default='127.0.0.1', help='TWS/IB Gateway host')
+    record.add_argument('--port', type=int, default=7497, help='TWS/IB Gateway port')
+    record.add_argument('--out', default='recordings', help='Directory to write the recording to')
+
+    replay = commands.add_parser('replay', help='Run the workload against a recorded session')
+    replay.add_argument('recording', help='Recording written by the record command')
+    replay.add_argument('--speed', type=float, default=0.0, help='Playback speed; 0 for maximum speed')
+    replay.add_argument('--match-timeout', type=float, default=5.0,
+                        help='Seconds to wait for a recorded request before skipping it')
+    replay.add_argument('--max-seconds', type=float, default=None,
+                        help='Exit with an error if the workload takes longer than this')
+
+    for command in (record, replay):
+        command.add_argument('--tickers', default='AAPL', help='Comma-separated tickers')
+        command.add_argument('--otm', type=float, default=10, help='OTM percentage')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    tickers = [ticker.strip().upper() for ticker in args.tickers.split(',') if ticker.strip()]
+
+    if args.command == 'record':
+        existing = set(glob.glob(os.path.join(args.out, '*.jsonl.gz')))
+        timings = run_against(args.host, args.port, tickers, args.otm, record_dir=args.out)
+        recorded = sorted(set(glob.glob(os.path.join(args.out, '*.jsonl.gz'))) - existing)
+        print(json.dumps({'timings': timings, 'recordings': recorded}, indent=2))
+        return
+
+    gateway = ReplayGateway(args.recording, speed=args.speed, match_timeout=args.match_timeout)
+    gateway.start_in_thread()
+    try:
+        timings = run_against(gateway.host, gateway.port, tickers, args.otm)
+    finally:
+        gateway.stop_thread()
+    total = sum(timings.values())
+    print(json.dumps({'timings': timings, 'total': total, 'replay': dict(gateway.stats)}, indent=2))
+    if args.max_seconds is not None and total > args.max_seconds:
+        logger.error(f"Workload took {total:.3f}s, over the {args.max_seconds:.3f}s limit")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()